@@ -0,0 +1,4 @@
+from dotenv import load_dotenv
+
+# .env is loaded once, here, before any app module reads its settings
+load_dotenv()
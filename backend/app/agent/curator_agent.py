@@ -1,13 +1,9 @@
-import os
-import json
 import time
-from typing import List
-from google import genai
+from typing import List, Optional
 from google.genai.errors import ClientError
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
-
-load_dotenv()
+from app.agent.llm import LLMClient
+from app.utils.lexical import lexical_order, prerank
 
 
 class RankedArticle(BaseModel):
@@ -83,14 +79,79 @@ CRITICAL RULES:
 - Provide specific, technical reasoning for each ranking"""
 
 
+def source_priority_bonus(article_type: str) -> float:
+    """
+    Calculate source priority bonus for tier 1 AI labs
+    Returns bonus score to add to base relevance score
+    """
+    # Tier 1: Primary AI Labs (Google, Anthropic, OpenAI, Meta)
+    tier1_sources = ['google', 'anthropic', 'openai', 'meta']
+    
+    article_type_lower = article_type.lower()
+    
+    # Check if article is from a tier 1 source
+    for source in tier1_sources:
+        if source in article_type_lower:
+            return 1.0  # Add 1.0 bonus to tier 1 sources
+    
+    # Tier 2: All other sources get no bonus
+    return 0.0
+
+
+def post_process_rankings(articles: List[RankedArticle]) -> List[RankedArticle]:
+    """Apply the source priority bonus to the LLM's scores, re-sort and renumber the ranks"""
+    if not articles:
+        return articles
+    
+    # Apply source priority bonus to tier 1 sources
+    for article in articles:
+        # Extract article type from digest_id (format: "article_type:article_id")
+        article_type = article.digest_id.split(':')[0] if ':' in article.digest_id else ''
+        bonus = source_priority_bonus(article_type)
+        
+        if bonus > 0:
+            original_score = article.relevance_score
+            article.relevance_score = min(10.0, article.relevance_score + bonus)
+            print(f"✓ Applied +{bonus} bonus to {article_type}: {original_score:.1f} → {article.relevance_score:.1f}")
+    
+    # Sort by relevance score (descending) after applying bonuses
+    articles = sorted(articles, key=lambda x: x.relevance_score, reverse=True)
+    
+    # Re-assign ranks to ensure they're sequential
+    for i, article in enumerate(articles, 1):
+        article.rank = i
+    
+    # Log score distribution for monitoring
+    scores = [a.relevance_score for a in articles]
+    print(f"Score distribution: min={min(scores):.1f}, max={max(scores):.1f}, "
+          f"avg={sum(scores)/len(scores):.1f}, range={max(scores)-min(scores):.1f}")
+    
+    return articles
+
+
+def lexical_ranking(digests: List[dict], interests: List[str]) -> List[RankedArticle]:
+    """
+    Ranking to send when the curator's reply is unusable: the BM25 pre-rank
+    order against the profile interests, scored evenly from 10 down
+    """
+    ordered = lexical_order(digests, interests)
+    step = 10.0 / max(len(ordered), 1)
+    return [
+        RankedArticle(
+            digest_id=d["id"],
+            relevance_score=round(10.0 - i * step, 2),
+            rank=i + 1,
+            reasoning="Keyword match with your interests (curator ranking unavailable)"
+        )
+        for i, d in enumerate(ordered)
+    ]
+
+
 class CuratorAgent:
     def __init__(self, user_profile: dict):
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = "gemini-2.5-flash-lite"
+        self.llm = LLMClient("curator")
         self.user_profile = user_profile
         self.system_prompt = self._build_system_prompt()
-        self.last_request_time = 0
-        self.min_request_interval = 6.5  # 6.5 seconds between requests
 
     def _build_system_prompt(self) -> str:
         # Group interests by category for better context
@@ -131,37 +192,20 @@ CONTENT PREFERENCES:
 
 ═══════════════════════════════════════════════════════════════"""
 
-    def _rate_limit(self):
-        """Ensure we don't exceed rate limits by spacing out requests"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            sleep_time = self.min_request_interval - elapsed
-            print(f"Rate limiting: waiting {sleep_time:.1f}s...")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
-    
-    def _get_source_priority_bonus(self, article_type: str) -> float:
+    def rank_digests(self, digests: List[dict], candidate_limit: Optional[int] = None) -> List[RankedArticle]:
         """
-        Calculate source priority bonus for tier 1 AI labs
-        Returns bonus score to add to base relevance score
+        Rank digests with the LLM. With candidate_limit, a local BM25 pass against
+        the profile interests first narrows the list to that many candidates.
         """
-        # Tier 1: Primary AI Labs (Google, Anthropic, OpenAI, Meta)
-        tier1_sources = ['google', 'anthropic', 'openai', 'meta']
-        
-        article_type_lower = article_type.lower()
-        
-        # Check if article is from a tier 1 source
-        for source in tier1_sources:
-            if source in article_type_lower:
-                return 1.0  # Add 1.0 bonus to tier 1 sources
-        
-        # Tier 2: All other sources get no bonus
-        return 0.0
-
-    def rank_digests(self, digests: List[dict]) -> List[RankedArticle]:
         if not digests:
             return []
         
+        if candidate_limit and len(digests) > candidate_limit:
+            start = time.perf_counter()
+            total = len(digests)
+            digests = prerank(digests, self.user_profile["interests"], candidate_limit)
+            print(f"Pre-ranked {total} → {len(digests)} candidates in {(time.perf_counter() - start) * 1000:.0f}ms")
+        
         # Format digests with better structure
         digest_list = "\n\n".join([
             f"[{i+1}] ID: {d['id']}\n"
@@ -205,110 +249,23 @@ Return your response as valid JSON (no line breaks in strings):
     }}
   ]
 }}"""
+        print(f"Curator prompt: {len(digests)} articles, {len(user_prompt):,} chars")
 
-        max_retries = 3
-        base_delay = 10
-        
-        for attempt in range(max_retries):
-            try:
-                # Rate limit before making request
-                self._rate_limit()
-                
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=user_prompt,
-                    config={"response_mime_type": "application/json"}
-                )
-                
-                # Clean the response text
-                response_text = response.text.strip()
-                
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-                
-                # Try to parse JSON
-                try:
-                    result = json.loads(response_text)
-                except json.JSONDecodeError as json_err:
-                    print(f"JSON decode error: {json_err}")
-                    print(f"Response text: {response_text[:1000]}")
-                    
-                    # Try to fix common JSON issues
-                    # Replace control characters with spaces
-                    import re
-                    cleaned_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', response_text)
-                    
-                    try:
-                        result = json.loads(cleaned_text)
-                        print("✓ Successfully parsed after cleaning control characters")
-                    except json.JSONDecodeError as second_err:
-                        print(f"Still failed after cleaning: {second_err}")
-                        print(f"Cleaned text sample: {cleaned_text[:1000]}")
-                        return []
-                
-                ranked_list = RankedDigestList(**result)
-                articles = ranked_list.articles if ranked_list else []
-                
+        try:
+            articles = RankedDigestList(**self.llm.generate_json(user_prompt)).articles
+            if articles:
                 # Post-process: apply source priority bonus and ensure proper ranking
-                if articles:
-                    # Apply source priority bonus to tier 1 sources
-                    for article in articles:
-                        # Extract article type from digest_id (format: "article_type:article_id")
-                        article_type = article.digest_id.split(':')[0] if ':' in article.digest_id else ''
-                        bonus = self._get_source_priority_bonus(article_type)
-                        
-                        if bonus > 0:
-                            original_score = article.relevance_score
-                            article.relevance_score = min(10.0, article.relevance_score + bonus)
-                            print(f"✓ Applied +{bonus} bonus to {article_type}: {original_score:.1f} → {article.relevance_score:.1f}")
-                    
-                    # Sort by relevance score (descending) after applying bonuses
-                    articles = sorted(articles, key=lambda x: x.relevance_score, reverse=True)
-                    
-                    # Re-assign ranks to ensure they're sequential
-                    for i, article in enumerate(articles, 1):
-                        article.rank = i
-                    
-                    # Log score distribution for monitoring
-                    if articles:
-                        scores = [a.relevance_score for a in articles]
-                        print(f"Score distribution: min={min(scores):.1f}, max={max(scores):.1f}, "
-                              f"avg={sum(scores)/len(scores):.1f}, range={max(scores)-min(scores):.1f}")
-                
-                return articles
-                
-            except ClientError as e:
-                if e.status_code == 429:  # Rate limit error
-                    if attempt < max_retries - 1:
-                        retry_delay = base_delay * (2 ** attempt)
-                        try:
-                            import re
-                            match = re.search(r'(\d+\.?\d*)s', str(e))
-                            if match:
-                                retry_delay = float(match.group(1)) + 1
-                        except:
-                            pass
-                        
-                        print(f"Rate limit hit. Retrying in {retry_delay:.1f}s... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        print(f"Rate limit exceeded after {max_retries} attempts: {e}")
-                        return []
-                else:
-                    print(f"API error: {e}")
-                    return []
-                    
-            except Exception as e:
-                print(f"Error ranking digests: {e}")
-                import traceback
-                traceback.print_exc()
-                return []
+                return post_process_rankings(articles)
+            print("Curator returned no rankings")
+        
+        except ClientError as e:
+            print(f"API error: {e}")
+        
+        except Exception as e:
+            print(f"Error ranking digests: {e}")
+            import traceback
+            traceback.print_exc()
         
-        return []
+        # An edition ranked by keyword beats no email at all
+        print(f"Falling back to the lexical ranking of {len(digests)} candidates")
+        return lexical_ranking(digests, self.user_profile["interests"])
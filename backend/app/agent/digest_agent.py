@@ -1,20 +1,21 @@
-import os
-import json
-import time
-from typing import Optional
-from google import genai
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 from google.genai.errors import ClientError
-from pydantic import BaseModel
-from dotenv import load_dotenv
+from pydantic import BaseModel, ValidationError
+from app.agent.llm import LLMClient, estimate_tokens
+from app.config import DIGEST_COMPRESSION_ENABLED, DIGEST_CONTENT_TOKEN_BUDGET
+from app.utils.compression import compress
 
-load_dotenv()
+MAX_CONTENT_CHARS = 8000
 
 
 class DigestOutput(BaseModel):
     title: str
     summary: str
 
-PROMPT = """You are an expert AI news analyst specializing in summarizing technical articles, research papers, and video content about artificial intelligence.
+GUIDELINES = """You are an expert AI news analyst specializing in summarizing technical articles, research papers, and video content about artificial intelligence.
 
 Your role is to create concise, informative digests that help readers quickly understand the key points and significance of AI-related content.
 
@@ -23,91 +24,143 @@ Guidelines:
 - Write a 2-3 sentence summary that highlights the main points and why they matter
 - Focus on actionable insights and implications
 - Use clear, accessible language while maintaining technical accuracy
-- Avoid marketing fluff - focus on substance
+- Avoid marketing fluff - focus on substance"""
+
+PROMPT = f"""{GUIDELINES}
 
 Return your response as JSON with fields: title (string), summary (string)"""
 
+BATCH_PROMPT = f"""{GUIDELINES}
+
+You will get several items, each starting with a line "### ID: <id>". Write one digest per item, from that item's content only.
+
+Return your response as JSON: {{"digests": [{{"id": string, "title": string, "summary": string}}, ...]}} with exactly one entry per item, using each item's ID exactly as given."""
+
+
+PROMPT_CACHE_SIZE = 256
+
+# (article key, content hash) -> prompt content. Keyed on a hash so the cache never
+# holds full article bodies, only the (budget-sized) text that goes into prompts.
+_prompt_cache: "OrderedDict[Tuple[str, bytes], str]" = OrderedDict()
+_prompt_cache_lock = threading.Lock()
+
+
+def prompt_content(content: str, title: str = "") -> str:
+    """The part of an article's content that goes into a digest prompt"""
+    if not DIGEST_COMPRESSION_ENABLED:
+        return content[:MAX_CONTENT_CHARS]
+    return compress(content, DIGEST_CONTENT_TOKEN_BUDGET, title) or content[:MAX_CONTENT_CHARS]
+
+
+def article_key(article: dict) -> str:
+    return f"{article['type']}:{article['id']}"
+
+
+def article_prompt_content(article: dict) -> str:
+    """
+    prompt_content of an article, cached by its key and a hash of its content:
+    batch packing sizes an article's prompt item before the request builds it.
+    """
+    key = (article_key(article), hashlib.blake2b(f"{article['title']}\n{article['content']}".encode(),
+                                                 digest_size=16).digest())
+    with _prompt_cache_lock:
+        cached = _prompt_cache.get(key)
+        if cached is not None:
+            _prompt_cache.move_to_end(key)
+            return cached
+    result = prompt_content(article["content"], article["title"])
+    with _prompt_cache_lock:
+        _prompt_cache[key] = result
+        if len(_prompt_cache) > PROMPT_CACHE_SIZE:
+            _prompt_cache.popitem(last=False)
+    return result
+
+
+def batch_item(label: str, article: dict) -> str:
+    return f"### ID: {label}\nType: {article['type']}\nTitle: {article['title']}\nContent: {article_prompt_content(article)}\n"
+
+
+def pack_batches(articles: List[dict], token_budget: int, max_articles: int) -> List[List[dict]]:
+    """
+    Split articles, in order, into batches of at most max_articles whose prompt
+    items add up to at most token_budget (estimated) tokens. An article over
+    the budget on its own gets a batch to itself.
+    """
+    batches, batch, tokens = [], [], estimate_tokens(BATCH_PROMPT)
+    for article in articles:
+        item_tokens = estimate_tokens(batch_item(f"A{max_articles}", article))
+        if batch and (len(batch) >= max_articles or tokens + item_tokens > token_budget):
+            batches.append(batch)
+            batch, tokens = [], estimate_tokens(BATCH_PROMPT)
+        batch.append(article)
+        tokens += item_tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
 
 class DigestAgent:
     def __init__(self):
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = "gemini-2.5-flash-lite"
+        self.llm = LLMClient("digest")  # LLM_MIN_REQUEST_INTERVAL apart: 9 requests/min max by default
         self.system_prompt = PROMPT
-        self.last_request_time = 0
-        self.min_request_interval = 6.5  # 6.5 seconds between requests (9 requests/min max)
-
-    def _rate_limit(self):
-        """Ensure we don't exceed rate limits by spacing out requests"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            sleep_time = self.min_request_interval - elapsed
-            print(f"Rate limiting: waiting {sleep_time:.1f}s...")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
 
     def generate_digest(self, title: str, content: str, article_type: str) -> Optional[DigestOutput]:
-        max_retries = 3
-        base_delay = 10
+        user_prompt = f"{self.system_prompt}\n\nCreate a digest for this {article_type}: \n Title: {title} \n Content: {prompt_content(content, title)}"
         
-        for attempt in range(max_retries):
-            try:
-                # Rate limit before making request
-                self._rate_limit()
-                
-                user_prompt = f"{self.system_prompt}\n\nCreate a digest for this {article_type}: \n Title: {title} \n Content: {content[:8000]}"
-
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=user_prompt,
-                    config={"response_mime_type": "application/json"}
-                )
-                
-                # Clean the response text
-                response_text = response.text.strip()
-                
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-                
-                result = json.loads(response_text)
-                
-                return DigestOutput(**result)
-                
-            except ClientError as e:
-                if e.status_code == 429:  # Rate limit error
-                    if attempt < max_retries - 1:
-                        # Extract retry delay from error if available
-                        retry_delay = base_delay * (2 ** attempt)  # Exponential backoff
-                        try:
-                            # Try to get the suggested delay from the error
-                            if 'retryDelay' in str(e):
-                                import re
-                                match = re.search(r'(\d+\.?\d*)s', str(e))
-                                if match:
-                                    retry_delay = float(match.group(1)) + 1  # Add 1s buffer
-                        except:
-                            pass
-                        
-                        print(f"Rate limit hit. Retrying in {retry_delay:.1f}s... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        print(f"Rate limit exceeded after {max_retries} attempts: {e}")
-                        return None
-                else:
-                    print(f"API error: {e}")
-                    return None
-                    
-            except Exception as e:
-                print(f"Error generating digest: {e}")
-                import traceback
-                traceback.print_exc()
-                return None
+        try:
+            result = self.llm.generate_json(user_prompt)
+            return DigestOutput(**result)
+        
+        except ClientError as e:
+            print(f"API error: {e}")
+            return None
+        
+        except Exception as e:
+            print(f"Error generating digest: {e}")
+            import traceback
+            traceback.print_exc()
+            return None
         
         return None
 
+    def generate_digests(self, articles: List[dict]) -> Dict[str, DigestOutput]:
+        """
+        Digest several articles ({"type", "id", "title", "content"}) in one request.
+        Returns the valid digests by article key ("type:id"). Entries that are
+        missing, duplicated, malformed or empty are left out, for the caller to retry.
+        """
+        # Short labels rather than the articles' own IDs (often long URLs), so the model copies them reliably
+        labels = {f"A{i}": article for i, article in enumerate(articles, 1)}
+        items = "\n".join(batch_item(label, article) for label, article in labels.items())
+        user_prompt = f"{BATCH_PROMPT}\n\nCreate a digest for each of these {len(articles)} items:\n\n{items}"
+
+        try:
+            result = self.llm.generate_json(user_prompt)
+        except ClientError as e:
+            print(f"API error: {e}")
+            return {}
+        except Exception as e:
+            print(f"Error generating batched digests: {e}")
+            return {}
+
+        entries = result.get("digests") if isinstance(result, dict) else result
+        digests = {}
+        seen = set()
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            label = str(entry.get("id", "")).strip()
+            if label not in labels:
+                continue
+            if label in seen:
+                # A repeated ID means the model mixed two items up: trust neither
+                digests.pop(article_key(labels[label]), None)
+                continue
+            seen.add(label)
+            try:
+                digest = DigestOutput(title=entry.get("title"), summary=entry.get("summary"))
+            except ValidationError:
+                continue
+            if digest.title.strip() and digest.summary.strip():
+                digests[article_key(labels[label])] = digest
+        return digests
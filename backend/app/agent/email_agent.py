@@ -1,15 +1,14 @@
-import os
-import json
-import time
 from datetime import datetime, timezone
 from typing import List, Optional
-from google import genai
 from google.genai.errors import ClientError
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
+from app.agent.llm import LLMClient
 from app.config import USER_TIMEZONE
 
-load_dotenv()
+
+def build_greeting(name: str) -> str:
+    current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
+    return f"Hey {name}, here is your daily digest of AI news for {current_date}."
 
 
 class EmailIntroduction(BaseModel):
@@ -25,6 +24,7 @@ class RankedArticleDetail(BaseModel):
     url: str
     article_type: str
     reasoning: Optional[str] = None
+    also_covered_by: List[dict] = Field(default_factory=list)
 
 
 class EmailDigestResponse(BaseModel):
@@ -42,6 +42,9 @@ class EmailDigestResponse(BaseModel):
             markdown += f"## {article.title}\n\n"
             markdown += f"{article.summary}\n\n"
             markdown += f"[Read more →]({article.url})\n\n"
+            if article.also_covered_by:
+                sources = ", ".join(f"[{d['article_type']}]({d['url']})" for d in article.also_covered_by)
+                markdown += f"Also covered by: {sources}\n\n"
             markdown += "---\n\n"
         
         return markdown
@@ -63,37 +66,38 @@ Your role is to write a warm, professional introduction for a daily AI news dige
 
 Keep it concise (2-3 sentences for the introduction), friendly, and professional."""
 
+EDITION_PROMPT = """You are an expert email writer specializing in creating engaging AI news digests.
+
+Your role is to write a warm, professional introduction for a daily AI news digest email. The same
+introduction is sent to many readers, and each email already starts with its own personal greeting, so:
+- Do not greet the reader and do not address or name any reader
+- Provide a brief, engaging overview of what's coming in the top 10 ranked articles
+- Highlight the most interesting or important themes
+- Set expectations for the content ahead
+
+Keep it concise (2-3 sentences), friendly, and professional."""
+
+
+def summarize_articles(ranked_articles: List) -> str:
+    return "\n".join([
+        f"{idx + 1}. {article.title if hasattr(article, 'title') else article.get('title', 'N/A')} (Score: {article.relevance_score if hasattr(article, 'relevance_score') else article.get('relevance_score', 0):.1f}/10)"
+        for idx, article in enumerate(ranked_articles[:10])
+    ])
+
 
 class EmailAgent:
     def __init__(self, user_profile: dict):
-        self.client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        self.model = "gemini-2.5-flash-lite"
+        self.llm = LLMClient("email")
         self.user_profile = user_profile
-        self.last_request_time = 0
-        self.min_request_interval = 6.5  # 6.5 seconds between requests
-
-    def _rate_limit(self):
-        """Ensure we don't exceed rate limits by spacing out requests"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            sleep_time = self.min_request_interval - elapsed
-            print(f"Rate limiting: waiting {sleep_time:.1f}s...")
-            time.sleep(sleep_time)
-        self.last_request_time = time.time()
 
     def generate_introduction(self, ranked_articles: List) -> EmailIntroduction:
         if not ranked_articles:
-            current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
             return EmailIntroduction(
-                greeting=f"Hey {self.user_profile['name']}, here is your daily digest of AI news for {current_date}.",
+                greeting=build_greeting(self.user_profile['name']),
                 introduction="No articles were ranked today."
             )
         
-        top_articles = ranked_articles[:10]
-        article_summaries = "\n".join([
-            f"{idx + 1}. {article.title if hasattr(article, 'title') else article.get('title', 'N/A')} (Score: {article.relevance_score if hasattr(article, 'relevance_score') else article.get('relevance_score', 0):.1f}/10)"
-            for idx, article in enumerate(top_articles)
-        ])
+        article_summaries = summarize_articles(ranked_articles)
         
         current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
         user_prompt = f"""{EMAIL_PROMPT}
@@ -111,76 +115,67 @@ Return your response as JSON with the following structure:
   "introduction": "string"
 }}"""
 
-        max_retries = 3
-        base_delay = 10
+        try:
+            result = self.llm.generate_json(user_prompt)
+            
+            intro = EmailIntroduction(**result)
+            if not intro.greeting.startswith(f"Hey {self.user_profile['name']}"):
+                intro.greeting = build_greeting(self.user_profile['name'])
+            
+            return intro
+        
+        except ClientError as e:
+            print(f"API error: {e}")
         
-        for attempt in range(max_retries):
-            try:
-                # Rate limit before making request
-                self._rate_limit()
-                
-                response = self.client.models.generate_content(
-                    model=self.model,
-                    contents=user_prompt,
-                    config={"response_mime_type": "application/json"}
-                )
-                
-                # Clean the response text
-                response_text = response.text.strip()
-                
-                # Remove markdown code blocks if present
-                if response_text.startswith("```json"):
-                    response_text = response_text[7:]
-                if response_text.startswith("```"):
-                    response_text = response_text[3:]
-                if response_text.endswith("```"):
-                    response_text = response_text[:-3]
-                response_text = response_text.strip()
-                
-                result = json.loads(response_text)
-                
-                intro = EmailIntroduction(**result)
-                current_date_check = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
-                if not intro.greeting.startswith(f"Hey {self.user_profile['name']}"):
-                    intro.greeting = f"Hey {self.user_profile['name']}, here is your daily digest of AI news for {current_date_check}."
-                
-                return intro
-                
-            except ClientError as e:
-                if e.status_code == 429:  # Rate limit error
-                    if attempt < max_retries - 1:
-                        retry_delay = base_delay * (2 ** attempt)
-                        try:
-                            import re
-                            match = re.search(r'(\d+\.?\d*)s', str(e))
-                            if match:
-                                retry_delay = float(match.group(1)) + 1
-                        except:
-                            pass
-                        
-                        print(f"Rate limit hit. Retrying in {retry_delay:.1f}s... (attempt {attempt + 1}/{max_retries})")
-                        time.sleep(retry_delay)
-                        continue
-                    else:
-                        print(f"Rate limit exceeded after {max_retries} attempts: {e}")
-                        break
-                else:
-                    print(f"API error: {e}")
-                    break
-                    
-            except Exception as e:
-                print(f"Error generating introduction: {e}")
-                import traceback
-                traceback.print_exc()
-                break
+        except Exception as e:
+            print(f"Error generating introduction: {e}")
+            import traceback
+            traceback.print_exc()
         
         # Fallback
-        current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
         return EmailIntroduction(
-            greeting=f"Hey {self.user_profile['name']}, here is your daily digest of AI news for {current_date}.",
+            greeting=build_greeting(self.user_profile['name']),
             introduction="Here are the top 10 AI news articles ranked by relevance to your interests."
         )
 
+    def generate_edition_introduction(self, ranked_articles: List) -> str:
+        """
+        Introduction shared by every reader of an edition. It names no one: the
+        per-recipient greeting (build_greeting) is added when each email is sent.
+        """
+        if not ranked_articles:
+            return "No articles were ranked today."
+        
+        current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
+        user_prompt = f"""{EDITION_PROMPT}
+
+Create a shared email introduction for {current_date}.
+
+Top 10 ranked articles:
+{summarize_articles(ranked_articles)}
+
+Generate an introduction that previews these articles.
+
+Return your response as JSON with the following structure:
+{{
+  "introduction": "string"
+}}"""
+
+        try:
+            result = self.llm.generate_json(user_prompt)
+            introduction = str(result.get("introduction") or "").strip()
+            if introduction:
+                return introduction
+        
+        except ClientError as e:
+            print(f"API error: {e}")
+        
+        except Exception as e:
+            print(f"Error generating introduction: {e}")
+        
+        # Fallback
+        return "Here are the top 10 AI news articles ranked by relevance to your interests."
+
     def create_email_digest(self, ranked_articles: List[dict], limit: int = 10) -> EmailDigest:
         top_articles = ranked_articles[:limit]
         introduction = self.generate_introduction(top_articles)
@@ -0,0 +1,212 @@
+"""
+Local stand-in for the Gemini API (LLM_BACKEND=fake).
+
+FakeBackend answers the agents' prompts without a network or a key, so the
+LLMClient rate limiting and retries, and the pipeline around them, can be
+load-tested offline:
+
+- Digest prompts get {"title", "summary"} built from the article itself, and
+  batched digest prompts a {"digests": [...]} entry per listed item.
+- Ranking prompts get every listed digest ID back with a score and a unique rank.
+- Email prompts get {"greeting", "introduction"} for the named reader, and
+  shared edition prompts just {"introduction"}.
+- Each call takes latency_ms ± jitter_ms.
+- Requests and tokens are counted over a sliding minute, shared by every
+  client like a per-project quota. Over rpm or tpm, the call fails with the
+  429 RESOURCE_EXHAUSTED ClientError the API raises. Its retryDelay is the
+  time until the window frees up.
+- malformed_rate of the calls return broken JSON: either truncated, or prose
+  around the answer. Malformed batched digest answers can also be valid JSON
+  with some entries missing or blank, as models do on long batches.
+
+Token counts are estimated at four characters per token. Whether a call is
+malformed is picked from the seed, the prompt and its repeat count, so the same
+calls fail on every run.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from google.genai.errors import ClientError
+
+from app.agent.llm import estimate_tokens
+
+WINDOW_SECONDS = 60.0
+
+
+@dataclass
+class FakeUsage:
+    prompt_token_count: int
+    candidates_token_count: int
+    total_token_count: int
+
+
+@dataclass
+class FakeResponse:
+    text: str
+    usage_metadata: FakeUsage
+
+
+def _sentences(text: str, count: int) -> List[str]:
+    parts = [s.strip() for s in re.split(r"(?<=[.!?])\s+", re.sub(r"[#*`>\[\]]", " ", text)) if len(s.strip()) > 20]
+    return parts[:count]
+
+
+def digest_answer(contents: str) -> Dict[str, str]:
+    title_match = re.search(r"Title: (.*?) \n", contents)
+    title = title_match.group(1).strip() if title_match else "AI update"
+    content = contents.split(" Content: ", 1)[-1]
+    summary = " ".join(_sentences(content, 3)) or f"A new development in AI: {title}."
+    return {"title": " ".join(title.split()[:10]), "summary": summary[:600]}
+
+
+def batch_digest_answer(contents: str) -> Dict[str, Any]:
+    items = re.split(r"^### ID: ", contents, flags=re.MULTILINE)[1:]
+    digests = []
+    for item in items:
+        label, _, rest = item.partition("\n")
+        title_match = re.search(r"^Title: (.*)$", rest, flags=re.MULTILINE)
+        content = rest.split("\nContent: ", 1)[-1]
+        digest = digest_answer(f"Title: {title_match.group(1) if title_match else ''} \n Content: {content}")
+        digests.append({"id": label.strip(), **digest})
+    return {"digests": digests}
+
+
+def ranking_answer(contents: str) -> Dict[str, Any]:
+    ids = re.findall(r"^\[\d+\] ID: (\S+)$", contents, flags=re.MULTILINE)
+    # Stable pseudo-scores from the ID, so the same digests rank the same way every run
+    scored = sorted(
+        ((round(int(hashlib.sha256(digest_id.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF * 10, 1), digest_id)
+         for digest_id in ids),
+        reverse=True,
+    )
+    return {"articles": [
+        {"digest_id": digest_id, "relevance_score": score, "rank": rank,
+         "reasoning": "Matches the profile interests with concrete technical detail."}
+        for rank, (score, digest_id) in enumerate(scored, 1)
+    ]}
+
+
+def introduction_answer(contents: str) -> Dict[str, str]:
+    match = re.search(r"Create an email introduction for (.+?) for (.+?)\.\n", contents)
+    name, date = match.groups() if match else ("there", "today")
+    count = len(re.findall(r"^\d+\. .+\(Score: ", contents, flags=re.MULTILINE))
+    return {
+        "greeting": f"Hey {name}, here is your AI news digest for {date}.",
+        "introduction": f"Today's {count} picks cover the most relevant releases and research for your interests.",
+    }
+
+
+def edition_introduction_answer(contents: str) -> Dict[str, str]:
+    count = len(re.findall(r"^\d+\. .+\(Score: ", contents, flags=re.MULTILINE))
+    return {"introduction": f"Today's {count} picks cover the most relevant releases and research for your interests."}
+
+
+def answer(contents: str) -> Dict[str, Any]:
+    """Schema-valid answer for one of the agents' prompts"""
+    if "ARTICLES TO RANK:" in contents:
+        return ranking_answer(contents)
+    if "Create a shared email introduction for" in contents:
+        return edition_introduction_answer(contents)
+    if "Create an email introduction for" in contents:
+        return introduction_answer(contents)
+    if "Create a digest for each of these" in contents:
+        return batch_digest_answer(contents)
+    if "Create a digest for this" in contents:
+        return digest_answer(contents)
+    return {}
+
+
+class FakeBackend:
+    def __init__(self, latency_ms: float = 400, jitter_ms: float = 100, rpm: int = 15, tpm: int = 250000,
+                 malformed_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rpm = rpm
+        self.tpm = tpm
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.stats = Counter()
+        self._window = deque()  # (admitted_at, tokens) over the last minute
+        self._seen = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls) -> "FakeBackend":
+        from app.config import (
+            FAKE_LLM_JITTER_MS, FAKE_LLM_LATENCY_MS, FAKE_LLM_MALFORMED_RATE, FAKE_LLM_RPM,
+            FAKE_LLM_SEED, FAKE_LLM_TPM,
+        )
+
+        return cls(latency_ms=FAKE_LLM_LATENCY_MS, jitter_ms=FAKE_LLM_JITTER_MS, rpm=FAKE_LLM_RPM,
+                   tpm=FAKE_LLM_TPM, malformed_rate=FAKE_LLM_MALFORMED_RATE, seed=FAKE_LLM_SEED)
+
+    def _admit(self, tokens: int) -> None:
+        """Take a slot in the minute's quota or raise the API's 429"""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+                self._window.popleft()
+            retry_after = 0.0
+            if self.rpm and len(self._window) >= self.rpm:
+                retry_after = self._window[len(self._window) - self.rpm][0] + WINDOW_SECONDS - now
+            if self.tpm:
+                excess = sum(t for _, t in self._window) + tokens - self.tpm
+                for admitted_at, t in self._window:
+                    if excess <= 0:
+                        break
+                    excess -= t
+                    retry_after = max(retry_after, admitted_at + WINDOW_SECONDS - now)
+                if excess > 0:  # Bigger than the whole quota
+                    retry_after = WINDOW_SECONDS
+            if retry_after > 0:
+                self.stats["rate_limited"] += 1
+                raise ClientError(429, {"error": {
+                    "code": 429,
+                    "message": f"You exceeded your current quota. Please retry in {retry_after:.1f}s.",
+                    "status": "RESOURCE_EXHAUSTED",
+                    "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo",
+                                 "retryDelay": f"{max(1, round(retry_after))}s"}],
+                }})
+            self._window.append((now, tokens))
+
+    def generate_content(self, model: str, contents: str, config: Optional[dict] = None) -> FakeResponse:
+        prompt_tokens = estimate_tokens(contents)
+        self._admit(prompt_tokens)
+
+        key = hashlib.sha256(contents.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._seen[key] += 1
+            rng = random.Random(f"{self.seed}:{key}:{self._seen[key]}")
+            self.stats["calls"] += 1
+
+        time.sleep(max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        result = answer(contents)
+        text = json.dumps(result)
+        if self.malformed_rate and rng.random() < self.malformed_rate:
+            with self._lock:
+                self.stats["malformed"] += 1
+            roll, batched = rng.random(), "digests" in result
+            if batched and roll < 1 / 3:
+                # Drop about half the entries and blank one of the rest
+                kept = [d for d in result["digests"] if rng.random() < 0.5]
+                if kept:
+                    kept[0] = {**kept[0], "summary": ""}
+                text = json.dumps({"digests": kept})
+            elif roll < (2 / 3 if batched else 0.5):
+                text = text[: len(text) // 2]
+            else:
+                text = f"Sure! Here is the result:\n{text}\nLet me know if you need more."
+
+        output_tokens = estimate_tokens(text)
+        with self._lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["output_tokens"] += output_tokens
+        return FakeResponse(text=text, usage_metadata=FakeUsage(prompt_tokens, output_tokens, prompt_tokens + output_tokens))
@@ -0,0 +1,213 @@
+"""
+Shared Gemini client for the agents.
+
+Every generate_content call goes through LLMClient.generate, which spaces
+requests out (min_request_interval), retries rate-limited (429) calls with
+exponential backoff or the delay the API suggests, and accounts for each call
+per agent and model: calls, failures, retries, 429s, prompt/output tokens from
+the usage metadata, time in the call, time waiting on the client-side rate
+limit and time sleeping before retries.
+
+usage_totals() returns the totals since reset_usage(); the daily runner stores
+them per run attempt in the llm_usage table.
+
+The calls themselves go to a backend, picked by LLM_BACKEND: "gemini" (the
+real API) or "fake" (the local stand-in in app/agent/fake_llm.py, for load and
+recovery testing without a key). A backend has generate_content(model,
+contents, config), returns an object with .text and .usage_metadata like a
+genai response, and raises google.genai.errors.ClientError like the API.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from google import genai
+from google.genai.errors import ClientError
+
+from app.config import LLM_BACKEND, LLM_JSON_ATTEMPTS, LLM_MIN_REQUEST_INTERVAL
+from app.utils import metrics
+
+DEFAULT_MODEL = "gemini-2.5-flash-lite"
+
+USAGE_FIELDS = (
+    "calls", "failed", "retries", "rate_limited",
+    "prompt_tokens", "output_tokens", "total_tokens",
+    "call_seconds", "throttle_seconds", "backoff_seconds",
+)
+
+_usage: Dict[Tuple[str, str], Dict[str, float]] = {}
+_usage_lock = threading.Lock()
+
+
+def _account(agent: str, model: str, **amounts: float) -> None:
+    with _usage_lock:
+        totals = _usage.setdefault((agent, model), dict.fromkeys(USAGE_FIELDS, 0))
+        for field, amount in amounts.items():
+            totals[field] += amount
+
+
+def usage_totals() -> List[Dict[str, Any]]:
+    """[{"agent", "model", <USAGE_FIELDS>}] since the last reset_usage()"""
+    with _usage_lock:
+        return [
+            {
+                "agent": agent,
+                "model": model,
+                **{field: round(value, 3) if isinstance(value, float) else value for field, value in totals.items()},
+            }
+            for (agent, model), totals in sorted(_usage.items())
+        ]
+
+
+def reset_usage() -> None:
+    with _usage_lock:
+        _usage.clear()
+
+
+def clean_json_text(text: str) -> str:
+    """Strip the markdown code fence the model sometimes wraps JSON in"""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+
+def parse_json_text(text: str) -> Any:
+    """Parse a JSON reply, retrying without the control characters models leave in strings"""
+    text = clean_json_text(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(re.sub(r'[\x00-\x1f\x7f-\x9f]', ' ', text))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (four characters per token), for sizing prompts"""
+    return max(1, len(text) // 4)
+
+
+class GeminiBackend:
+    def __init__(self, api_key: Optional[str] = None):
+        self.client = genai.Client(api_key=api_key or os.getenv("GEMINI_API_KEY"))
+
+    def generate_content(self, model: str, contents: str, config: Optional[dict] = None) -> Any:
+        return self.client.models.generate_content(model=model, contents=contents, config=config)
+
+
+_backends: Dict[str, Any] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(name: Optional[str] = None) -> Any:
+    """The shared backend instance for name (LLM_BACKEND by default), created on first use"""
+    name = (name or LLM_BACKEND).lower()
+    with _backends_lock:
+        if name not in _backends:
+            if name == "gemini":
+                _backends[name] = GeminiBackend()
+            elif name == "fake":
+                from app.agent.fake_llm import FakeBackend
+                _backends[name] = FakeBackend.from_config()
+            else:
+                raise ValueError(f"Unknown LLM backend {name!r} (expected gemini or fake)")
+        return _backends[name]
+
+
+class LLMClient:
+    def __init__(self, agent: str, model: str = DEFAULT_MODEL, min_request_interval: Optional[float] = None,
+                 max_retries: int = 3, base_delay: float = 10, backend: Any = None):
+        self.agent = agent
+        self.model = model
+        self.backend = backend or get_backend()
+        if min_request_interval is None:
+            min_request_interval = LLM_MIN_REQUEST_INTERVAL
+        self.min_request_interval = min_request_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.last_request_time = 0
+
+    def _rate_limit(self):
+        """Ensure we don't exceed rate limits by spacing out requests"""
+        elapsed = time.time() - self.last_request_time
+        if elapsed < self.min_request_interval:
+            sleep_time = self.min_request_interval - elapsed
+            print(f"Rate limiting: waiting {sleep_time:.1f}s...")
+            time.sleep(sleep_time)
+            _account(self.agent, self.model, throttle_seconds=sleep_time)
+            metrics.observe("llm_throttle_seconds", sleep_time, agent=self.agent)
+        self.last_request_time = time.time()
+
+    def _retry_delay(self, error: ClientError, attempt: int) -> float:
+        retry_delay = self.base_delay * (2 ** attempt)  # Exponential backoff
+        # Prefer the delay the API suggests
+        if "retryDelay" in str(error):
+            match = re.search(r'(\d+\.?\d*)s', str(error))
+            if match:
+                retry_delay = float(match.group(1)) + 1  # Add 1s buffer
+        return retry_delay
+
+    def generate(self, contents: str, config: Optional[dict] = None) -> Any:
+        """
+        One generate_content call, rate limited and retried on 429. Raises the
+        ClientError once retries are exhausted, or any other error at once.
+        """
+        for attempt in range(self.max_retries):
+            self._rate_limit()
+            started = time.perf_counter()
+            try:
+                with metrics.span("llm_call", agent=self.agent, model=self.model) as current:
+                    response = self.backend.generate_content(self.model, contents, config)
+                    usage = getattr(response, "usage_metadata", None)
+                    prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+                    output_tokens = getattr(usage, "candidates_token_count", None) or 0
+                    total_tokens = getattr(usage, "total_token_count", None) or prompt_tokens + output_tokens
+                    current.set(prompt_tokens=prompt_tokens, output_tokens=output_tokens, attempt=attempt + 1)
+            except ClientError as e:
+                # google-genai errors carry the HTTP status as .code (there is no .status_code)
+                rate_limited = e.code == 429
+                _account(self.agent, self.model, calls=1, failed=1, rate_limited=int(rate_limited),
+                         call_seconds=time.perf_counter() - started)
+                if not rate_limited:
+                    raise
+                metrics.inc("llm_rate_limited_total", agent=self.agent)
+                if attempt == self.max_retries - 1:
+                    print(f"Rate limit exceeded after {self.max_retries} attempts: {e}")
+                    raise
+                retry_delay = self._retry_delay(e, attempt)
+                print(f"Rate limit hit. Retrying in {retry_delay:.1f}s... (attempt {attempt + 1}/{self.max_retries})")
+                _account(self.agent, self.model, retries=1, backoff_seconds=retry_delay)
+                metrics.inc("llm_retries_total", agent=self.agent)
+                time.sleep(retry_delay)
+                continue
+            except Exception:
+                _account(self.agent, self.model, calls=1, failed=1, call_seconds=time.perf_counter() - started)
+                raise
+
+            _account(self.agent, self.model, calls=1, prompt_tokens=prompt_tokens, output_tokens=output_tokens,
+                     total_tokens=total_tokens, call_seconds=time.perf_counter() - started)
+            metrics.inc("llm_tokens_total", prompt_tokens, agent=self.agent, model=self.model, kind="prompt")
+            metrics.inc("llm_tokens_total", output_tokens, agent=self.agent, model=self.model, kind="output")
+            return response
+
+    def generate_json(self, contents: str, attempts: int = LLM_JSON_ATTEMPTS) -> Any:
+        """
+        generate() for a JSON reply, parsed. A reply that doesn't parse (cut off,
+        or wrapped in prose) is asked for again, up to attempts calls in all; then
+        the last JSONDecodeError is raised.
+        """
+        for attempt in range(1, attempts + 1):
+            response = self.generate(contents, config={"response_mime_type": "application/json"})
+            try:
+                return parse_json_text(response.text)
+            except json.JSONDecodeError as e:
+                metrics.inc("llm_malformed_total", agent=self.agent)
+                if attempt == attempts:
+                    raise
+                print(f"Malformed JSON reply ({e}), asking again (attempt {attempt}/{attempts})")
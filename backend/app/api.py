@@ -1,14 +1,12 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from app.database.repository import Repository
-from app.services.email_service import EmailService
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
+from datetime import datetime
 import logging
 import os 
-from dotenv import load_dotenv
-
-load_dotenv()
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,9 +23,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    from app.utils.metrics import observe
+    
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template, not the raw path, so job ids don't each get their own series
+    route = request.scope.get("route")
+    observe("api_request_seconds", time.perf_counter() - started, method=request.method,
+            path=getattr(route, "path", "unmatched"), code=response.status_code)
+    return response
+
+
+def _queue_outbox_dispatch(background_tasks: BackgroundTasks) -> None:
+    """Drain the outbox after the response is sent (the worker picks up anything left over)"""
+    from app.config import OUTBOX_DISPATCH_INLINE
+    
+    if OUTBOX_DISPATCH_INLINE:
+        from app.services.outbox import dispatch_outbox
+        background_tasks.add_task(dispatch_outbox, max_batches=1)
+
+
 class SubscribeRequest(BaseModel):
     email: EmailStr
     name: Optional[str] = None
+    interests: Optional[List[str]] = Field(default=None, max_length=20)
 
 
 class SubscribeResponse(BaseModel):
@@ -47,16 +69,21 @@ async def health():
 
 
 @app.post("/api/subscribe", response_model=SubscribeResponse)
-async def subscribe(request: SubscribeRequest):
+async def subscribe(request: SubscribeRequest, background_tasks: BackgroundTasks):
     """
     Subscribe a user to the daily AI news digest.
-    Sends a confirmation email immediately upon successful registration.
+    The confirmation email is queued in the outbox in the same transaction and
+    sent in the background, so the response never waits on SMTP.
     """
     from app.database.connection import get_session
+    from app.database.repository import Repository
+    from app.profiles.user_profile import profile_service
+    from app.services.email_service import EmailService
     
     session = get_session()
     try:
         repo = Repository(session=session)
+        subject, html_content = EmailService().build_confirmation_message(request.name or "there")
         
         existing = repo.get_email_by_address(request.email)
         if existing:
@@ -67,16 +94,15 @@ async def subscribe(request: SubscribeRequest):
                     email=request.email
                 )
             else:
-                # Reactivate the email
-                repo.update_email_status(request.email, True)
+                # Reactivate the email and queue the confirmation in one transaction
+                repo.update_email_status(request.email, True, commit=False)
+                if request.interests is not None:
+                    repo.set_subscriber_interests(request.email, request.interests, commit=False)
+                repo.enqueue_outbox("confirmation", request.email, subject, html_content, commit=False)
+                session.commit()
+                profile_service.invalidate(request.email)
                 logger.info(f"Reactivated subscription for {request.email}")
-                
-                # Send confirmation email
-                email_service = EmailService()
-                email_sent = email_service.send_confirmation_email(
-                    to_email=request.email,
-                    name=request.name or "there"
-                )
+                _queue_outbox_dispatch(background_tasks)
                 
                 return SubscribeResponse(
                     success=True,
@@ -88,23 +114,21 @@ async def subscribe(request: SubscribeRequest):
         email_record = repo.create_email(
             email=request.email,
             name=request.name,
-            is_active=True
+            is_active=True,
+            commit=False
         )
         
         if not email_record:
             raise HTTPException(status_code=500, detail="Failed to create subscription")
         
-        logger.info(f"New subscription created for {request.email}")
+        if request.interests:
+            repo.set_subscriber_interests(request.email, request.interests, commit=False)
+        repo.enqueue_outbox("confirmation", request.email, subject, html_content, commit=False)
+        session.commit()
+        profile_service.invalidate(request.email)
         
-        # Send confirmation email
-        email_service = EmailService()
-        email_sent = email_service.send_confirmation_email(
-            to_email=request.email,
-            name=request.name or "there"
-        )
-        
-        if not email_sent:
-            logger.warning(f"Confirmation email failed to send to {request.email}")
+        logger.info(f"New subscription created for {request.email}")
+        _queue_outbox_dispatch(background_tasks)
         
         return SubscribeResponse(
             success=True,
@@ -124,12 +148,12 @@ async def subscribe(request: SubscribeRequest):
 async def get_subscriber_count():
     """Get the total number of active subscribers"""
     from app.database.connection import get_session
+    from app.database.repository import Repository
     
     session = get_session()
     try:
         repo = Repository(session=session)
-        subscribers = repo.get_all_emails(active_only=True)
-        return {"count": len(subscribers)}
+        return {"count": repo.count_emails(active_only=True)}
     except Exception as e:
         logger.error(f"Error getting subscriber count: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get subscriber count")
@@ -148,12 +172,16 @@ class UnsubscribeResponse(BaseModel):
 
 
 @app.post("/api/unsubscribe", response_model=UnsubscribeResponse)
-async def unsubscribe(request: UnsubscribeRequest):
+async def unsubscribe(request: UnsubscribeRequest, background_tasks: BackgroundTasks):
     """
     Unsubscribe a user from the daily AI news digest.
-    Completely removes the email from the database and sends a confirmation email.
+    Completely removes the email from the database and queues a confirmation
+    email in the same transaction.
     """
     from app.database.connection import get_session
+    from app.database.repository import Repository
+    from app.profiles.user_profile import profile_service
+    from app.services.email_service import EmailService
     
     session = get_session()
     try:
@@ -171,20 +199,15 @@ async def unsubscribe(request: UnsubscribeRequest):
         # Store name before deletion
         user_name = existing.name or "there"
         
-        deleted = repo.delete_email(request.email)
+        deleted = repo.delete_email(request.email, commit=False)
         
         if deleted:
+            subject, html_content = EmailService().build_unsubscribe_message(user_name)
+            repo.enqueue_outbox("unsubscribe", request.email, subject, html_content, commit=False)
+            session.commit()
+            profile_service.invalidate(request.email)
             logger.info(f"Deleted email from database: {request.email}")
-            
-            # Send unsubscribe confirmation email
-            email_service = EmailService()
-            email_sent = email_service.send_unsubscribe_confirmation_email(
-                to_email=request.email,
-                name=user_name
-            )
-            
-            if not email_sent:
-                logger.warning(f"Unsubscribe confirmation email failed to send to {request.email}")
+            _queue_outbox_dispatch(background_tasks)
             
             return UnsubscribeResponse(
                 success=True,
@@ -202,49 +225,169 @@ async def unsubscribe(request: UnsubscribeRequest):
         session.close()
 
 
-@app.post("/api/trigger-daily-digest")
-async def trigger_daily_digest():
+class SearchResult(BaseModel):
+    id: str
+    kind: str
+    article_type: str
+    article_id: str
+    title: str
+    url: str
+    snippet: Optional[str] = None
+    score: float
+    published_at: Optional[datetime] = None
+
+
+class SearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    has_more: bool
+    took_ms: float
+    results: List[SearchResult]
+
+
+@app.get("/api/search", response_model=SearchResponse)
+async def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    page: int = Query(1, ge=1, le=1000),
+    page_size: int = Query(20, ge=1, le=100),
+    kind: Optional[str] = Query(None, pattern="^(digest|article)$")
+):
+    """
+    Full-text search over past digests and article content, ranked by relevance.
+    Use kind=digest or kind=article to restrict the results.
+    """
+    from app.database.connection import get_session
+    from app.database.repository import Repository
+    
+    session = get_session()
+    try:
+        repo = Repository(session=session)
+        start = time.perf_counter()
+        result = repo.search(q, page=page, page_size=page_size, kind=kind)
+        took_ms = (time.perf_counter() - start) * 1000
+        
+        return SearchResponse(
+            query=q,
+            page=page,
+            page_size=page_size,
+            has_more=result["has_more"],
+            took_ms=round(took_ms, 2),
+            results=[SearchResult(**row) for row in result["results"]]
+        )
+    except Exception as e:
+        logger.error(f"Error searching for '{q}': {str(e)}")
+        raise HTTPException(status_code=500, detail="Search failed")
+    finally:
+        session.close()
+
+
+@app.post("/api/trigger-daily-digest", status_code=202)
+async def trigger_daily_digest(response: Response):
     """
-    Trigger the daily digest pipeline manually.
-    This endpoint is designed to be called by cron jobs.
+    Queue the daily digest pipeline; a worker (python -m app.worker) runs it.
+    Returns immediately with the job id. Designed to be called by cron jobs:
+    triggers while today's edition is still queued or running coalesce into that job.
+    With JOB_RUN_INLINE (the default on Vercel, where no worker runs) the job is
+    run within the request and the response carries its outcome.
     """
-    from app.daily_runner import run_daily_pipeline
-    import asyncio
-    from concurrent.futures import ThreadPoolExecutor
-    import traceback
+    from app.config import JOB_RUN_INLINE
+    from app.worker import enqueue_daily_digest, run_inline
     
     logger.info("Daily digest triggered via API endpoint")
     
-    try:
-        # Run the pipeline in a thread pool to avoid blocking
-        loop = asyncio.get_event_loop()
-        with ThreadPoolExecutor() as executor:
-            result = await loop.run_in_executor(
-                executor,
-                run_daily_pipeline,
-                24,  # hours
-                10   # top_n
-            )
+    if JOB_RUN_INLINE:
+        from fastapi.concurrency import run_in_threadpool
         
-        return {
-            "success": result.get("success", False),
-            "message": "Daily digest pipeline completed",
-            "details": {
-                "scraping": result.get("scraping", {}),
-                "processing": result.get("processing", {}),
-                "digests": result.get("digests", {}),
-                "email_sent": result.get("success", False),
-                "duration_seconds": result.get("duration_seconds", 0),
-                "error": result.get("error")
+        try:
+            job = await run_in_threadpool(run_inline, 24, 10)
+        except Exception as e:
+            logger.error(f"Error running daily digest: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to run the daily digest")
+        
+        if not job["coalesced"]:
+            response.status_code = 200
+            return {
+                "success": job["status"] == "succeeded",
+                "message": f"Daily digest {job['status']}",
+                "job_id": job["id"],
+                "status": job["status"],
+                "coalesced": False,
+                "result": job["result"],
+                "error": job["error"],
+                "status_url": f"/api/jobs/{job['id']}"
             }
+    else:
+        try:
+            job = enqueue_daily_digest(hours=24, top_n=10)
+        except Exception as e:
+            logger.error(f"Error queueing daily digest: {str(e)}")
+            raise HTTPException(status_code=500, detail="Failed to queue the daily digest")
+    
+    return {
+        "success": True,
+        "message": "Daily digest already in progress" if job["coalesced"] else "Daily digest queued",
+        "job_id": job["id"],
+        "status": job["status"],
+        "coalesced": job["coalesced"],
+        "status_url": f"/api/jobs/{job['id']}"
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a background job, with per-stage progress of its pipeline run"""
+    from app.database.connection import get_session
+    from app.database.repository import Repository
+    
+    session = get_session()
+    try:
+        repo = Repository(session=session)
+        job = repo.get_job(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        
+        stages = {
+            name: {key: record[key] for key in ("status", "duration", "error") if record[key] is not None}
+            for name, record in repo.get_stage_runs(job["dedupe_key"]).items()
         }
-    except Exception as e:
-        error_details = traceback.format_exc()
-        logger.error(f"Error triggering daily digest: {str(e)}\n{error_details}")
         return {
-            "success": False,
-            "message": "Daily digest pipeline failed",
-            "error": str(e),
-            "traceback": error_details
+            "id": job["id"],
+            "kind": job["kind"],
+            "run_id": job["dedupe_key"],
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "error": job["error"],
+            "result": job["result"],
+            "stages": stages
         }
+    finally:
+        session.close()
 
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Prometheus metrics: this process's request, DB and SMTP timings, plus the
+    stage timings and totals of the last daily pipeline run (from the run ledger).
+    """
+    from app.utils.metrics import REGISTRY, render_last_run
+    
+    body = REGISTRY.render_prometheus()
+    try:
+        from app.database.connection import get_session
+        from app.database.repository import Repository
+        
+        session = get_session()
+        try:
+            run = Repository(session=session).get_last_pipeline_run()
+        finally:
+            session.close()
+        if run and run["report"]:
+            body += render_last_run(run["id"], run["finished_at"], run["report"])
+    except Exception as e:
+        logger.error(f"Error loading the last pipeline run for /metrics: {str(e)}")
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4")
@@ -1,3 +1,4 @@
+import os
 from datetime import timezone, timedelta
 
 # Common timezones:
@@ -10,4 +11,171 @@ USER_TIMEZONE = timezone(timedelta(hours=5, minutes=30))  # IST by default
 YOUTUBE_CHANNELS = [
     "UCn8ujwUInbJkBhffxqAPBVQ",  # Dave Ebbelaar
     "UCawZsQWqfGSbCI5yjkdVkTA",  # Matthew Berman
-]
\ No newline at end of file
+]
+
+# Page size for streaming repository reads (subscribers, digests).
+# Larger pages mean fewer round trips, smaller pages keep memory flat.
+STREAM_PAGE_SIZE = int(os.getenv("STREAM_PAGE_SIZE", "500"))
+
+# Subscriber profiles memoized by app/profiles/user_profile.py. The least recently
+# used are dropped past PROFILE_CACHE_SIZE, and entries older than
+# PROFILE_CACHE_TTL_SECONDS are reloaded (0 keeps them until invalidated), so
+# edits made outside the API (another process, the database) show up eventually.
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+PROFILE_CACHE_TTL_SECONDS = float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600"))
+
+# Maintenance jobs run at the end of the daily pipeline (see app/database/maintenance.py).
+# Available jobs: empty_digests, unavailable_transcripts, analyze, vacuum
+MAINTENANCE_ENABLED = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+MAINTENANCE_JOBS = [
+    job.strip()
+    for job in os.getenv("MAINTENANCE_JOBS", "empty_digests,unavailable_transcripts,analyze").split(",")
+    if job.strip()
+]
+UNAVAILABLE_TRANSCRIPT_TTL_DAYS = int(os.getenv("UNAVAILABLE_TRANSCRIPT_TTL_DAYS", "7"))
+
+# Near-duplicate detection before digest generation (see app/services/dedup.py).
+# Stories whose MinHash-estimated Jaccard similarity reaches DEDUP_THRESHOLD are
+# digested once; the other copies are listed as "Also covered by" in the email.
+# Shingles are word trigrams: two launch posts written to the same template
+# ("our fastest model yet", "per million input tokens") share about a third of
+# their bigrams but only a quarter of their trigrams, while a press copy of a
+# post keeps well over half of its trigrams. 0.5 sits between the two.
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.5"))
+DEDUP_NUM_PERM = int(os.getenv("DEDUP_NUM_PERM", "128"))
+DEDUP_SHINGLE_SIZE = int(os.getenv("DEDUP_SHINGLE_SIZE", "3"))
+
+# Batched digests (see app/agent/digest_agent.py). With DIGEST_BATCH_ENABLED one request
+# digests up to DIGEST_BATCH_MAX_ARTICLES articles, packed to DIGEST_BATCH_TOKEN_BUDGET
+# (estimated) prompt tokens. Under the per-minute request quota this digests several
+# articles per request instead of one. Entries missing or invalid in the reply are retried
+# in a later batch, then one article per request.
+DIGEST_BATCH_ENABLED = os.getenv("DIGEST_BATCH_ENABLED", "true").lower() == "true"
+DIGEST_BATCH_MAX_ARTICLES = int(os.getenv("DIGEST_BATCH_MAX_ARTICLES", "8"))
+DIGEST_BATCH_TOKEN_BUDGET = int(os.getenv("DIGEST_BATCH_TOKEN_BUDGET", "20000"))
+
+# Content compression before digesting (see app/utils/compression.py). Image markdown,
+# link lists and URLs are stripped, and content still over DIGEST_CONTENT_TOKEN_BUDGET
+# (estimated) tokens keeps its highest-information sentences, scored with TF-IDF.
+# With DIGEST_COMPRESSION_ENABLED=false the content is cut at 8000 characters instead.
+DIGEST_COMPRESSION_ENABLED = os.getenv("DIGEST_COMPRESSION_ENABLED", "true").lower() == "true"
+DIGEST_CONTENT_TOKEN_BUDGET = int(os.getenv("DIGEST_CONTENT_TOKEN_BUDGET", "1500"))
+
+# Lexical pre-ranking before the curator LLM (see app/utils/lexical.py).
+# Only PRERANK_FACTOR * top_n digests, by BM25 score against the profile
+# interests, are sent to the curator for the email.
+PRERANK_ENABLED = os.getenv("PRERANK_ENABLED", "true").lower() == "true"
+PRERANK_FACTOR = int(os.getenv("PRERANK_FACTOR", "3"))
+
+# Per-subscriber personalization (see app/services/personalization.py).
+# Each subscriber's top_n is picked from the curator's candidates by blending
+# the LLM score with their interest affinity: (1 - weight) * llm + weight * affinity.
+PERSONALIZATION_ENABLED = os.getenv("PERSONALIZATION_ENABLED", "true").lower() == "true"
+PERSONALIZATION_WEIGHT = float(os.getenv("PERSONALIZATION_WEIGHT", "0.4"))
+
+# Subscriber cohorts (see app/services/cohorts.py). The curator and the email
+# introduction run once per cohort, so LLM calls per send are bounded by
+# 2 * (COHORT_COUNT + 1) whatever the subscriber count. More cohorts follow
+# individual interests more closely; 0 sends everyone the default edition.
+COHORT_COUNT = int(os.getenv("COHORT_COUNT", "4"))
+
+# Daily pipeline scheduler (see app/pipeline/dag.py). Independent stages (scraping
+# and enriching each source) run concurrently on PIPELINE_MAX_WORKERS threads,
+# with at most PIPELINE_<RESOURCE>_CONCURRENCY stages using each shared resource.
+# The database is capped by connections rather than stages: the run replaces
+# DB_POOL_SIZE/DB_MAX_OVERFLOW with a pool of PIPELINE_DB_CONCURRENCY connections,
+# which every session (stages, ledger, subscriber prefetch) waits on.
+PIPELINE_MAX_WORKERS = int(os.getenv("PIPELINE_MAX_WORKERS", "4"))
+PIPELINE_RESOURCE_LIMITS = {
+    "db": int(os.getenv("PIPELINE_DB_CONCURRENCY", "3")),
+    "http": int(os.getenv("PIPELINE_HTTP_CONCURRENCY", "4")),
+    "llm": int(os.getenv("PIPELINE_LLM_CONCURRENCY", "1")),
+    "smtp": int(os.getenv("PIPELINE_SMTP_CONCURRENCY", "1")),
+}
+
+# Streaming ingest (see app/pipeline/streaming.py). Instead of one stage per
+# source, scraped items flow through bounded queues (scrape → fetch/convert →
+# digest) and are digested as soon as they're ready. STREAM_QUEUE_SIZE bounds
+# the items held between steps.
+PIPELINE_STREAMING = os.getenv("PIPELINE_STREAMING", "false").lower() == "true"
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "32"))
+
+# Background job queue (see app/worker.py). The API only queues the daily run;
+# a worker process claims and runs it. A running job whose worker sends no
+# heartbeat for JOB_STALE_SECONDS is put back in the queue (it then resumes
+# from the run ledger), until it has been claimed JOB_MAX_ATTEMPTS times; then it
+# is marked failed. Where no worker can run (Vercel serverless functions),
+# JOB_RUN_INLINE makes the trigger endpoint claim and run the job inside the
+# request instead; it defaults to on when VERCEL is set.
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "5"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RUN_INLINE = os.getenv("JOB_RUN_INLINE", "true" if os.getenv("VERCEL") else "false").lower() == "true"
+
+# Transactional outbox for confirmation / unsubscribe emails (see app/services/outbox.py).
+# The API writes the email in the same transaction as the subscription change; the
+# dispatcher sends it over OUTBOX_SMTP_CONNECTIONS reused SMTP connections, retrying
+# with exponential backoff (OUTBOX_RETRY_BASE_SECONDS * 2^attempt) up to OUTBOX_MAX_ATTEMPTS.
+# With OUTBOX_DISPATCH_INLINE the API also drains the outbox after responding.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_SMTP_CONNECTIONS = int(os.getenv("OUTBOX_SMTP_CONNECTIONS", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "60"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_DISPATCH_INLINE = os.getenv("OUTBOX_DISPATCH_INLINE", "true").lower() == "true"
+
+# Outgoing SMTP (see app/services/email_service.py): Gmail with STARTTLS and an app
+# password by default. The sandbox points it at a local sink without TLS or login.
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_AUTH = os.getenv("SMTP_AUTH", "true").lower() == "true"
+
+# Instrumentation (see app/utils/metrics.py). Pipeline stages, scrapes, HTTP fetches,
+# LLM calls, DB queries and SMTP sends are timed into histograms, served by the API
+# at /metrics, and each daily run writes a JSON report (histograms, counters and up to
+# METRICS_MAX_SPANS individual spans) to METRICS_REPORT_DIR.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_REPORT_DIR = os.getenv("METRICS_REPORT_DIR", "run_reports")
+METRICS_MAX_SPANS = int(os.getenv("METRICS_MAX_SPANS", "5000"))
+
+# Profiling (see app/utils/profiling.py). With PIPELINE_PROFILE=true (or main.py --profile)
+# the daily run executes one stage at a time, each under PIPELINE_PROFILER ("auto" =
+# pyinstrument if installed, else cProfile) and tracemalloc, and writes per-stage profiles,
+# peak memory and a profile.json summary to PIPELINE_PROFILE_DIR/<edition>-attempt<n>/.
+# Applies to runs the API triggers too, since the worker reads the same setting.
+PIPELINE_PROFILE = os.getenv("PIPELINE_PROFILE", "false").lower() == "true"
+PIPELINE_PROFILER = os.getenv("PIPELINE_PROFILER", "auto").lower()
+PIPELINE_PROFILE_DIR = os.getenv("PIPELINE_PROFILE_DIR", "profiles")
+
+# HTTP record/replay (see app/utils/cassette.py). HTTP_MODE=record saves every response the
+# scrapers, markdown converter and transcript fetches get to HTTP_CASSETTE_DIR; HTTP_MODE=replay
+# serves them from there and never touches the network (unrecorded requests fail like a
+# connection error). Replay can add HTTP_REPLAY_LATENCY_MS per request ("recorded" replays the
+# original timings) and fail HTTP_REPLAY_ERROR_RATE of requests with HTTP_REPLAY_ERROR_STATUS
+# (0 = connection error), picked deterministically from HTTP_REPLAY_SEED.
+HTTP_MODE = os.getenv("HTTP_MODE", "live").lower()
+HTTP_CASSETTE_DIR = os.getenv("HTTP_CASSETTE_DIR", "cassettes")
+HTTP_REPLAY_LATENCY_MS = os.getenv("HTTP_REPLAY_LATENCY_MS", "0")
+HTTP_REPLAY_ERROR_RATE = float(os.getenv("HTTP_REPLAY_ERROR_RATE", "0"))
+HTTP_REPLAY_ERROR_STATUS = int(os.getenv("HTTP_REPLAY_ERROR_STATUS", "503"))
+HTTP_REPLAY_SEED = int(os.getenv("HTTP_REPLAY_SEED", "0"))
+
+# LLM backend (see app/agent/llm.py). "gemini" calls the API; "fake" answers locally
+# (app/agent/fake_llm.py) with schema-valid JSON for digest, ranking and email prompts, for
+# load and recovery testing without a key. The fake takes FAKE_LLM_LATENCY_MS (± FAKE_LLM_JITTER_MS)
+# per call, enforces FAKE_LLM_RPM requests and FAKE_LLM_TPM tokens per minute (0 = unlimited)
+# with 429s that carry a retryDelay, and returns malformed JSON for FAKE_LLM_MALFORMED_RATE
+# of calls (picked from FAKE_LLM_SEED). Each agent spaces its calls LLM_MIN_REQUEST_INTERVAL apart,
+# and asks again, up to LLM_JSON_ATTEMPTS calls in all, when a JSON reply doesn't parse.
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()
+LLM_MIN_REQUEST_INTERVAL = float(os.getenv("LLM_MIN_REQUEST_INTERVAL", "6.5"))
+LLM_JSON_ATTEMPTS = int(os.getenv("LLM_JSON_ATTEMPTS", "3"))
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "400"))
+FAKE_LLM_JITTER_MS = float(os.getenv("FAKE_LLM_JITTER_MS", "100"))
+FAKE_LLM_RPM = int(os.getenv("FAKE_LLM_RPM", "15"))
+FAKE_LLM_TPM = int(os.getenv("FAKE_LLM_TPM", "250000"))
+FAKE_LLM_MALFORMED_RATE = float(os.getenv("FAKE_LLM_MALFORMED_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
@@ -1,10 +1,12 @@
+import json
 import logging
+from dataclasses import replace
 from datetime import datetime
-from dotenv import load_dotenv
+from pathlib import Path
+from typing import Optional
 
-load_dotenv()
-
-from app.runner import run_scrapers
+from app.agent.llm import reset_usage, usage_totals
+from app.runner import SCRAPER_NAMES, run_scraper
 from app.services.process_anthropic import process_anthropic_markdown
 from app.services.process_google import process_google_markdown
 from app.services.process_youtube import process_youtube_transcripts
@@ -14,7 +16,21 @@ from app.services.process_techcrunch import process_techcrunch_markdown
 from app.services.process_mittr import process_mittr_markdown
 from app.services.process_venturebeat import process_venturebeat_markdown
 from app.services.process_digest import process_digests
-from app.services.process_email import send_digest_email
+from app.services.process_email import (
+    DEFAULT_COHORT, deliver_editions, load_send_inputs, plan_from_dict, plan_to_dict,
+    rank_editions, write_introductions
+)
+from app.database.connection import size_pool
+from app.database.maintenance import run_maintenance
+from app.pipeline.dag import Pipeline, Stage, format_report
+from app.pipeline.ledger import RunLedger, edition_id
+from app.pipeline.streaming import run_streaming_ingest
+from app.utils.metrics import REGISTRY
+from app.utils.profiling import profiler_for_run
+from app.config import (
+    MAINTENANCE_ENABLED, METRICS_ENABLED, METRICS_REPORT_DIR, PIPELINE_MAX_WORKERS,
+    PIPELINE_RESOURCE_LIMITS, PIPELINE_STREAMING
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -23,8 +39,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Sources whose scraped items need enriching (markdown / transcripts) before digesting.
+# OpenAI feeds are digested straight from the RSS description.
+ENRICHERS = {
+    "anthropic": process_anthropic_markdown,
+    "google": process_google_markdown,
+    "huggingface": process_huggingface_markdown,
+    "huggingface_papers": process_huggingface_papers_markdown,
+    "techcrunch": process_techcrunch_markdown,
+    "mittr": process_mittr_markdown,
+    "venturebeat": process_venturebeat_markdown,
+    "youtube": process_youtube_transcripts,
+}
+
+
+def resource_limits() -> dict:
+    """
+    Stage concurrency per resource. The database is not one of them: the run gets
+    a pool of PIPELINE_DB_CONCURRENCY connections instead (see run_daily_pipeline),
+    so stages, ledger writes and the subscriber prefetch hold a connection only
+    around their queries, not through a whole stage's HTTP or LLM calls.
+    """
+    return {resource: limit for resource, limit in PIPELINE_RESOURCE_LIMITS.items() if resource != "db"}
+
+
+def build_stages(hours: int, top_n: int, streaming: bool = PIPELINE_STREAMING,
+                 ledger: Optional[RunLedger] = None) -> list:
+    """
+    Stage graph of the daily run:
+    scrape:<source> → enrich:<source> → digest → rank → render → send → maintenance
+    In streaming mode the first three are a single "ingest" stage.
+    
+    Stage outputs are JSON-serializable so the ledger can hand them to a resumed run.
+    Enrich, digest and ingest resume by themselves (they only pick up rows not yet
+    processed); send checkpoints the last subscriber it delivered to.
+    """
+    stages = []
+    if streaming:
+        # Items flow from scrape to digest on their own, under the same resource limits
+        stages.append(Stage("ingest", lambda _: run_streaming_ingest(hours)))
+        digest_stage = "ingest"
+    else:
+        for name in SCRAPER_NAMES:
+            stages.append(Stage(
+                f"scrape:{name}", lambda _, name=name: len(run_scraper(name, hours)),
+                resources=["http"]
+            ))
+        
+        digest_inputs = []
+        for name in SCRAPER_NAMES:
+            if name in ENRICHERS:
+                stages.append(Stage(
+                    f"enrich:{name}", lambda _, func=ENRICHERS[name]: func(),
+                    # Enriching also picks up rows left over from earlier runs, so a failed scrape doesn't block it
+                    inputs=[f"scrape:{name}"], resources=["http"], always_run=True
+                ))
+                digest_inputs.append(f"enrich:{name}")
+            else:
+                digest_inputs.append(f"scrape:{name}")
+        
+        # A failed source must not hold back the others: digest whatever made it in
+        stages.append(Stage("digest", lambda _: process_digests(), inputs=digest_inputs,
+                            resources=["llm"], always_run=True))
+        digest_stage = "digest"
+    
+    def rank(_):
+        send_inputs = load_send_inputs(hours)
+        return plan_to_dict(rank_editions(send_inputs["digests"], send_inputs["profile_counts"], top_n))
+    
+    def render(inputs):
+        return plan_to_dict(write_introductions(plan_from_dict(inputs["rank"], top_n), top_n))
+    
+    def send(inputs):
+        plan = plan_from_dict(inputs["render"], top_n)
+        return deliver_editions(
+            plan["editions"], plan["assignment"], top_n,
+            cursor=ledger.cursor("send") if ledger else None,
+            on_checkpoint=(lambda cursor: ledger.checkpoint("send", cursor)) if ledger else None
+        )
+    
+    stages.extend([
+        Stage("rank", rank, inputs=[digest_stage], resources=["llm"], always_run=True),
+        Stage("render", render, inputs=["rank"], resources=["llm"]),
+        # Never re-sent once complete, even if a retried digest re-ranks the edition
+        Stage("send", send, inputs=["render"], resources=["smtp"], once=True),
+    ])
+    if MAINTENANCE_ENABLED:
+        stages.append(Stage("maintenance", lambda _: run_maintenance(), inputs=["send"], always_run=True))
+    return stages
+
+
+def write_run_report(results: dict) -> Optional[str]:
+    """
+    Dump the run's stage timings, metrics and spans to
+    METRICS_REPORT_DIR/<edition>-attempt<n>.json. Returns the path.
+    """
+    if not METRICS_ENABLED or not METRICS_REPORT_DIR:
+        return None
+    report = {
+        key: results.get(key)
+        for key in ("run_id", "attempt", "start_time", "end_time", "duration_seconds", "success", "timings",
+                    "llm_usage", "profile_dir")
+    }
+    report["metrics"] = REGISTRY.run_report()
+    directory = Path(METRICS_REPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{results['run_id'].replace('/', '_')}-attempt{results.get('attempt', 1)}.json"
+    path.write_text(json.dumps(report, indent=2, default=str))
+    return str(path)
 
-def run_daily_pipeline(hours: int = 24, top_n: int = 10) -> dict:
+
+def run_daily_pipeline(hours: int = 24, top_n: int = 10, run_id: Optional[str] = None,
+                       resume: bool = True, profile: Optional[bool] = None) -> dict:
+    """
+    Run the daily pipeline for one edition (run_id, by default today's date and
+    parameters). Re-running the same edition skips the stages that already
+    completed and resumes the rest; resume=False starts the edition over.
+    profile (default PIPELINE_PROFILE) profiles each stage, see app/utils/profiling.py.
+    """
     start_time = datetime.now()
     logger.info("=" * 60)
     logger.info("Starting Daily AI News Aggregator Pipeline")
@@ -36,112 +168,147 @@ def run_daily_pipeline(hours: int = 24, top_n: int = 10) -> dict:
         "processing": {},
         "digests": {},
         "email": {},
+        "maintenance": {},
+        "timings": {},
+        "run_id": run_id or edition_id(hours, top_n),
         "success": False
     }
+    ledger = None
+    # The run report and LLM usage cover this run only (the /metrics series keep counting)
+    REGISTRY.start_run()
+    reset_usage()
     
     try:
-        logger.info("\n[1/10] Scraping articles from sources...")
-        scraping_results = run_scrapers(hours=hours)
-        results["scraping"] = {
-            "youtube": len(scraping_results.get("youtube", [])),
-            "openai": len(scraping_results.get("openai", [])),
-            "anthropic": len(scraping_results.get("anthropic", [])),
-            "google": len(scraping_results.get("google", [])),
-            "huggingface": len(scraping_results.get("huggingface", [])),
-            "huggingface_papers": len(scraping_results.get("huggingface_papers", [])),
-            "techcrunch": len(scraping_results.get("techcrunch", [])),
-            "mittr": len(scraping_results.get("mittr", [])),
-            "venturebeat": len(scraping_results.get("venturebeat", []))
-        }
-        total_scraped = sum(results["scraping"].values())
-        logger.info(f"✓ Scraped {total_scraped} total articles from all sources")
-        
-        logger.info("\n[2/10] Processing Anthropic markdown...")
-        anthropic_result = process_anthropic_markdown()
-        results["processing"]["anthropic"] = anthropic_result
-        logger.info(f"✓ Processed {anthropic_result['processed']} Anthropic articles "
-                    f"({anthropic_result['failed']} failed)")
-        
-        logger.info("\n[3/10] Processing Google markdown...")
-        google_result = process_google_markdown()
-        results["processing"]["google"] = google_result
-        logger.info(f"✓ Processed {google_result['processed']} Google articles "
-                    f"({google_result['failed']} failed)")
-        
-        logger.info("\n[4/10] Processing HuggingFace markdown...")
-        huggingface_result = process_huggingface_markdown()
-        results["processing"]["huggingface"] = huggingface_result
-        logger.info(f"✓ Processed {huggingface_result['processed']} HuggingFace articles "
-                    f"({huggingface_result['failed']} failed)")
-        
-        logger.info("\n[5/10] Processing HuggingFace Papers markdown...")
-        huggingface_papers_result = process_huggingface_papers_markdown()
-        results["processing"]["huggingface_papers"] = huggingface_papers_result
-        logger.info(f"✓ Processed {huggingface_papers_result['processed']} HuggingFace papers "
-                    f"({huggingface_papers_result['failed']} failed)")
-        
-        logger.info("\n[6/10] Processing TechCrunch markdown...")
-        techcrunch_result = process_techcrunch_markdown()
-        results["processing"]["techcrunch"] = techcrunch_result
-        logger.info(f"✓ Processed {techcrunch_result['processed']} TechCrunch articles "
-                    f"({techcrunch_result['failed']} failed)")
-        
-        logger.info("\n[7/10] Processing MIT TR markdown...")
-        mittr_result = process_mittr_markdown()
-        results["processing"]["mittr"] = mittr_result
-        logger.info(f"✓ Processed {mittr_result['processed']} MIT TR articles "
-                    f"({mittr_result['failed']} failed)")
-        
-        logger.info("\n[8/10] Processing VentureBeat markdown...")
-        venturebeat_result = process_venturebeat_markdown()
-        results["processing"]["venturebeat"] = venturebeat_result
-        logger.info(f"✓ Processed {venturebeat_result['processed']} VentureBeat articles "
-                    f"({venturebeat_result['failed']} failed)")
+        size_pool(PIPELINE_RESOURCE_LIMITS["db"])
+        ledger = RunLedger(results["run_id"], resume=resume)
+        results["attempt"] = ledger.attempt
+        limits = resource_limits()
+        stages = build_stages(hours, top_n, ledger=ledger)
+        max_workers = PIPELINE_MAX_WORKERS
+        profiler = profiler_for_run(results["run_id"], ledger.attempt, enabled=profile)
+        if profiler:
+            # Profilers and tracemalloc are process-wide: one stage at a time keeps each profile its own
+            stages = [replace(stage, func=profiler.wrap(stage.name, stage.func)) for stage in stages]
+            max_workers = 1
+            results["profile_dir"] = str(profiler.directory)
+            logger.info(f"Profiling each stage ({profiler.engine}) into {profiler.directory}")
+        logger.info(f"Running stage graph for {results['run_id']} ({max_workers} workers, limits {limits}, "
+                    f"{PIPELINE_RESOURCE_LIMITS['db']} db connections)")
+        pipeline = Pipeline(stages, resource_limits=limits, max_workers=max_workers, ledger=ledger)
+        run = pipeline.run()
+        outputs, runs = run["outputs"], run["runs"]
+        results["timings"] = run["report"]
         
-        logger.info("\n[9/10] Processing YouTube transcripts...")
-        youtube_result = process_youtube_transcripts()
-        results["processing"]["youtube"] = youtube_result
-        logger.info(f"✓ Processed {youtube_result['processed']} transcripts "
-                    f"({youtube_result['unavailable']} unavailable)")
-        
-        logger.info("\n[10/10] Creating digests and sending email...")
-        digest_result = process_digests()
-        results["digests"] = digest_result
-        logger.info(f"✓ Created {digest_result['processed']} digests "
-                    f"({digest_result['failed']} failed out of {digest_result['total']} total)")
+        if "ingest" in outputs:
+            ingest = outputs["ingest"]
+            results["scraping"] = ingest["scraping"]
+            results["processing"] = ingest["processing"]
+            results["digests"] = ingest["digests"]
+            results["streaming"] = {
+                key: ingest[key] for key in ("wall_seconds", "first_digest_seconds", "busy_seconds", "max_queue")
+            }
+        else:
+            results["scraping"] = {name: outputs.get(f"scrape:{name}") or 0 for name in SCRAPER_NAMES}
+            for name in ENRICHERS:
+                stage = f"enrich:{name}"
+                if stage in outputs:
+                    results["processing"][name] = outputs[stage]
+                elif stage in runs:
+                    results["processing"][name] = {"error": runs[stage].error}
+            if "digest" in outputs:
+                results["digests"] = outputs["digest"]
+        logger.info(f"✓ Scraped {sum(results['scraping'].values())} total articles from all sources")
         
-        email_result = send_digest_email(hours=hours, top_n=top_n)
-        results["email"] = email_result
+        if results["digests"]:
+            digest_result = results["digests"]
+            logger.info(f"✓ Created {digest_result['processed']} digests "
+                        f"({digest_result['failed']} failed out of {digest_result['total']} total)")
         
-        if email_result["success"]:
-            logger.info(f"✓ Email sent successfully with {email_result['articles_count']} articles")
+        if "send" in outputs and outputs["send"]["sent"] > 0:
+            delivery = outputs["send"]
+            editions = outputs["render"]["editions"]
+            default_edition = next(e for e in editions if e["cohort"] == DEFAULT_COHORT)
+            results["email"] = {
+                "success": True,
+                "subject": delivery["subject"],
+                "articles_count": min(top_n, len(default_edition["articles"])),
+                "recipients": delivery["sent"],
+                "failed": delivery["failed"],
+                "personalized": delivery["personalized"],
+                "editions": len(editions)
+            }
+            logger.info(f"✓ Email sent successfully with {results['email']['articles_count']} articles")
             results["success"] = True
         else:
-            logger.error(f"✗ Failed to send email: {email_result.get('error', 'Unknown error')}")
+            # Report the first email stage that did not succeed
+            failed = next((runs[s] for s in ("rank", "render", "send") if s not in outputs), None)
+            error = failed.error if failed else "Failed to send emails to any subscribers"
+            results["email"] = {"success": False, "error": error}
+            logger.error(f"✗ Failed to send email: {error}")
+        
+        if "maintenance" in outputs:
+            results["maintenance"] = outputs["maintenance"]
+            logger.info(f"✓ Maintenance finished in {outputs['maintenance']['duration_seconds']:.2f}s")
+        
+        logger.info("\n" + format_report(run["report"]))
+        if profiler and profiler.stages:
+            logger.info("\n" + profiler.format_summary())
         
     except Exception as e:
         logger.error(f"Pipeline failed with error: {e}", exc_info=True)
         results["error"] = str(e)
     
+    results["llm_usage"] = usage_totals()
+    if ledger:
+        try:
+            ledger.save_llm_usage(results["llm_usage"])
+        except Exception as e:
+            logger.error(f"Failed to record LLM usage: {e}")
+        try:
+            # Histogram totals go with the timings so the API can serve them at /metrics
+            report = {**results["timings"], "metrics": REGISTRY.summary()} if METRICS_ENABLED else results["timings"]
+            ledger.finish("success" if results["success"] else "failed", report)
+        except Exception as e:
+            logger.error(f"Failed to record the run: {e}")
+    
     end_time = datetime.now()
     duration = (end_time - start_time).total_seconds()
     results["end_time"] = end_time.isoformat()
     results["duration_seconds"] = duration
+    try:
+        results["report_path"] = write_run_report(results)
+    except Exception as e:
+        logger.error(f"Failed to write the run report: {e}")
     
     logger.info("\n" + "=" * 60)
     logger.info("Pipeline Summary")
     logger.info("=" * 60)
     logger.info(f"Duration: {duration:.1f} seconds")
+    if results["timings"]:
+        logger.info(f"Critical path: {' → '.join(results['timings']['critical_path'])} "
+                    f"({results['timings']['critical_path_seconds']:.1f}s)")
     logger.info(f"Scraped: {results['scraping']}")
     logger.info(f"Processed: {results['processing']}")
     logger.info(f"Digests: {results['digests']}")
     logger.info(f"Email: {'Sent' if results['success'] else 'Failed'}")
+    for usage in results["llm_usage"]:
+        logger.info(f"LLM {usage['agent']}: {usage['calls']} calls ({usage['retries']} retries, "
+                    f"{usage['rate_limited']} rate limited), {usage['prompt_tokens']:,} prompt + "
+                    f"{usage['output_tokens']:,} output tokens, {usage['call_seconds']:.1f}s in calls, "
+                    f"{usage['throttle_seconds'] + usage['backoff_seconds']:.1f}s waiting")
+    logger.info(f"Maintenance: {[(j['job'], j.get('rows')) for j in results['maintenance'].get('jobs', [])]}")
+    if results.get("report_path"):
+        logger.info(f"Run report: {results['report_path']}")
+    if results.get("profile_dir"):
+        logger.info(f"Stage profiles: {results['profile_dir']}")
     logger.info("=" * 60)
     
     return results
 
 
 if __name__ == "__main__":
-    result = run_daily_pipeline(hours=24, top_n=10)
+    import sys
+    
+    result = run_daily_pipeline(hours=24, top_n=10, profile=True if "--profile" in sys.argv else None)
     exit(0 if result["success"] else 1)
 
@@ -0,0 +1,174 @@
+"""
+Create and backfill the full-text search index (search_documents)
+
+Usage:
+    python -m app.database.build_search_index            # create + backfill
+    python -m app.database.build_search_index benchmark "query one" "query two" ...
+
+New digests and article markdown are indexed on write by the Repository;
+this script is only needed once for existing rows (or after a restore). A
+search_documents table from before the integer pk column is dropped and
+rebuilt, which also trims its documents to the current excerpt size.
+"""
+import sys
+import time
+import logging
+from typing import List
+from sqlalchemy import inspect, text
+from app.database.connection import engine, get_database_info, get_session
+from app.database.models import (
+    SearchDocument, Digest, YouTubeVideo, AnthropicArticle, GoogleArticle, MetaArticle,
+    MistralArticle, HuggingFaceArticle, HuggingFacePaper, TechCrunchArticle, MITTRArticle,
+    VentureBeatArticle
+)
+from app.database.repository import Repository, search_excerpt, upsert_search_documents
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ARTICLE_SOURCES = [
+    ("anthropic", AnthropicArticle),
+    ("google", GoogleArticle),
+    ("meta", MetaArticle),
+    ("mistral", MistralArticle),
+    ("huggingface", HuggingFaceArticle),
+    ("huggingface_papers", HuggingFacePaper),
+    ("techcrunch", TechCrunchArticle),
+    ("mittr", MITTRArticle),
+    ("venturebeat", VentureBeatArticle),
+]
+
+BATCH_SIZE = 500
+
+
+def _flush(session, documents: List[dict]) -> int:
+    if documents:
+        upsert_search_documents(session, documents)
+        session.commit()
+    return len(documents)
+
+
+def _drop_outdated_table() -> None:
+    """Drop a search_documents table keyed on its string id (FTS5 followed its implicit rowid)"""
+    inspector = inspect(engine)
+    if not inspector.has_table("search_documents"):
+        return
+    if "pk" in {column["name"] for column in inspector.get_columns("search_documents")}:
+        return
+    logger.info("Rebuilding search_documents with an integer key")
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            conn.execute(text("DROP TABLE IF EXISTS search_documents_fts"))
+        conn.execute(text("DROP TABLE search_documents"))  # Its triggers and indexes go with it
+
+
+def build_search_index() -> bool:
+    """Create the search table/indexes if missing and backfill them from existing rows"""
+    try:
+        db_info = get_database_info()
+
+        logger.info("=" * 60)
+        logger.info("Build Search Index")
+        logger.info("=" * 60)
+        logger.info(f"Environment: {db_info['environment']}")
+        logger.info(f"Database: {db_info['database']}")
+        logger.info("=" * 60)
+
+        _drop_outdated_table()
+        SearchDocument.__table__.create(bind=engine, checkfirst=True)
+
+        session = get_session()
+        try:
+            indexed = 0
+            batch = []
+            for d in session.query(Digest).yield_per(BATCH_SIZE):
+                if not d.title or not d.summary:
+                    continue
+                batch.append(dict(
+                    id=f"digest:{d.id}", kind="digest", article_type=d.article_type,
+                    article_id=d.article_id, url=d.url, title=d.title, body=d.summary,
+                    published_at=d.created_at
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    indexed += _flush(session, batch)
+                    batch = []
+            indexed += _flush(session, batch)
+            logger.info(f"✓ Indexed {indexed} digests")
+
+            for article_type, model in ARTICLE_SOURCES:
+                indexed = 0
+                batch = []
+                query = session.query(model).filter(model.markdown.isnot(None))
+                for a in query.yield_per(BATCH_SIZE):
+                    batch.append(dict(
+                        id=f"article:{article_type}:{a.guid}", kind="article",
+                        article_type=article_type, article_id=a.guid, url=a.url, title=a.title,
+                        body=search_excerpt(a.description, a.markdown), published_at=a.published_at
+                    ))
+                    if len(batch) >= BATCH_SIZE:
+                        indexed += _flush(session, batch)
+                        batch = []
+                indexed += _flush(session, batch)
+                logger.info(f"✓ Indexed {indexed} {article_type} articles")
+
+            indexed = 0
+            batch = []
+            query = session.query(YouTubeVideo).filter(
+                YouTubeVideo.transcript.isnot(None),
+                YouTubeVideo.transcript != "__UNAVAILABLE__"
+            )
+            for v in query.yield_per(BATCH_SIZE):
+                batch.append(dict(
+                    id=f"article:youtube:{v.video_id}", kind="article", article_type="youtube",
+                    article_id=v.video_id, url=v.url, title=v.title,
+                    body=search_excerpt(v.description, v.transcript), published_at=v.published_at
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    indexed += _flush(session, batch)
+                    batch = []
+            indexed += _flush(session, batch)
+            logger.info(f"✓ Indexed {indexed} YouTube transcripts")
+        finally:
+            session.close()
+
+        logger.info("\n✓ Search index build complete!")
+        return True
+
+    except Exception as e:
+        logger.error(f"✗ Search index build failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def benchmark(queries: List[str], runs: int = 20) -> dict:
+    """Report p50/p95 latency of the first results page for each query"""
+    repo = Repository()
+    try:
+        with engine.connect() as conn:
+            documents = conn.execute(text("SELECT COUNT(*) FROM search_documents")).scalar()
+        print(f"\n=== Search Benchmark ({documents} documents, {runs} runs per query) ===")
+
+        report = {}
+        for query in queries:
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = repo.search(query, page=1, page_size=20)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p50 = timings[len(timings) // 2]
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            report[query] = {"p50_ms": p50, "p95_ms": p95, "results": len(result["results"])}
+            print(f"{query!r:40} p50={p50:7.2f}ms  p95={p95:7.2f}ms  results={len(result['results'])}")
+        return report
+    finally:
+        repo.session.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "benchmark":
+        benchmark(sys.argv[2:] or ["language models", "reinforcement learning", "inference latency"])
+    else:
+        success = build_search_index()
+        sys.exit(0 if success else 1)
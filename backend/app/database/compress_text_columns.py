@@ -0,0 +1,289 @@
+"""
+Migration and tooling for zstd-compressed text columns (see app/database/compression.py)
+
+Usage:
+    python -m app.database.compress_text_columns migrate [batch_size]
+        Add a binary <column>_zstd next to each markdown/transcript column and fill
+        it with the compressed text. Safe with the app running, and to re-run:
+        only rows not copied yet are written.
+    python -m app.database.compress_text_columns drop-plain
+        Once every process runs with COMPRESS_TEXT_COLUMNS=true, drop the text
+        columns to reclaim their space.
+    python -m app.database.compress_text_columns train <output_path> [dict_size]
+        Train a zstd dictionary on existing content (set ZSTD_DICT_PATH to use it).
+    python -m app.database.compress_text_columns benchmark [sample_size]
+        Report stored size and read/decode throughput for the compressed columns.
+
+Rollout: run `migrate`, set COMPRESS_TEXT_COLUMNS=true and redeploy, run `migrate`
+again to copy rows written by processes still on the text columns in between, then
+`drop-plain`. The text columns are never altered in place, so processes on either
+setting keep working until then. Run `train` before `migrate` if you want a
+dictionary, since frames only embed the dictionary they were written with.
+"""
+import os
+import sys
+import time
+import logging
+from typing import List, Optional, Set, Tuple
+from sqlalchemy import LargeBinary, inspect, text
+from app.database.connection import engine, get_database_info
+from app.database.compression import COMPRESS_TEXT_COLUMNS, ZstdCodec, ZSTD_MAGIC, compressed_column_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# (table, primary key columns, text column)
+COMPRESSED_COLUMNS: List[Tuple[str, Tuple[str, ...], str]] = [
+    ("anthropic_articles", ("guid",), "markdown"),
+    ("google_articles", ("guid",), "markdown"),
+    ("meta_articles", ("guid",), "markdown"),
+    ("mistral_articles", ("guid",), "markdown"),
+    ("huggingface_articles", ("guid",), "markdown"),
+    ("huggingface_papers", ("guid",), "markdown"),
+    ("techcrunch_articles", ("guid",), "markdown"),
+    ("mittr_articles", ("guid",), "markdown"),
+    ("venturebeat_articles", ("guid",), "markdown"),
+    ("youtube_videos", ("video_id",), "transcript"),
+    ("stage_runs", ("run_id", "stage"), "output"),
+]
+
+
+def _to_bytes(value) -> bytes:
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    return bytes(value)
+
+
+def _columns(table: str) -> Set[str]:
+    """Column names of table (empty if it doesn't exist)"""
+    inspector = inspect(engine)
+    if not inspector.has_table(table):
+        return set()
+    return {c["name"] for c in inspector.get_columns(table)}
+
+
+def _pending_filter(column: str, target: str) -> str:
+    return f"{column} IS NOT NULL AND {target} IS NULL"
+
+
+def migrate(batch_size: int = 200) -> bool:
+    """Add the compressed columns and copy the text columns into them, in batches"""
+    try:
+        db_info = get_database_info()
+        codec = ZstdCodec()
+        binary_type = LargeBinary().compile(dialect=engine.dialect)
+
+        logger.info("=" * 60)
+        logger.info("Database Migration: Compress markdown and transcript columns")
+        logger.info("=" * 60)
+        logger.info(f"Environment: {db_info['environment']}")
+        logger.info(f"Database: {db_info['database']}")
+        logger.info("=" * 60)
+
+        for table, keys, column in COMPRESSED_COLUMNS:
+            target = compressed_column_name(column)
+            existing = _columns(table)
+            if not existing:
+                continue
+            with engine.connect() as conn:
+                if target not in existing:
+                    logger.info(f"Adding {table}.{target}...")
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {target} {binary_type}"))
+                    conn.commit()
+                if column not in existing:
+                    continue  # Created with compression on, or already dropped: nothing to copy
+
+                raw_bytes = 0
+                stored_bytes = 0
+                copied = 0
+                match = " AND ".join(f"{key} = :k{i}" for i, key in enumerate(keys))
+                while True:
+                    # Every row read is written below, so the next query starts past it
+                    rows = conn.execute(text(
+                        f"SELECT {', '.join(keys)}, {column} FROM {table} "
+                        f"WHERE {_pending_filter(column, target)} LIMIT :limit"
+                    ), {"limit": batch_size}).fetchall()
+                    if not rows:
+                        break
+
+                    updates = []
+                    for row in rows:
+                        data = _to_bytes(row[-1])
+                        # Rows compressed in place by an earlier version of this script are copied as they are
+                        packed = data if data[:4] == ZSTD_MAGIC else codec.compress(data.decode("utf-8"))
+                        raw_bytes += len(data)
+                        stored_bytes += len(packed)
+                        updates.append({**{f"k{i}": row[i] for i in range(len(keys))}, "value": packed})
+
+                    # The IS NULL check keeps a value the app wrote in the meantime
+                    conn.execute(
+                        text(f"UPDATE {table} SET {target} = :value WHERE {match} AND {target} IS NULL"),
+                        updates
+                    )
+                    conn.commit()
+                    copied += len(updates)
+
+                ratio = raw_bytes / stored_bytes if stored_bytes else 0
+                logger.info(f"✓ {table}.{column}: copied {copied} rows to {target} "
+                            f"({raw_bytes / 1024:.0f} KB → {stored_bytes / 1024:.0f} KB, {ratio:.1f}x)")
+
+        logger.info("\n✓ Migration complete! Set COMPRESS_TEXT_COLUMNS=true to read and write compressed values, "
+                    "then run migrate once more.")
+        return True
+
+    except Exception as e:
+        logger.error(f"✗ Migration failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def drop_plain() -> bool:
+    """Drop the text columns, once every value has been copied to its compressed column"""
+    if not COMPRESS_TEXT_COLUMNS:
+        logger.error("✗ COMPRESS_TEXT_COLUMNS is not enabled: the app still reads the text columns")
+        return False
+
+    droppable = []
+    with engine.connect() as conn:
+        for table, _, column in COMPRESSED_COLUMNS:
+            target = compressed_column_name(column)
+            existing = _columns(table)
+            if column not in existing:
+                continue
+            if target not in existing:
+                logger.error(f"✗ {table}.{target} does not exist: run migrate first")
+                return False
+            missing = conn.execute(text(
+                f"SELECT count(*) FROM {table} WHERE {_pending_filter(column, target)}"
+            )).scalar()
+            if missing:
+                logger.error(f"✗ {table}: {missing} rows not copied yet: run migrate again")
+                return False
+            droppable.append((table, column))
+
+        for table, column in droppable:
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+            conn.commit()
+            logger.info(f"✓ Dropped {table}.{column}")
+    return True
+
+
+def _sample_values(limit_per_table: int) -> List[bytes]:
+    codec = ZstdCodec(dict_path=None)
+    samples = []
+    with engine.connect() as conn:
+        for table, _, column in COMPRESSED_COLUMNS:
+            existing = _columns(table)
+            source = column if column in existing else compressed_column_name(column)
+            if source not in existing:
+                continue
+            rows = conn.execute(text(
+                f"SELECT {source} FROM {table} WHERE {source} IS NOT NULL LIMIT :limit"
+            ), {"limit": limit_per_table}).fetchall()
+            for (value,) in rows:
+                data = _to_bytes(value)
+                if data[:4] == ZSTD_MAGIC:
+                    try:
+                        data = codec.decompress(data).encode("utf-8")
+                    except Exception:
+                        continue  # Written with a dictionary we don't have here
+                samples.append(data)
+    return samples
+
+
+def train(output_path: str, dict_size: int = 112640, limit_per_table: int = 2000) -> bool:
+    """Train a zstd dictionary from existing content"""
+    import zstandard
+
+    samples = _sample_values(limit_per_table)
+    if len(samples) < 10:
+        logger.error(f"✗ Need at least 10 samples to train a dictionary, found {len(samples)}")
+        return False
+
+    dictionary = zstandard.train_dictionary(dict_size, samples)
+    with open(output_path, "wb") as f:
+        f.write(dictionary.as_bytes())
+    logger.info(f"✓ Trained {len(dictionary.as_bytes()) / 1024:.0f} KB dictionary "
+                f"(id {dictionary.dict_id()}) from {len(samples)} samples → {output_path}")
+    return True
+
+
+def benchmark(sample_size: int = 500, dict_path: Optional[str] = None) -> dict:
+    """Measure compression ratio and decode throughput on a sample of real rows"""
+    codec = ZstdCodec(dict_path=dict_path or os.getenv("ZSTD_DICT_PATH"))
+    samples = [s.decode("utf-8") for s in _sample_values(sample_size)]
+    if not samples:
+        logger.warning("No rows to benchmark")
+        return {}
+
+    raw_bytes = sum(len(s.encode("utf-8")) for s in samples)
+
+    start = time.perf_counter()
+    packed = [codec.compress(s) for s in samples]
+    compress_seconds = time.perf_counter() - start
+    stored_bytes = sum(len(p) for p in packed)
+
+    start = time.perf_counter()
+    for p in packed:
+        codec.decompress(p)
+    decompress_seconds = time.perf_counter() - start
+
+    # End-to-end read throughput of one compressed column as stored
+    table, _, text_column = COMPRESSED_COLUMNS[0]
+    column = compressed_column_name(text_column)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        rows = conn.execute(text(
+            f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL LIMIT :limit"
+        ), {"limit": sample_size}).fetchall()
+        read_bytes = 0
+        for (value,) in rows:
+            data = _to_bytes(value)
+            read_bytes += len(data)
+            codec.decompress(data)
+        read_seconds = time.perf_counter() - start
+
+    result = {
+        "samples": len(samples),
+        "raw_mb": raw_bytes / 1e6,
+        "stored_mb": stored_bytes / 1e6,
+        "ratio": raw_bytes / stored_bytes if stored_bytes else 0,
+        "compress_mb_per_s": raw_bytes / 1e6 / compress_seconds if compress_seconds else 0,
+        "decompress_mb_per_s": raw_bytes / 1e6 / decompress_seconds if decompress_seconds else 0,
+        "read_rows": len(rows),
+        "read_transfer_mb": read_bytes / 1e6,
+        "read_rows_per_s": len(rows) / read_seconds if read_seconds else 0,
+    }
+
+    print(f"\n=== Compression Benchmark ({'with' if codec.has_dict else 'no'} dictionary, level {codec.level}) ===")
+    print(f"Samples:        {result['samples']}")
+    print(f"Raw size:       {result['raw_mb']:.2f} MB")
+    print(f"Stored size:    {result['stored_mb']:.2f} MB ({result['ratio']:.1f}x)")
+    print(f"Compress:       {result['compress_mb_per_s']:.0f} MB/s")
+    print(f"Decompress:     {result['decompress_mb_per_s']:.0f} MB/s")
+    print(f"Read + decode:  {result['read_rows_per_s']:.0f} rows/s from {table}.{column} "
+          f"({result['read_transfer_mb']:.2f} MB transferred)")
+    return result
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "help"
+
+    if command == "migrate":
+        batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        sys.exit(0 if migrate(batch_size) else 1)
+    elif command == "drop-plain":
+        sys.exit(0 if drop_plain() else 1)
+    elif command == "train":
+        if len(sys.argv) < 3:
+            print("Usage: python -m app.database.compress_text_columns train <output_path> [dict_size]")
+            sys.exit(1)
+        dict_size = int(sys.argv[3]) if len(sys.argv) > 3 else 112640
+        sys.exit(0 if train(sys.argv[2], dict_size) else 1)
+    elif command == "benchmark":
+        sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+        benchmark(sample_size)
+    else:
+        print(__doc__)
+        sys.exit(0 if command == "help" else 1)
@@ -0,0 +1,104 @@
+"""
+Transparent zstd compression for large text columns (article markdown, transcripts).
+
+Opt in with COMPRESS_TEXT_COLUMNS=true. Compressed values live in a separate
+BYTEA/BLOB column, <column>_zstd, next to the plain text column, and are decoded
+back to str on access, so callers keep working with plain strings. Run
+`python -m app.database.compress_text_columns migrate` before switching the flag
+on: it adds the binary columns and fills them while the app keeps running on the
+text columns, which are never altered in place.
+
+Optional: train a dictionary on existing content for better ratios on short
+pages and point ZSTD_DICT_PATH at it. Frames written with a dictionary can
+only be read with that same dictionary, so never replace it in place.
+"""
+import os
+from typing import Optional
+from sqlalchemy import Column, LargeBinary, Text
+from sqlalchemy.types import TypeDecorator
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Values shorter than this are stored as raw UTF-8: compression doesn't pay off,
+# and markers like "__UNAVAILABLE__" stay byte-identical so equality filters work
+MIN_COMPRESS_BYTES = 64
+
+COMPRESS_TEXT_COLUMNS = os.getenv("COMPRESS_TEXT_COLUMNS", "false").lower() == "true"
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "6"))
+ZSTD_DICT_PATH = os.getenv("ZSTD_DICT_PATH")
+
+
+class ZstdCodec:
+    def __init__(self, level: int = ZSTD_LEVEL, dict_path: Optional[str] = ZSTD_DICT_PATH):
+        import zstandard  # Only needed when compression is enabled
+
+        dict_data = None
+        if dict_path:
+            with open(dict_path, "rb") as f:
+                dict_data = zstandard.ZstdCompressionDict(f.read())
+
+        self.level = level
+        self.has_dict = dict_data is not None
+        self.compressor = zstandard.ZstdCompressor(level=level, dict_data=dict_data)
+        self.decompressor = zstandard.ZstdDecompressor(dict_data=dict_data)
+
+    def compress(self, value: str) -> bytes:
+        raw = value.encode("utf-8")
+        if len(raw) < MIN_COMPRESS_BYTES:
+            return raw
+        return self.compressor.compress(raw)
+
+    def decompress(self, data: bytes) -> str:
+        if data[:4] == ZSTD_MAGIC:
+            data = self.decompressor.decompress(data)
+        # Anything else is raw UTF-8 (short values, or rows not yet migrated)
+        return data.decode("utf-8")
+
+
+_codec: Optional[ZstdCodec] = None
+
+
+def get_codec() -> ZstdCodec:
+    global _codec
+    if _codec is None:
+        _codec = ZstdCodec()
+    return _codec
+
+
+class CompressedText(TypeDecorator):
+    """
+    Text stored zstd-compressed as binary and decoded transparently. Reads accept
+    every format a row can be in: zstd frames, raw UTF-8 bytes (short values) and
+    plain strings.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return bytes(value)
+        return get_codec().compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return value
+        return get_codec().decompress(bytes(value))
+
+
+def compressed_column_name(column: str) -> str:
+    return f"{column}_zstd"
+
+
+def large_text_column(name: str) -> Column:
+    """
+    Column for a large text field. When opted in, the attribute maps to the
+    compressed column (<name>_zstd) instead of the text one.
+    """
+    if COMPRESS_TEXT_COLUMNS:
+        return Column(compressed_column_name(name), CompressedText(), nullable=True)
+    return Column(name, Text, nullable=True)
@@ -1,11 +1,8 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from dotenv import load_dotenv
+import threading
+from typing import Optional
 from urllib.parse import urlparse
 
-load_dotenv()
-
 def get_database_url() -> str:
     """
     Get database URL from environment.
@@ -39,7 +36,9 @@ def get_database_info() -> dict:
         masked_url = database_url
     
     # Determine environment
-    if "neon" in parsed.hostname or "neon" in database_url:
+    if parsed.scheme.startswith("sqlite"):
+        environment = "SQLite (Local)"
+    elif "neon" in (parsed.hostname or "") or "neon" in database_url:
         environment = "Neon (Cloud)"
     elif parsed.hostname in ["localhost", "127.0.0.1"]:
         environment = "Local"
@@ -56,19 +55,78 @@ def get_database_info() -> dict:
     }
 
 
-engine = create_engine(
-    get_database_url(),
-    pool_pre_ping=True,  # Verify connections before using them
-    pool_recycle=300,    # Recycle connections after 5 minutes
-    pool_size=1,         # Serverless: use minimal pool size
-    max_overflow=0,      # Serverless: no overflow connections
-    connect_args={
-        "sslmode": "require",
-        "connect_timeout": 10
+def get_engine_options(database_url: str) -> dict:
+    """Dialect-specific engine options: SQLite for local runs, PostgreSQL otherwise"""
+    if database_url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    
+    return {
+        "pool_pre_ping": True,  # Verify connections before using them
+        "pool_recycle": 300,    # Recycle connections after 5 minutes
+        "pool_size": _pool_connections or int(os.getenv("DB_POOL_SIZE", "1")),  # Serverless: use minimal pool size
+        # Overflow connections are closed when returned, so API requests still hold one
+        "max_overflow": 0 if _pool_connections else int(os.getenv("DB_MAX_OVERFLOW", "3")),
+        "connect_args": {
+            "sslmode": "require",
+            "connect_timeout": 10
+        }
     }
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+# The engine is created on first use rather than at import, so importing the
+# API (or anything that imports the repository) stays cheap on cold starts
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+# Fixed pool size set by size_pool (None: DB_POOL_SIZE + DB_MAX_OVERFLOW overflow connections)
+_pool_connections: Optional[int] = None
+
+
+def get_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                from sqlalchemy.orm import sessionmaker
+                from app.utils.metrics import instrument_engine
+                
+                database_url = get_database_url()
+                _engine = create_engine(database_url, **get_engine_options(database_url))
+                instrument_engine(_engine)
+                _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
+    return _engine
+
+
+def size_pool(connections: int) -> None:
+    """
+    Give this process a pool of exactly `connections` connections (the daily
+    pipeline's PIPELINE_DB_CONCURRENCY). Sessions wait there for a free one, so
+    the pool caps concurrent database work while each session holds a connection
+    only for its transaction. An existing engine is replaced; sessions already
+    open on it keep working until closed.
+    """
+    global _engine, _pool_connections
+    with _engine_lock:
+        before = get_engine_options(get_database_url())
+        _pool_connections = connections
+        if _engine is None or get_engine_options(get_database_url()) == before:
+            return
+        previous, _engine = _engine, None
+    previous.dispose()
+
 
 def get_session():
-    return SessionLocal()
+    get_engine()
+    return _session_factory()
+
+
+def __getattr__(name: str):
+    # `from app.database.connection import engine` keeps working, lazily
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        get_engine()
+        return _session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
@@ -0,0 +1,114 @@
+"""
+Set-based database maintenance jobs.
+Each job runs as a single SQL statement and reports affected rows and timing.
+
+Run manually:
+    python -m app.database.maintenance                      # configured jobs
+    python -m app.database.maintenance empty_digests vacuum # specific jobs
+"""
+import sys
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+from sqlalchemy import text
+from app.config import MAINTENANCE_JOBS, UNAVAILABLE_TRANSCRIPT_TTL_DAYS
+from app.database.connection import engine
+from app.database.repository import Repository
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _timed(job: str, func: Callable[[], Optional[int]]) -> dict:
+    start = time.perf_counter()
+    try:
+        rows = func()
+        duration = time.perf_counter() - start
+        logger.info(f"✓ {job}: {rows if rows is not None else '-'} rows in {duration * 1000:.1f}ms")
+        return {"job": job, "success": True, "rows": rows, "duration_seconds": duration}
+    except Exception as e:
+        duration = time.perf_counter() - start
+        logger.error(f"✗ {job} failed after {duration * 1000:.1f}ms: {e}")
+        return {"job": job, "success": False, "rows": None, "duration_seconds": duration, "error": str(e)}
+
+
+def delete_empty_digests() -> dict:
+    """Bulk delete digests with an empty title or summary"""
+    def run():
+        repo = Repository()
+        try:
+            return repo.delete_empty_digests()
+        finally:
+            repo.session.close()
+
+    return _timed("empty_digests", run)
+
+
+def purge_unavailable_transcripts(ttl_days: int = UNAVAILABLE_TRANSCRIPT_TTL_DAYS) -> dict:
+    """Bulk delete videos stuck on the unavailable-transcript marker for longer than ttl_days"""
+    def run():
+        # created_at is stored as naive UTC
+        cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=ttl_days)
+        repo = Repository()
+        try:
+            return repo.purge_unavailable_transcripts(older_than=cutoff)
+        finally:
+            repo.session.close()
+
+    return _timed("unavailable_transcripts", run)
+
+
+def _run_autocommit(statement: str) -> None:
+    # VACUUM cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(statement))
+
+
+def analyze() -> dict:
+    """Refresh planner statistics"""
+    return _timed("analyze", lambda: _run_autocommit("ANALYZE"))
+
+
+def vacuum() -> dict:
+    """Reclaim dead rows (and refresh statistics on PostgreSQL)"""
+    statement = "VACUUM (ANALYZE)" if engine.dialect.name == "postgresql" else "VACUUM"
+    return _timed("vacuum", lambda: _run_autocommit(statement))
+
+
+MAINTENANCE_REGISTRY: Dict[str, Callable[[], dict]] = {
+    "empty_digests": delete_empty_digests,
+    "unavailable_transcripts": purge_unavailable_transcripts,
+    "analyze": analyze,
+    "vacuum": vacuum,
+}
+
+
+def run_maintenance(jobs: Optional[List[str]] = None) -> dict:
+    """Run the given maintenance jobs in order, continuing past failures"""
+    jobs = jobs if jobs is not None else MAINTENANCE_JOBS
+    start = time.perf_counter()
+    results = []
+
+    for job in jobs:
+        func = MAINTENANCE_REGISTRY.get(job)
+        if func is None:
+            logger.warning(f"Unknown maintenance job: {job}")
+            results.append({"job": job, "success": False, "error": "Unknown job"})
+            continue
+        results.append(func())
+
+    return {
+        "jobs": results,
+        "success": all(r["success"] for r in results),
+        "duration_seconds": time.perf_counter() - start
+    }
+
+
+if __name__ == "__main__":
+    result = run_maintenance(sys.argv[1:] or None)
+    print(f"\nMaintenance finished in {result['duration_seconds']:.2f}s")
+    for job in result["jobs"]:
+        status = "✓" if job["success"] else "✗"
+        print(f"{status} {job['job']}: rows={job.get('rows')} ({job.get('duration_seconds', 0) * 1000:.1f}ms)")
+    sys.exit(0 if result["success"] else 1)
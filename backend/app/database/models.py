@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, String, DateTime, Text, Boolean
+from sqlalchemy import Column, String, DateTime, Text, Boolean, Float, Integer, DDL, Index, event, text
 from sqlalchemy.orm import declarative_base
+from .compression import large_text_column
 
 Base = declarative_base()
 
@@ -15,7 +16,7 @@ class YouTubeVideo(Base):
     channel_id = Column(String, nullable=False)
     published_at = Column(DateTime, nullable=False)
     description = Column(Text)
-    transcript = Column(Text, nullable=True)
+    transcript = large_text_column("transcript")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -40,7 +41,7 @@ class AnthropicArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -53,7 +54,7 @@ class GoogleArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -69,6 +70,19 @@ class Digest(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class DigestDuplicate(Base):
+    __tablename__ = "digest_duplicates"
+    
+    id = Column(String, primary_key=True)  # "article_type:article_id" of the duplicate article
+    digest_id = Column(String, nullable=False, index=True)  # Digest of the canonical article
+    article_type = Column(String, nullable=False)
+    article_id = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    similarity = Column(Float, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class Email(Base):
     __tablename__ = "emails"
     
@@ -79,6 +93,102 @@ class Email(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
+class SubscriberProfile(Base):
+    __tablename__ = "subscriber_profiles"
+    
+    email_id = Column(String, primary_key=True)  # emails.id
+    interests = Column(Text, nullable=False)  # JSON list of interest phrases, most important first
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # confirmation, unsubscribe
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)  # Retry backoff; lease expiry while sending
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class PipelineRun(Base):
+    __tablename__ = "pipeline_runs"
+    
+    id = Column(String, primary_key=True)  # Edition, e.g. "2026-01-31/24h/top10"
+    status = Column(String, nullable=False, default="running")  # running, success, failed
+    attempts = Column(Integer, nullable=False, default=1)
+    report = Column(Text, nullable=True)  # JSON timing report of the last attempt
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class PipelineStageRun(Base):
+    __tablename__ = "stage_runs"
+    
+    run_id = Column(String, primary_key=True)  # pipeline_runs.id
+    stage = Column(String, primary_key=True)
+    status = Column(String, nullable=False)  # running, success, failed, skipped
+    cursor = Column(Text, nullable=True)  # JSON checkpoint of a partially completed stage
+    output = large_text_column("output")  # JSON output, reused when the run resumes
+    error = Column(Text, nullable=True)
+    duration = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class LLMUsage(Base):
+    __tablename__ = "llm_usage"
+    
+    # Totals per agent and model for one attempt of a pipeline run (see app/agent/llm.py)
+    run_id = Column(String, primary_key=True)  # pipeline_runs.id
+    attempt = Column(Integer, primary_key=True)
+    agent = Column(String, primary_key=True)  # digest, curator, email
+    model = Column(String, primary_key=True)
+    calls = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    retries = Column(Integer, nullable=False, default=0)
+    rate_limited = Column(Integer, nullable=False, default=0)  # HTTP 429 responses
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    output_tokens = Column(Integer, nullable=False, default=0)
+    total_tokens = Column(Integer, nullable=False, default=0)
+    call_seconds = Column(Float, nullable=False, default=0)  # Waiting on the API
+    throttle_seconds = Column(Float, nullable=False, default=0)  # Client-side rate limit
+    backoff_seconds = Column(Float, nullable=False, default=0)  # Sleeping before retries
+    recorded_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # e.g. "daily_digest"
+    dedupe_key = Column(String, nullable=False)  # Triggers with the same key coalesce while one is pending
+    params = Column(Text, nullable=True)  # JSON keyword arguments
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    result = Column(Text, nullable=True)  # JSON summary
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    worker = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        # At most one pending job per key: a concurrent duplicate insert fails instead of queueing twice
+        Index(
+            "ix_jobs_pending_dedupe", "kind", "dedupe_key", unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+            sqlite_where=text("status IN ('queued', 'running')")
+        ),
+    )
+
+
 class MetaArticle(Base):
     __tablename__ = "meta_articles"
     
@@ -88,7 +198,7 @@ class MetaArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -101,7 +211,7 @@ class MistralArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -114,7 +224,7 @@ class HuggingFaceArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -127,7 +237,7 @@ class HuggingFacePaper(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     upvotes = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -140,7 +250,7 @@ class TechCrunchArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -153,7 +263,7 @@ class MITTRArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
     created_at = Column(DateTime, default=datetime.utcnow)
 
 
@@ -166,6 +276,53 @@ class VentureBeatArticle(Base):
     description = Column(Text)
     published_at = Column(DateTime, nullable=False)
     category = Column(String, nullable=True)
-    markdown = Column(Text, nullable=True)
+    markdown = large_text_column("markdown")
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class SearchDocument(Base):
+    __tablename__ = "search_documents"
+    
+    # Explicit integer key for the SQLite FTS5 index to follow: the implicit rowid of a
+    # table with a string primary key can be renumbered by VACUUM
+    pk = Column(Integer, primary_key=True, autoincrement=True)
+    id = Column(String, nullable=False, unique=True)  # "digest:<digest id>" or "article:<type>:<id>"
+    kind = Column(String, nullable=False)  # "digest" or "article"
+    article_type = Column(String, nullable=False)
+    article_id = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    body = Column(Text, nullable=True)  # Digest summary, or an article's bounded excerpt
+    published_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
+# PostgreSQL: weighted tsvector kept current by a generated column, with a GIN index
+for _statement in (
+    """ALTER TABLE search_documents ADD COLUMN tsv tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_search_documents_tsv ON search_documents USING GIN (tsv)",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+# SQLite: external-content FTS5 table kept in sync by triggers
+for _statement in (
+    "CREATE VIRTUAL TABLE search_documents_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='pk', tokenize='porter unicode61')",
+    """CREATE TRIGGER search_documents_ai AFTER INSERT ON search_documents BEGIN
+        INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.pk, new.title, new.body);
+    END""",
+    """CREATE TRIGGER search_documents_ad AFTER DELETE ON search_documents BEGIN
+        INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body)
+        VALUES ('delete', old.pk, old.title, old.body);
+    END""",
+    """CREATE TRIGGER search_documents_au AFTER UPDATE ON search_documents BEGIN
+        INSERT INTO search_documents_fts(search_documents_fts, rowid, title, body)
+        VALUES ('delete', old.pk, old.title, old.body);
+        INSERT INTO search_documents_fts(rowid, title, body) VALUES (new.pk, new.title, new.body);
+    END""",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
@@ -1,19 +1,80 @@
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator
+from sqlalchemy import func, delete, exists, literal, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
 from .models import (
     YouTubeVideo, OpenAIArticle, AnthropicArticle, GoogleArticle, Digest, Email,
     MetaArticle, MistralArticle, HuggingFaceArticle, 
-    HuggingFacePaper, TechCrunchArticle, MITTRArticle, VentureBeatArticle
+    HuggingFacePaper, TechCrunchArticle, MITTRArticle, VentureBeatArticle, SearchDocument,
+    DigestDuplicate, SubscriberProfile, PipelineRun, PipelineStageRun, LLMUsage, Job, OutboxMessage
 )
 from .connection import get_session
+from app.config import STREAM_PAGE_SIZE
+import json
+import re
 import uuid
 
+# Articles are searchable by their title and an excerpt (description, then the start of
+# the content), not a second copy of the full text, which stays in its (compressible) column
+SEARCH_EXCERPT_CHARS = 2_000
+
+# Per-agent LLM counters kept in llm_usage (as accumulated by app/agent/llm.py)
+USAGE_COLUMNS = (
+    "calls", "failed", "retries", "rate_limited",
+    "prompt_tokens", "output_tokens", "total_tokens",
+    "call_seconds", "throttle_seconds", "backoff_seconds",
+)
+
+
+def search_excerpt(description: Optional[str], content: Optional[str]) -> str:
+    """The part of an article that goes into the search index"""
+    parts = [part.strip() for part in (description, content) if part and part.strip()]
+    return "\n\n".join(parts)[:SEARCH_EXCERPT_CHARS]
+
+
+def upsert_search_documents(session: Session, documents: List[Dict[str, Any]]) -> None:
+    """Insert or update search documents by document id, with one lookup for the whole batch"""
+    existing = {
+        document.id: document
+        for document in session.query(SearchDocument).filter(SearchDocument.id.in_([d["id"] for d in documents]))
+    }
+    for fields in documents:
+        document = existing.get(fields["id"])
+        if document is None:
+            existing[fields["id"]] = SearchDocument(**fields)
+            session.add(existing[fields["id"]])
+        else:
+            for key, value in fields.items():
+                setattr(document, key, value)
+
 
 class Repository:
     def __init__(self, session: Optional[Session] = None):
         self.session = session or get_session()
     
+    def _index_search_document(self, **fields) -> None:
+        """Upsert a search document in the current transaction; indexing failures never block the write"""
+        if fields.get("body"):
+            fields["body"] = fields["body"][:SEARCH_EXCERPT_CHARS]
+        try:
+            with self.session.begin_nested():
+                upsert_search_documents(self.session, [fields])
+        except SQLAlchemyError as e:
+            print(f"Warning: Failed to index search document {fields.get('id')}: {e}")
+    
+    def _index_article(self, article_type: str, article_id: str, article: Any, body: str) -> None:
+        self._index_search_document(
+            id=f"article:{article_type}:{article_id}",
+            kind="article",
+            article_type=article_type,
+            article_id=article_id,
+            url=article.url,
+            title=article.title,
+            body=search_excerpt(article.description, body),
+            published_at=article.published_at
+        )
+    
     def create_youtube_video(self, video_id: str, title: str, url: str, channel_id: str, 
                             published_at: datetime, description: str = "", transcript: Optional[str] = None) -> Optional[YouTubeVideo]:
         existing = self.session.query(YouTubeVideo).filter_by(video_id=video_id).first()
@@ -156,16 +217,27 @@ class Repository:
             self.session.commit()
         return len(new_articles)
     
+    def _detached(self, rows: list) -> list:
+        """
+        Hand rows to a caller that fetches a page per row: ends the read so the
+        session holds no connection through the HTTP calls in between
+        """
+        for row in rows:
+            self.session.expunge(row)
+        self.session.commit()
+        return rows
+    
     def get_anthropic_articles_without_markdown(self, limit: Optional[int] = None) -> List[AnthropicArticle]:
         query = self.session.query(AnthropicArticle).filter(AnthropicArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_anthropic_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(AnthropicArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("anthropic", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -174,12 +246,13 @@ class Repository:
         query = self.session.query(GoogleArticle).filter(GoogleArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_google_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(GoogleArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("google", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -188,23 +261,32 @@ class Repository:
         query = self.session.query(YouTubeVideo).filter(YouTubeVideo.transcript.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_youtube_video_transcript(self, video_id: str, transcript: str) -> bool:
         video = self.session.query(YouTubeVideo).filter_by(video_id=video_id).first()
         if video:
             video.transcript = transcript
+            if transcript != "__UNAVAILABLE__":
+                self._index_article("youtube", video.video_id, video, transcript)
             self.session.commit()
             return True
         return False
     
-    def get_articles_without_digest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        articles = []
+    def get_digested_keys(self) -> set:
+        """"type:id" keys of every article already covered by a digest"""
         seen_ids = set()
+        for article_type, article_id in self.session.query(Digest.article_type, Digest.article_id):
+            seen_ids.add(f"{article_type}:{article_id}")
         
-        digests = self.session.query(Digest).all()
-        for d in digests:
-            seen_ids.add(f"{d.article_type}:{d.article_id}")
+        # Near-duplicates of an already digested story are covered by its digest
+        for (duplicate_id,) in self.session.query(DigestDuplicate.id):
+            seen_ids.add(duplicate_id)
+        return seen_ids
+    
+    def get_articles_without_digest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        articles = []
+        seen_ids = self.get_digested_keys()
         
         youtube_videos = self.session.query(YouTubeVideo).filter(
             YouTubeVideo.transcript.isnot(None),
@@ -413,47 +495,120 @@ class Repository:
             created_at=created_at
         )
         self.session.add(digest)
+        self._index_search_document(
+            id=f"digest:{digest_id}",
+            kind="digest",
+            article_type=article_type,
+            article_id=article_id,
+            url=url,
+            title=title,
+            body=summary,
+            published_at=created_at
+        )
         self.session.commit()
         return digest
     
-    def get_recent_digests(self, hours: int = 24) -> List[Dict[str, Any]]:
+    def iter_recent_digests(self, hours: int = 24, page_size: int = STREAM_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Stream recent digests through a server-side cursor, newest first.
+        Each digest carries the near-duplicate articles it stands in for.
+        """
         cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        digests = self.session.query(Digest).filter(
+        query = self.session.query(Digest).filter(
             Digest.created_at >= cutoff_time
-        ).order_by(Digest.created_at.desc()).all()
+        ).order_by(Digest.created_at.desc()).yield_per(page_size)
         
-        # Filter out digests with empty title or summary
-        return [
-            {
-                "id": d.id,
-                "article_type": d.article_type,
-                "article_id": d.article_id,
-                "url": d.url,
-                "title": d.title,
-                "summary": d.summary,
-                "created_at": d.created_at
-            }
-            for d in digests
-            if d.title and d.title.strip() and d.summary and d.summary.strip()
-        ]
+        batch = []
+        for d in query:
+            # Filter out digests with empty title or summary
+            if d.title and d.title.strip() and d.summary and d.summary.strip():
+                batch.append({
+                    "id": d.id,
+                    "article_type": d.article_type,
+                    "article_id": d.article_id,
+                    "url": d.url,
+                    "title": d.title,
+                    "summary": d.summary,
+                    "created_at": d.created_at,
+                    "duplicates": []
+                })
+            if len(batch) >= page_size:
+                yield from self._attach_duplicates(batch)
+                batch = []
+        if batch:
+            yield from self._attach_duplicates(batch)
+    
+    def _attach_duplicates(self, digests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_id = {d["id"]: d for d in digests}
+        duplicates = self.session.query(DigestDuplicate).filter(
+            DigestDuplicate.digest_id.in_(list(by_id))
+        ).order_by(DigestDuplicate.similarity.desc())
+        for dup in duplicates:
+            by_id[dup.digest_id]["duplicates"].append({
+                "article_type": dup.article_type,
+                "article_id": dup.article_id,
+                "url": dup.url,
+                "title": dup.title,
+                "similarity": dup.similarity
+            })
+        return digests
+    
+    def get_recent_digests(self, hours: int = 24) -> List[Dict[str, Any]]:
+        return list(self.iter_recent_digests(hours=hours))
+    
+    def create_digest_duplicates(self, digest_id: str, duplicates: List[dict]) -> int:
+        """Record articles that are near-duplicates of the story behind digest_id"""
+        new_duplicates = []
+        for dup in duplicates:
+            duplicate_id = f"{dup['type']}:{dup['id']}"
+            if self.session.get(DigestDuplicate, duplicate_id) is None:
+                new_duplicates.append(DigestDuplicate(
+                    id=duplicate_id,
+                    digest_id=digest_id,
+                    article_type=dup["type"],
+                    article_id=dup["id"],
+                    url=dup["url"],
+                    title=dup["title"],
+                    similarity=dup.get("similarity")
+                ))
+        if new_duplicates:
+            self.session.add_all(new_duplicates)
+            self.session.commit()
+        return len(new_duplicates)
     
     def delete_empty_digests(self) -> int:
-        """Delete digests with empty title or summary"""
-        empty_digests = self.session.query(Digest).filter(
-            (Digest.title == "") | (Digest.summary == "") | 
-            (Digest.title == None) | (Digest.summary == None)
-        ).all()
-        
-        count = len(empty_digests)
-        for digest in empty_digests:
-            self.session.delete(digest)
-        
+        """Delete digests with empty title or summary in a single DELETE statement"""
+        result = self.session.execute(
+            delete(Digest).where(
+                Digest.title.is_(None) | Digest.summary.is_(None) |
+                (func.trim(Digest.title) == "") | (func.trim(Digest.summary) == "")
+            )
+        )
+        self.session.commit()
+        return result.rowcount or 0
+    
+    def purge_unavailable_transcripts(self, older_than: datetime) -> int:
+        """
+        Delete YouTube videos whose transcript was marked unavailable before
+        older_than and that never produced a digest, in a single DELETE statement
+        """
+        has_digest = exists().where(
+            Digest.id == literal("youtube:").concat(YouTubeVideo.video_id)
+        )
+        result = self.session.execute(
+            delete(YouTubeVideo).where(
+                YouTubeVideo.transcript == "__UNAVAILABLE__",
+                YouTubeVideo.created_at < older_than,
+                ~has_digest
+            ).execution_options(synchronize_session=False)
+        )
         self.session.commit()
-        return count
+        return result.rowcount or 0
 
 
-    def create_email(self, email: str, name: Optional[str] = None, is_active: bool = True) -> Optional[Email]:
-        """Create a new email recipient"""
+    def create_email(self, email: str, name: Optional[str] = None, is_active: bool = True,
+                     commit: bool = True) -> Optional[Email]:
+        """Create a new email recipient (commit=False leaves it in the caller's transaction)"""
         existing = self.session.query(Email).filter_by(email=email).first()
         if existing:
             return None
@@ -465,7 +620,10 @@ class Repository:
             is_active="true" if is_active else "false"
         )
         self.session.add(email_record)
-        self.session.commit()
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
         return email_record
     
     def get_all_emails(self, active_only: bool = True) -> List[Email]:
@@ -475,25 +633,127 @@ class Repository:
             query = query.filter_by(is_active="true")
         return query.all()
     
+    def count_emails(self, active_only: bool = True) -> int:
+        """Count email recipients without loading them"""
+        query = self.session.query(func.count(Email.id))
+        if active_only:
+            query = query.filter(Email.is_active == "true")
+        return query.scalar() or 0
+    
+    def count_subscriber_profiles(self) -> Dict[Optional[str], int]:
+        """Active subscribers per distinct raw interest profile (None = default profile)"""
+        rows = self.session.query(
+            SubscriberProfile.interests, func.count(Email.id)
+        ).select_from(Email).outerjoin(
+            SubscriberProfile, SubscriberProfile.email_id == Email.id
+        ).filter(Email.is_active == "true").group_by(SubscriberProfile.interests).all()
+        return {interests: count for interests, count in rows}
+    
+    def iter_email_pages(self, active_only: bool = True, page_size: int = STREAM_PAGE_SIZE,
+                         after_id: Optional[str] = None) -> Iterator[List[Any]]:
+        """
+        Page through email recipients using keyset pagination on the primary key,
+        starting after after_id if given.
+        Each page is read in its own short-lived session, closed before the page is
+        yielded: no connection is held between pages, and the repository's session
+        (with any writes the caller has pending in it) is never committed.
+        Rows are lightweight tuples (id, email, name, is_active, interests), not ORM
+        objects; interests is the subscriber's raw JSON interest list or None.
+        """
+        last_id = after_id
+        while True:
+            reader = get_session()
+            try:
+                query = reader.query(
+                    Email.id, Email.email, Email.name, Email.is_active, SubscriberProfile.interests
+                ).outerjoin(SubscriberProfile, SubscriberProfile.email_id == Email.id)
+                if active_only:
+                    query = query.filter(Email.is_active == "true")
+                if last_id is not None:
+                    query = query.filter(Email.id > last_id)
+                page = query.order_by(Email.id).limit(page_size).all()
+            finally:
+                reader.close()
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            last_id = page[-1].id
+    
+    def iter_emails(self, active_only: bool = True, page_size: int = STREAM_PAGE_SIZE) -> Iterator[Any]:
+        """Stream email recipients one at a time, fetching them page by page"""
+        for page in self.iter_email_pages(active_only=active_only, page_size=page_size):
+            yield from page
+    
     def get_email_by_address(self, email: str) -> Optional[Email]:
         """Get an email recipient by email address"""
         return self.session.query(Email).filter_by(email=email).first()
     
-    def update_email_status(self, email: str, is_active: bool) -> bool:
+    def update_email_status(self, email: str, is_active: bool, commit: bool = True) -> bool:
         """Update the active status of an email recipient"""
         email_record = self.session.query(Email).filter_by(email=email).first()
         if email_record:
             email_record.is_active = "true" if is_active else "false"
-            self.session.commit()
+            if commit:
+                self.session.commit()
             return True
         return False
     
-    def delete_email(self, email: str) -> bool:
+    def set_subscriber_interests(self, email: str, interests: List[str], commit: bool = True) -> bool:
+        """Store a subscriber's interests (most important first); an empty list clears them"""
+        email_record = self.session.query(Email).filter_by(email=email).first()
+        if not email_record:
+            return False
+        
+        profile = self.session.get(SubscriberProfile, email_record.id)
+        interests = [i.strip() for i in interests if i and i.strip()]
+        if not interests:
+            if profile:
+                self.session.delete(profile)
+        elif profile:
+            profile.interests = json.dumps(interests)
+        else:
+            self.session.add(SubscriberProfile(email_id=email_record.id, interests=json.dumps(interests)))
+        if commit:
+            self.session.commit()
+        return True
+    
+    def get_subscriber_rows(self, emails: List[str], chunk_size: int = 1000) -> List[Any]:
+        """(email, name, interests) for many recipients, one query per chunk of addresses"""
+        rows = []
+        for start in range(0, len(emails), chunk_size):
+            chunk = emails[start:start + chunk_size]
+            rows.extend(self.session.query(
+                Email.email, Email.name, SubscriberProfile.interests
+            ).outerjoin(
+                SubscriberProfile, SubscriberProfile.email_id == Email.id
+            ).filter(Email.email.in_(chunk)).all())
+        return rows
+    
+    def get_first_active_name(self) -> Optional[str]:
+        """Name of the earliest active recipient (used for the default profile)"""
+        return self.session.query(Email.name).filter(
+            Email.is_active == "true"
+        ).order_by(Email.created_at, Email.id).limit(1).scalar()
+    
+    def get_subscriber_interests(self, email: str) -> Optional[List[str]]:
+        """A subscriber's own interests, or None if they use the default profile"""
+        raw = self.session.query(SubscriberProfile.interests).join(
+            Email, SubscriberProfile.email_id == Email.id
+        ).filter(Email.email == email).scalar()
+        return json.loads(raw) if raw else None
+    
+    def delete_email(self, email: str, commit: bool = True) -> bool:
         """Delete an email recipient"""
         email_record = self.session.query(Email).filter_by(email=email).first()
         if email_record:
+            profile = self.session.get(SubscriberProfile, email_record.id)
+            if profile:
+                self.session.delete(profile)
             self.session.delete(email_record)
-            self.session.commit()
+            if commit:
+                self.session.commit()
             return True
         return False
 
@@ -520,12 +780,13 @@ class Repository:
         query = self.session.query(MetaArticle).filter(MetaArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_meta_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(MetaArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("meta", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -553,12 +814,13 @@ class Repository:
         query = self.session.query(MistralArticle).filter(MistralArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_mistral_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(MistralArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("mistral", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -586,12 +848,13 @@ class Repository:
         query = self.session.query(HuggingFaceArticle).filter(HuggingFaceArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_huggingface_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(HuggingFaceArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("huggingface", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -619,12 +882,13 @@ class Repository:
         query = self.session.query(HuggingFacePaper).filter(HuggingFacePaper.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_huggingface_paper_markdown(self, guid: str, markdown: str) -> bool:
         paper = self.session.query(HuggingFacePaper).filter_by(guid=guid).first()
         if paper:
             paper.markdown = markdown
+            self._index_article("huggingface_papers", paper.guid, paper, markdown)
             self.session.commit()
             return True
         return False
@@ -652,12 +916,13 @@ class Repository:
         query = self.session.query(TechCrunchArticle).filter(TechCrunchArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_techcrunch_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(TechCrunchArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("techcrunch", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -685,12 +950,13 @@ class Repository:
         query = self.session.query(MITTRArticle).filter(MITTRArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_mittr_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(MITTRArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("mittr", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
@@ -718,12 +984,382 @@ class Repository:
         query = self.session.query(VentureBeatArticle).filter(VentureBeatArticle.markdown.is_(None))
         if limit:
             query = query.limit(limit)
-        return query.all()
+        return self._detached(query.all())
     
     def update_venturebeat_article_markdown(self, guid: str, markdown: str) -> bool:
         article = self.session.query(VentureBeatArticle).filter_by(guid=guid).first()
         if article:
             article.markdown = markdown
+            self._index_article("venturebeat", article.guid, article, markdown)
             self.session.commit()
             return True
         return False
+
+    # Search
+    def search(self, query: str, page: int = 1, page_size: int = 20, kind: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ranked full-text search over digests and article content.
+        Uses the tsvector/GIN index on PostgreSQL and FTS5 on SQLite. One extra row
+        is fetched to report has_more instead of counting every match.
+        """
+        params: Dict[str, Any] = {"limit": page_size + 1, "offset": (page - 1) * page_size}
+        kind_filter = ""
+        if kind:
+            kind_filter = "AND d.kind = :kind"
+            params["kind"] = kind
+        
+        if self.session.get_bind().dialect.name == "postgresql":
+            params["query"] = query
+            sql = f"""
+                SELECT d.id, d.kind, d.article_type, d.article_id, d.url, d.title, d.published_at,
+                       ts_rank_cd(d.tsv, q) AS score,
+                       ts_headline('english', left(coalesce(d.body, ''), 5000), q,
+                                   'MaxFragments=1, MinWords=10, MaxWords=30') AS snippet
+                FROM search_documents d, websearch_to_tsquery('english', :query) q
+                WHERE d.tsv @@ q {kind_filter}
+                ORDER BY score DESC, d.published_at DESC NULLS LAST
+                LIMIT :limit OFFSET :offset
+            """
+        else:
+            # Quote each term so user input can't inject FTS5 query syntax
+            terms = re.findall(r"\w+", query)
+            if not terms:
+                return {"results": [], "has_more": False}
+            params["query"] = " ".join(f'"{term}"' for term in terms)
+            sql = f"""
+                SELECT d.id, d.kind, d.article_type, d.article_id, d.url, d.title, d.published_at,
+                       -bm25(search_documents_fts, 10.0, 1.0) AS score,
+                       snippet(search_documents_fts, 1, '<b>', '</b>', '…', 30) AS snippet
+                FROM search_documents_fts
+                JOIN search_documents d ON d.pk = search_documents_fts.rowid
+                WHERE search_documents_fts MATCH :query {kind_filter}
+                ORDER BY bm25(search_documents_fts, 10.0, 1.0)
+                LIMIT :limit OFFSET :offset
+            """
+        
+        rows = self.session.execute(text(sql), params).mappings().all()
+        return {
+            "results": [dict(row) for row in rows[:page_size]],
+            "has_more": len(rows) > page_size
+        }
+    
+    def start_pipeline_run(self, run_id: str, resume: bool = True) -> PipelineRun:
+        """Create the run, or start a new attempt of it. Without resume, earlier stage results are dropped."""
+        run = self.session.get(PipelineRun, run_id)
+        if run is None:
+            run = PipelineRun(id=run_id, status="running", attempts=1)
+            self.session.add(run)
+        else:
+            run.status = "running"
+            run.attempts += 1
+            run.started_at = datetime.utcnow()
+            run.finished_at = None
+        if not resume:
+            self.session.query(PipelineStageRun).filter_by(run_id=run_id).delete()
+        self.session.commit()
+        return run
+    
+    def finish_pipeline_run(self, run_id: str, status: str, report: Optional[dict] = None) -> None:
+        run = self.session.get(PipelineRun, run_id)
+        if run:
+            run.status = status
+            run.finished_at = datetime.utcnow()
+            run.report = json.dumps(report, default=str) if report is not None else None
+            self.session.commit()
+    
+    def get_last_pipeline_run(self) -> Optional[Dict[str, Any]]:
+        """Most recently finished run: {"id", "status", "attempts", "finished_at", "report"}"""
+        run = (
+            self.session.query(PipelineRun)
+            .filter(PipelineRun.finished_at.isnot(None))
+            .order_by(PipelineRun.finished_at.desc())
+            .first()
+        )
+        if run is None:
+            return None
+        return {
+            "id": run.id,
+            "status": run.status,
+            "attempts": run.attempts,
+            "finished_at": run.finished_at,
+            "report": json.loads(run.report) if run.report else None,
+        }
+    
+    def get_stage_runs(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """Stage records of a run: {stage: {"status", "cursor", "output", "error", "duration"}}"""
+        stages = {}
+        for record in self.session.query(PipelineStageRun).filter_by(run_id=run_id):
+            stages[record.stage] = {
+                "status": record.status,
+                "cursor": json.loads(record.cursor) if record.cursor else None,
+                "output": json.loads(record.output) if record.output else None,
+                "error": record.error,
+                "duration": record.duration,
+            }
+        return stages
+    
+    def save_stage_run(self, run_id: str, stage: str, status: str, output: Any = None,
+                       error: Optional[str] = None, duration: Optional[float] = None) -> None:
+        record = self.session.get(PipelineStageRun, (run_id, stage))
+        if record is None:
+            record = PipelineStageRun(run_id=run_id, stage=stage)
+            self.session.add(record)
+        record.status = status
+        record.output = json.dumps(output, default=str) if output is not None else None
+        record.error = error
+        record.duration = duration
+        self.session.commit()
+    
+    def save_stage_cursor(self, run_id: str, stage: str, cursor: Any) -> None:
+        """Checkpoint a stage's progress; it survives a crash and is handed back on resume"""
+        record = self.session.get(PipelineStageRun, (run_id, stage))
+        if record is None:
+            record = PipelineStageRun(run_id=run_id, stage=stage, status="running")
+            self.session.add(record)
+        record.cursor = json.dumps(cursor, default=str)
+        self.session.commit()
+    
+    def save_llm_usage(self, run_id: str, attempt: int, usage: List[Dict[str, Any]]) -> None:
+        """Store the LLM totals of one run attempt (rows as returned by app.agent.llm.usage_totals)"""
+        for row in usage:
+            record = self.session.get(LLMUsage, (run_id, attempt, row["agent"], row["model"]))
+            if record is None:
+                record = LLMUsage(run_id=run_id, attempt=attempt, agent=row["agent"], model=row["model"])
+                self.session.add(record)
+            for field in USAGE_COLUMNS:
+                setattr(record, field, row.get(field, 0))
+            record.recorded_at = datetime.utcnow()
+        self.session.commit()
+    
+    def get_llm_usage(self, run_id: str) -> List[Dict[str, Any]]:
+        """LLM totals of every attempt of a run, oldest attempt first"""
+        records = (
+            self.session.query(LLMUsage)
+            .filter_by(run_id=run_id)
+            .order_by(LLMUsage.attempt, LLMUsage.agent, LLMUsage.model)
+            .all()
+        )
+        return [
+            {
+                "attempt": r.attempt,
+                "agent": r.agent,
+                "model": r.model,
+                **{field: getattr(r, field) for field in USAGE_COLUMNS},
+            }
+            for r in records
+        ]
+    
+    def _job_to_dict(self, job: Job) -> Dict[str, Any]:
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "dedupe_key": job.dedupe_key,
+            "params": json.loads(job.params) if job.params else {},
+            "status": job.status,
+            "result": json.loads(job.result) if job.result else None,
+            "error": job.error,
+            "attempts": job.attempts,
+            "worker": job.worker,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+    
+    def _pending_job(self, kind: str, dedupe_key: str) -> Optional[Job]:
+        return self.session.query(Job).filter(
+            Job.kind == kind, Job.dedupe_key == dedupe_key, Job.status.in_(["queued", "running"])
+        ).first()
+    
+    def enqueue_job(self, kind: str, dedupe_key: str, params: Optional[dict] = None) -> Dict[str, Any]:
+        """
+        Queue a job unless one with the same kind and key is already queued or running.
+        Returns the job dict with "coalesced" set when an existing job was returned.
+        """
+        existing = self._pending_job(kind, dedupe_key)
+        if existing:
+            return {**self._job_to_dict(existing), "coalesced": True}
+        
+        job = Job(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            dedupe_key=dedupe_key,
+            params=json.dumps(params or {}),
+            status="queued",
+            attempts=0
+        )
+        self.session.add(job)
+        try:
+            self.session.commit()
+        except IntegrityError:
+            # Lost the race to a concurrent trigger: the pending-job unique index kept one
+            self.session.rollback()
+            existing = self._pending_job(kind, dedupe_key)
+            if existing is None:
+                raise
+            return {**self._job_to_dict(existing), "coalesced": True}
+        return {**self._job_to_dict(job), "coalesced": False}
+    
+    def claim_job(self, worker: str, kinds: Optional[List[str]] = None,
+                  job_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job (or job_id, if it is still queued).
+        PostgreSQL skips rows other workers have locked (FOR UPDATE SKIP LOCKED);
+        the conditional UPDATE makes the claim safe on SQLite too, where the lock
+        clause is not supported.
+        """
+        query = self.session.query(Job.id).filter(Job.status == "queued")
+        if kinds:
+            query = query.filter(Job.kind.in_(kinds))
+        if job_id:
+            query = query.filter(Job.id == job_id)
+        if self.session.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        row = query.order_by(Job.created_at).first()
+        if row is None:
+            self.session.commit()
+            return None
+        
+        now = datetime.utcnow()
+        result = self.session.query(Job).filter(Job.id == row.id, Job.status == "queued").update({
+            Job.status: "running",
+            Job.worker: worker,
+            Job.started_at: now,
+            Job.heartbeat_at: now,
+            Job.attempts: Job.attempts + 1
+        }, synchronize_session=False)
+        self.session.commit()
+        if not result:
+            return None  # Another worker claimed it first
+        return self._job_to_dict(self.session.get(Job, row.id))
+    
+    def heartbeat_job(self, job_id: str) -> None:
+        self.session.query(Job).filter(Job.id == job_id, Job.status == "running").update(
+            {Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+        )
+        self.session.commit()
+    
+    def finish_job(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        self.session.query(Job).filter(Job.id == job_id).update({
+            Job.status: status,
+            Job.result: json.dumps(result, default=str) if result is not None else None,
+            Job.error: error,
+            Job.finished_at: datetime.utcnow()
+        }, synchronize_session=False)
+        self.session.commit()
+    
+    def requeue_stale_jobs(self, stale_after_seconds: int, max_attempts: int) -> Dict[str, int]:
+        """
+        Put running jobs whose worker stopped sending heartbeats back in the queue,
+        or mark them failed once they have used max_attempts (a job that keeps
+        killing its worker must not be retried forever). Returns {"requeued", "failed"}.
+        """
+        now = datetime.utcnow()
+        stale = self.session.query(Job).filter(
+            Job.status == "running", Job.heartbeat_at < now - timedelta(seconds=stale_after_seconds)
+        )
+        failed = stale.filter(Job.attempts >= max_attempts).update({
+            Job.status: "failed",
+            Job.worker: None,
+            Job.error: f"Worker stopped responding ({max_attempts} attempts)",
+            Job.finished_at: now
+        }, synchronize_session=False)
+        requeued = stale.filter(Job.attempts < max_attempts).update(
+            {Job.status: "queued", Job.worker: None}, synchronize_session=False
+        )
+        self.session.commit()
+        return {"requeued": requeued or 0, "failed": failed or 0}
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.session.get(Job, job_id)
+        return self._job_to_dict(job) if job else None
+    
+    def enqueue_outbox(self, kind: str, to_email: str, subject: str, html: str, commit: bool = True) -> OutboxMessage:
+        """
+        Queue an email for the outbox dispatcher. With commit=False it is written in
+        the caller's transaction, so it is sent if and only if that change commits.
+        """
+        message = OutboxMessage(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            to_email=to_email,
+            subject=subject,
+            html=html,
+            status="pending",
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        self.session.add(message)
+        if commit:
+            self.session.commit()
+        return message
+    
+    def claim_outbox_batch(self, limit: int, lease_seconds: int, max_attempts: int) -> List[OutboxMessage]:
+        """
+        Take up to limit due messages for sending. Claimed rows are leased: if the
+        dispatcher dies, they become due again once the lease expires, unless they
+        have used max_attempts (a message that keeps killing the dispatcher must not
+        be retried forever): those are marked failed.
+        """
+        now = datetime.utcnow()
+        self.session.query(OutboxMessage).filter(
+            OutboxMessage.status == "sending",
+            OutboxMessage.next_attempt_at <= now,
+            OutboxMessage.attempts >= max_attempts
+        ).update({
+            OutboxMessage.status: "failed",
+            OutboxMessage.last_error: f"Dispatcher stopped before the send finished ({max_attempts} attempts)"
+        }, synchronize_session=False)
+        query = self.session.query(OutboxMessage.id).filter(
+            OutboxMessage.status.in_(["pending", "sending"]),
+            OutboxMessage.next_attempt_at <= now,
+            OutboxMessage.attempts < max_attempts
+        )
+        if self.session.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update(skip_locked=True)
+        ids = [row.id for row in query.order_by(OutboxMessage.next_attempt_at).limit(limit)]
+        if not ids:
+            self.session.commit()
+            return []
+        
+        lease_until = now + timedelta(seconds=lease_seconds)
+        claimed = []
+        for message_id in ids:
+            # Conditional update: a concurrent dispatcher may have taken it (SQLite has no SKIP LOCKED)
+            updated = self.session.query(OutboxMessage).filter(
+                OutboxMessage.id == message_id,
+                OutboxMessage.status.in_(["pending", "sending"]),
+                OutboxMessage.next_attempt_at <= now,
+                OutboxMessage.attempts < max_attempts
+            ).update({
+                OutboxMessage.status: "sending",
+                OutboxMessage.next_attempt_at: lease_until,
+                OutboxMessage.attempts: OutboxMessage.attempts + 1
+            }, synchronize_session=False)
+            if updated:
+                claimed.append(message_id)
+        self.session.commit()
+        if not claimed:
+            return []
+        return self.session.query(OutboxMessage).filter(OutboxMessage.id.in_(claimed)).all()
+    
+    def mark_outbox_sent(self, message_ids: List[str]) -> None:
+        if not message_ids:
+            return
+        self.session.query(OutboxMessage).filter(OutboxMessage.id.in_(message_ids)).update({
+            OutboxMessage.status: "sent",
+            OutboxMessage.sent_at: datetime.utcnow(),
+            OutboxMessage.last_error: None
+        }, synchronize_session=False)
+        self.session.commit()
+    
+    def mark_outbox_failed(self, message_id: str, error: str, retry_at: Optional[datetime]) -> None:
+        """Schedule a retry at retry_at, or give up (status "failed") when it is None"""
+        self.session.query(OutboxMessage).filter(OutboxMessage.id == message_id).update({
+            OutboxMessage.status: "pending" if retry_at else "failed",
+            OutboxMessage.next_attempt_at: retry_at,
+            OutboxMessage.last_error: error[:2000]
+        }, synchronize_session=False)
+        self.session.commit()
+    
+    def count_outbox(self) -> Dict[str, int]:
+        return dict(self.session.query(OutboxMessage.status, func.count(OutboxMessage.id)).group_by(OutboxMessage.status).all())
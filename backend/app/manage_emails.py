@@ -4,6 +4,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.database.repository import Repository
+from app.profiles.user_profile import profile_service
 
 
 def add_email(email: str, name: str = None):
@@ -63,6 +64,33 @@ def delete_email(email: str):
         print(f"✗ Email not found: {email}")
 
 
+def set_interests(email: str, interests: str):
+    """Set a recipient's interests (semicolon-separated, most important first)"""
+    repo = Repository()
+    interest_list = [i.strip() for i in interests.split(";") if i.strip()]
+    if repo.set_subscriber_interests(email, interest_list):
+        profile_service.invalidate(email)
+        if interest_list:
+            print(f"✓ Set {len(interest_list)} interests for {email}")
+        else:
+            print(f"✓ Cleared interests for {email} (default profile)")
+    else:
+        print(f"✗ Email not found: {email}")
+
+
+def show_interests(email: str):
+    """Show a recipient's interests"""
+    repo = Repository()
+    interests = repo.get_subscriber_interests(email)
+    if not interests:
+        print(f"{email} uses the default profile interests")
+        return
+    
+    print(f"\nInterests for {email}:\n")
+    for i, interest in enumerate(interests, 1):
+        print(f"  {i}. {interest}")
+
+
 def show_help():
     """Show help message"""
     print("""
@@ -77,6 +105,8 @@ Commands:
     activate <email>       Activate an email recipient
     deactivate <email>     Deactivate an email recipient
     delete <email>         Delete an email recipient
+    interests <email> ["a; b; c"]
+                           Show or set a recipient's interests ("" clears them)
     help                   Show this help message
 
 Examples:
@@ -85,6 +115,7 @@ Examples:
     python app/manage_emails.py activate john@example.com
     python app/manage_emails.py deactivate john@example.com
     python app/manage_emails.py delete john@example.com
+    python app/manage_emails.py interests john@example.com "RAG systems; LLM inference; AI safety"
 """)
 
 
@@ -128,6 +159,16 @@ if __name__ == "__main__":
             sys.exit(1)
         delete_email(sys.argv[2])
     
+    elif command == "interests":
+        if len(sys.argv) < 3:
+            print("Error: Email address required")
+            print("Usage: python app/manage_emails.py interests <email> [\"interest; interest\"]")
+            sys.exit(1)
+        if len(sys.argv) > 3:
+            set_interests(sys.argv[2], sys.argv[3])
+        else:
+            show_interests(sys.argv[2])
+    
     elif command == "help":
         show_help()
     
@@ -0,0 +1,250 @@
+"""
+Declarative stage graph for the daily pipeline.
+
+Each Stage names the stages whose outputs it needs. The executor starts a
+stage as soon as its inputs have finished, runs independent branches on a
+thread pool, and caps concurrent use of shared resources (database
+connections, outbound HTTP, the LLM quota, SMTP) with one semaphore per
+resource. Every run produces per-stage timings and its critical path.
+
+With a ledger (see app/pipeline/ledger.py), stage results are recorded as they
+finish, and a stage that completed in an earlier attempt is not run again
+unless one of its inputs had to be recomputed.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SUCCESS = "success"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class Stage:
+    name: str
+    func: Callable[[Dict[str, Any]], Any]  # Receives {input name: output}
+    inputs: List[str] = field(default_factory=list)
+    resources: List[str] = field(default_factory=list)
+    always_run: bool = False  # Run even if an input failed or was skipped (e.g. cleanup)
+    # Once completed, never run again for the same run, even if its inputs are recomputed
+    # (stages with external side effects, e.g. sending email)
+    once: bool = False
+
+
+@dataclass
+class StageRun:
+    name: str
+    status: str = PENDING
+    start: float = 0.0  # Seconds since the run started
+    end: float = 0.0
+    waited: float = 0.0  # Seconds spent waiting for resources
+    error: Optional[str] = None
+    resumed: bool = False  # Output taken from an earlier attempt
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Pipeline:
+    def __init__(self, stages: List[Stage], resource_limits: Optional[Dict[str, int]] = None,
+                 max_workers: int = 4, ledger=None):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError("Duplicate stage names")
+        for stage in stages:
+            for name in stage.inputs:
+                if name not in self.stages:
+                    raise ValueError(f"Stage {stage.name!r} depends on unknown stage {name!r}")
+        self.order = self._topological_order()
+        self.max_workers = max_workers
+        self.ledger = ledger
+        self.resource_limits = dict(resource_limits or {})
+        self._semaphores = {
+            resource: threading.BoundedSemaphore(limit)
+            for resource, limit in self.resource_limits.items()
+        }
+
+    def _topological_order(self) -> List[str]:
+        order: List[str] = []
+        state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Cycle in pipeline: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for dependency in self.stages[name].inputs:
+                visit(dependency, path + [name])
+            state[name] = 2
+            order.append(name)
+
+        for name in self.stages:
+            visit(name, [])
+        return order
+
+    def _run_stage(self, stage: Stage, inputs: Dict[str, Any], run: StageRun, started: float) -> Any:
+        # Acquire in a fixed order so two stages can never deadlock on each other
+        acquired = []
+        wait_start = time.perf_counter()
+        try:
+            for resource in sorted(stage.resources):
+                semaphore = self._semaphores.get(resource)
+                if semaphore:
+                    semaphore.acquire()
+                    acquired.append(semaphore)
+            run.start = time.perf_counter() - started
+            run.waited = run.start - (wait_start - started)
+            logger.info(f"▶ {stage.name}")
+            self._record(StageRun(stage.name, status="running"))
+            with span("pipeline_stage", stage=stage.name) as current:
+                current.set(waited=run.waited)
+                return stage.func(inputs)
+        finally:
+            run.end = time.perf_counter() - started
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Execute the graph. Returns {"outputs": {stage: output}, "runs": {stage: StageRun},
+        "report": timing report}. A failed stage skips its dependents (unless always_run).
+        """
+        started = time.perf_counter()
+        outputs: Dict[str, Any] = {}
+        runs = {name: StageRun(name) for name in self.order}
+        pending = list(self.order)
+        finished = set()
+        running: Dict[Future, str] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as executor:
+            while pending or running:
+                # Topological order: a stage skipped here unblocks its dependents in the same pass
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if not all(i in finished for i in stage.inputs):
+                        continue
+                    pending.remove(name)
+                    if self._reusable(stage, runs):
+                        outputs[name] = self.ledger.output(name)
+                        runs[name].status = SUCCESS
+                        runs[name].resumed = True
+                        logger.info(f"↺ {name} (completed in an earlier attempt)")
+                        finished.add(name)
+                        continue
+                    failed_inputs = [i for i in stage.inputs if runs[i].status != SUCCESS]
+                    if failed_inputs and not stage.always_run:
+                        runs[name].status = SKIPPED
+                        runs[name].error = f"inputs not available: {', '.join(failed_inputs)}"
+                        logger.warning(f"⤼ Skipping {name} ({runs[name].error})")
+                        self._record(runs[name])
+                        finished.add(name)
+                        continue
+                    stage_inputs = {i: outputs.get(i) for i in stage.inputs}
+                    future = executor.submit(self._run_stage, stage, stage_inputs, runs[name], started)
+                    running[future] = name
+
+                if not running:
+                    continue
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    finished.add(name)
+                    try:
+                        outputs[name] = future.result()
+                        runs[name].status = SUCCESS
+                        logger.info(f"✓ {name} ({runs[name].duration:.1f}s)")
+                    except Exception as e:
+                        runs[name].status = FAILED
+                        runs[name].error = str(e)
+                        logger.error(f"✗ {name} failed: {e}", exc_info=True)
+                    self._record(runs[name], outputs.get(name))
+
+        wall = time.perf_counter() - started
+        return {"outputs": outputs, "runs": runs, "report": self.report(runs, wall)}
+
+    def _reusable(self, stage: Stage, runs: Dict[str, StageRun]) -> bool:
+        # A completed stage whose inputs were recomputed would hand on stale output
+        if not self.ledger or not self.ledger.is_complete(stage.name):
+            return False
+        return stage.once or all(runs[i].resumed for i in stage.inputs)
+
+    def _record(self, run: StageRun, output: Any = None) -> None:
+        if not self.ledger:
+            return
+        try:
+            self.ledger.record(run.name, run.status, output=output, error=run.error, duration=round(run.duration, 3))
+        except Exception as e:
+            # Losing a checkpoint only costs a re-run of the stage next time
+            logger.error(f"Failed to record stage {run.name}: {e}")
+
+    def critical_path(self, runs: Dict[str, StageRun]) -> List[str]:
+        """Chain of stages that determined the end time: walk back from the last stage to finish"""
+        executed = [r for r in runs.values() if r.status != SKIPPED]
+        if not executed:
+            return []
+        def executed_inputs(name: str) -> List[StageRun]:
+            # A skipped input never ran: look through it to the stages it was waiting on
+            found = []
+            for i in self.stages[name].inputs:
+                found.extend(executed_inputs(i) if runs[i].status == SKIPPED else [runs[i]])
+            return found
+
+        current = max(executed, key=lambda r: r.end).name
+        path = [current]
+        while True:
+            inputs = executed_inputs(current)
+            if not inputs:
+                break
+            current = max(inputs, key=lambda r: r.end).name
+            path.append(current)
+        return list(reversed(path))
+
+    def report(self, runs: Dict[str, StageRun], wall_seconds: float) -> Dict[str, Any]:
+        path = self.critical_path(runs)
+        return {
+            "wall_seconds": round(wall_seconds, 3),
+            "serial_seconds": round(sum(r.duration for r in runs.values() if r.status != SKIPPED), 3),
+            "critical_path": path,
+            # Resource waits on the path count: they delayed the end just as much
+            "critical_path_seconds": round(sum(runs[name].duration + runs[name].waited for name in path), 3),
+            "stages": {
+                name: {
+                    "status": r.status,
+                    "start": round(r.start, 3),
+                    "end": round(r.end, 3),
+                    "duration": round(r.duration, 3),
+                    "waited": round(r.waited, 3),
+                    **({"resumed": True} if r.resumed else {}),
+                    **({"error": r.error} if r.error else {})
+                }
+                for name, r in runs.items()
+            }
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Human-readable timing table with the critical path marked"""
+    critical = set(report["critical_path"])
+    lines = [
+        f"Wall time: {report['wall_seconds']:.1f}s (stages total {report['serial_seconds']:.1f}s, "
+        f"critical path {report['critical_path_seconds']:.1f}s)",
+        f"{'':2}{'Stage':<28}{'Status':<9}{'Start':>8}{'Duration':>10}{'Waited':>9}",
+    ]
+    stages = sorted(report["stages"].items(), key=lambda item: (item[1]["status"] == SKIPPED, item[1]["start"]))
+    for name, s in stages:
+        marker = "* " if name in critical else "  "
+        status = "resumed" if s.get("resumed") else s["status"]
+        lines.append(f"{marker}{name:<28}{status:<9}{s['start']:>7.1f}s{s['duration']:>9.1f}s{s['waited']:>8.1f}s")
+    lines.append(f"* critical path: {' → '.join(report['critical_path'])}")
+    return "\n".join(lines)
@@ -0,0 +1,81 @@
+"""
+Run ledger: per-stage status, checkpoints and outputs of a pipeline run.
+
+A run is identified by its edition (see edition_id). When a run for the same
+edition is started again (after a crash, a timeout or a failed stage), stages
+that already succeeded are not executed: their stored output is handed to the
+stages that need it. Stages that stopped part-way resume from the last cursor
+they checkpointed.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from app.config import USER_TIMEZONE
+from app.database.repository import Repository
+
+logger = logging.getLogger(__name__)
+
+
+def edition_id(hours: int, top_n: int, day: Optional[datetime] = None) -> str:
+    """One edition per local day and run parameters"""
+    day = (day or datetime.now(timezone.utc)).astimezone(USER_TIMEZONE)
+    return f"{day.strftime('%Y-%m-%d')}/{hours}h/top{top_n}"
+
+
+class RunLedger:
+    def __init__(self, run_id: str, resume: bool = True):
+        self.run_id = run_id
+        # Every call uses its own short-lived session: stages record from worker threads
+        repo = Repository()
+        try:
+            run = repo.start_pipeline_run(run_id, resume=resume)
+            self.attempt = run.attempts
+            self.stages = repo.get_stage_runs(run_id)
+        finally:
+            repo.session.close()
+        completed = [name for name, record in self.stages.items() if record["status"] == "success"]
+        if completed:
+            logger.info(f"Resuming run {run_id} (attempt {self.attempt}): {len(completed)} stages already completed")
+
+    def is_complete(self, stage: str) -> bool:
+        record = self.stages.get(stage)
+        return bool(record) and record["status"] == "success"
+
+    def output(self, stage: str) -> Any:
+        return self.stages[stage]["output"]
+
+    def cursor(self, stage: str) -> Any:
+        """Last checkpoint of a stage that did not complete, or None"""
+        record = self.stages.get(stage)
+        return record["cursor"] if record else None
+
+    def checkpoint(self, stage: str, cursor: Any) -> None:
+        repo = Repository()
+        try:
+            repo.save_stage_cursor(self.run_id, stage, cursor)
+        finally:
+            repo.session.close()
+
+    def record(self, stage: str, status: str, output: Any = None, error: Optional[str] = None,
+               duration: Optional[float] = None) -> None:
+        repo = Repository()
+        try:
+            repo.save_stage_run(self.run_id, stage, status, output=output, error=error, duration=duration)
+        finally:
+            repo.session.close()
+
+    def finish(self, status: str, report: Optional[Dict[str, Any]] = None) -> None:
+        repo = Repository()
+        try:
+            repo.finish_pipeline_run(self.run_id, status, report)
+        finally:
+            repo.session.close()
+    
+    def save_llm_usage(self, usage: List[Dict[str, Any]]) -> None:
+        """LLM totals of this attempt, per agent and model"""
+        repo = Repository()
+        try:
+            repo.save_llm_usage(self.run_id, self.attempt, usage)
+        finally:
+            repo.session.close()
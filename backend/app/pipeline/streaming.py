@@ -0,0 +1,406 @@
+"""
+Item-level streaming from scrape to digest.
+
+Instead of waiting for every source to be scraped and every markdown stage to
+finish, each item moves on as soon as it is ready:
+
+    scrape (per source) → fetch queue → fetch + convert → digest queue → digest
+
+Queues are bounded, so a slow step blocks the one before it (backpressure) and
+memory stays bounded by the queue sizes. Near-duplicates are detected
+incrementally with an LSH index: the first copy of a story to reach the digest
+step becomes its canonical article, later copies are recorded against its digest.
+With DIGEST_BATCH_ENABLED, a digest worker takes whatever is already queued (up
+to a batch) along with the item it waited for, and digests it in one request.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.agent.digest_agent import DigestAgent, article_key, pack_batches
+from app.config import (
+    DEDUP_ENABLED, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE, DEDUP_THRESHOLD,
+    DIGEST_BATCH_ENABLED, DIGEST_BATCH_MAX_ARTICLES, DIGEST_BATCH_TOKEN_BUDGET,
+    PIPELINE_RESOURCE_LIMITS, STREAM_QUEUE_SIZE
+)
+from app.utils.minhash import MinHasher, MinHashLSHIndex
+from app.database.repository import Repository
+from app.runner import SCRAPER_NAMES, SCRAPER_REGISTRY, run_scraper
+from app.services.process_digest import digest_article, has_content, iter_digests, save_digest
+from app.services.process_youtube import TRANSCRIPT_UNAVAILABLE_MARKER
+
+logger = logging.getLogger(__name__)
+
+# Sources whose items need their page converted to markdown before digesting:
+# (repository getter for pending rows, repository setter for the markdown)
+MARKDOWN_SOURCES = {
+    "anthropic": ("get_anthropic_articles_without_markdown", "update_anthropic_article_markdown"),
+    "google": ("get_google_articles_without_markdown", "update_google_article_markdown"),
+    "huggingface": ("get_huggingface_articles_without_markdown", "update_huggingface_article_markdown"),
+    "huggingface_papers": ("get_huggingface_papers_without_markdown", "update_huggingface_paper_markdown"),
+    "techcrunch": ("get_techcrunch_articles_without_markdown", "update_techcrunch_article_markdown"),
+    "mittr": ("get_mittr_articles_without_markdown", "update_mittr_article_markdown"),
+    "venturebeat": ("get_venturebeat_articles_without_markdown", "update_venturebeat_article_markdown"),
+}
+
+_DONE = object()  # End-of-stream marker, one per consumer
+
+
+class StreamingIngest:
+    def __init__(self, hours: int = 24, queue_size: int = STREAM_QUEUE_SIZE,
+                 scrape_workers: int = PIPELINE_RESOURCE_LIMITS["http"],
+                 fetch_workers: int = PIPELINE_RESOURCE_LIMITS["http"],
+                 digest_workers: int = PIPELINE_RESOURCE_LIMITS["llm"],
+                 scrape: Callable[[str, int], List[Any]] = run_scraper):
+        self.hours = hours
+        self.scrape = scrape
+        self.scrape_workers = max(1, scrape_workers)
+        self.fetch_workers = max(1, fetch_workers)
+        self.digest_workers = max(1, digest_workers)
+        self.fetch_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.digest_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.scraper_types = {name: type(scraper) for name, scraper, _ in SCRAPER_REGISTRY}
+
+        self._lock = threading.Lock()
+        self._queued_keys: set = set()  # "type:id" already digested or on their way
+        self._index = MinHashLSHIndex(
+            MinHasher(num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE), DEDUP_THRESHOLD
+        ) if DEDUP_ENABLED else None
+        self._started = 0.0
+        self.stats: Dict[str, Any] = {
+            "scraping": {},
+            "processing": {},
+            "digests": {"total": 0, "processed": 0, "failed": 0, "duplicates": 0},
+            "busy_seconds": {"scrape": 0.0, "fetch": 0.0, "digest": 0.0},
+            "max_queue": {"fetch": 0, "digest": 0},
+            "first_digest_seconds": None,
+        }
+
+    def _claim(self, key: str) -> bool:
+        with self._lock:
+            if key in self._queued_keys:
+                return False
+            self._queued_keys.add(key)
+            return True
+
+    def _count(self, *path: str, amount: float = 1) -> None:
+        with self._lock:
+            target = self.stats
+            for part in path[:-1]:
+                target = target.setdefault(part, {})
+            target[path[-1]] = target.get(path[-1], 0) + amount
+
+    def _put(self, q: queue.Queue, name: str, item: Any) -> None:
+        q.put(item)  # Blocks while the next step is behind
+        with self._lock:
+            self.stats["max_queue"][name] = max(self.stats["max_queue"][name], q.qsize())
+
+    def _scrape_source(self, name: str) -> None:
+        start = time.perf_counter()
+        try:
+            items = self.scrape(name, self.hours)
+        except Exception as e:
+            logger.error(f"Failed to scrape {name}: {e}", exc_info=True)
+            items = []
+        with self._lock:
+            self.stats["scraping"][name] = len(items)
+
+        if name in MARKDOWN_SOURCES or name == "youtube":
+            # Same rows the batch enrich step would pick up, including earlier failures
+            self._queue_pending_enrichment(name)
+        else:
+            # Digested straight from the feed description
+            for item in items:
+                article = {
+                    "type": name,
+                    "id": item.guid,
+                    "title": item.title,
+                    "url": item.url,
+                    "content": item.description or "",
+                    "published_at": item.published_at,
+                }
+                if self._claim(f"{name}:{item.guid}"):
+                    self._put(self.digest_queue, "digest", article)
+        self._count("busy_seconds", "scrape", amount=time.perf_counter() - start)
+
+    def _queue_pending_enrichment(self, name: str) -> None:
+        repo = Repository()
+        try:
+            if name == "youtube":
+                rows = repo.get_youtube_videos_without_transcript()
+                tasks = [{
+                    "type": "youtube", "id": v.video_id, "title": v.title, "url": v.url,
+                    "description": v.description, "published_at": v.published_at
+                } for v in rows]
+            else:
+                rows = getattr(repo, MARKDOWN_SOURCES[name][0])()
+                tasks = [{
+                    "type": name, "id": a.guid, "title": a.title, "url": a.url,
+                    "description": a.description, "published_at": a.published_at
+                } for a in rows]
+        finally:
+            repo.session.close()  # Don't hold a connection while blocked on the queue
+
+        counts = {"total": len(tasks), "processed": 0, "failed": 0}
+        if name == "youtube":
+            counts["unavailable"] = 0
+        with self._lock:
+            self.stats["processing"][name] = counts
+        for task in tasks:
+            self._put(self.fetch_queue, "fetch", task)
+
+    def _feed_backlog(self, backlog: List[dict]) -> None:
+        # Items enriched in earlier runs but never digested
+        for article in backlog:
+            self._put(self.digest_queue, "digest", article)
+
+    def _fetch_worker(self) -> None:
+        scrapers: Dict[str, Any] = {}  # Converters keep parser state: one instance per thread
+        while True:
+            task = self.fetch_queue.get()
+            if task is _DONE:
+                return
+            start = time.perf_counter()
+            try:
+                article = self._fetch(task, scrapers)
+            except Exception as e:
+                # A dead worker would leave the producers blocked on a full queue
+                logger.error(f"Error processing {task['type']} {task['id']}: {e}", exc_info=True)
+                self._count("processing", task["type"], "failed")
+                article = None
+            self._count("busy_seconds", "fetch", amount=time.perf_counter() - start)
+            if article and self._claim(f"{article['type']}:{article['id']}"):
+                self._put(self.digest_queue, "digest", article)
+
+    def _fetch(self, task: dict, scrapers: Dict[str, Any]) -> Optional[dict]:
+        name = task["type"]
+        if name not in scrapers:
+            scrapers[name] = self.scraper_types[name]()
+        scraper = scrapers[name]
+        # A session per item: no connection is held while waiting on the network or a queue
+        repo = Repository()
+        try:
+            if name == "youtube":
+                transcript = scraper.get_transcript(task["id"])
+                if not transcript:
+                    repo.update_youtube_video_transcript(task["id"], TRANSCRIPT_UNAVAILABLE_MARKER)
+                    self._count("processing", name, "unavailable")
+                    return None
+                content = transcript.text
+                repo.update_youtube_video_transcript(task["id"], content)
+            else:
+                content = scraper.url_to_markdown(task["url"])
+                if not content:
+                    self._count("processing", name, "failed")
+                    return None
+                getattr(repo, MARKDOWN_SOURCES[name][1])(task["id"], content)
+        except Exception as e:
+            if name == "youtube":
+                repo.update_youtube_video_transcript(task["id"], TRANSCRIPT_UNAVAILABLE_MARKER)
+            self._count("processing", name, "failed")
+            logger.error(f"Error processing {name} {task['id']}: {e}")
+            return None
+        finally:
+            repo.session.close()
+
+        self._count("processing", name, "processed")
+        return {
+            "type": name,
+            "id": task["id"],
+            "title": task["title"],
+            "url": task["url"],
+            "content": content or task.get("description") or "",
+            "published_at": task["published_at"],
+        }
+
+    def _digest_worker(self) -> None:
+        agent = DigestAgent()
+        left_over = None
+        while True:
+            article = left_over if left_over is not None else self.digest_queue.get()
+            if article is _DONE:
+                return
+            batch = [article]
+            left_over = self._fill_batch(batch) if DIGEST_BATCH_ENABLED else None
+            start = time.perf_counter()
+            repo = Repository()
+            try:
+                if len(batch) == 1:
+                    self._digest(article, agent, repo)
+                else:
+                    self._digest_batch(batch, agent, repo)
+            except Exception as e:
+                # Keep draining the queue: a dead worker would leave the producers blocked on it
+                logger.error(f"Error digesting {', '.join(article_key(a) for a in batch)}: {e}", exc_info=True)
+                self._count("digests", "failed", amount=len(batch))
+            finally:
+                repo.session.close()
+            self._count("busy_seconds", "digest", amount=time.perf_counter() - start)
+
+    def _fill_batch(self, batch: List[dict]) -> Any:
+        """
+        Add the items already queued to batch, up to one request's worth, without
+        waiting for more. Returns the item taken that ended the batch (the
+        end-of-stream marker, or an article over the token budget), if any.
+        """
+        while len(batch) < DIGEST_BATCH_MAX_ARTICLES:
+            try:
+                article = self.digest_queue.get_nowait()
+            except queue.Empty:
+                return None
+            if article is _DONE:
+                return article
+            if len(pack_batches(batch + [article], DIGEST_BATCH_TOKEN_BUDGET, DIGEST_BATCH_MAX_ARTICLES)) > 1:
+                return article
+            batch.append(article)
+        return None
+
+    def _near_duplicate(self, article: dict, repo: Repository):
+        """
+        The article's MinHash signature, and True if it was recorded as a
+        near-duplicate of an existing digest (so it needs no digest of its own)
+        """
+        content = article.get("content") or ""
+        if self._index is None or not content.strip():
+            return None, False
+        signature = self._index.hasher.signature(content)
+        with self._lock:
+            match = self._index.query(signature)
+        if not match:
+            return signature, False
+        digest_id, similarity = match
+        self._count("digests", "duplicates",
+                    amount=repo.create_digest_duplicates(digest_id, [{**article, "similarity": similarity}]))
+        logger.info(f"  ↳ {article['type']} {article['id']} is a near-duplicate of digest {digest_id}")
+        return signature, True
+
+    def _digest(self, article: dict, agent: DigestAgent, repo: Repository) -> None:
+        signature, duplicate = self._near_duplicate(article, repo)
+        if duplicate:
+            return
+
+        self._count("digests", "total")
+        self._saved(digest_article(agent, repo, article), signature)
+
+    def _digest_batch(self, batch: List[dict], agent: DigestAgent, repo: Repository) -> None:
+        # Copies of one story within the batch: only the first is digested, the rest wait on it
+        local = MinHashLSHIndex(self._index.hasher, self._index.threshold) if self._index is not None else None
+        canonicals, signatures, held = [], {}, {}
+        for article in batch:
+            signature, duplicate = self._near_duplicate(article, repo)
+            if duplicate:
+                continue
+            key = article_key(article)
+            if signature is not None:
+                match = local.query(signature)
+                if match:
+                    held.setdefault(match[0], []).append((article, match[1]))
+                    continue
+                local.insert(key, signature)
+            signatures[key] = signature
+            canonicals.append(article)
+
+        self._count("digests", "total", amount=len(canonicals))
+        for article, digest_result in iter_digests(agent, canonicals):
+            key = article_key(article)
+            created_digest = save_digest(repo, article, digest_result) if has_content(article) else None
+            self._saved(created_digest, signatures[key])
+            copies = held.get(key)
+            if not copies:
+                continue
+            if created_digest:
+                cluster = [{**copy, "similarity": similarity} for copy, similarity in copies]
+                self._count("digests", "duplicates", amount=repo.create_digest_duplicates(created_digest.id, cluster))
+                logger.info(f"  ↳ Also covered by {len(cluster)} other source(s)")
+            else:
+                # No digest to attach them to: each gets its own chance
+                for copy, _ in copies:
+                    self._digest(copy, agent, repo)
+
+    def _saved(self, created_digest, signature) -> None:
+        if not created_digest:
+            self._count("digests", "failed")
+            return
+        self._count("digests", "processed")
+        with self._lock:
+            if self.stats["first_digest_seconds"] is None:
+                self.stats["first_digest_seconds"] = round(time.perf_counter() - self._started, 3)
+            if signature is not None:
+                self._index.insert(created_digest.id, signature)
+
+    def _start(self, target: Callable, count: int, name: str, *args) -> List[threading.Thread]:
+        threads = [
+            threading.Thread(target=target, args=args, name=f"{name}-{i}", daemon=True)
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Scrape every source and digest what comes out. Returns the same counts as
+        the batch steps ("scraping", "processing", "digests") plus timings.
+        """
+        self._started = time.perf_counter()
+        repo = Repository()
+        try:
+            with self._lock:
+                self._queued_keys = repo.get_digested_keys()
+            backlog = repo.get_articles_without_digest()
+        finally:
+            repo.session.close()
+        backlog = [a for a in backlog if self._claim(f"{a['type']}:{a['id']}")]
+        logger.info(f"Streaming ingest: {len(SCRAPER_NAMES)} sources, {len(backlog)} items waiting from earlier runs")
+
+        digesters = self._start(self._digest_worker, self.digest_workers, "digest")
+        fetchers = self._start(self._fetch_worker, self.fetch_workers, "fetch")
+
+        # Scrapers pull source names from a queue so at most scrape_workers run at once
+        sources: queue.Queue = queue.Queue()
+        for name in SCRAPER_NAMES:
+            sources.put(name)
+
+        def scrape_worker():
+            while True:
+                try:
+                    name = sources.get_nowait()
+                except queue.Empty:
+                    return
+                self._scrape_source(name)
+
+        producers = self._start(scrape_worker, self.scrape_workers, "scrape")
+        producers += self._start(self._feed_backlog, 1, "backlog", backlog)
+
+        # Shut down in order: each step is told it is done once everything upstream has finished
+        for thread in producers:
+            thread.join()
+        for _ in fetchers:
+            self.fetch_queue.put(_DONE)
+        for thread in fetchers:
+            thread.join()
+        for _ in digesters:
+            self.digest_queue.put(_DONE)
+        for thread in digesters:
+            thread.join()
+
+        wall = time.perf_counter() - self._started
+        busy = self.stats["busy_seconds"]
+        result = {
+            **self.stats,
+            "busy_seconds": {step: round(seconds, 3) for step, seconds in busy.items()},
+            "wall_seconds": round(wall, 3),
+        }
+        digests = result["digests"]
+        logger.info(
+            f"Streaming ingest finished in {wall:.1f}s (steps total {sum(busy.values()):.1f}s): "
+            f"{digests['processed']} digests, {digests['failed']} failed, {digests['duplicates']} duplicates; "
+            f"first digest after {result['first_digest_seconds'] or 0:.1f}s"
+        )
+        return result
+
+
+def run_streaming_ingest(hours: int = 24) -> Dict[str, Any]:
+    return StreamingIngest(hours=hours).run()
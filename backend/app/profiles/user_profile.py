@@ -1,59 +1,50 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from app.config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL_SECONDS
 from app.database.repository import Repository
 
+# Default interests, most important first. Subscribers can set their own
+# (subscriber_profiles), which personalize their article selection.
+DEFAULT_INTERESTS = [
+    "Large Language Models (LLMs) and their applications",
+    "Retrieval-Augmented Generation (RAG) systems",
+    "AI agent architectures and autonomous workflows",
+    "Multimodal models (vision-language, audio-language, VLMs)",
+    "Machine learning systems and scalable training pipelines",
+    "Deep learning architectures and optimization techniques",
+    "Diffusion models and generative modeling",
+    "Self-supervised learning and representation learning",
+    "Reinforcement learning and RLHF/RLAIF",
+    "Neural scaling laws and model efficiency research",
+    "Model distillation, quantization, pruning, and compression",
+    "Continual learning and adaptive inference",
+    "Vector databases, embeddings, and semantic retrieval",
+    "Evaluation methods for LLMs, agents, and RAG systems",
+    "AI safety, alignment, robustness, and interpretability",
+    "Systems-level AI: compilers, kernels, and model serving",
+    "High-performance inference (GPU, TPU, accelerated runtimes)",
+    "MLOps, production deployments, monitoring, and infra",
+    "Distributed training and large-scale model optimization",
+    "Research papers with real-world implementation value",
+    "Case studies of AI in production at scale",
+    "Benchmarking, dataset engineering, and synthetic data",
+    "Foundation model fine-tuning, adapters, and LoRA variants"
+]
 
-def get_user_profile(email: str = None) -> dict:
-    """
-    Get user profile with dynamic name from database.
-    If email is provided, fetch that user's name.
-    Otherwise, fetch the first active user's name.
-    """
-    repo = Repository()
-    
-    # Default name if no user found
-    user_name = "User"
-    
-    try:
-        if email:
-            user = repo.get_email_by_address(email)
-            if user and user.name:
-                user_name = user.name
-        else:
-            # Get first active user
-            users = repo.get_all_emails(active_only=True)
-            if users and users[0].name:
-                user_name = users[0].name
-    finally:
-        repo.session.close()  # Always release the connection
-    
+
+DEFAULT_NAME = "User"
+
+
+def build_profile(name: Optional[str] = None, interests: Optional[List[str]] = None) -> dict:
+    """Profile dict for a subscriber name and interests (defaults when missing). No I/O."""
     return {
-        "name": user_name,
+        "name": name or DEFAULT_NAME,
         "title": "AI/ML Engineer & Researcher",
         "background": "Experienced AI/ML engineer with deep interest in practical AI applications, research breakthroughs, and production-ready systems",
-        "interests": [
-            "Large Language Models (LLMs) and their applications",
-            "Retrieval-Augmented Generation (RAG) systems",
-            "AI agent architectures and autonomous workflows",
-            "Multimodal models (vision-language, audio-language, VLMs)",
-            "Machine learning systems and scalable training pipelines",
-            "Deep learning architectures and optimization techniques",
-            "Diffusion models and generative modeling",
-            "Self-supervised learning and representation learning",
-            "Reinforcement learning and RLHF/RLAIF",
-            "Neural scaling laws and model efficiency research",
-            "Model distillation, quantization, pruning, and compression",
-            "Continual learning and adaptive inference",
-            "Vector databases, embeddings, and semantic retrieval",
-            "Evaluation methods for LLMs, agents, and RAG systems",
-            "AI safety, alignment, robustness, and interpretability",
-            "Systems-level AI: compilers, kernels, and model serving",
-            "High-performance inference (GPU, TPU, accelerated runtimes)",
-            "MLOps, production deployments, monitoring, and infra",
-            "Distributed training and large-scale model optimization",
-            "Research papers with real-world implementation value",
-            "Case studies of AI in production at scale",
-            "Benchmarking, dataset engineering, and synthetic data",
-            "Foundation model fine-tuning, adapters, and LoRA variants"
-        ],
+        "interests": interests or DEFAULT_INTERESTS,
         "preferences": {
             "prefer_practical": True,
             "prefer_technical_depth": True,
@@ -65,5 +56,129 @@ def get_user_profile(email: str = None) -> dict:
     }
 
 
-# Backward compatibility - default profile
-USER_PROFILE = get_user_profile()
+def parse_interests(raw) -> Optional[List[str]]:
+    """Interests as stored in subscriber_profiles (JSON text) or already a list"""
+    if not raw:
+        return None
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except json.JSONDecodeError:
+            return None
+    return [i for i in raw if isinstance(i, str) and i.strip()] or None
+
+
+class ProfileService:
+    """
+    Memoized user profiles. Nothing is loaded until first use; load_many()
+    fetches any number of subscribers in one query per run, and invalidate()
+    drops cached entries after a name or interests change. At most max_size
+    profiles are kept (least recently used go first), each for ttl_seconds,
+    so a long-running API process neither grows nor serves stale profiles.
+    """
+    
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl_seconds: float = PROFILE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # email (None = default profile) -> (cached at, profile), least recently used first
+        self._profiles: "OrderedDict[Optional[str], Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, email: Optional[str] = None) -> dict:
+        with self._lock:
+            profile = self._cached(email)
+        if profile is None:
+            if email is None:
+                profile = self._load_default()
+            else:
+                profile = self.load_many([email])[email]
+        return profile
+    
+    def load_many(self, emails: Iterable[str]) -> Dict[str, dict]:
+        """Profiles for all given addresses, fetching the uncached ones in one query"""
+        emails = list(dict.fromkeys(emails))
+        with self._lock:
+            profiles = {e: self._cached(e) for e in emails}
+        missing = [e for e, profile in profiles.items() if profile is None]
+        
+        if missing:
+            repo = Repository()
+            try:
+                rows = repo.get_subscriber_rows(missing)
+            finally:
+                repo.session.close()  # Always release the connection
+            
+            loaded = {e: build_profile() for e in missing}  # Unknown addresses get the defaults
+            for email, name, interests in rows:
+                loaded[email] = build_profile(name, parse_interests(interests))
+            with self._lock:
+                self._store(loaded)
+            profiles.update(loaded)  # Not read back: a large batch may evict its own entries
+        
+        return profiles
+    
+    def prime(self, email: str, name: Optional[str], interests: Optional[str]) -> dict:
+        """Cache a profile from a subscriber row the caller already fetched"""
+        profile = build_profile(name, parse_interests(interests))
+        with self._lock:
+            self._store({email: profile})
+        return profile
+    
+    def invalidate(self, email: Optional[str] = None) -> None:
+        """Forget one subscriber's cached profile, or every cached profile"""
+        with self._lock:
+            if email is None:
+                self._profiles.clear()
+            else:
+                self._profiles.pop(email, None)
+                self._profiles.pop(None, None)  # Their name may be the default profile's
+    
+    def _cached(self, email: Optional[str]) -> Optional[dict]:
+        # Caller holds the lock
+        entry = self._profiles.get(email)
+        if entry is None:
+            return None
+        cached_at, profile = entry
+        if self.ttl_seconds > 0 and time.monotonic() - cached_at >= self.ttl_seconds:
+            del self._profiles[email]
+            return None
+        self._profiles.move_to_end(email)
+        return profile
+    
+    def _store(self, profiles: Dict[Optional[str], dict]) -> None:
+        # Caller holds the lock
+        now = time.monotonic()
+        for email, profile in profiles.items():
+            self._profiles[email] = (now, profile)
+            self._profiles.move_to_end(email)
+        while len(self._profiles) > self.max_size:
+            self._profiles.popitem(last=False)
+    
+    def _load_default(self) -> dict:
+        repo = Repository()
+        try:
+            profile = build_profile(repo.get_first_active_name())
+        finally:
+            repo.session.close()  # Always release the connection
+        with self._lock:
+            self._store({None: profile})
+        return profile
+
+
+profile_service = ProfileService()
+
+
+def get_user_profile(email: str = None) -> dict:
+    """
+    Get user profile with dynamic name from the database (memoized, see ProfileService).
+    If email is provided, use that user's name and their own interests (if set).
+    Otherwise, use the first active user's name.
+    """
+    return profile_service.get(email)
+
+
+def __getattr__(name: str):
+    # Backward compatibility - default profile, loaded on first access instead of at import
+    if name == "USER_PROFILE":
+        return get_user_profile()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -13,6 +13,7 @@ from .scrapers.techcrunch import TechCrunchScraper
 from .scrapers.mittr import MITTRScraper
 from .scrapers.venturebeat import VentureBeatScraper
 from .database.repository import Repository
+from .utils.metrics import inc, span
 
 logger = logging.getLogger(__name__)
 
@@ -141,21 +142,33 @@ SCRAPER_REGISTRY = [
 ]
 
 
-def run_scrapers(hours: int = 24) -> dict:
-    repo = Repository()
-    results = {}
+SCRAPER_NAMES = [name for name, _, _ in SCRAPER_REGISTRY]
+
 
-    try:
-        for name, scraper, save_func in SCRAPER_REGISTRY:
+def run_scraper(name: str, hours: int = 24) -> List[Any]:
+    """Scrape and save a single source with its own session (safe to run concurrently)"""
+    for scraper_name, scraper, save_func in SCRAPER_REGISTRY:
+        if scraper_name == name:
+            repo = Repository()
             try:
-                items = save_func(scraper, repo, hours)
-                results[name] = items
-            except Exception as e:
-                logger.error(f"Failed to scrape {name}: {e}", exc_info=True)
-                results[name] = []
-    finally:
-        repo.session.close()
+                with span("scrape", source=name) as current:
+                    items = save_func(scraper, repo, hours)
+                    current.set(items=len(items))
+                inc("scrape_items_total", len(items), source=name)
+                return items
+            finally:
+                repo.session.close()
+    raise ValueError(f"Unknown scraper: {name}")
 
+
+def run_scrapers(hours: int = 24) -> dict:
+    results = {}
+    for name in SCRAPER_NAMES:
+        try:
+            results[name] = run_scraper(name, hours)
+        except Exception as e:
+            logger.error(f"Failed to scrape {name}: {e}", exc_info=True)
+            results[name] = []
     return results
 
 
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import feedparser
-import requests
+from app.utils.http import http_get
 from pydantic import BaseModel
 from app.utils.markdown_converter import MarkdownConverter
 
@@ -31,7 +31,7 @@ class GoogleScraper:
         
         for rss_url in self.rss_urls:
             try:
-                response = requests.get(rss_url, headers=headers)
+                response = http_get(rss_url, headers=headers)
                 feed = feedparser.parse(response.content)
                 if not feed.entries:
                     continue
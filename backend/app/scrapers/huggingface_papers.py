@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-import requests
+from app.utils.http import http_get
 from bs4 import BeautifulSoup
 from pydantic import BaseModel
 from app.utils.markdown_converter import MarkdownConverter
@@ -23,7 +23,7 @@ class HuggingFacePapersScraper:
     def _fetch_paper_description(self, paper_url: str, headers: dict) -> str:
         """Fetch the abstract/description from an individual paper page"""
         try:
-            response = requests.get(paper_url, headers=headers, timeout=10)
+            response = http_get(paper_url, headers=headers, timeout=10)
             response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
             
@@ -60,7 +60,7 @@ class HuggingFacePapersScraper:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         
         try:
-            response = requests.get(self.base_url, headers=headers, timeout=10)
+            response = http_get(self.base_url, headers=headers, timeout=10)
             response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
             
@@ -1,6 +1,6 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
-import requests
+from app.utils.http import http_get
 from bs4 import BeautifulSoup
 from pydantic import BaseModel
 from app.utils.markdown_converter import MarkdownConverter
@@ -27,7 +27,7 @@ class MistralScraper:
         }
         
         try:
-            response = requests.get(self.news_url, headers=headers, timeout=15)
+            response = http_get(self.news_url, headers=headers, timeout=15)
             response.raise_for_status()
             soup = BeautifulSoup(response.content, 'html.parser')
             
@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import feedparser
-import requests
+from app.utils.http import http_get
 from pydantic import BaseModel
 from app.utils.markdown_converter import MarkdownConverter
 
@@ -23,7 +23,7 @@ class VentureBeatScraper:
 
     def get_articles(self, hours: int = 24) -> List[VentureBeatArticle]:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(self.rss_url, headers=headers)
+        response = http_get(self.rss_url, headers=headers)
         feed = feedparser.parse(response.content)
         if not feed.entries:
             return []
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 import os
 import feedparser
-import requests
+from app.utils.http import http_get, new_http_session
 from pydantic import BaseModel
 from youtube_transcript_api import YouTubeTranscriptApi
 from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
@@ -25,16 +25,21 @@ class ChannelVideo(BaseModel):
 class YouTubeScraper:
     def __init__(self):
         proxy_config = None
+        # With HTTP_MODE=record/replay transcripts go through their own record/replay session
+        # (the transcript client sets its own headers on it)
+        http_client = new_http_session()
         proxy_username = os.getenv("PROXY_USERNAME")
         proxy_password = os.getenv("PROXY_PASSWORD")
         
         if proxy_username and proxy_password:
             proxy_config = WebshareProxyConfig(
                 proxy_username=proxy_username,
-                proxy_password=proxy_password
+                proxy_password=proxy_password,
+                # Its retry adapter would replace the record/replay one
+                **({"retries_when_blocked": 0} if http_client is not None else {})
             )
         
-        self.transcript_api = YouTubeTranscriptApi(proxy_config=proxy_config)
+        self.transcript_api = YouTubeTranscriptApi(proxy_config=proxy_config, http_client=http_client)
 
     def _get_rss_url(self, channel_id: str) -> str:
         return f"https://www.youtube.com/feeds/videos.xml?channel_id={channel_id}"
@@ -60,7 +65,7 @@ class YouTubeScraper:
 
     def get_latest_videos(self, channel_id: str, hours: int = 24) -> list[ChannelVideo]:
         headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
-        response = requests.get(self._get_rss_url(channel_id), headers=headers)
+        response = http_get(self._get_rss_url(channel_id), headers=headers)
         feed = feedparser.parse(response.content)
         if not feed.entries:
             return []
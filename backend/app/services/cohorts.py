@@ -0,0 +1,131 @@
+"""
+Cohorts of subscribers with similar interests, so LLM work is shared.
+
+Distinct interest profiles are encoded as sparse term vectors and grouped
+with weighted spherical k-means (cosine similarity) into at most
+COHORT_COUNT cohorts. The curator and the email introduction then run once
+per cohort instead of once per subscriber. Subscribers without their own
+interests form the default cohort, which uses the default profile.
+
+COHORT_COUNT is the quality-vs-cost knob: more cohorts track individual
+interests more closely, at two LLM calls per extra cohort.
+"""
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from scipy import sparse
+
+from app.profiles.user_profile import parse_interests
+from app.utils.lexical import interest_query, l2_normalize_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COHORT = -1
+COHORT_INTERESTS_LIMIT = 12
+
+
+def encode_profiles(interest_lists: List[List[str]]) -> sparse.csr_matrix:
+    """Sparse (profiles × terms) matrix of interest term weights, L2-normalized rows"""
+    vocabulary: Dict[str, int] = {}
+    indptr = [0]
+    indices: List[int] = []
+    data: List[float] = []
+    for interests in interest_lists:
+        for token, weight in interest_query(interests).items():
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+            data.append(weight)
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix(
+        (np.array(data), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(interest_lists), max(len(vocabulary), 1))
+    )
+    return l2_normalize_rows(matrix).tocsr()
+
+
+def spherical_kmeans(vectors: sparse.csr_matrix, k: int, weights: Optional[np.ndarray] = None,
+                     max_iter: int = 30, seed: int = 42) -> np.ndarray:
+    """Weighted k-means on unit vectors by cosine similarity (k-means++ seeding). Returns labels."""
+    n = vectors.shape[0]
+    k = min(k, n)
+    if k <= 1:
+        return np.zeros(n, dtype=np.int64)
+    weights = np.ones(n) if weights is None else np.asarray(weights, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+
+    # k-means++ seeding on cosine distance, weighted by profile popularity
+    centers = [int(rng.choice(n, p=weights / weights.sum()))]
+    distance = 1.0 - (vectors @ vectors[centers[0]].T).toarray().ravel()
+    for _ in range(1, k):
+        probs = np.clip(distance, 0, None) * weights
+        if probs.sum() <= 0:
+            break
+        centers.append(int(rng.choice(n, p=probs / probs.sum())))
+        distance = np.minimum(distance, 1.0 - (vectors @ vectors[centers[-1]].T).toarray().ravel())
+    centroids = vectors[centers].toarray()
+
+    labels = np.full(n, -1, dtype=np.int64)
+    for _ in range(max_iter):
+        similarity = vectors @ centroids.T
+        new_labels = np.asarray(similarity.argmax(axis=1)).ravel()
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        assignment = sparse.csr_matrix(
+            (weights, (labels, np.arange(n))), shape=(len(centroids), n)
+        )
+        sums = np.asarray((assignment @ vectors).todense())
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # An emptied cohort keeps its old centroid
+        np.divide(sums, norms, out=centroids, where=norms > 0)
+    return labels
+
+
+def representative_interests(interest_lists: List[List[str]], counts: List[int],
+                             limit: int = COHORT_INTERESTS_LIMIT) -> List[str]:
+    """Most shared interests of a cohort, most important first"""
+    scores: Counter = Counter()
+    for interests, count in zip(interest_lists, counts):
+        for position, interest in enumerate(interests):
+            # Same decay as interest_query: earlier interests count more
+            scores[interest] += count * (1.0 - 0.5 * position / max(len(interests) - 1, 1))
+    return [interest for interest, _ in scores.most_common(limit)]
+
+
+def plan_cohorts(profile_counts: Dict[Optional[str], int], max_cohorts: int) -> Tuple[Dict[Optional[str], int], Dict[int, List[str]]]:
+    """
+    Assign every distinct raw interest profile (JSON text, None = default) to a cohort.
+
+    Returns (cohort id by raw profile, interests by cohort id). Subscribers
+    without interests map to DEFAULT_COHORT, which has no entry in the interests map.
+    """
+    assignment: Dict[Optional[str], int] = {}
+    raw_profiles: List[str] = []
+    interest_lists: List[List[str]] = []
+    counts: List[int] = []
+    for raw, count in profile_counts.items():
+        interests = parse_interests(raw)
+        if not interests or max_cohorts <= 0:
+            assignment[raw] = DEFAULT_COHORT
+            continue
+        raw_profiles.append(raw)
+        interest_lists.append(interests)
+        counts.append(count)
+
+    cohort_interests: Dict[int, List[str]] = {}
+    if not raw_profiles:
+        return assignment, cohort_interests
+
+    labels = spherical_kmeans(encode_profiles(interest_lists), max_cohorts, weights=np.array(counts))
+    for cohort in np.unique(labels):
+        members = np.flatnonzero(labels == cohort)
+        cohort_interests[int(cohort)] = representative_interests(
+            [interest_lists[i] for i in members], [counts[i] for i in members]
+        )
+        for i in members:
+            assignment[raw_profiles[i]] = int(cohort)
+
+    logger.info(f"Grouped {sum(counts)} subscribers with {len(raw_profiles)} distinct interest profiles "
+                f"into {len(cohort_interests)} cohorts")
+    return assignment, cohort_interests
+
@@ -0,0 +1,58 @@
+"""
+Near-duplicate clustering of articles before digest generation.
+
+TechCrunch, VentureBeat and MIT TR often cover the same announcement as the
+lab blogs. Articles are grouped by MinHash/LSH over their markdown so only one
+canonical article per story is digested; the rest are recorded against its digest.
+"""
+import logging
+from typing import List
+import numpy as np
+
+from app.config import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+from app.utils.minhash import MinHasher, cluster_signatures
+
+logger = logging.getLogger(__name__)
+
+# Primary sources win over press coverage of the same announcement
+CANONICAL_SOURCE_PRIORITY = ["openai", "anthropic", "google", "meta", "mistral", "huggingface", "huggingface_papers", "youtube"]
+
+
+def _canonical_rank(article: dict) -> tuple:
+    article_type = article["type"]
+    priority = CANONICAL_SOURCE_PRIORITY.index(article_type) if article_type in CANONICAL_SOURCE_PRIORITY else len(CANONICAL_SOURCE_PRIORITY)
+    return (priority, -len(article.get("content") or ""))
+
+
+def cluster_articles(articles: List[dict], threshold: float = DEDUP_THRESHOLD) -> List[dict]:
+    """
+    Group near-duplicate articles. Returns one entry per cluster:
+    {"canonical": article, "duplicates": [article + "similarity", ...]}
+    Articles without content are returned as their own cluster.
+    """
+    with_content = []
+    clusters = []
+    for article in articles:
+        if article.get("content") and article["content"].strip():
+            with_content.append(article)
+        else:
+            clusters.append({"canonical": article, "duplicates": []})
+    if not with_content:
+        return clusters
+
+    hasher = MinHasher(num_perm=DEDUP_NUM_PERM, shingle_size=DEDUP_SHINGLE_SIZE)
+    signatures = hasher.signatures([a["content"] for a in with_content])
+
+    for members in cluster_signatures(signatures, threshold):
+        members = sorted(members, key=lambda i: _canonical_rank(with_content[i]))
+        canonical_idx = members[0]
+        duplicates = []
+        for i in members[1:]:
+            similarity = float(np.mean(signatures[i] == signatures[canonical_idx]))
+            duplicates.append({**with_content[i], "similarity": similarity})
+        clusters.append({"canonical": with_content[canonical_idx], "duplicates": duplicates})
+
+    merged = sum(len(c["duplicates"]) for c in clusters)
+    if merged:
+        logger.info(f"Near-duplicate detection: {len(articles)} articles → {len(clusters)} stories ({merged} duplicates)")
+    return clusters
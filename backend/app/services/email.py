@@ -3,12 +3,9 @@ import smtplib
 import html
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
 import markdown
 from typing import List, Optional
 
-load_dotenv()
-
 MY_EMAIL = os.getenv("MY_EMAIL")
 APP_PASSWORD = os.getenv("APP_PASSWORD")
 
@@ -18,8 +15,10 @@ def get_recipients_from_db() -> List[str]:
     from app.database.repository import Repository
     
     repo = Repository()
-    email_records = repo.get_all_emails(active_only=True)
-    return [record.email for record in email_records]
+    try:
+        return [record.email for record in repo.iter_emails(active_only=True)]
+    finally:
+        repo.session.close()
 
 
 def send_email(subject: str, body_text: str, body_html: str = None, recipients: list = None, use_db_recipients: bool = False):
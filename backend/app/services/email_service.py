@@ -2,257 +2,257 @@ import os
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
+from typing import Tuple
 import logging
 
-load_dotenv()
+from app.config import SMTP_AUTH, SMTP_HOST, SMTP_PORT, SMTP_STARTTLS
+from app.utils.metrics import span
+
 logger = logging.getLogger(__name__)
 
+SMTP_TIMEOUT_SECONDS = 30
+
 
 class EmailService:
     def __init__(self):
         self.my_email = os.getenv("MY_EMAIL")
         self.app_password = os.getenv("APP_PASSWORD")
-        self.smtp_server = "smtp.gmail.com"
-        self.smtp_port = 587
+        self.smtp_server = SMTP_HOST
+        self.smtp_port = SMTP_PORT
         
         if not self.my_email or not self.app_password:
             logger.warning("MY_EMAIL or APP_PASSWORD not found in environment variables")
     
-    def send_confirmation_email(self, to_email: str, name: str = "there") -> bool:
+    def build_confirmation_message(self, name: str = "there") -> Tuple[str, str]:
+        """Subject and HTML of the welcome email"""
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <style>
+                body {{
+                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                    max-width: 600px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }}
+                .header {{
+                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                    color: white;
+                    padding: 30px;
+                    border-radius: 10px 10px 0 0;
+                    text-align: center;
+                }}
+                .content {{
+                    background: #f9fafb;
+                    padding: 30px;
+                    border-radius: 0 0 10px 10px;
+                }}
+                .button {{
+                    display: inline-block;
+                    background: #667eea;
+                    color: white;
+                    padding: 12px 30px;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    margin: 20px 0;
+                }}
+                .footer {{
+                    text-align: center;
+                    margin-top: 30px;
+                    color: #666;
+                    font-size: 14px;
+                }}
+                h1 {{
+                    margin: 0;
+                    font-size: 28px;
+                }}
+                .emoji {{
+                    font-size: 48px;
+                    margin-bottom: 10px;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <div class="emoji">🤖</div>
+                <h1>Welcome to AI News Digest!</h1>
+            </div>
+            <div class="content">
+                <p>Hey {name},</p>
+                
+                <p>Thanks for subscribing to our daily AI news digest! You're now part of an exclusive community that stays ahead of the curve in artificial intelligence.</p>
+                
+                <p><strong>What to expect:</strong></p>
+                <ul>
+                    <li>📰 Daily curated AI news from top sources</li>
+                    <li>🎯 Personalized content based on your interests</li>
+                    <li>⚡ Quick summaries to save you time</li>
+                    <li>🔗 Direct links to full articles and videos</li>
+                </ul>
+                
+                <p>Your first digest will arrive in your inbox tomorrow morning. Get ready to stay informed!</p>
+                
+                <p>If you have any questions or feedback, feel free to reply to this email.</p>
+                
+                <p>Best regards,<br>
+                <strong>The AI News Digest Team</strong></p>
+            </div>
+            <div class="footer">
+                <p>You're receiving this because you subscribed to AI News Digest.</p>
+                <p>© 2025 AI News Digest. All rights reserved.</p>
+            </div>
+        </body>
+        </html>
         """
-        Send a confirmation email to a newly subscribed user using Gmail SMTP
+        return "Welcome to AI News Digest! 🤖", html_content
+    
+    def build_unsubscribe_message(self, name: str = "there") -> Tuple[str, str]:
+        """Subject and HTML of the unsubscribe confirmation"""
+        html_content = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+            <style>
+                body {{
+                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+                    line-height: 1.6;
+                    color: #333;
+                    max-width: 600px;
+                    margin: 0 auto;
+                    padding: 20px;
+                }}
+                .header {{
+                    background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
+                    color: white;
+                    padding: 30px;
+                    border-radius: 10px 10px 0 0;
+                    text-align: center;
+                }}
+                .content {{
+                    background: #f9fafb;
+                    padding: 30px;
+                    border-radius: 0 0 10px 10px;
+                }}
+                .button {{
+                    display: inline-block;
+                    background: #667eea;
+                    color: white;
+                    padding: 12px 30px;
+                    text-decoration: none;
+                    border-radius: 5px;
+                    margin: 20px 0;
+                }}
+                .footer {{
+                    text-align: center;
+                    margin-top: 30px;
+                    color: #666;
+                    font-size: 14px;
+                }}
+                h1 {{
+                    margin: 0;
+                    font-size: 28px;
+                }}
+                .emoji {{
+                    font-size: 48px;
+                    margin-bottom: 10px;
+                }}
+            </style>
+        </head>
+        <body>
+            <div class="header">
+                <div class="emoji">👋</div>
+                <h1>You've Been Unsubscribed</h1>
+            </div>
+            <div class="content">
+                <p>Hey {name},</p>
+                
+                <p>We're sorry to see you go! Your email has been successfully removed from our AI News Digest mailing list.</p>
+                
+                <p><strong>What this means:</strong></p>
+                <ul>
+                    <li>❌ You won't receive any more daily digests</li>
+                    <li>🗑️ Your email has been removed from our database</li>
+                    <li>✅ This change is effective immediately</li>
+                </ul>
+                
+                <p>If you unsubscribed by mistake or change your mind, you can always resubscribe at any time by visiting our website.</p>
+                
+                <p>We'd love to hear your feedback! If you have a moment, please reply to this email and let us know why you unsubscribed. Your input helps us improve.</p>
+                
+                <p>Thank you for being part of our community, and we hope to see you again in the future!</p>
+                
+                <p>Best regards,<br>
+                <strong>The AI News Digest Team</strong></p>
+            </div>
+            <div class="footer">
+                <p>This is a confirmation that you've been unsubscribed from AI News Digest.</p>
+                <p>© 2025 AI News Digest. All rights reserved.</p>
+            </div>
+        </body>
+        </html>
         """
+        return "You've Been Unsubscribed from AI News Digest", html_content
+    
+    def build_mime(self, to_email: str, subject: str, html_content: str) -> MIMEMultipart:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self.my_email
+        msg['To'] = to_email
+        msg.attach(MIMEText(html_content, 'html'))
+        return msg
+    
+    def connect(self) -> smtplib.SMTP:
+        """Open and log in an SMTP connection (reuse it for a batch with send_with)"""
+        with span("smtp_connect"):
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+            if SMTP_STARTTLS:
+                server.starttls()
+            if SMTP_AUTH:
+                server.login(self.my_email, self.app_password)
+        return server
+    
+    def send_with(self, server: smtplib.SMTP, to_email: str, subject: str, html_content: str) -> None:
+        """Send over an open connection; raises on failure so the caller can retry or reconnect"""
+        with span("smtp_send"):
+            server.send_message(self.build_mime(to_email, subject, html_content))
+    
+    def _send(self, to_email: str, subject: str, html_content: str, description: str) -> bool:
         if not self.my_email or not self.app_password:
             logger.error("Cannot send email: MY_EMAIL or APP_PASSWORD not configured")
             return False
         
         try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <style>
-                    body {{
-                        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                    }}
-                    .header {{
-                        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                        color: white;
-                        padding: 30px;
-                        border-radius: 10px 10px 0 0;
-                        text-align: center;
-                    }}
-                    .content {{
-                        background: #f9fafb;
-                        padding: 30px;
-                        border-radius: 0 0 10px 10px;
-                    }}
-                    .button {{
-                        display: inline-block;
-                        background: #667eea;
-                        color: white;
-                        padding: 12px 30px;
-                        text-decoration: none;
-                        border-radius: 5px;
-                        margin: 20px 0;
-                    }}
-                    .footer {{
-                        text-align: center;
-                        margin-top: 30px;
-                        color: #666;
-                        font-size: 14px;
-                    }}
-                    h1 {{
-                        margin: 0;
-                        font-size: 28px;
-                    }}
-                    .emoji {{
-                        font-size: 48px;
-                        margin-bottom: 10px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <div class="emoji">🤖</div>
-                    <h1>Welcome to AI News Digest!</h1>
-                </div>
-                <div class="content">
-                    <p>Hey {name},</p>
-                    
-                    <p>Thanks for subscribing to our daily AI news digest! You're now part of an exclusive community that stays ahead of the curve in artificial intelligence.</p>
-                    
-                    <p><strong>What to expect:</strong></p>
-                    <ul>
-                        <li>📰 Daily curated AI news from top sources</li>
-                        <li>🎯 Personalized content based on your interests</li>
-                        <li>⚡ Quick summaries to save you time</li>
-                        <li>🔗 Direct links to full articles and videos</li>
-                    </ul>
-                    
-                    <p>Your first digest will arrive in your inbox tomorrow morning. Get ready to stay informed!</p>
-                    
-                    <p>If you have any questions or feedback, feel free to reply to this email.</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>The AI News Digest Team</strong></p>
-                </div>
-                <div class="footer">
-                    <p>You're receiving this because you subscribed to AI News Digest.</p>
-                    <p>© 2025 AI News Digest. All rights reserved.</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = "Welcome to AI News Digest! 🤖"
-            msg['From'] = self.my_email
-            msg['To'] = to_email
+            # Send via SMTP (Gmail unless SMTP_HOST says otherwise)
+            with self.connect() as server:
+                self.send_with(server, to_email, subject, html_content)
             
-            # Attach HTML content
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Send via Gmail SMTP
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.my_email, self.app_password)
-                server.send_message(msg)
-            
-            logger.info(f"Confirmation email sent to {to_email} via Gmail SMTP")
+            logger.info(f"{description} sent to {to_email} via {self.smtp_server}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to send confirmation email to {to_email}: {str(e)}")
+            logger.error(f"Failed to send {description.lower()} to {to_email}: {str(e)}")
             return False
     
+    def send_confirmation_email(self, to_email: str, name: str = "there") -> bool:
+        """
+        Send a confirmation email to a newly subscribed user using Gmail SMTP
+        """
+        subject, html_content = self.build_confirmation_message(name)
+        return self._send(to_email, subject, html_content, "Confirmation email")
+    
     def send_unsubscribe_confirmation_email(self, to_email: str, name: str = "there") -> bool:
         """
         Send a confirmation email when a user unsubscribes using Gmail SMTP
         """
-        if not self.my_email or not self.app_password:
-            logger.error("Cannot send email: MY_EMAIL or APP_PASSWORD not configured")
-            return False
-        
-        try:
-            html_content = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <style>
-                    body {{
-                        font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                        line-height: 1.6;
-                        color: #333;
-                        max-width: 600px;
-                        margin: 0 auto;
-                        padding: 20px;
-                    }}
-                    .header {{
-                        background: linear-gradient(135deg, #6b7280 0%, #4b5563 100%);
-                        color: white;
-                        padding: 30px;
-                        border-radius: 10px 10px 0 0;
-                        text-align: center;
-                    }}
-                    .content {{
-                        background: #f9fafb;
-                        padding: 30px;
-                        border-radius: 0 0 10px 10px;
-                    }}
-                    .button {{
-                        display: inline-block;
-                        background: #667eea;
-                        color: white;
-                        padding: 12px 30px;
-                        text-decoration: none;
-                        border-radius: 5px;
-                        margin: 20px 0;
-                    }}
-                    .footer {{
-                        text-align: center;
-                        margin-top: 30px;
-                        color: #666;
-                        font-size: 14px;
-                    }}
-                    h1 {{
-                        margin: 0;
-                        font-size: 28px;
-                    }}
-                    .emoji {{
-                        font-size: 48px;
-                        margin-bottom: 10px;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <div class="emoji">👋</div>
-                    <h1>You've Been Unsubscribed</h1>
-                </div>
-                <div class="content">
-                    <p>Hey {name},</p>
-                    
-                    <p>We're sorry to see you go! Your email has been successfully removed from our AI News Digest mailing list.</p>
-                    
-                    <p><strong>What this means:</strong></p>
-                    <ul>
-                        <li>❌ You won't receive any more daily digests</li>
-                        <li>🗑️ Your email has been removed from our database</li>
-                        <li>✅ This change is effective immediately</li>
-                    </ul>
-                    
-                    <p>If you unsubscribed by mistake or change your mind, you can always resubscribe at any time by visiting our website.</p>
-                    
-                    <p>We'd love to hear your feedback! If you have a moment, please reply to this email and let us know why you unsubscribed. Your input helps us improve.</p>
-                    
-                    <p>Thank you for being part of our community, and we hope to see you again in the future!</p>
-                    
-                    <p>Best regards,<br>
-                    <strong>The AI News Digest Team</strong></p>
-                </div>
-                <div class="footer">
-                    <p>This is a confirmation that you've been unsubscribed from AI News Digest.</p>
-                    <p>© 2025 AI News Digest. All rights reserved.</p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = "You've Been Unsubscribed from AI News Digest"
-            msg['From'] = self.my_email
-            msg['To'] = to_email
-            
-            # Attach HTML content
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Send via Gmail SMTP
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.my_email, self.app_password)
-                server.send_message(msg)
-            
-            logger.info(f"Unsubscribe confirmation email sent to {to_email} via Gmail SMTP")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send unsubscribe confirmation email to {to_email}: {str(e)}")
-            return False
+        subject, html_content = self.build_unsubscribe_message(name)
+        return self._send(to_email, subject, html_content, "Unsubscribe confirmation email")
     
     def send_digest_email(self, to_email: str, subject: str, html_content: str) -> bool:
         """
@@ -266,33 +266,7 @@ class EmailService:
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
-        if not self.my_email or not self.app_password:
-            logger.error("Cannot send email: MY_EMAIL or APP_PASSWORD not configured")
-            return False
-        
-        try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.my_email
-            msg['To'] = to_email
-            
-            # Attach HTML content
-            html_part = MIMEText(html_content, 'html')
-            msg.attach(html_part)
-            
-            # Send via Gmail SMTP
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls()
-                server.login(self.my_email, self.app_password)
-                server.send_message(msg)
-            
-            logger.info(f"Digest email sent to {to_email} via Gmail SMTP")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to send digest email to {to_email}: {str(e)}")
-            return False
+        return self._send(to_email, subject, html_content, "Digest email")
     
     def send_digest_to_all_subscribers(self, subject: str, html_content: str) -> dict:
         """
@@ -308,41 +282,44 @@ class EmailService:
         from app.database.repository import Repository
         
         repo = Repository()
-        subscribers = repo.get_all_emails(active_only=True)
-        
-        if not subscribers:
-            logger.warning("No active subscribers found in database")
-            return {
-                "success": False,
-                "total": 0,
-                "sent": 0,
-                "failed": 0,
-                "error": "No active subscribers"
-            }
-        
-        sent_count = 0
-        failed_count = 0
-        
-        for subscriber in subscribers:
-            try:
-                success = self.send_digest_email(
-                    to_email=subscriber.email,
-                    subject=subject,
-                    html_content=html_content
-                )
-                if success:
-                    sent_count += 1
-                else:
+        try:
+            total = repo.count_emails(active_only=True)
+            
+            if total == 0:
+                logger.warning("No active subscribers found in database")
+                return {
+                    "success": False,
+                    "total": 0,
+                    "sent": 0,
+                    "failed": 0,
+                    "error": "No active subscribers"
+                }
+            
+            sent_count = 0
+            failed_count = 0
+            
+            for subscriber in repo.iter_emails(active_only=True):
+                try:
+                    success = self.send_digest_email(
+                        to_email=subscriber.email,
+                        subject=subject,
+                        html_content=html_content
+                    )
+                    if success:
+                        sent_count += 1
+                    else:
+                        failed_count += 1
+                except Exception as e:
+                    logger.error(f"Error sending to {subscriber.email}: {str(e)}")
                     failed_count += 1
-            except Exception as e:
-                logger.error(f"Error sending to {subscriber.email}: {str(e)}")
-                failed_count += 1
+        finally:
+            repo.session.close()
         
-        logger.info(f"Digest sent to {sent_count}/{len(subscribers)} subscribers ({failed_count} failed)")
+        logger.info(f"Digest sent to {sent_count}/{total} subscribers ({failed_count} failed)")
         
         return {
             "success": sent_count > 0,
-            "total": len(subscribers),
+            "total": total,
             "sent": sent_count,
             "failed": failed_count
         }
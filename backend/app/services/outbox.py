@@ -0,0 +1,154 @@
+"""
+Outbox dispatcher for transactional emails (subscription confirmations).
+
+The API queues emails in the outbox table in the same transaction as the
+subscription change and returns without touching SMTP. The dispatcher drains
+due messages in batches, spread over a few SMTP connections that stay open for
+the whole drain, and retries failures with exponential backoff.
+
+Usage (from backend/):
+    python -m app.services.outbox    # Drain the outbox once
+The worker (python -m app.worker) also drains it between jobs.
+"""
+import logging
+import smtplib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.config import (
+    OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_BASE_SECONDS, OUTBOX_SMTP_CONNECTIONS
+)
+from app.database.repository import Repository
+from app.services.email_service import EmailService
+
+logger = logging.getLogger(__name__)
+
+# Only one drain per process at a time; others return immediately
+_drain_lock = threading.Lock()
+
+
+class PooledSender:
+    """One SMTP connection, opened on first use and reused for every message it sends"""
+    
+    def __init__(self, service: EmailService):
+        self.service = service
+        self.server: Optional[smtplib.SMTP] = None
+    
+    def send(self, to_email: str, subject: str, html: str) -> None:
+        for attempt in range(2):
+            if self.server is None:
+                self.server = self.service.connect()
+            try:
+                self.service.send_with(self.server, to_email, subject, html)
+                return
+            except OSError as e:
+                # SMTP errors are OSErrors too; only a lost connection is worth reconnecting for
+                if isinstance(e, smtplib.SMTPException) and not isinstance(e, smtplib.SMTPServerDisconnected):
+                    raise
+                # Idle connections get dropped by the server: reconnect once and retry
+                self.close()
+                if attempt == 1:
+                    raise
+    
+    def close(self) -> None:
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                pass
+            self.server = None
+
+
+def retry_at(attempts: int) -> Optional[datetime]:
+    """When to try again after attempts failures, or None to give up"""
+    if attempts >= OUTBOX_MAX_ATTEMPTS:
+        return None
+    return datetime.utcnow() + timedelta(seconds=OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _send_share(sender: PooledSender, messages: List[dict]) -> List[str]:
+    """
+    Send messages over one connection. Returns the ids sent; failures are rescheduled.
+    Each message is marked sent as soon as the server accepts it, so if the process
+    dies mid-batch only the message in flight is sent again.
+    """
+    sent = []
+    repo = Repository()
+    try:
+        for message in messages:
+            try:
+                sender.send(message["to_email"], message["subject"], message["html"])
+            except Exception as e:
+                when = retry_at(message["attempts"])
+                logger.error(f"Failed to send {message['kind']} email to {message['to_email']} "
+                             f"(attempt {message['attempts']}): {e}"
+                             + ("" if when else " - giving up"))
+                repo.mark_outbox_failed(message["id"], str(e), when)
+                if isinstance(e, smtplib.SMTPAuthenticationError):
+                    sender.close()
+                continue
+            repo.mark_outbox_sent([message["id"]])
+            sent.append(message["id"])
+    finally:
+        repo.session.close()
+    return sent
+
+
+def dispatch_outbox(batch_size: int = OUTBOX_BATCH_SIZE, connections: int = OUTBOX_SMTP_CONNECTIONS,
+                    max_batches: Optional[int] = None) -> dict:
+    """Send every due outbox message. Returns {"sent", "failed", "batches"}."""
+    result = {"sent": 0, "failed": 0, "batches": 0}
+    if not _drain_lock.acquire(blocking=False):
+        return result
+    
+    service = EmailService()
+    senders = [PooledSender(service) for _ in range(max(1, connections))]
+    try:
+        if not service.my_email or not service.app_password:
+            logger.error("Cannot drain outbox: MY_EMAIL or APP_PASSWORD not configured")
+            return result
+        
+        with ThreadPoolExecutor(max_workers=len(senders), thread_name_prefix="outbox") as executor:
+            while max_batches is None or result["batches"] < max_batches:
+                repo = Repository()
+                try:
+                    batch = [
+                        {"id": m.id, "kind": m.kind, "to_email": m.to_email, "subject": m.subject,
+                         "html": m.html, "attempts": m.attempts}
+                        for m in repo.claim_outbox_batch(batch_size, OUTBOX_LEASE_SECONDS, OUTBOX_MAX_ATTEMPTS)
+                    ]
+                finally:
+                    repo.session.close()
+                if not batch:
+                    break
+                
+                # Round-robin the batch over the open connections
+                shares = [batch[i::len(senders)] for i in range(len(senders))]
+                futures = [executor.submit(_send_share, sender, share) for sender, share in zip(senders, shares) if share]
+                sent = [message_id for future in futures for message_id in future.result()]
+                result["batches"] += 1
+                result["sent"] += len(sent)
+                result["failed"] += len(batch) - len(sent)
+    finally:
+        for sender in senders:
+            sender.close()
+        _drain_lock.release()
+    
+    if result["batches"]:
+        logger.info(f"Outbox: sent {result['sent']}, {result['failed']} failed "
+                    f"({result['batches']} batches over {len(senders)} connections)")
+    return result
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    outcome = dispatch_outbox()
+    print(f"Sent: {outcome['sent']}")
+    print(f"Failed: {outcome['failed']}")
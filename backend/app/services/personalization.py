@@ -0,0 +1,132 @@
+"""
+Per-subscriber article selection from one shared LLM ranking.
+
+The curator ranks a candidate pool once (default profile). Each subscriber's
+own interests (subscriber_profiles) are encoded as a sparse vector over the
+pool's vocabulary, and a whole page of subscribers is scored against the pool
+with a single sparse matrix product, blended with the LLM base scores.
+Subscribers without interests get the base ranking.
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from scipy import sparse
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.config import PERSONALIZATION_WEIGHT
+from app.profiles.user_profile import DEFAULT_INTERESTS, parse_interests
+from app.utils.lexical import interest_query, l2_normalize_rows, tfidf_matrix
+
+logger = logging.getLogger(__name__)
+
+
+class Personalizer:
+    def __init__(self, articles: Sequence, top_n: int, weight: float = PERSONALIZATION_WEIGHT):
+        """
+        articles: ranked candidates (RankedArticleDetail-like, best first) with
+        title, summary and relevance_score (0-10)
+        """
+        self.articles = list(articles)
+        self.top_n = top_n
+        self.weight = weight
+        self.vocabulary: Dict[str, int] = {}
+        documents = [f"{a.title} {a.title} {a.summary}" for a in self.articles]
+        self.article_matrix = tfidf_matrix(documents, self.vocabulary)
+        self.base_scores = np.array([a.relevance_score / 10.0 for a in self.articles])
+        self.default_selection = list(range(min(top_n, len(self.articles))))
+        self._row_cache: Dict[str, Optional[Dict[int, float]]] = {}
+
+    def _encode(self, interests: List[str]) -> Optional[Dict[int, float]]:
+        key = "\n".join(interests)
+        if key not in self._row_cache:
+            row = {}
+            for token, weight in interest_query(interests).items():
+                index = self.vocabulary.get(token)
+                if index is not None:
+                    row[index] = weight
+            self._row_cache[key] = row or None
+        return self._row_cache[key]
+
+    def interest_matrix(self, interest_lists: Sequence[Optional[List[str]]]) -> sparse.csr_matrix:
+        """Sparse (subscribers × vocabulary) matrix, L2-normalized rows"""
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        for interests in interest_lists:
+            row = self._encode(interests) if interests else None
+            if row:
+                indices.extend(row.keys())
+                data.extend(row.values())
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.array(data), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+            shape=(len(interest_lists), self.article_matrix.shape[1])
+        )
+        return l2_normalize_rows(matrix).tocsr()
+
+    def select(self, interest_lists: Sequence[Optional[List[str]]]) -> List[List[int]]:
+        """Indices into articles, best first, of each subscriber's top_n"""
+        if not interest_lists:
+            return []
+        if not self.articles or self.weight <= 0:
+            return [self.default_selection for _ in interest_lists]
+
+        affinity = (self.interest_matrix(interest_lists) @ self.article_matrix.T).toarray()
+        # Scale each subscriber's affinities to [0, 1] so the blend weight means the same for everyone
+        row_max = affinity.max(axis=1, keepdims=True)
+        has_profile = row_max.ravel() > 0
+        np.divide(affinity, row_max, out=affinity, where=row_max > 0)
+        scores = (1.0 - self.weight) * self.base_scores + self.weight * affinity
+
+        k = len(self.default_selection)
+        if k < len(self.articles):
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(len(self.articles)), (len(interest_lists), 1))
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        top = np.take_along_axis(top, order, axis=1)
+
+        return [
+            top[i].tolist() if has_profile[i] else self.default_selection
+            for i in range(len(interest_lists))
+        ]
+
+
+def benchmark(subscribers: int = 100_000, articles: int = 30, top_n: int = 10, page_size: int = 500) -> dict:
+    """Time personalization for synthetic subscribers over a synthetic candidate pool"""
+    from types import SimpleNamespace
+
+    rng = np.random.default_rng(0)
+    words = " ".join(DEFAULT_INTERESTS).split()
+    pool = [
+        SimpleNamespace(
+            title=" ".join(rng.choice(words, 8)),
+            summary=" ".join(rng.choice(words, 80)),
+            relevance_score=float(rng.uniform(3, 10))
+        )
+        for _ in range(articles)
+    ]
+    pool.sort(key=lambda a: a.relevance_score, reverse=True)
+    interest_lists = [
+        list(rng.choice(DEFAULT_INTERESTS, 5, replace=False)) if i % 4 else None
+        for i in range(subscribers)
+    ]
+
+    start = time.perf_counter()
+    personalizer = Personalizer(pool, top_n)
+    for page_start in range(0, subscribers, page_size):
+        personalizer.select(interest_lists[page_start:page_start + page_size])
+    seconds = time.perf_counter() - start
+
+    print(f"Personalized {subscribers:,} subscribers over {articles} articles "
+          f"in {seconds:.2f}s ({subscribers / seconds:,.0f}/s)")
+    return {"subscribers": subscribers, "articles": articles, "seconds": seconds}
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    benchmark(subscribers=count)
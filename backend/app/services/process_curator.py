@@ -1,9 +1,6 @@
 import logging
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-
-load_dotenv()
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
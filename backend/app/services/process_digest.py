@@ -1,12 +1,14 @@
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 import logging
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from app.agent.digest_agent import DigestAgent
+from app.agent.digest_agent import DigestAgent, DigestOutput, article_key, pack_batches
 from app.database.repository import Repository
+from app.config import DEDUP_ENABLED, DIGEST_BATCH_ENABLED, DIGEST_BATCH_MAX_ARTICLES, DIGEST_BATCH_TOKEN_BUDGET
+from app.services.dedup import cluster_articles
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,6 +17,109 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+BATCH_ROUNDS = 2  # Batched attempts per article before it is tried on its own
+
+
+def digest_article(agent: DigestAgent, repo: Repository, article: dict):
+    """Generate and save the digest of one article. Returns the Digest, or None on failure."""
+    article_type = article["type"]
+    article_id = article["id"]
+    
+    # Check if article has content
+    content = article.get("content", "")
+    if not content or not content.strip():
+        logger.warning(f"✗ Article has no content for {article_type} {article_id}")
+        return None
+    
+    try:
+        digest_result = agent.generate_digest(
+            title=article["title"],
+            content=content,
+            article_type=article_type
+        )
+    except Exception as e:
+        logger.error(f"✗ Error processing {article_type} {article_id}: {e}")
+        return None
+    return save_digest(repo, article, digest_result)
+
+
+def save_digest(repo: Repository, article: dict, digest_result: Optional[DigestOutput]):
+    """Validate and save a generated digest. Returns the Digest, or None on failure."""
+    article_type = article["type"]
+    article_id = article["id"]
+    
+    try:
+        if not digest_result:
+            logger.warning(f"✗ Failed to generate digest for {article_type} {article_id}")
+            return None
+        # Validate digest has content before creating
+        if not digest_result.title or not digest_result.title.strip():
+            logger.warning(f"✗ Digest has empty title for {article_type} {article_id}")
+            return None
+        if not digest_result.summary or not digest_result.summary.strip():
+            logger.warning(f"✗ Digest has empty summary for {article_type} {article_id}")
+            return None
+        
+        created_digest = repo.create_digest(
+            article_type=article_type,
+            article_id=article_id,
+            url=article["url"],
+            title=digest_result.title,
+            summary=digest_result.summary,
+            published_at=article.get("published_at")
+        )
+        if not created_digest:
+            logger.warning(f"✗ Failed to save digest for {article_type} {article_id}")
+            return None
+        logger.info(f"✓ Successfully created digest for {article_type} {article_id}")
+        return created_digest
+    except Exception as e:
+        logger.error(f"✗ Error processing {article_type} {article_id}: {e}")
+        return None
+
+
+def has_content(article: dict) -> bool:
+    content = article.get("content", "")
+    return bool(content and content.strip())
+
+
+def iter_digests(agent: DigestAgent, articles: List[dict]) -> Iterator[Tuple[dict, Optional[DigestOutput]]]:
+    """
+    Generate the digests of articles several per request (DIGEST_BATCH_*), yielding
+    (article, DigestOutput or None) as each one resolves. Articles left out of a
+    batch's reply are packed into the next round's batches; after BATCH_ROUNDS
+    rounds the rest are tried one per request.
+    """
+    pending = []
+    for article in articles:
+        if has_content(article):
+            pending.append(article)
+        else:
+            logger.warning(f"✗ Article has no content for {article['type']} {article['id']}")
+            yield article, None
+    
+    for round_number in range(1, BATCH_ROUNDS + 1):
+        retry = []
+        for batch in pack_batches(pending, DIGEST_BATCH_TOKEN_BUDGET, DIGEST_BATCH_MAX_ARTICLES):
+            logger.info(f"Digesting a batch of {len(batch)} articles (round {round_number})")
+            results = agent.generate_digests(batch)
+            for article in batch:
+                digest_result = results.get(article_key(article))
+                if digest_result:
+                    yield article, digest_result
+                else:
+                    retry.append(article)
+        if retry:
+            logger.warning(f"{len(retry)} articles missing from the batched replies, retrying")
+        pending = retry
+    
+    for article in pending:
+        yield article, agent.generate_digest(
+            title=article["title"],
+            content=article["content"],
+            article_type=article["type"]
+        )
+
 
 def process_digests(limit: Optional[int] = None) -> dict:
     agent = DigestAgent()
@@ -23,70 +128,57 @@ def process_digests(limit: Optional[int] = None) -> dict:
     repo = Repository()
     try:
         articles = repo.get_articles_without_digest(limit=limit)
+        repo.session.commit()  # Plain dicts: don't hold the connection through the LLM calls
+        
+        # Digest one canonical article per story; its near-duplicates ride along
+        duplicates_by_key = {}
+        if DEDUP_ENABLED and len(articles) > 1:
+            clusters = cluster_articles(articles)
+            articles = [c["canonical"] for c in clusters]
+            duplicates_by_key = {
+                f"{c['canonical']['type']}:{c['canonical']['id']}": c["duplicates"]
+                for c in clusters if c["duplicates"]
+            }
         
         total = len(articles)
         processed = 0
         failed = 0
+        duplicates = 0
         
         logger.info(f"Starting digest processing for {total} articles")
         
-        for idx, article in enumerate(articles, 1):
+        if DIGEST_BATCH_ENABLED:
+            # Each digest is saved as soon as its batch comes back
+            results = (
+                (article, save_digest(repo, article, digest_result))
+                for article, digest_result in iter_digests(agent, articles)
+            )
+        else:
+            results = ((article, digest_article(agent, repo, article)) for article in articles)
+        
+        for idx, (article, created_digest) in enumerate(results, 1):
             article_type = article["type"]
             article_id = article["id"]
             article_title = article["title"][:60] + "..." if len(article["title"]) > 60 else article["title"]
             
-            logger.info(f"[{idx}/{total}] Processing {article_type}: {article_title} (ID: {article_id})")
+            logger.info(f"[{idx}/{total}] Processed {article_type}: {article_title} (ID: {article_id})")
             
-            # Check if article has content
-            content = article.get("content", "")
-            if not content or not content.strip():
+            if not created_digest:
                 failed += 1
-                logger.warning(f"✗ Article has no content for {article_type} {article_id}")
                 continue
-            
-            try:
-                digest_result = agent.generate_digest(
-                    title=article["title"],
-                    content=content,
-                    article_type=article_type
-                )
-                
-                if digest_result:
-                    # Validate digest has content before creating
-                    if not digest_result.title or not digest_result.title.strip():
-                        failed += 1
-                        logger.warning(f"✗ Digest has empty title for {article_type} {article_id}")
-                    elif not digest_result.summary or not digest_result.summary.strip():
-                        failed += 1
-                        logger.warning(f"✗ Digest has empty summary for {article_type} {article_id}")
-                    else:
-                        created_digest = repo.create_digest(
-                            article_type=article_type,
-                            article_id=article_id,
-                            url=article["url"],
-                            title=digest_result.title,
-                            summary=digest_result.summary,
-                            published_at=article.get("published_at")
-                        )
-                        if created_digest:
-                            processed += 1
-                            logger.info(f"✓ Successfully created digest for {article_type} {article_id}")
-                        else:
-                            failed += 1
-                            logger.warning(f"✗ Failed to save digest for {article_type} {article_id}")
-                else:
-                    failed += 1
-                    logger.warning(f"✗ Failed to generate digest for {article_type} {article_id}")
-            except Exception as e:
-                failed += 1
-                logger.error(f"✗ Error processing {article_type} {article_id}: {e}")
+            processed += 1
+            cluster = duplicates_by_key.get(f"{article_type}:{article_id}")
+            if cluster:
+                duplicates += repo.create_digest_duplicates(created_digest.id, cluster)
+                logger.info(f"  ↳ Also covered by {len(cluster)} other source(s)")
         
-        logger.info(f"Processing complete: {processed} processed, {failed} failed out of {total} total")
+        logger.info(f"Processing complete: {processed} processed, {failed} failed out of {total} total ({duplicates} duplicates merged)")
         
         return {
             "total": total,
             "processed": processed,
-            "failed": failed
+            "failed": failed,
+            "duplicates": duplicates
         }
     finally:
         repo.session.close()  # Always close the session
@@ -97,4 +189,5 @@ if __name__ == "__main__":
     print(f"Total articles: {result['total']}")
     print(f"Processed: {result['processed']}")
     print(f"Failed: {result['failed']}")
+    print(f"Duplicates merged: {result['duplicates']}")
 
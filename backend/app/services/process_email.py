@@ -1,16 +1,25 @@
 import logging
 import html
+import queue
+import threading
 from datetime import datetime, timezone
-from dotenv import load_dotenv
+from typing import Any, Callable, Iterator, List, Optional
 
-load_dotenv()
-
-from app.agent.email_agent import EmailAgent, RankedArticleDetail, EmailDigestResponse
+from app.agent.email_agent import (
+    EmailAgent, RankedArticleDetail, EmailDigestResponse, EmailIntroduction, build_greeting
+)
 from app.agent.curator_agent import CuratorAgent
-from app.profiles.user_profile import get_user_profile
+from app.profiles.user_profile import (
+    DEFAULT_NAME, build_profile, get_user_profile, parse_interests, profile_service
+)
 from app.database.repository import Repository
 from app.services.email_service import EmailService
-from app.config import USER_TIMEZONE
+from app.services.personalization import Personalizer
+from app.services.cohorts import plan_cohorts, DEFAULT_COHORT
+from app.config import (
+    USER_TIMEZONE, STREAM_PAGE_SIZE, PRERANK_ENABLED, PRERANK_FACTOR, PERSONALIZATION_ENABLED,
+    COHORT_COUNT
+)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,6 +29,39 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def candidate_limit(top_n: int) -> Optional[int]:
+    """How many pre-ranked digests the curator sees for a top_n email (None = all)"""
+    return PRERANK_FACTOR * top_n if PRERANK_ENABLED else None
+
+
+def build_article_details(ranked_articles: list, digests: list, limit: Optional[int] = None) -> list:
+    """Join curator rankings with their digests (and near-duplicate sources)"""
+    digests_by_id = {d["id"]: d for d in digests}
+    article_details = []
+    for a in ranked_articles:
+        matching_digest = digests_by_id.get(a.digest_id)
+        
+        if matching_digest:
+            article_details.append(RankedArticleDetail(
+                digest_id=a.digest_id,
+                rank=a.rank,
+                relevance_score=a.relevance_score,
+                reasoning=a.reasoning,
+                title=matching_digest["title"],
+                summary=matching_digest["summary"],
+                url=matching_digest["url"],
+                article_type=matching_digest["article_type"],
+                also_covered_by=matching_digest.get("duplicates", [])
+            ))
+        else:
+            logger.warning(f"No matching digest found for digest_id: {a.digest_id}")
+        
+        # Stop once we have enough articles
+        if limit and len(article_details) >= limit:
+            break
+    return article_details
+
+
 def generate_email_digest(hours: int = 24, top_n: int = 10) -> EmailDigestResponse:
     user_profile = get_user_profile()
     curator = CuratorAgent(user_profile)
@@ -36,7 +78,7 @@ def generate_email_digest(hours: int = 24, top_n: int = 10) -> EmailDigestRespon
         raise ValueError("No digests available")
     
     logger.info(f"Ranking {total} digests for email generation")
-    ranked_articles = curator.rank_digests(digests)
+    ranked_articles = curator.rank_digests(digests, candidate_limit=candidate_limit(top_n))
     
     if not ranked_articles:
         logger.error("Failed to rank digests")
@@ -44,25 +86,7 @@ def generate_email_digest(hours: int = 24, top_n: int = 10) -> EmailDigestRespon
     
     logger.info(f"Generating email digest with top {top_n} articles")
     
-    # Create article details - filter out any that don't have matching digests
-    article_details = []
-    for a in ranked_articles:
-        # Find matching digest
-        matching_digest = next((d for d in digests if d["id"] == a.digest_id), None)
-        
-        if matching_digest:
-            article_details.append(RankedArticleDetail(
-                digest_id=a.digest_id,
-                rank=a.rank,
-                relevance_score=a.relevance_score,
-                reasoning=a.reasoning,
-                title=matching_digest["title"],
-                summary=matching_digest["summary"],
-                url=matching_digest["url"],
-                article_type=matching_digest["article_type"]
-            ))
-        else:
-            logger.warning(f"No matching digest found for digest_id: {a.digest_id}")
+    article_details = build_article_details(ranked_articles, digests)
     
     email_digest = email_agent.create_email_digest_response(
         ranked_articles=article_details,
@@ -87,6 +111,14 @@ def digest_to_html(digest_response: EmailDigestResponse) -> str:
     # Build articles HTML
     articles_html = []
     for article in digest_response.articles:
+        also_covered_html = ""
+        if article.also_covered_by:
+            links = ", ".join(
+                f'<a href="{html.escape(d["url"])}">{html.escape(d["article_type"].upper())}</a>'
+                for d in article.also_covered_by
+            )
+            also_covered_html = f'<p class="also-covered">Also covered by: {links}</p>'
+        
         article_html = f"""
         <div class="article">
             <h2 class="article-title">{html.escape(article.title)}</h2>
@@ -96,6 +128,7 @@ def digest_to_html(digest_response: EmailDigestResponse) -> str:
             </div>
             <p class="article-summary">{html.escape(article.summary)}</p>
             <a href="{html.escape(article.url)}" class="read-more">Read Full Article →</a>
+            {also_covered_html}
         </div>
         """
         articles_html.append(article_html)
@@ -203,6 +236,15 @@ def digest_to_html(digest_response: EmailDigestResponse) -> str:
             .read-more:hover {{
                 text-decoration: underline;
             }}
+            .also-covered {{
+                font-size: 12px;
+                color: #666;
+                margin: 10px 0 0 0;
+            }}
+            .also-covered a {{
+                color: #667eea;
+                text-decoration: none;
+            }}
             .footer {{
                 background: #f9fafb;
                 padding: 25px 30px;
@@ -244,132 +286,299 @@ def digest_to_html(digest_response: EmailDigestResponse) -> str:
     return html_content
 
 
-def send_digest_email(hours: int = 24, top_n: int = 10) -> dict:
+def stream_subscriber_pages(page_size: int = STREAM_PAGE_SIZE, prefetch_pages: int = 2,
+                            after_id: Optional[str] = None) -> Iterator[List[Any]]:
     """
-    Generate and send email digest to all active subscribers
+    Stream active subscribers page by page, in id order (after after_id if given).
+    A background thread fetches the next pages (keyset pagination) while the
+    caller is still sending to the current page, so delivery starts after the
+    first page and memory stays bounded by prefetch_pages * page_size.
+    """
+    pages: queue.Queue = queue.Queue(maxsize=prefetch_pages)
+    stop = threading.Event()
+    done = object()
     
-    Args:
-        hours: Number of hours to look back for digests
-        top_n: Number of top articles to include
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
     
-    Returns:
-        dict: Result summary with success status and details
-    """
-    try:
-        # Get all active subscribers
+    def fetch_pages():
         repo = Repository()
-        subscribers = repo.get_all_emails(active_only=True)
-        repo.session.close()  # Release the connection
-        
-        if not subscribers:
+        try:
+            for page in repo.iter_email_pages(active_only=True, page_size=page_size, after_id=after_id):
+                if not put(page):
+                    return
+        except Exception as e:
+            put(e)
+        finally:
+            repo.session.close()  # Release the connection
+            put(done)
+    
+    fetcher = threading.Thread(target=fetch_pages, name="subscriber-prefetch", daemon=True)
+    fetcher.start()
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
+
+
+def stream_subscribers(page_size: int = STREAM_PAGE_SIZE, prefetch_pages: int = 2) -> Iterator[Any]:
+    """Stream active subscribers one at a time (see stream_subscriber_pages)"""
+    for page in stream_subscriber_pages(page_size, prefetch_pages):
+        yield from page
+
+
+def load_send_inputs(hours: int = 24) -> dict:
+    """Subscriber counts per interest profile and recent digests; raises ValueError if either is empty"""
+    # The subscriber list itself is streamed later, while sending
+    repo = Repository()
+    try:
+        profile_counts = repo.count_subscriber_profiles()
+        if sum(profile_counts.values()) == 0:
             logger.warning("No active subscribers found")
-            return {
-                "success": False,
-                "error": "No active subscribers"
-            }
+            raise ValueError("No active subscribers")
         
-        # Get ranked articles once (same for all users)
-        logger.info("Generating base digest data...")
-        user_profile = get_user_profile()  # Use default profile for ranking
-        curator = CuratorAgent(user_profile)
-        
-        repo = Repository()
         digests = repo.get_recent_digests(hours=hours)
+    finally:
         repo.session.close()  # Release the connection
+    
+    if not digests:
+        logger.warning(f"No digests found from the last {hours} hours")
+        raise ValueError("No digests available")
+    
+    return {"profile_counts": profile_counts, "digests": digests}
+
+
+def rank_editions(digests: list, profile_counts: dict, top_n: int) -> dict:
+    """
+    Rank phase: one curator ranking per subscriber cohort.
+    LLM calls are bounded by the number of cohorts, not subscribers.
+    
+    Returns {"editions": {cohort: edition}, "assignment": {raw interests: cohort},
+    "profiles": {cohort: profile}}. Cohorts whose ranking fails fall back to the
+    default edition; raises ValueError if even the default ranking fails.
+    """
+    assignment, cohort_interests = plan_cohorts(profile_counts, COHORT_COUNT)
+    profile_service.invalidate()  # Each run starts from fresh subscriber data
+    # Editions go to many subscribers: their profiles carry the placeholder name, never a subscriber's
+    base_profile = build_profile()
+    
+    # The default edition is always built: it is the fallback for every cohort
+    profiles = {DEFAULT_COHORT: base_profile}
+    for cohort, interests in cohort_interests.items():
+        profiles[cohort] = {**base_profile, "interests": interests}
+    
+    logger.info(f"Ranking {len(digests)} digests for email generation")
+    editions = {}
+    for cohort, profile in profiles.items():
+        label = "default" if cohort == DEFAULT_COHORT else f"cohort {cohort + 1}/{len(cohort_interests)}"
+        logger.info(f"Ranking {label} edition ({', '.join(profile['interests'][:3])}...)")
         
-        total = len(digests)
-        
-        if total == 0:
-            logger.warning(f"No digests found from the last {hours} hours")
-            return {
-                "success": False,
-                "error": "No digests available"
-            }
-        
-        logger.info(f"Ranking {total} digests for email generation")
-        ranked_articles = curator.rank_digests(digests)
-        
+        ranked_articles = CuratorAgent(profile).rank_digests(digests, candidate_limit=candidate_limit(top_n))
         if not ranked_articles:
-            logger.error("Failed to rank digests")
-            return {
-                "success": False,
-                "error": "Failed to rank articles"
+            logger.error(f"Failed to rank digests for {label} edition")
+            continue
+        
+        # The whole ranked pool stays available so each subscriber can get their own top_n
+        article_details = build_article_details(ranked_articles, digests)
+        editions[cohort] = {
+            "articles": article_details,
+            "total_ranked": len(ranked_articles),
+            "introduction": None,
+            "personalizer": Personalizer(article_details, top_n) if PERSONALIZATION_ENABLED else None
+        }
+    
+    if DEFAULT_COHORT not in editions:
+        logger.error("Failed to rank digests")
+        raise ValueError("Failed to rank articles")
+    
+    return {"editions": editions, "assignment": assignment, "profiles": profiles}
+
+
+def write_introductions(plan: dict, top_n: int) -> dict:
+    """Render phase: one introduction per edition, naming no one (the greeting is added per subscriber)"""
+    for cohort, edition in plan["editions"].items():
+        email_agent = EmailAgent(plan["profiles"][cohort])
+        edition["introduction"] = email_agent.generate_edition_introduction(edition["articles"][:top_n])
+    return plan
+
+
+def build_editions(digests: list, profile_counts: dict, top_n: int) -> dict:
+    """Rank and render every edition (see rank_editions / write_introductions)"""
+    return write_introductions(rank_editions(digests, profile_counts, top_n), top_n)
+
+
+def plan_to_dict(plan: dict) -> dict:
+    """JSON-serializable form of a rank_editions / write_introductions plan (for the run ledger)"""
+    return {
+        "editions": [
+            {
+                "cohort": cohort,
+                "articles": [article.model_dump(mode="json") for article in edition["articles"]],
+                "total_ranked": edition["total_ranked"],
+                "introduction": edition["introduction"]
             }
+            for cohort, edition in plan["editions"].items()
+        ],
+        # Keys are raw interest JSON or None, so pairs rather than an object
+        "assignment": [[raw, cohort] for raw, cohort in plan["assignment"].items()],
+        "profiles": [[cohort, profile] for cohort, profile in plan["profiles"].items()]
+    }
+
+
+def plan_from_dict(data: dict, top_n: int) -> dict:
+    """Inverse of plan_to_dict; personalizers are rebuilt from the articles"""
+    editions = {}
+    for edition in data["editions"]:
+        articles = [RankedArticleDetail(**article) for article in edition["articles"]]
+        editions[edition["cohort"]] = {
+            "articles": articles,
+            "total_ranked": edition["total_ranked"],
+            "introduction": edition["introduction"],
+            "personalizer": Personalizer(articles, top_n) if PERSONALIZATION_ENABLED else None
+        }
+    return {
+        "editions": editions,
+        "assignment": {raw: cohort for raw, cohort in data["assignment"]},
+        "profiles": {cohort: profile for cohort, profile in data["profiles"]}
+    }
+
+
+def deliver_editions(editions: dict, assignment: dict, top_n: int, cursor: Optional[dict] = None,
+                     on_checkpoint: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    Deliver phase: stream subscribers, map each to their cohort's edition, pick
+    their articles (one matrix product per page) and send. No LLM calls.
+    
+    After each page, on_checkpoint receives a cursor (last subscriber id and the
+    counts so far); passing it back as cursor resumes after that subscriber.
+    """
+    email_service = EmailService()
+    current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
+    subject = f"Your Daily AI News Digest - {current_date} 📰"
+    
+    cursor = cursor or {}
+    sent_count = cursor.get("sent", 0)
+    failed_count = cursor.get("failed", 0)
+    personalized_count = cursor.get("personalized", 0)
+    if cursor.get("last_id"):
+        logger.info(f"Resuming delivery after subscriber {cursor['last_id']} ({sent_count} already sent)")
+    
+    for page in stream_subscriber_pages(after_id=cursor.get("last_id")):
+        by_edition = {}
+        for subscriber in page:
+            cohort = assignment.get(subscriber.interests, DEFAULT_COHORT)
+            by_edition.setdefault(cohort if cohort in editions else DEFAULT_COHORT, []).append(subscriber)
         
-        # Create article details - filter out any that don't have matching digests
-        article_details = []
-        for a in ranked_articles:
-            # Find matching digest
-            matching_digest = next((d for d in digests if d["id"] == a.digest_id), None)
-            
-            if matching_digest:
-                article_details.append(RankedArticleDetail(
-                    digest_id=a.digest_id,
-                    rank=a.rank,
-                    relevance_score=a.relevance_score,
-                    reasoning=a.reasoning,
-                    title=matching_digest["title"],
-                    summary=matching_digest["summary"],
-                    url=matching_digest["url"],
-                    article_type=matching_digest["article_type"]
-                ))
+        for cohort, subscribers in by_edition.items():
+            edition = editions[cohort]
+            articles = edition["articles"]
+            if edition["personalizer"]:
+                selections = edition["personalizer"].select([parse_interests(s.interests) for s in subscribers])
             else:
-                logger.warning(f"No matching digest found for digest_id: {a.digest_id}")
+                selections = [list(range(min(top_n, len(articles))))] * len(subscribers)
             
-            # Stop once we have enough articles
-            if len(article_details) >= top_n:
-                break
-        
-        # Send personalized email to each subscriber
-        email_service = EmailService()
-        current_date = datetime.now(timezone.utc).astimezone(USER_TIMEZONE).strftime('%B %d, %Y')
-        subject = f"Your Daily AI News Digest - {current_date} 📰"
+            for subscriber, selection in zip(subscribers, selections):
+                try:
+                    subscriber_articles = [
+                        articles[i].model_copy(update={"rank": rank})
+                        for rank, i in enumerate(selection, 1)
+                    ]
+                    if subscriber.interests:
+                        personalized_count += 1
+                    
+                    # The page row already has the name: no per-subscriber query, and nothing cached per
+                    # subscriber, so memory stays bounded by the page size however long the list is
+                    name = subscriber.name or DEFAULT_NAME
+                    digest_response = EmailDigestResponse(
+                        introduction=EmailIntroduction(
+                            greeting=build_greeting(name),
+                            introduction=edition["introduction"]
+                        ),
+                        articles=subscriber_articles,
+                        total_ranked=edition["total_ranked"],
+                        top_n=top_n
+                    )
+                    
+                    # Convert to HTML with personalized greeting
+                    html_content = digest_to_html(digest_response)
+                    
+                    # Send email
+                    success = email_service.send_digest_email(
+                        to_email=subscriber.email,
+                        subject=subject,
+                        html_content=html_content
+                    )
+                    
+                    if success:
+                        sent_count += 1
+                        logger.info(f"✓ Sent personalized digest to {subscriber.email} ({name})")
+                    else:
+                        failed_count += 1
+                        logger.error(f"✗ Failed to send to {subscriber.email}")
+                        
+                except Exception as e:
+                    logger.error(f"Error sending to {subscriber.email}: {str(e)}")
+                    failed_count += 1
         
-        sent_count = 0
-        failed_count = 0
+        if on_checkpoint:
+            on_checkpoint({
+                "last_id": page[-1].id,
+                "sent": sent_count,
+                "failed": failed_count,
+                "personalized": personalized_count
+            })
+    
+    return {
+        "subject": subject,
+        "sent": sent_count,
+        "failed": failed_count,
+        "personalized": personalized_count
+    }
+
+
+def send_digest_email(hours: int = 24, top_n: int = 10) -> dict:
+    """
+    Generate and send email digest to all active subscribers
+    
+    Args:
+        hours: Number of hours to look back for digests
+        top_n: Number of top articles to include
+    
+    Returns:
+        dict: Result summary with success status and details
+    """
+    try:
+        inputs = load_send_inputs(hours)
+        plan = build_editions(inputs["digests"], inputs["profile_counts"], top_n)
+        editions = plan["editions"]
         
-        for subscriber in subscribers:
-            try:
-                # Get personalized user profile for this subscriber
-                personalized_profile = get_user_profile(email=subscriber.email)
-                email_agent = EmailAgent(personalized_profile)
-                
-                # Generate personalized introduction
-                digest_response = email_agent.create_email_digest_response(
-                    ranked_articles=article_details,
-                    total_ranked=len(ranked_articles),
-                    limit=top_n
-                )
-                
-                # Convert to HTML with personalized greeting
-                html_content = digest_to_html(digest_response)
-                
-                # Send email
-                success = email_service.send_digest_email(
-                    to_email=subscriber.email,
-                    subject=subject,
-                    html_content=html_content
-                )
-                
-                if success:
-                    sent_count += 1
-                    logger.info(f"✓ Sent personalized digest to {subscriber.email} ({personalized_profile['name']})")
-                else:
-                    failed_count += 1
-                    logger.error(f"✗ Failed to send to {subscriber.email}")
-                    
-            except Exception as e:
-                logger.error(f"Error sending to {subscriber.email}: {str(e)}")
-                failed_count += 1
+        delivery = deliver_editions(editions, plan["assignment"], top_n)
+        sent_count = delivery["sent"]
+        failed_count = delivery["failed"]
         
         if sent_count > 0:
-            logger.info(f"✓ Digest sent to {sent_count}/{len(subscribers)} subscribers")
+            logger.info(f"✓ Digest sent to {sent_count}/{sent_count + failed_count} subscribers "
+                        f"({len(editions)} editions)")
             return {
                 "success": True,
-                "subject": subject,
-                "articles_count": len(article_details),
+                "subject": delivery["subject"],
+                "articles_count": min(top_n, len(editions[DEFAULT_COHORT]["articles"])),
                 "recipients": sent_count,
-                "failed": failed_count
+                "failed": failed_count,
+                "personalized": delivery["personalized"],
+                "editions": len(editions)
             }
         else:
             logger.error("Failed to send digest to any subscribers")
@@ -0,0 +1,170 @@
+"""
+HTTP record/replay for deterministic offline runs.
+
+RecordReplayAdapter is a requests transport adapter. Mounted on the session
+behind http_get (and handed to the YouTube transcript client), it sits under
+every outbound request the scrapers, the markdown converter and the
+transcript fetches make:
+
+- record: requests go to the network as usual and each response is saved to
+  the cassette store.
+- replay: responses come from the store and the network is never touched. A
+  request with no cassette fails like a connection error. Latency and errors
+  can be injected: a fixed delay per request (or the recorded one), and a
+  fraction of requests failing with a status code or a connection error. The
+  choice is made from the seed, the request and its repeat count, so it is
+  the same on every run whatever order the threads send in.
+
+The store is one gzipped JSON file per request, keyed by method, URL and body
+under a directory per host. Files are written atomically, so concurrent
+scrapers can record into the same store.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional, Union
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# requests has already decoded the body, and the length changes with it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class CassetteStore:
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    @staticmethod
+    def key(method: str, url: str, body: Optional[bytes] = None) -> str:
+        digest = hashlib.sha256(f"{method.upper()} {url}\n".encode("utf-8"))
+        if body:
+            digest.update(body if isinstance(body, bytes) else str(body).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def path(self, url: str, key: str) -> Path:
+        host = "".join(c if c.isalnum() or c in ".-" else "_" for c in (urlparse(url).netloc or "unknown"))
+        return self.directory / host / f"{key}.json.gz"
+
+    def load(self, url: str, key: str) -> Optional[dict]:
+        path = self.path(url, key)
+        if not path.exists():
+            return None
+        return json.loads(gzip.decompress(path.read_bytes()))
+
+    def save(self, url: str, key: str, entry: dict) -> Path:
+        path = self.path(url, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(gzip.compress(json.dumps(entry).encode("utf-8"), mtime=0))
+        os.replace(tmp, path)
+        return path
+
+
+class RecordReplayAdapter(HTTPAdapter):
+    def __init__(self, mode: str, store: CassetteStore, latency_ms: Union[str, float] = 0,
+                 error_rate: float = 0.0, error_status: int = 503, seed: int = 0, **kwargs):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown HTTP mode {mode!r} (expected record or replay)")
+        super().__init__(**kwargs)
+        self.mode = mode
+        self.store = store
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.seed = seed
+        self._seen = Counter()
+        self._seen_lock = threading.Lock()
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        key = CassetteStore.key(request.method, request.url, request.body)
+        if self.mode == "record":
+            response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+            self.store.save(request.url, key, {
+                "method": request.method,
+                "url": request.url,
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_HEADERS},
+                "body": base64.b64encode(response.content).decode("ascii"),
+                "elapsed_ms": round(response.elapsed.total_seconds() * 1000, 1),
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+            })
+            return response
+        return self._replay(request, key)
+
+    def _replay(self, request, key: str) -> requests.Response:
+        entry = self.store.load(request.url, key)
+        if entry is None:
+            raise requests.ConnectionError(f"No cassette for {request.method} {request.url}", request=request)
+
+        with self._seen_lock:
+            self._seen[key] += 1
+            occurrence = self._seen[key]
+        rng = random.Random(f"{self.seed}:{key}:{occurrence}")
+
+        delay_ms = entry.get("elapsed_ms", 0) if self.latency_ms == "recorded" else float(self.latency_ms)
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+
+        if self.error_rate and rng.random() < self.error_rate:
+            if not self.error_status:
+                raise requests.ConnectionError(f"Injected connection error for {request.url}", request=request)
+            return self._build(request, self.error_status, "Injected error", {}, b"", delay_ms)
+        return self._build(request, entry["status"], entry.get("reason"), entry["headers"],
+                           base64.b64decode(entry["body"]), delay_ms)
+
+    @staticmethod
+    def _build(request, status: int, reason: Optional[str], headers: dict, body: bytes,
+               delay_ms: float) -> requests.Response:
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = status
+        response.reason = reason
+        response.headers = CaseInsensitiveDict(headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = body
+        response._content_consumed = True
+        response.elapsed = timedelta(milliseconds=delay_ms)
+        return response
+
+
+def _replay_latency(value: str) -> Union[str, float]:
+    return "recorded" if value.strip().lower() == "recorded" else float(value or 0)
+
+
+def build_session(mode: str, directory: Union[str, Path], latency_ms: Union[str, float] = 0,
+                  error_rate: float = 0.0, error_status: int = 503, seed: int = 0) -> requests.Session:
+    """A requests session whose http and https traffic goes through a RecordReplayAdapter"""
+    adapter = RecordReplayAdapter(mode, CassetteStore(directory), latency_ms=latency_ms,
+                                  error_rate=error_rate, error_status=error_status, seed=seed)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def session_from_config() -> Optional[requests.Session]:
+    """The record/replay session HTTP_MODE asks for, or None for plain live requests"""
+    from app.config import (
+        HTTP_CASSETTE_DIR, HTTP_MODE, HTTP_REPLAY_ERROR_RATE, HTTP_REPLAY_ERROR_STATUS,
+        HTTP_REPLAY_LATENCY_MS, HTTP_REPLAY_SEED,
+    )
+
+    if HTTP_MODE == "live":
+        return None
+    return build_session(HTTP_MODE, HTTP_CASSETTE_DIR, latency_ms=_replay_latency(HTTP_REPLAY_LATENCY_MS),
+                         error_rate=HTTP_REPLAY_ERROR_RATE, error_status=HTTP_REPLAY_ERROR_STATUS,
+                         seed=HTTP_REPLAY_SEED)
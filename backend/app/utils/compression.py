@@ -0,0 +1,133 @@
+"""
+Extractive compression of article content before summarization.
+
+The markdown converter keeps plenty the digest model doesn't need: image tags,
+link lists (related posts, share buttons, navigation), bare URLs. Those are
+stripped first. If the rest is still over the token budget, the sentences that
+carry the most information are kept: each is scored by the TF-IDF cosine of its
+row against the whole article's centroid (plus its overlap with the title and a
+small bonus for the lead), and the best ones are taken until the budget is full.
+They go back in their original order, so the model still reads the article front
+to back, with the substance from the end of a long post included.
+"""
+import re
+from typing import List, Tuple
+import numpy as np
+
+from app.agent.llm import estimate_tokens
+from app.utils.lexical import tfidf_matrix, tokenize
+
+_IMAGE_RE = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+_LINK_RE = re.compile(r"\[([^\]]*)\]\([^)]*\)")
+_URL_RE = re.compile(r"<?https?://\S+>?")
+_HTML_RE = re.compile(r"</?[a-zA-Z][^>]*>")
+_WORD_RE = re.compile(r"[^\W_]{2,}")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+
+MAX_SENTENCE_WORDS = 60  # Transcripts come without punctuation: longer runs are split into chunks
+MIN_SENTENCE_WORDS = 8  # Shorter ones (headings, captions) score in proportion to their length
+MIN_KEPT_WORDS = 4  # Once compressing, fragments shorter than this (mostly headings) are dropped
+TITLE_WEIGHT = 0.3
+LEAD_SENTENCES = 3
+LEAD_WEIGHT = 0.1
+
+
+def _link_line(line: str) -> bool:
+    """A line that is (almost) only links: a link list, breadcrumbs, share buttons"""
+    if not _LINK_RE.search(line) and not _URL_RE.search(line):
+        return False
+    rest = _URL_RE.sub("", _LINK_RE.sub("", line))
+    return len(_WORD_RE.findall(rest)) < 3
+
+
+def clean_markdown(text: str) -> List[str]:
+    """Paragraphs of text with images, link-only lines, URLs, HTML tags and markup removed"""
+    paragraphs, current = [], []
+    for line in text.splitlines():
+        line = _IMAGE_RE.sub("", line).strip()
+        if not line or re.fullmatch(r"[|:\-\s]+", line) or _link_line(line):
+            if current:
+                paragraphs.append(" ".join(current))
+                current = []
+            continue
+        heading = line.startswith("#")
+        line = _URL_RE.sub("", _LINK_RE.sub(r"\1", _HTML_RE.sub("", line)))
+        line = re.sub(r"^(#+|>+|[-*+]|\d+[.)])\s+", "", line)
+        line = re.sub(r"[*`|]+", " ", line)  # Underscores stay: they are in identifiers more than emphasis
+        line = " ".join(line.split())
+        if not line:
+            continue
+        if heading:
+            # A heading is a paragraph of its own, not the start of the next sentence
+            if current:
+                paragraphs.append(" ".join(current))
+            paragraphs.append(line)
+            current = []
+            continue
+        current.append(line)
+    if current:
+        paragraphs.append(" ".join(current))
+    return paragraphs
+
+
+def split_sentences(paragraphs: List[str]) -> List[Tuple[int, str]]:
+    """(paragraph index, sentence) pairs, with unpunctuated runs cut into chunks of words"""
+    sentences = []
+    for index, paragraph in enumerate(paragraphs):
+        for sentence in _SENTENCE_RE.split(paragraph):
+            words = sentence.split()
+            for start in range(0, len(words), MAX_SENTENCE_WORDS):
+                sentences.append((index, " ".join(words[start:start + MAX_SENTENCE_WORDS])))
+    return sentences
+
+
+def score_sentences(sentences: List[str], title: str = "") -> np.ndarray:
+    """Information score of each sentence within its article (higher is kept first)"""
+    vocabulary = {}
+    rows = tfidf_matrix(sentences, vocabulary)
+    centroid = np.asarray(rows.sum(axis=0)).ravel()
+    centroid /= np.linalg.norm(centroid) or 1.0
+    scores = rows @ centroid
+
+    title_terms = [vocabulary[t] for t in set(tokenize(title)) if t in vocabulary]
+    if title_terms:
+        title_vector = np.zeros(rows.shape[1])
+        title_vector[title_terms] = 1.0
+        scores += TITLE_WEIGHT * (rows @ (title_vector / np.sqrt(len(title_terms))))
+
+    lengths = np.array([len(s.split()) for s in sentences], dtype=np.float64)
+    scores *= np.minimum(1.0, lengths / MIN_SENTENCE_WORDS)
+    scores[:LEAD_SENTENCES] += LEAD_WEIGHT
+    return scores
+
+
+def compress(text: str, token_budget: int, title: str = "") -> str:
+    """
+    The content of text that fits in token_budget (estimated) tokens: all of the
+    cleaned text if it fits, otherwise its highest-scoring sentences in order.
+    """
+    paragraphs = clean_markdown(text)
+    cleaned = "\n\n".join(paragraphs)
+    if estimate_tokens(cleaned) <= token_budget:
+        return cleaned
+
+    sentences = split_sentences(paragraphs)
+    scores = score_sentences([s for _, s in sentences], title)
+    keep, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        sentence = sentences[i][1]
+        cost = estimate_tokens(sentence) + 1
+        if len(sentence.split()) >= MIN_KEPT_WORDS and used + cost <= token_budget:
+            keep.append(i)
+            used += cost
+    if not keep:
+        return cleaned[:token_budget * 4]
+
+    parts, previous = [], None
+    for i in sorted(keep):
+        paragraph, sentence = sentences[i]
+        if previous is not None:
+            parts.append(" " if paragraph == previous else "\n\n")
+        parts.append(sentence)
+        previous = paragraph
+    return "".join(parts)
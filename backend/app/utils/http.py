@@ -0,0 +1,55 @@
+"""
+Outbound HTTP for scrapers and the markdown converter.
+
+Every GET goes through http_get so it is timed (http_request_seconds, by host
+and status) and shows up as a span in the run report. With HTTP_MODE=record or
+replay it is sent through the record/replay session (see app/utils/cassette.py).
+"""
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+
+from app.utils.metrics import span
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_ready = False
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> Optional[requests.Session]:
+    """The record/replay session for HTTP_MODE, created on first use; None when live"""
+    global _session, _session_ready
+    if not _session_ready:
+        with _session_lock:
+            if not _session_ready:
+                _session = new_http_session()
+                _session_ready = True
+                if _session is not None:
+                    from app.config import HTTP_CASSETTE_DIR, HTTP_MODE
+                    logger.info(f"HTTP {HTTP_MODE} mode, cassettes in {HTTP_CASSETTE_DIR}")
+    return _session
+
+
+def new_http_session() -> Optional[requests.Session]:
+    """A separate record/replay session for clients that configure their own (None when live)"""
+    from app.utils.cassette import session_from_config
+
+    return session_from_config()
+
+
+def http_get(url: str, headers: Optional[dict] = None, timeout: Optional[float] = None,
+             **kwargs) -> requests.Response:
+    """requests.get, instrumented. Raises like requests.get; HTTP error statuses are returned as usual."""
+    client = get_http_session() or requests
+    with span("http_request", host=urlparse(url).netloc or "unknown") as current:
+        response = client.get(url, headers=headers, timeout=timeout, **kwargs)
+        current.labels["code"] = response.status_code
+        current.set(url=url, bytes=len(response.content))
+        if response.status_code >= 400:
+            current.fail(f"HTTP {response.status_code}")
+        return response
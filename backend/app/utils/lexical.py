@@ -0,0 +1,137 @@
+"""
+Lexical scoring with sparse matrices (BM25, TF-IDF).
+
+Used to pre-rank digests against the profile interests so only the most
+promising candidates are sent to the curator LLM (and to order them when its
+reply is unusable), and to match articles against per-subscriber interests.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Sequence
+import numpy as np
+from scipy import sparse
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a an and are as at be been but by can for from has have how in into is it its
+new of on or our that the their this to was we were what when which while who
+will with you your about across after also more most than them they these those
+""".split())
+
+
+def _stem(token: str) -> str:
+    # Light plural folding so "models"/"model" and "llms"/"llm" match
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def phrase_terms(phrase: str) -> frozenset:
+    """Distinct terms of a short phrase; cached since interest phrases repeat across profiles"""
+    return frozenset(tokenize(phrase))
+
+
+def term_matrix(documents: Sequence[str], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+    """Term-frequency matrix (documents × vocabulary), growing the vocabulary in place"""
+    indptr = [0]
+    indices: List[int] = []
+    for doc in documents:
+        for token in tokenize(doc):
+            indices.append(vocabulary.setdefault(token, len(vocabulary)))
+        indptr.append(len(indices))
+    data = np.ones(len(indices), dtype=np.float64)
+    matrix = sparse.csr_matrix(
+        (data, np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+        shape=(len(documents), max(len(vocabulary), 1))
+    )
+    matrix.sum_duplicates()  # Repeated tokens collapse into counts
+    return matrix
+
+
+def bm25_scores(documents: Sequence[str], query_weights: Dict[str, float],
+                k1: float = 1.5, b: float = 0.75) -> np.ndarray:
+    """BM25 score of every document for a weighted bag-of-words query"""
+    if not documents:
+        return np.zeros(0)
+
+    vocabulary: Dict[str, int] = {}
+    tf = term_matrix(documents, vocabulary)
+    n_docs = tf.shape[0]
+
+    doc_len = np.asarray(tf.sum(axis=1)).ravel()
+    avg_len = doc_len.mean() or 1.0
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+    # Saturate term frequencies in place on the CSR data array
+    row_norm = k1 * (1 - b + b * doc_len / avg_len)
+    norm = np.repeat(row_norm, np.diff(tf.indptr))
+    weighted = tf.copy()
+    weighted.data = tf.data * (k1 + 1) / (tf.data + norm)
+
+    query = np.zeros(tf.shape[1])
+    for token, weight in query_weights.items():
+        index = vocabulary.get(token)
+        if index is not None:
+            query[index] += weight
+    return weighted @ (query * idf)
+
+
+def l2_normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def tfidf_matrix(documents: Sequence[str], vocabulary: Dict[str, int]) -> sparse.csr_matrix:
+    """L2-normalized TF-IDF rows (sublinear tf) over the given documents"""
+    tf = term_matrix(documents, vocabulary)
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    idf = np.log((1 + tf.shape[0]) / (1 + df)) + 1.0
+    tf.data = 1.0 + np.log(tf.data)
+    return l2_normalize_rows(tf @ sparse.diags(idf)).tocsr()
+
+
+def interest_query(interests: Sequence[str], min_weight: float = 0.5) -> Dict[str, float]:
+    """
+    Bag-of-words query from an ordered interests list. Earlier interests weigh
+    more (1.0 down to min_weight), matching "ranked by importance" in the profile.
+    """
+    weights: Dict[str, float] = {}
+    count = len(interests)
+    for i, interest in enumerate(interests):
+        weight = 1.0 - (1.0 - min_weight) * (i / max(count - 1, 1))
+        for token in phrase_terms(interest):
+            weights[token] = weights.get(token, 0.0) + weight
+    return weights
+
+
+def prerank(digests: List[dict], interests: Sequence[str], limit: int) -> List[dict]:
+    """
+    Keep the `limit` digests that score highest against the interests.
+    Ties keep the incoming order (newest first); the result stays in incoming order.
+    """
+    if len(digests) <= limit:
+        return digests
+    keep = np.sort(_best_first(digests, interests)[:limit])
+    return [digests[i] for i in keep]
+
+
+def lexical_order(digests: List[dict], interests: Sequence[str]) -> List[dict]:
+    """Every digest, best match against the interests first (ties keep the incoming order)"""
+    if not digests:
+        return []
+    return [digests[i] for i in _best_first(digests, interests)]
+
+
+def _best_first(digests: List[dict], interests: Sequence[str]) -> np.ndarray:
+    # Title counted twice: it is the densest signal in a short digest
+    documents = [f"{d['title']} {d['title']} {d['summary']}" for d in digests]
+    scores = bm25_scores(documents, interest_query(interests))
+    return np.argsort(-scores, kind="stable")
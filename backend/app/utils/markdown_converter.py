@@ -1,7 +1,7 @@
-import requests
+from app.utils.http import http_get
 from bs4 import BeautifulSoup
 import html2text
-from typing import Optional
+from typing import Optional, Union
 
 
 class MarkdownConverter:
@@ -17,34 +17,37 @@ class MarkdownConverter:
             headers = {
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
             }
-            response = requests.get(url, headers=headers, timeout=timeout)
+            response = http_get(url, headers=headers, timeout=timeout)
             response.raise_for_status()
-            
-            # Parse HTML
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            
-            # Get the main content (try common article containers)
-            main_content = (
-                soup.find('article') or 
-                soup.find('main') or 
-                soup.find('div', class_='content') or
-                soup.find('div', class_='post-content') or
-                soup.body
-            )
-            
-            if not main_content:
-                return None
-            
-            # Convert to markdown
-            html_content = str(main_content)
-            markdown = self.html2text.handle(html_content)
-            
-            return markdown.strip()
+            return self.convert_html(response.content)
             
         except Exception as e:
             print(f"Error converting URL {url}: {e}")
             return None
+    
+    def convert_html(self, content: Union[str, bytes]) -> Optional[str]:
+        """Convert a fetched page to markdown (no network; raises on unparsable input)"""
+        # Parse HTML
+        soup = BeautifulSoup(content, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style", "nav", "footer", "header"]):
+            script.decompose()
+        
+        # Get the main content (try common article containers)
+        main_content = (
+            soup.find('article') or 
+            soup.find('main') or 
+            soup.find('div', class_='content') or
+            soup.find('div', class_='post-content') or
+            soup.body
+        )
+        
+        if not main_content:
+            return None
+        
+        # Convert to markdown
+        html_content = str(main_content)
+        markdown = self.html2text.handle(html_content)
+        
+        return markdown.strip()
@@ -0,0 +1,372 @@
+"""
+In-process instrumentation: spans, counters and latency histograms.
+
+    with span("scrape", source="openai") as s:
+        items = scraper.get_articles()
+        s.set(items=len(items))
+
+Every span is timed into the histogram "<name>_seconds", labelled with its own
+labels plus status ("ok" or "error"), and kept as an individual record for the
+run report (up to METRICS_MAX_SPANS). Database statements executed while a span
+is open on the same thread are added to its db_queries / db_seconds attributes,
+so the report shows how much of each stage went to the database.
+
+render_prometheus() formats everything in the Prometheus text format (served by
+the API at /metrics). Those series only ever grow, as Prometheus expects of
+counters and histograms. Each observation is also kept in per-run series that
+start_run() clears: summary() and run_report() return those as JSON, so a run
+report covers one run without resetting what /metrics serves.
+
+Only the standard library is used, so the API can import this cheaply.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import METRICS_ENABLED, METRICS_MAX_SPANS
+
+PREFIX = "aggregator_"
+
+# Upper bounds in seconds: from a 5ms query to a 10 minute stage
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HELP = {
+    "api_request_seconds": "API request handling, by route template",
+    "pipeline_stage_seconds": "Daily pipeline stage duration",
+    "scrape_seconds": "Scraping and saving one source",
+    "scrape_items_total": "Items returned by a source scrape",
+    "http_request_seconds": "Outbound HTTP GET, including reading the body",
+    "llm_call_seconds": "One Gemini generate_content call (see app/agent/llm.py)",
+    "llm_throttle_seconds": "Time spent in the client-side LLM rate limit before a call",
+    "llm_tokens_total": "Gemini tokens used, by kind (prompt, output)",
+    "llm_retries_total": "Gemini calls retried after a rate limit",
+    "llm_rate_limited_total": "Gemini calls rejected with HTTP 429",
+    "llm_malformed_total": "Gemini JSON replies that did not parse",
+    "db_query_seconds": "Database statement execution (an executemany batch counts once)",
+    "smtp_connect_seconds": "Opening and logging in an SMTP connection",
+    "smtp_send_seconds": "One email handed to the SMTP server",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate from the buckets, interpolating linearly inside one (as Prometheus does)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - cumulative) / count, self.max)
+            cumulative += count
+        return self.max
+
+
+class Span:
+    __slots__ = ("name", "labels", "attrs", "parent", "thread", "start", "duration", "status", "error")
+
+    def __init__(self, name: str, labels: Dict[str, Any], parent: Optional[str], start: float):
+        self.name = name
+        self.labels = labels
+        self.attrs: Dict[str, Any] = {}
+        self.parent = parent
+        self.thread = threading.current_thread().name
+        self.start = start  # Seconds since the run started
+        self.duration = 0.0
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set(self, **attrs) -> None:
+        """Attach details to the span record (not used as metric labels)"""
+        self.attrs.update(attrs)
+
+    def fail(self, error: str) -> None:
+        """Mark the span failed without raising (e.g. an HTTP error status)"""
+        self.status = "error"
+        self.error = error[:200]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "labels": {name: str(value) for name, value in self.labels.items()},
+            "start": round(self.start, 4),
+            "duration": round(self.duration, 4),
+            "status": self.status,
+            "thread": self.thread,
+            **({"parent": self.parent} if self.parent else {}),
+            **({"attrs": {k: round(v, 4) if isinstance(v, float) else v for k, v in self.attrs.items()}}
+               if self.attrs else {}),
+            **({"error": self.error} if self.error else {}),
+        }
+
+
+class Registry:
+    def __init__(self, max_spans: int = METRICS_MAX_SPANS):
+        self.max_spans = max_spans
+        self._lock = threading.Lock()
+        self._local = threading.local()  # Stack of open spans per thread
+        self.reset()
+
+    def reset(self) -> None:
+        """Start over, including the cumulative series /metrics serves (tests, benchmarks)"""
+        with self._lock:
+            self.histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+            self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.start_run()
+
+    def start_run(self) -> None:
+        """Begin a new run report (the daily runner calls this); /metrics keeps counting"""
+        with self._lock:
+            self.run_histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+            self.run_counters: Dict[str, Dict[Labels, float]] = {}
+            self.spans: List[Span] = []
+            self.dropped_spans = 0
+            self.started_at = datetime.now(timezone.utc)
+            self._started = time.perf_counter()
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            for counters in (self.counters, self.run_counters):
+                series = counters.setdefault(name, {})
+                series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _key(labels)
+        with self._lock:
+            for histograms in (self.histograms, self.run_histograms):
+                series = histograms.setdefault(name, {})
+                if key not in series:
+                    series[key] = _Histogram()
+                series[key].observe(value)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[Span]:
+        stack = self._stack()
+        started = time.perf_counter()
+        current = Span(name, labels, stack[-1].name if stack else None, started - self._started)
+        stack.append(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.fail(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            current.duration = time.perf_counter() - started
+            stack.pop()
+            self.observe(f"{name}_seconds", current.duration, **current.labels, status=current.status)
+            with self._lock:
+                if len(self.spans) < self.max_spans:
+                    self.spans.append(current)
+                else:
+                    self.dropped_spans += 1
+
+    def record_query(self, seconds: float, operation: str, batch: bool) -> None:
+        self.observe("db_query_seconds", seconds, operation=operation, batch=str(batch).lower())
+        stack = self._stack()
+        if stack:
+            attrs = stack[-1].attrs
+            attrs["db_queries"] = attrs.get("db_queries", 0) + 1
+            attrs["db_seconds"] = attrs.get("db_seconds", 0.0) + seconds
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                metric = PREFIX + name
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self.histograms.items()):
+                metric = PREFIX + name
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        bucket_labels = _format_labels(labels, 'le="%s"' % le)
+                        lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def summary(self) -> Dict[str, Any]:
+        """This run's histograms (count, sum, p50, p95, max) and counters, without individual spans"""
+        with self._lock:
+            return {
+                "started_at": self.started_at.isoformat(),
+                "histograms": {
+                    name: [
+                        {
+                            "labels": dict(labels),
+                            "count": h.count,
+                            "sum": round(h.sum, 4),
+                            "p50": round(h.quantile(0.5), 4),
+                            "p95": round(h.quantile(0.95), 4),
+                            "max": round(h.max, 4),
+                        }
+                        for labels, h in sorted(series.items(), key=lambda item: -item[1].sum)
+                    ]
+                    for name, series in sorted(self.run_histograms.items())
+                },
+                "counters": {
+                    name: [{"labels": dict(labels), "value": value} for labels, value in sorted(series.items())]
+                    for name, series in sorted(self.run_counters.items())
+                },
+            }
+
+    def run_report(self, slowest: int = 20) -> Dict[str, Any]:
+        """summary() plus the slowest spans and every recorded span"""
+        report = self.summary()
+        with self._lock:
+            spans = list(self.spans)
+            dropped = self.dropped_spans
+        report["slowest_spans"] = [s.to_dict() for s in sorted(spans, key=lambda s: -s.duration)[:slowest]]
+        report["spans"] = [s.to_dict() for s in spans]
+        report["dropped_spans"] = dropped
+        return report
+
+
+REGISTRY = Registry()
+
+
+class _NoopSpan(Span):
+    def __init__(self):
+        super().__init__("", {}, None, 0.0)
+
+
+@contextmanager
+def span(name: str, **labels) -> Iterator[Span]:
+    """Time a block; see the module docstring"""
+    if not METRICS_ENABLED:
+        yield _NoopSpan()
+        return
+    with REGISTRY.span(name, **labels) as current:
+        yield current
+
+
+def inc(name: str, amount: float = 1, **labels) -> None:
+    if METRICS_ENABLED:
+        REGISTRY.inc(name, amount, **labels)
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if METRICS_ENABLED:
+        REGISTRY.observe(name, value, **labels)
+
+
+def instrument_engine(engine) -> None:
+    """Time every statement the engine executes into db_query_seconds"""
+    if not METRICS_ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_started")
+        if not started:
+            return
+        words = statement.split(None, 1)
+        REGISTRY.record_query(time.perf_counter() - started.pop(), words[0].upper() if words else "OTHER",
+                              executemany)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # A failed statement never reaches after_cursor_execute
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started"):
+            connection.info["query_started"].pop()
+
+
+def render_last_run(run_id: str, finished_at: Optional[datetime], report: Dict[str, Any]) -> str:
+    """
+    Gauges from the stored report of the last pipeline run. The pipeline runs in
+    another process (cron or the job worker), so the API serves its numbers from
+    the run ledger rather than from its own registry.
+    """
+    lines = [
+        f"# HELP {PREFIX}last_run_info Last finished daily pipeline run",
+        f"# TYPE {PREFIX}last_run_info gauge",
+        f'{PREFIX}last_run_info{{run_id="{_escape(run_id)}"}} 1',
+    ]
+    if finished_at:
+        lines += [
+            f"# TYPE {PREFIX}last_run_finished_timestamp_seconds gauge",
+            f"{PREFIX}last_run_finished_timestamp_seconds "
+            f"{finished_at.replace(tzinfo=finished_at.tzinfo or timezone.utc).timestamp():.0f}",
+        ]
+    if "wall_seconds" in report:
+        lines += [
+            f"# TYPE {PREFIX}last_run_wall_seconds gauge",
+            f"{PREFIX}last_run_wall_seconds {report['wall_seconds']}",
+            f"# TYPE {PREFIX}last_run_critical_path_seconds gauge",
+            f"{PREFIX}last_run_critical_path_seconds {report['critical_path_seconds']}",
+        ]
+    if report.get("stages"):
+        lines.append(f"# TYPE {PREFIX}last_run_stage_seconds gauge")
+        for stage, timing in sorted(report["stages"].items()):
+            labels = _key({"stage": stage, "status": timing["status"]})
+            lines.append(f"{PREFIX}last_run_stage_seconds{_format_labels(labels)} {timing['duration']}")
+    for name, series in sorted(report.get("metrics", {}).get("histograms", {}).items()):
+        metric = f"{PREFIX}last_run_{name}"
+        lines.append(f"# TYPE {metric}_sum gauge")
+        lines.append(f"# TYPE {metric}_count gauge")
+        for entry in series:
+            labels = _key(entry["labels"])
+            lines.append(f"{metric}_sum{_format_labels(labels)} {entry['sum']}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {entry['count']}")
+    for name, series in sorted(report.get("metrics", {}).get("counters", {}).items()):
+        metric = f"{PREFIX}last_run_{name}"
+        lines.append(f"# TYPE {metric} gauge")
+        for entry in series:
+            lines.append(f"{metric}{_format_labels(_key(entry['labels']))} {entry['value']:g}")
+    return "\n".join(lines) + "\n"
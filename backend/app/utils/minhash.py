@@ -0,0 +1,189 @@
+"""
+MinHash signatures with LSH banding for near-duplicate text detection.
+
+Everything past splitting the words runs in NumPy: word n-gram hashes are
+combined from per-word hashes, the permutations are multiply-shift hashes
+(no modulo), and the shingles of many documents are permuted in one pass
+before np.minimum.reduceat takes each document's minimum. LSH bucketing
+groups identical bands with np.unique instead of Python dicts.
+"""
+import re
+import zlib
+from typing import Dict, Hashable, Iterator, List, Optional, Sequence, Set, Tuple
+import numpy as np
+
+# Permutations are multiply-shift hashes h(x) = (a*x + b) mod 2^64 >> 32 of
+# 32-bit shingle hashes: uint64 arithmetic wraps, so no modulo is needed
+_SHIFT = np.uint64(32)
+_MIX = np.uint64(0x9E3779B97F4A7C15)  # Odd multiplier folding the next word into an n-gram hash
+_MAX_HASH = np.uint32(0xFFFFFFFF)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CHUNK = 4096  # Shingles permuted per pass: num_perm x _CHUNK uint64 values (4 MB at 128 permutations)
+
+
+def shingle_hashes(text: str, size: int = 3) -> np.ndarray:
+    """32-bit hashes of the unique word `size`-grams of a text (the whole text if shorter)"""
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    word_hashes = np.fromiter((zlib.crc32(w.encode("utf-8")) for w in words), dtype=np.uint64, count=len(words))
+    size = min(size, len(words))
+    count = len(words) - size + 1
+    grams = word_hashes[:count] * _MIX
+    for offset in range(1, size):
+        # Multiplying after each word carries its bits into the top half kept below
+        grams = (grams ^ word_hashes[offset:offset + count]) * _MIX
+    return np.unique(grams >> _SHIFT)
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Pick (bands, rows) so the LSH S-curve threshold (1/b)^(1/r) sits just below
+    the target Jaccard threshold, favouring recall over extra candidate pairs
+    """
+    best = (num_perm, 1)
+    best_gap = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        curve = (1.0 / bands) ** (1.0 / rows)
+        if curve <= threshold and threshold - curve < best_gap:
+            best, best_gap = (bands, rows), threshold - curve
+    return best
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, shingle_size: int = 3, seed: int = 42):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # a must be odd for multiply-shift hashing
+        self.a = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+
+    def _permute(self, hashes: np.ndarray) -> np.ndarray:
+        """Every permutation of every hash: shape (num_perm, len(hashes))"""
+        return (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> _SHIFT
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text, self.shingle_size)
+        signature = np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        for start in range(0, len(hashes), _CHUNK):
+            np.minimum(signature, self._permute(hashes[start:start + _CHUNK]).min(axis=1), out=signature,
+                       casting="unsafe")
+        return signature
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Signature matrix of shape (len(texts), num_perm). The shingles of
+        consecutive documents are permuted together, about _CHUNK at a time;
+        a document longer than that is hashed on its own, in chunks.
+        """
+        signatures = np.full((len(texts), self.num_perm), _MAX_HASH, dtype=np.uint32)
+        shingles = [shingle_hashes(text, self.shingle_size) for text in texts]
+        group: List[int] = []
+        size = 0
+        for i, hashes in enumerate(shingles):
+            if len(hashes) > _CHUNK:
+                signatures[i] = self.signature(texts[i])
+                continue
+            if not len(hashes):
+                continue  # No words: no shingles, the signature stays at the maximum
+            group.append(i)
+            size += len(hashes)
+            if size >= _CHUNK:
+                self._fill(signatures, shingles, group)
+                group, size = [], 0
+        if group:
+            self._fill(signatures, shingles, group)
+        return signatures
+
+    def _fill(self, signatures: np.ndarray, shingles: List[np.ndarray], group: List[int]) -> None:
+        lengths = np.array([len(shingles[i]) for i in group])
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        permuted = self._permute(np.concatenate([shingles[i] for i in group]))
+        signatures[group] = np.minimum.reduceat(permuted, starts, axis=1).T
+
+
+def band_buckets(signatures: np.ndarray, bands: int, rows: int) -> Iterator[np.ndarray]:
+    """Yield the row indices of every LSH bucket holding more than one row"""
+    for band in range(bands):
+        band_sig = signatures[:, band * rows:(band + 1) * rows]
+        _, bucket = np.unique(band_sig, axis=0, return_inverse=True)
+        order = np.argsort(bucket.ravel(), kind="stable")
+        boundaries = np.flatnonzero(np.diff(bucket.ravel()[order])) + 1
+        for members in np.split(order, boundaries):
+            if len(members) > 1:
+                yield members
+
+
+def cluster_signatures(signatures: np.ndarray, threshold: float = 0.5) -> List[List[int]]:
+    """
+    Group rows whose estimated Jaccard similarity reaches the threshold
+    (transitively, via union-find). Singletons are returned as 1-element clusters.
+
+    Within a bucket each member is compared against an anchor in one vectorized
+    step instead of pairwise, so large buckets of copies stay linear.
+    """
+    n = len(signatures)
+    parent = np.arange(n)
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return int(x)
+
+    if n > 1:
+        bands, rows = optimal_bands(signatures.shape[1], threshold)
+        for members in band_buckets(signatures, bands, rows):
+            roots = np.array([find(int(m)) for m in members])
+            if (roots == roots[0]).all():
+                continue  # Already merged through another band
+            while len(members) > 1:
+                anchor = int(members[0])
+                similarity = (signatures[members[1:]] == signatures[anchor]).mean(axis=1)
+                matched = members[1:][similarity >= threshold]
+                root = find(anchor)
+                for m in matched:
+                    parent[find(int(m))] = root
+                # Members unlike this anchor may still match each other
+                members = members[1:][similarity < threshold]
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(n):
+        clusters.setdefault(find(i), []).append(i)
+    return list(clusters.values())
+
+
+class MinHashLSHIndex:
+    """Incremental LSH index for streaming use: query before inserting each new item"""
+
+    def __init__(self, hasher: MinHasher, threshold: float = 0.5):
+        self.hasher = hasher
+        self.threshold = threshold
+        self.bands, self.rows = optimal_bands(hasher.num_perm, threshold)
+        self.buckets: List[Dict[bytes, Set[Hashable]]] = [{} for _ in range(self.bands)]
+        self.signatures: Dict[Hashable, np.ndarray] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def insert(self, key: Hashable, signature: np.ndarray) -> None:
+        self.signatures[key] = signature
+        for band, band_key in enumerate(self._band_keys(signature)):
+            self.buckets[band].setdefault(band_key, set()).add(key)
+
+    def query(self, signature: np.ndarray) -> Optional[Tuple[Hashable, float]]:
+        """Best existing match at or above the threshold, as (key, estimated similarity)"""
+        candidates: Set[Hashable] = set()
+        for band, band_key in enumerate(self._band_keys(signature)):
+            candidates |= self.buckets[band].get(band_key, set())
+        best = None
+        for key in candidates:
+            similarity = float((self.signatures[key] == signature).mean())
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        return best
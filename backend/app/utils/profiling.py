@@ -0,0 +1,209 @@
+"""
+Per-stage profiling for the daily pipeline (main.py --profile or PIPELINE_PROFILE=true).
+
+Each stage runs under a profiler and tracemalloc, and its artifacts go into one
+directory per run attempt, PIPELINE_PROFILE_DIR/<edition>-attempt<n>/:
+
+- cProfile: <stage>.pstats (load with pstats, snakeviz or flameprof) and
+  <stage>.txt, the top functions by cumulative and by own time.
+- pyinstrument (if installed, or PIPELINE_PROFILER=pyinstrument): <stage>.html,
+  an interactive call tree, and <stage>.txt.
+- <stage>.memory.txt: peak traced memory during the stage and the source lines
+  that allocated the most.
+- profile.json: one entry per stage with its seconds, peak and net memory,
+  top functions and artifact paths.
+
+The profilers and tracemalloc are process-wide, so while profiling the pipeline
+runs one stage at a time. Each stage's figures are then its own. On Python 3.12+,
+cProfile also sees the threads a stage starts; pyinstrument samples only the
+stage's own thread. Tracing slows Python code down a lot, so only compare
+profiled runs with other profiled runs.
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+TRACEBACK_FRAMES = 1
+
+
+def _file_name(stage: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in stage)
+
+
+def resolve_engine(engine: str) -> str:
+    """cprofile or pyinstrument; "auto" picks pyinstrument when it is installed"""
+    engine = engine.lower()
+    if engine == "auto":
+        try:
+            import pyinstrument  # noqa: F401
+            return "pyinstrument"
+        except ImportError:
+            return "cprofile"
+    if engine not in ("cprofile", "pyinstrument"):
+        raise ValueError(f"Unknown profiler {engine!r} (expected auto, cprofile or pyinstrument)")
+    return engine
+
+
+class StageProfiler:
+    def __init__(self, directory: Path, engine: str = "auto"):
+        self.directory = Path(directory)
+        self.engine = resolve_engine(engine)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()  # One stage at a time, whatever the pipeline's worker count
+
+    @classmethod
+    def for_run(cls, run_id: str, attempt: int = 1) -> "StageProfiler":
+        from app.config import PIPELINE_PROFILE_DIR, PIPELINE_PROFILER
+
+        directory = Path(PIPELINE_PROFILE_DIR) / f"{run_id.replace('/', '_')}-attempt{attempt}"
+        return cls(directory, PIPELINE_PROFILER)
+
+    def wrap(self, name: str, func: Callable[[Dict[str, Any]], Any]) -> Callable[[Dict[str, Any]], Any]:
+        def profiled(inputs: Dict[str, Any]) -> Any:
+            with self.profile(name):
+                return func(inputs)
+        return profiled
+
+    @contextmanager
+    def profile(self, name: str):
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start(TRACEBACK_FRAMES)
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+            try:
+                profiler = self._start()
+            except Exception as e:
+                # e.g. another profiler is already active in the process
+                logger.error(f"Could not profile {name}: {e}")
+                profiler = None
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                seconds = time.perf_counter() - started
+                if profiler is not None:
+                    self._stop(profiler)
+                # Measured before the profile is written out, which allocates plenty itself
+                current, peak = tracemalloc.get_traced_memory()
+                after = tracemalloc.take_snapshot()
+                if started_tracing:
+                    tracemalloc.stop()
+
+                entry = {
+                    "seconds": round(seconds, 3),
+                    "peak_memory_bytes": peak - baseline,
+                    "net_memory_bytes": current - baseline,
+                    "artifacts": [],
+                }
+                try:
+                    if profiler is not None:
+                        entry.update(self._write_profile(profiler, name))
+                    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+                    differences = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "lineno")
+                    entry["artifacts"].append(self._write_memory(name, peak - baseline, current - baseline,
+                                                                 differences))
+                except Exception as e:
+                    # Losing a profile must not fail the stage
+                    logger.error(f"Failed to write the profile of {name}: {e}")
+                    entry["error"] = str(e)
+                self.stages[name] = entry
+                self._write_summary()
+
+    def _start(self):
+        if self.engine == "pyinstrument":
+            from pyinstrument import Profiler
+
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop(self, profiler) -> None:
+        if self.engine == "pyinstrument":
+            profiler.stop()
+        else:
+            profiler.disable()
+
+    def _write_profile(self, profiler, name: str) -> Dict[str, Any]:
+        base = self.directory / _file_name(name)
+        if self.engine == "pyinstrument":
+            html_path, text_path = base.with_suffix(".html"), base.with_suffix(".txt")
+            html_path.write_text(profiler.output_html())
+            text_path.write_text(profiler.output_text(unicode=True))
+            return {"artifacts": [str(html_path), str(text_path)]}
+
+        import io
+        import pstats
+
+        stats_path, text_path = base.with_suffix(".pstats"), base.with_suffix(".txt")
+        profiler.dump_stats(str(stats_path))
+        text = io.StringIO()
+        stats = pstats.Stats(profiler, stream=text)
+        for order in ("cumulative", "tottime"):
+            stats.sort_stats(order).print_stats(TOP_FUNCTIONS)
+        text_path.write_text(text.getvalue())
+        return {"artifacts": [str(stats_path), str(text_path)], "top_functions": self._top_functions(stats)}
+
+    @staticmethod
+    def _top_functions(stats) -> List[Dict[str, Any]]:
+        """Functions with the most own time: where the stage's time actually went"""
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:10]
+        return [
+            {"function": f"{Path(file).name}:{line}({func})", "calls": calls,
+             "own_seconds": round(own, 4), "cumulative_seconds": round(cumulative, 4)}
+            for (file, line, func), (_, calls, own, cumulative, _) in rows
+        ]
+
+    def _write_memory(self, name: str, peak: int, net: int, differences: list) -> str:
+        path = self.directory / f"{_file_name(name)}.memory.txt"
+        lines = [
+            f"Stage {name}: peak {peak / 2**20:.1f} MiB above the start, net {net / 2**20:+.1f} MiB",
+            "",
+            f"Largest net allocations by line (top {TOP_ALLOCATIONS}):",
+        ]
+        lines += [str(difference) for difference in differences[:TOP_ALLOCATIONS]]
+        path.write_text("\n".join(lines) + "\n")
+        return str(path)
+
+    def _write_summary(self) -> None:
+        summary = {"engine": self.engine, "stages": self.stages}
+        (self.directory / "profile.json").write_text(json.dumps(summary, indent=2))
+
+    def format_summary(self) -> str:
+        """Stages by time, with their peak memory"""
+        lines = [f"Profiles ({self.engine}) in {self.directory}:"]
+        for name, entry in sorted(self.stages.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            peak = entry.get("peak_memory_bytes")
+            memory = f"peak {peak / 2**20:7.1f} MiB" if peak is not None else "no memory figures"
+            top = entry.get("top_functions") or []
+            hottest = f", hottest {top[0]['function']}" if top else ""
+            lines.append(f"  {name:<28}{entry['seconds']:>8.1f}s  {memory}{hottest}")
+        return "\n".join(lines)
+
+
+def profiler_for_run(run_id: str, attempt: int = 1, enabled: Optional[bool] = None) -> Optional[StageProfiler]:
+    """The StageProfiler for a run when profiling is on (enabled, else PIPELINE_PROFILE); None otherwise"""
+    from app.config import PIPELINE_PROFILE
+
+    if not (PIPELINE_PROFILE if enabled is None else enabled):
+        return None
+    return StageProfiler.for_run(run_id, attempt)
@@ -0,0 +1,182 @@
+"""
+Worker for the background job queue.
+
+POST /api/trigger-daily-digest only queues a job (see enqueue_daily_digest);
+this process claims queued jobs from the database and runs them, and drains
+the email outbox (app/services/outbox.py) between jobs. Several
+workers can run at once: PostgreSQL hands each job to exactly one of them
+(FOR UPDATE SKIP LOCKED). Where no worker process can run (Vercel),
+JOB_RUN_INLINE makes the trigger endpoint run its job itself (run_inline).
+
+Usage (from backend/):
+    python -m app.worker           # Run forever, polling for jobs
+    python -m app.worker --once    # Run the queued jobs, then exit (cron)
+"""
+import argparse
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.config import JOB_HEARTBEAT_SECONDS, JOB_MAX_ATTEMPTS, JOB_POLL_SECONDS, JOB_STALE_SECONDS
+from app.database.repository import Repository
+from app.pipeline.ledger import edition_id
+from app.services.outbox import dispatch_outbox
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+DAILY_DIGEST = "daily_digest"
+
+
+def enqueue_daily_digest(hours: int = 24, top_n: int = 10) -> Dict[str, Any]:
+    """Queue today's edition; triggers for an edition that is already pending coalesce into it"""
+    repo = Repository()
+    try:
+        return repo.enqueue_job(DAILY_DIGEST, edition_id(hours, top_n), {"hours": hours, "top_n": top_n})
+    finally:
+        repo.session.close()
+
+
+def run_daily_digest(job: Dict[str, Any]) -> Dict[str, Any]:
+    from app.daily_runner import run_daily_pipeline
+    
+    params = job["params"]
+    result = run_daily_pipeline(
+        hours=params.get("hours", 24),
+        top_n=params.get("top_n", 10),
+        run_id=job["dedupe_key"]  # The edition: a retried job resumes from the run ledger
+    )
+    return {
+        "success": result.get("success", False),
+        "run_id": result.get("run_id"),
+        "scraping": result.get("scraping", {}),
+        "digests": result.get("digests", {}),
+        "email": result.get("email", {}),
+        "duration_seconds": result.get("duration_seconds", 0),
+        "llm_usage": result.get("llm_usage", []),
+        "profile_dir": result.get("profile_dir"),
+        "error": result.get("error") or result.get("email", {}).get("error")
+    }
+
+
+JOB_HANDLERS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    DAILY_DIGEST: run_daily_digest,
+}
+
+
+def _heartbeat(job_id: str, stop: threading.Event) -> None:
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        repo = Repository()
+        try:
+            repo.heartbeat_job(job_id)
+        except Exception as e:
+            logger.error(f"Heartbeat for job {job_id} failed: {e}")
+        finally:
+            repo.session.close()
+
+
+def run_job(job: Dict[str, Any]) -> str:
+    """Run a claimed job and record its outcome. Returns the final status."""
+    logger.info(f"Running job {job['id']} ({job['kind']} {job['dedupe_key']}, attempt {job['attempts']})")
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job["id"], stop), daemon=True)
+    heartbeat.start()
+    
+    status, result, error = "failed", None, None
+    try:
+        result = JOB_HANDLERS[job["kind"]](job)
+        status = "succeeded" if result.get("success") else "failed"
+        error = result.get("error")
+    except Exception as e:
+        logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+        error = str(e)
+    finally:
+        stop.set()
+        heartbeat.join()
+    
+    repo = Repository()
+    try:
+        repo.finish_job(job["id"], status, result=result, error=error)
+    finally:
+        repo.session.close()
+    logger.info(f"Job {job['id']} {status}")
+    return status
+
+
+def _requeue_stale(repo: Repository) -> None:
+    stale = repo.requeue_stale_jobs(JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS)
+    if stale["requeued"]:
+        logger.warning(f"Requeued {stale['requeued']} job(s) whose worker stopped responding")
+    if stale["failed"]:
+        logger.error(f"Gave up on {stale['failed']} job(s) after {JOB_MAX_ATTEMPTS} attempts")
+
+
+def claim_next(worker: str) -> Optional[Dict[str, Any]]:
+    repo = Repository()
+    try:
+        _requeue_stale(repo)
+        return repo.claim_job(worker, kinds=list(JOB_HANDLERS))
+    finally:
+        repo.session.close()
+
+
+def run_inline(hours: int = 24, top_n: int = 10) -> Dict[str, Any]:
+    """
+    Queue today's edition and run it in this process, for deployments without a
+    worker. A job already running elsewhere is left to it. Returns the job dict
+    (with "coalesced" if this call did not run it).
+    """
+    worker = f"inline:{socket.gethostname()}:{os.getpid()}"
+    repo = Repository()
+    try:
+        # Nothing else sweeps for jobs whose request timed out mid-run
+        _requeue_stale(repo)
+        queued = repo.enqueue_job(DAILY_DIGEST, edition_id(hours, top_n), {"hours": hours, "top_n": top_n})
+        job = repo.claim_job(worker, job_id=queued["id"])
+    finally:
+        repo.session.close()
+    if job is None:
+        return {**queued, "coalesced": True}  # Running elsewhere
+    
+    run_job(job)
+    repo = Repository()
+    try:
+        return {**repo.get_job(job["id"]), "coalesced": False}
+    finally:
+        repo.session.close()
+
+
+def work(once: bool = False, poll_seconds: float = JOB_POLL_SECONDS) -> int:
+    """Claim and run jobs. With once, return when the queue is empty. Returns the number of jobs run."""
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Worker {worker} started")
+    processed = 0
+    while True:
+        try:
+            dispatch_outbox()
+        except Exception as e:
+            logger.error(f"Outbox dispatch failed: {e}", exc_info=True)
+        
+        job = claim_next(worker)
+        if job:
+            run_job(job)
+            processed += 1
+            continue
+        if once:
+            logger.info(f"Queue empty, {processed} job(s) run")
+            return processed
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run queued background jobs")
+    parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+    args = parser.parse_args()
+    work(once=args.once)
@@ -0,0 +1,76 @@
+"""The agents' deterministic pre- and post-processing: digest batching, curator re-ranking and email rendering"""
+import random
+
+ARTICLE_TYPES = ["openai", "anthropic", "google", "meta", "mistral", "huggingface",
+                 "huggingface_papers", "techcrunch", "mittr", "venturebeat", "youtube"]
+
+
+def _rankings(count: int):
+    from app.agent.curator_agent import RankedArticle
+
+    rng = random.Random(7)
+    return [
+        RankedArticle(
+            digest_id=f"{rng.choice(ARTICLE_TYPES)}:article-{i}",
+            relevance_score=round(rng.uniform(2.0, 9.5), 1),
+            rank=i + 1,
+            reasoning="Technical depth with benchmark results and released code.",
+        )
+        for i in range(count)
+    ]
+
+
+def test_pack_digest_batches(benchmark):
+    from app.agent.digest_agent import pack_batches
+
+    benchmark.group = "agents"
+    rng = random.Random(5)
+    articles = [
+        {"type": rng.choice(ARTICLE_TYPES), "id": f"article-{i}", "title": f"Article {i}: a new model release",
+         "content": "Paragraph about the release, its benchmarks and what changed. " * rng.randint(5, 200)}
+        for i in range(200)
+    ]
+    batches = benchmark(pack_batches, articles, 20000, 8)
+    assert [a["id"] for batch in batches for a in batch] == [a["id"] for a in articles]
+    assert all(1 <= len(batch) <= 8 for batch in batches)
+
+
+def test_curator_post_process(benchmark):
+    from app.agent.curator_agent import post_process_rankings
+
+    benchmark.group = "agents"
+    # Post-processing adjusts scores in place, so each round gets a fresh LLM response
+    ranked = benchmark.pedantic(
+        post_process_rankings, setup=lambda: ((_rankings(200),), {}), rounds=50, warmup_rounds=2,
+    )
+    assert [a.rank for a in ranked] == list(range(1, 201))
+
+
+def test_digest_to_html(benchmark):
+    from app.agent.email_agent import EmailDigestResponse, EmailIntroduction, RankedArticleDetail
+    from app.services.process_email import digest_to_html
+
+    benchmark.group = "agents"
+    rng = random.Random(11)
+    articles = [
+        RankedArticleDetail(
+            digest_id=f"{article_type}:article-{i}",
+            rank=i + 1,
+            relevance_score=round(rng.uniform(6.0, 10.0), 1),
+            title=f"Article {i}: new model release & <benchmark> results",
+            summary="A summary of the article covering what changed, why it matters and the numbers. " * 4,
+            url=f"https://example.com/{article_type}/{i}",
+            article_type=article_type,
+            also_covered_by=[{"url": f"https://example.com/other/{i}", "article_type": "techcrunch"}] if i % 3 == 0 else [],
+        )
+        for i, article_type in enumerate(rng.choice(ARTICLE_TYPES) for _ in range(10))
+    ]
+    digest = EmailDigestResponse(
+        introduction=EmailIntroduction(greeting="Hey Alex, here is your AI digest for January 15, 2026.",
+                                       introduction="Today's picks cover new model releases and research."),
+        articles=articles,
+        total_ranked=200,
+        top_n=10,
+    )
+    html = benchmark(digest_to_html, digest)
+    assert html.count('class="article"') == 10
@@ -0,0 +1,34 @@
+"""HTML to markdown conversion of stored article pages, and compressing the markdown for digest prompts"""
+import pytest
+
+
+@pytest.mark.parametrize("page", ["short", "long"])
+def test_convert_html(benchmark, offline_http, page):
+    from app.utils.markdown_converter import MarkdownConverter
+
+    benchmark.group = "markdown"
+    html = offline_http.page(f"https://fixtures.local/articles/{page}")
+    markdown = benchmark(MarkdownConverter().convert_html, html)
+    assert markdown and markdown.startswith("# ")
+
+
+def test_convert_url(benchmark, offline_http):
+    """convert_url end to end, fetch included (served from the fixtures)"""
+    from app.utils.markdown_converter import MarkdownConverter
+
+    benchmark.group = "markdown"
+    markdown = benchmark(MarkdownConverter().convert_url, "https://fixtures.local/articles/long")
+    assert markdown
+
+
+def test_compress_markdown(benchmark, offline_http):
+    """The long page's markdown fitted into a digest prompt budget well under its size"""
+    from app.agent.llm import estimate_tokens
+    from app.utils.compression import compress
+    from app.utils.markdown_converter import MarkdownConverter
+
+    benchmark.group = "markdown"
+    markdown = MarkdownConverter().convert_html(offline_http.page("https://fixtures.local/articles/long"))
+    budget = estimate_tokens(markdown) // 4
+    compressed = benchmark(compress, markdown, budget, markdown.splitlines()[0].lstrip("# "))
+    assert compressed and estimate_tokens(compressed) <= budget
@@ -0,0 +1,84 @@
+"""Repository bulk inserts and the digest backlog query on SQLite"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import clear_tables
+
+ROWS = 500
+
+
+def _feed_rows(source: str, count: int = ROWS):
+    published = datetime(2026, 1, 15, 12, 0)
+    return [
+        {
+            "guid": f"{source}-{i}",
+            "title": f"{source.title()} article {i}",
+            "url": f"https://example.com/{source}/{i}",
+            "published_at": published - timedelta(minutes=i),
+            "description": f"Description of {source} article {i}. " * 8,
+            "category": "AI",
+        }
+        for i in range(count)
+    ]
+
+
+def _video_rows(count: int = ROWS):
+    published = datetime(2026, 1, 15, 12, 0)
+    return [
+        {
+            "video_id": f"video{i:06d}",
+            "title": f"Video {i}",
+            "url": f"https://www.youtube.com/watch?v=video{i:06d}",
+            "channel_id": "UCn8ujwUInbJkBhffxqAPBVQ",
+            "published_at": published - timedelta(minutes=i),
+            "description": f"Description of video {i}. " * 8,
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("source", ["openai", "anthropic", "techcrunch", "youtube"])
+def test_bulk_create(benchmark, repository, source):
+    benchmark.group = "repository"
+    if source == "youtube":
+        method, rows = "bulk_create_youtube_videos", _video_rows()
+    else:
+        method, rows = f"bulk_create_{source}_articles", _feed_rows(source)
+    # Every round starts from empty tables, otherwise rounds after the first only hit the dedupe path
+    inserted = benchmark.pedantic(
+        getattr(repository, method), args=(rows,),
+        setup=lambda: clear_tables(repository), rounds=10, warmup_rounds=1,
+    )
+    assert inserted == len(rows)
+
+
+def test_bulk_create_existing(benchmark, repository):
+    """Re-scraping a feed that is already stored: all rows hit the dedupe lookups"""
+    benchmark.group = "repository"
+    rows = _feed_rows("openai")
+    repository.bulk_create_openai_articles(rows)
+    assert benchmark(repository.bulk_create_openai_articles, rows) == 0
+
+
+def test_get_articles_without_digest(benchmark, repository):
+    from app.database.models import AnthropicArticle, Digest, GoogleArticle, TechCrunchArticle, YouTubeVideo
+
+    benchmark.group = "repository"
+    session = repository.session
+    markdown = "## Heading\n\n" + "Some paragraph of article text. " * 200
+    for model, source in ((AnthropicArticle, "anthropic"), (GoogleArticle, "google"), (TechCrunchArticle, "techcrunch")):
+        session.add_all(model(**{k: v for k, v in row.items() if hasattr(model, k)}, markdown=markdown)
+                        for row in _feed_rows(source))
+    session.add_all(YouTubeVideo(**row, transcript="transcript text " * 300) for row in _video_rows())
+    repository.bulk_create_openai_articles(_feed_rows("openai"))
+    # TechCrunch's backlog is already digested
+    session.add_all(
+        Digest(id=f"techcrunch:techcrunch-{i}", article_type="techcrunch", article_id=f"techcrunch-{i}",
+               url=f"https://example.com/techcrunch/{i}", title=f"Digest {i}", summary="Summary.")
+        for i in range(ROWS)
+    )
+    session.commit()
+
+    articles = benchmark(repository.get_articles_without_digest)
+    assert len(articles) == 4 * ROWS
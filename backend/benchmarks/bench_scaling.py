@@ -0,0 +1,31 @@
+"""
+The history and subscriber paths at a few corpus sizes (see make_corpus.py).
+
+Small enough for every run; scaling.py sweeps much larger sizes and reports
+the growth exponents.
+"""
+import pytest
+
+from make_corpus import SOURCES, generate_corpus
+
+PER_DAY = 5
+
+
+@pytest.mark.parametrize("days", [10, 40])
+def test_get_articles_without_digest_history(benchmark, repository, days):
+    benchmark.group = "scaling: history"
+    generate_corpus(repository.session, articles_per_source=PER_DAY * days, days=days, subscribers=0, verbose=False)
+    articles = benchmark(repository.get_articles_without_digest)
+    # Only the last day is undigested, whatever the history
+    assert 0 < len(articles) <= 2 * PER_DAY * len(SOURCES)
+
+
+@pytest.mark.parametrize("subscribers", [2000, 8000])
+def test_stream_subscribers(benchmark, repository, subscribers):
+    benchmark.group = "scaling: subscribers"
+    generate_corpus(repository.session, articles_per_source=10, days=7, subscribers=subscribers, verbose=False)
+
+    def stream() -> int:
+        return sum(len(page) for page in repository.iter_email_pages())
+
+    assert benchmark(stream) == repository.count_emails()
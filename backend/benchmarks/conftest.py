@@ -0,0 +1,120 @@
+"""
+Shared setup for the offline benchmark suite.
+
+The suite never touches the network or a real database: every http_get the
+scrapers and the markdown converter make is answered from benchmarks/fixtures/
+(built by make_fixtures.py), and the repository runs against a throwaway
+SQLite file.
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+import requests
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Must be set before anything imports app.database.connection
+_db_dir = tempfile.mkdtemp(prefix="aggregator-bench-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+# Scrapers pass hours through to a now - hours cutoff; the fixtures are dated
+# January 2026, so look back far enough to keep every entry
+ALL_HOURS = 24 * 365 * 50
+
+HTTP_CLIENT_MODULES = (
+    "app.scrapers.anthropic",
+    "app.scrapers.google",
+    "app.scrapers.huggingface",
+    "app.scrapers.huggingface_papers",
+    "app.scrapers.meta",
+    "app.scrapers.mistral",
+    "app.scrapers.mittr",
+    "app.scrapers.openai",
+    "app.scrapers.techcrunch",
+    "app.scrapers.venturebeat",
+    "app.scrapers.youtube",
+    "app.utils.markdown_converter",
+)
+
+
+def pytest_collect_file(file_path, parent):
+    # python_files only matches the unit tests: bench_*.py are collected when benchmarks/ is passed explicitly
+    if file_path.suffix == ".py" and file_path.name.startswith("bench_"):
+        return pytest.Module.from_parent(parent, path=file_path)
+
+
+class FixtureHTTP:
+    """Stands in for http_get: serves stored bodies by URL, 404 for anything unrecorded"""
+
+    def __init__(self, directory: Path = FIXTURES_DIR):
+        index_path = directory / "urls.json"
+        if not index_path.exists():
+            pytest.exit("No benchmark fixtures; run python benchmarks/make_fixtures.py first", returncode=2)
+        index = json.loads(index_path.read_text())
+        # Decompressed once up front so the benchmarks time parsing, not gunzip
+        self.bodies = {url: gzip.decompress((directory / name).read_bytes()) for url, name in index.items()}
+        self.misses = []
+
+    def page(self, url: str) -> str:
+        return self.bodies[url].decode("utf-8")
+
+    def get(self, url: str, headers=None, timeout=None, **kwargs) -> requests.Response:
+        response = requests.Response()
+        response.url = url
+        response.encoding = "utf-8"
+        if url in self.bodies:
+            response.status_code = 200
+            response._content = self.bodies[url]
+        else:
+            self.misses.append(url)
+            response.status_code = 404
+            response._content = b""
+        return response
+
+
+@pytest.fixture(scope="session")
+def fixture_http():
+    return FixtureHTTP()
+
+
+@pytest.fixture(autouse=True)
+def offline_http(fixture_http, monkeypatch):
+    import importlib
+
+    for module_name in HTTP_CLIENT_MODULES:
+        monkeypatch.setattr(importlib.import_module(module_name), "http_get", fixture_http.get)
+    return fixture_http
+
+
+def clear_tables(repo) -> None:
+    """Delete every row, children first; the schema (and SQLite's FTS index) stays in place"""
+    from app.database.models import Base
+
+    repo.session.rollback()
+    for table in reversed(Base.metadata.sorted_tables):
+        repo.session.execute(table.delete())
+    repo.session.commit()
+
+
+@pytest.fixture
+def repository():
+    """Repository on an empty SQLite database, emptied again afterwards"""
+    from app.database.connection import get_engine
+    from app.database.models import Base
+    from app.database.repository import Repository
+
+    Base.metadata.create_all(get_engine())
+    repo = Repository()
+    clear_tables(repo)
+    yield repo
+    clear_tables(repo)
+    repo.session.close()
@@ -0,0 +1,108 @@
+"""
+Cold-start budget for the serverless API entry point.
+
+Imports app.api in fresh interpreters with `python -X importtime`, reports the
+median cumulative import time and the slowest modules, and exits non-zero when
+the budget is exceeded or a pipeline-only dependency leaks into the API's
+import graph.
+
+Usage (from backend/):
+    python benchmarks/import_time.py                 # default budget
+    python benchmarks/import_time.py --budget-ms 900 --runs 7
+    IMPORT_TIME_BUDGET_MS=900 python benchmarks/import_time.py
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+ENTRY_MODULE = "app.api"
+DEFAULT_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000"))
+
+# Only the pipeline needs these; importing app.api must not pull them in
+FORBIDDEN_PREFIXES = [
+    "google.genai",
+    "feedparser",
+    "bs4",
+    "html2text",
+    "youtube_transcript_api",
+    "numpy",
+    "scipy",
+    "zstandard",
+    "markdown",
+    "app.agent",
+    "app.scrapers",
+    "app.daily_runner",
+]
+
+
+def measure_once(module: str) -> Tuple[float, Dict[str, float]]:
+    """Cumulative import time (ms) of module, and self time (ms) of every module imported"""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("DATABASE_URL", "sqlite://")  # No connection is made at import
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    total_ms = 0.0
+    self_times: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[0].strip().isdigit():
+            continue  # Header line
+        name = parts[2].strip()
+        self_times[name] = int(parts[0]) / 1000
+        if name == module:
+            total_ms = int(parts[1]) / 1000
+    return total_ms, self_times
+
+
+def run(module: str = ENTRY_MODULE, budget_ms: float = DEFAULT_BUDGET_MS, runs: int = 5, top: int = 10) -> bool:
+    totals: List[float] = []
+    self_times: Dict[str, float] = {}
+    for _ in range(runs):
+        total_ms, times = measure_once(module)
+        totals.append(total_ms)
+        self_times = times
+
+    median = statistics.median(totals)
+    leaked = sorted(
+        name for name in self_times
+        if any(name == prefix or name.startswith(prefix + ".") for prefix in FORBIDDEN_PREFIXES)
+    )
+
+    print(f"\n=== Import time: {module} ({runs} runs) ===")
+    print(f"Median: {median:.0f}ms (min {min(totals):.0f}ms, max {max(totals):.0f}ms), budget {budget_ms:.0f}ms")
+    print(f"\nSlowest modules (self time, last run):")
+    for name, ms in sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"  {ms:8.1f}ms  {name}")
+
+    ok = True
+    if leaked:
+        ok = False
+        print(f"\n✗ Pipeline-only modules imported by {module}: {', '.join(leaked[:20])}")
+    if median > budget_ms:
+        ok = False
+        print(f"\n✗ Import time {median:.0f}ms exceeds the {budget_ms:.0f}ms budget")
+    if ok:
+        print(f"\n✓ Within budget")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the API cold-start import budget")
+    parser.add_argument("--module", default=ENTRY_MODULE)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.module, args.budget_ms, args.runs) else 1)
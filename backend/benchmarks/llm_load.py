@@ -0,0 +1,102 @@
+"""
+Load test for the LLM client against the local fake backend.
+
+Runs --calls digest generations on --workers threads through DigestAgent and
+LLMClient, against a FakeBackend with the given latency, quotas and malformed
+rate. Reports throughput, how many digests came back, and the client's
+rate-limit waits, 429s, retries and backoff. No network or API key is needed.
+
+With --batch N each worker digests N articles at a time the way the pipeline
+does (iter_digests: batched requests, then retries of the missing entries), so
+--calls is then a number of articles rather than of requests.
+
+Usage (from backend/):
+    python benchmarks/llm_load.py
+    python benchmarks/llm_load.py --calls 200 --workers 8 --rpm 60 --malformed-rate 0.05
+    python benchmarks/llm_load.py --min-interval 6.5 --rpm 15     # production spacing
+    python benchmarks/llm_load.py --min-interval 6.5 --rpm 15 --batch 8
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ["LLM_BACKEND"] = "fake"
+
+
+def run(calls: int, workers: int, backend, min_interval: float, base_delay: float, batch: int = 1) -> dict:
+    import threading
+
+    from app.agent.digest_agent import DigestAgent
+    from app.agent.llm import LLMClient, reset_usage, usage_totals
+    from app.services.process_digest import iter_digests
+
+    reset_usage()
+    local = threading.local()
+
+    def agent() -> DigestAgent:
+        # One agent per worker thread, as the pipeline has one per stage
+        if not hasattr(local, "agent"):
+            local.agent = DigestAgent()
+            local.agent.llm = LLMClient("digest", min_request_interval=min_interval,
+                                        base_delay=base_delay, backend=backend)
+        return local.agent
+
+    def article(i: int) -> dict:
+        content = " ".join(f"Sentence {j} about model release {i} with benchmark results." for j in range(40))
+        return {"type": "openai", "id": f"load-{i}", "title": f"Article {i}", "content": content}
+
+    def digest(first: int) -> int:
+        if batch <= 1:
+            a = article(first)
+            return int(agent().generate_digest(a["title"], a["content"], a["type"]) is not None)
+        articles = [article(i) for i in range(first, min(first + batch, calls))]
+        return sum(1 for _, result in iter_digests(agent(), articles) if result is not None)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(digest, range(0, calls, max(1, batch))))
+    elapsed = time.perf_counter() - started
+    usage = next((u for u in usage_totals() if u["agent"] == "digest"), {})
+    return {"elapsed": elapsed, "ok": sum(results), "usage": usage}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test LLMClient against the fake backend")
+    parser.add_argument("--calls", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--rpm", type=int, default=120, help="Requests per minute quota (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=0, help="Tokens per minute quota (0 = unlimited)")
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--min-interval", type=float, default=0.0, help="Client-side spacing per agent (s)")
+    parser.add_argument("--base-delay", type=float, default=1.0, help="Retry backoff base when no retryDelay (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch", type=int, default=1, help="Articles per digest request (1 = one request each)")
+    args = parser.parse_args()
+    os.environ["DIGEST_BATCH_MAX_ARTICLES"] = str(max(1, args.batch))
+
+    from app.agent.fake_llm import FakeBackend
+
+    backend = FakeBackend(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rpm=args.rpm, tpm=args.tpm,
+                          malformed_rate=args.malformed_rate, seed=args.seed)
+    print(f"{args.calls} digests ({args.batch} per request) on {args.workers} workers; fake backend {args.latency_ms:.0f}±{args.jitter_ms:.0f}ms, "
+          f"rpm={args.rpm or '∞'}, tpm={args.tpm or '∞'}, malformed={args.malformed_rate:.0%}\n")
+    result = run(args.calls, args.workers, backend, args.min_interval, args.base_delay, args.batch)
+    usage = result["usage"]
+
+    print(f"\n{'=' * 60}")
+    print(f"Wall time:        {result['elapsed']:.1f}s")
+    print(f"Digests:          {result['ok']}/{args.calls} ({result['ok'] / result['elapsed']:.2f}/s)")
+    print(f"Calls:            {usage.get('calls', 0)} ({usage.get('failed', 0)} failed, "
+          f"{usage.get('rate_limited', 0)} rate limited, {usage.get('retries', 0)} retried)")
+    print(f"Malformed:        {backend.stats['malformed']}")
+    print(f"In calls:         {usage.get('call_seconds', 0):.1f}s")
+    print(f"Throttled:        {usage.get('throttle_seconds', 0):.1f}s")
+    print(f"Backing off:      {usage.get('backoff_seconds', 0):.1f}s")
+    print(f"Tokens:           {usage.get('prompt_tokens', 0):,} in / {usage.get('output_tokens', 0):,} out")
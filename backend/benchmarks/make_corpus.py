@@ -0,0 +1,254 @@
+"""
+Fill a database with a synthetic corpus at production-and-beyond volumes.
+
+A real day brings about 50 articles and a handful of subscribers, which hides
+anything that grows with the stored history or the subscriber list. This
+generator bulk-inserts, deterministically from --seed:
+
+- --articles rows per source (all eleven), published evenly over --days. Articles
+  have markdown and videos have transcripts, with a few left for enrichment.
+  A few videos are marked as having no transcript.
+- Digests for everything older than --backlog-hours. A --duplicate-rate fraction
+  of those articles is recorded as a near-duplicate of an earlier digest
+  instead. Newer articles are the undigested backlog.
+- --subscribers recipients. Most are active, and --profile-rate of them have
+  2-5 interests drawn from the defaults.
+
+Text comes from a pool of paragraphs built from the make_fixtures.py vocabulary,
+so generation time is spent inserting, not composing. Rows go in with
+executemany, --chunk-size at a time. The search index is not filled; run
+python -m app.database.build_search_index afterwards if you need it.
+
+The target is a SQLite file under .corpus/ unless --database says otherwise.
+Anything else needs --yes, since the rows are mixed in with the real data.
+
+Usage (from backend/):
+    python benchmarks/make_corpus.py
+    python benchmarks/make_corpus.py --articles 20000 --days 365 --subscribers 1000000
+    python benchmarks/make_corpus.py --database postgresql://... --yes --reset
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.make_fixtures import _paragraph, _title  # noqa: E402
+
+DEFAULT_DATABASE = f"sqlite:///{BACKEND_DIR / '.corpus' / 'corpus.db'}"
+
+# article type -> (table, key column, content column, extra columns)
+SOURCES = {
+    "youtube": ("youtube_videos", "video_id", "transcript", {"channel_id": "UCsynthetic0000000000000"}),
+    "openai": ("openai_articles", "guid", None, {"category": "Research"}),
+    "anthropic": ("anthropic_articles", "guid", "markdown", {"category": "News"}),
+    "google": ("google_articles", "guid", "markdown", {"category": "AI"}),
+    "meta": ("meta_articles", "guid", "markdown", {"category": "Research"}),
+    "mistral": ("mistral_articles", "guid", "markdown", {"category": "News"}),
+    "huggingface": ("huggingface_articles", "guid", "markdown", {"category": "Blog"}),
+    "huggingface_papers": ("huggingface_papers", "guid", "markdown", {"upvotes": "42"}),
+    "techcrunch": ("techcrunch_articles", "guid", "markdown", {"category": "AI"}),
+    "mittr": ("mittr_articles", "guid", "markdown", {"category": "Artificial intelligence"}),
+    "venturebeat": ("venturebeat_articles", "guid", "markdown", {"category": "AI"}),
+}
+
+PARAGRAPHS = 400
+UNENRICHED_RATE = 0.05  # Articles still waiting for markdown or a transcript
+UNAVAILABLE_RATE = 0.05  # Videos with no transcript to fetch
+ACTIVE_RATE = 0.95
+
+
+def _text_pool(rng: random.Random) -> List[str]:
+    return [_paragraph(rng, rng.randint(3, 7)) for _ in range(PARAGRAPHS)]
+
+
+def _write(session, tables, rows: Iterator[Tuple[str, dict]], chunk_size: int, counts: Counter) -> None:
+    """Insert (table name, row) pairs with executemany, chunk_size rows per table at a time"""
+    from sqlalchemy import insert
+
+    buffers = defaultdict(list)
+
+    def flush(name: str) -> None:
+        session.execute(insert(tables[name]), buffers[name])
+        session.commit()
+        counts[name] += len(buffers[name])
+        buffers[name] = []
+
+    for name, row in rows:
+        buffers[name].append(row)
+        if len(buffers[name]) >= chunk_size:
+            flush(name)
+    for name in list(buffers):
+        if buffers[name]:
+            flush(name)
+
+
+def _source_rows(rng: random.Random, source: str, count: int, now: datetime, days: float, pool: List[str],
+                 recent_digests: deque, backlog_hours: float,
+                 duplicate_rate: float) -> Iterator[Tuple[str, dict]]:
+    """Article rows for one source, oldest first, with their digests and near-duplicates"""
+    table, key, content, extra = SOURCES[source]
+    span = timedelta(days=days)
+    backlog = now - timedelta(hours=backlog_hours)
+    for i in range(count):
+        article_id = f"{source}-{i:07d}"
+        # Spread evenly over the history, oldest first, with some jitter
+        published = now - span + span * ((i + rng.random()) / count)
+        title = _title(rng)
+        url = f"https://{source}.example.com/{article_id}"
+        body = "\n\n".join(rng.sample(pool, rng.randint(3, 8)))
+        row = {key: article_id, "title": title, "url": url, "published_at": published,
+               "description": pool[rng.randrange(PARAGRAPHS)][:300], "created_at": published, **extra}
+        digestible = True
+        if content:
+            roll = rng.random()
+            if source == "youtube" and roll < UNAVAILABLE_RATE:
+                row[content] = "__UNAVAILABLE__"
+            elif roll < UNAVAILABLE_RATE + UNENRICHED_RATE:
+                row[content] = None
+            else:
+                row[content] = f"# {title}\n\n{body}"
+            digestible = row[content] not in (None, "__UNAVAILABLE__")
+        yield table, row
+
+        if not digestible or published >= backlog:
+            continue
+        if recent_digests and rng.random() < duplicate_rate:
+            yield "digest_duplicates", {
+                "id": f"{source}:{article_id}", "digest_id": rng.choice(recent_digests), "article_type": source,
+                "article_id": article_id, "url": url, "title": title,
+                "similarity": round(rng.uniform(0.8, 0.98), 3), "created_at": published,
+            }
+        else:
+            recent_digests.append(f"{source}:{article_id}")
+            yield "digests", {
+                "id": f"{source}:{article_id}", "article_type": source, "article_id": article_id,
+                "url": url, "title": title, "summary": " ".join(body.split()[:60]) + ".",
+                "created_at": published + timedelta(hours=rng.uniform(0, 6)),
+            }
+
+
+def _subscriber_rows(rng: random.Random, count: int, now: datetime, days: float,
+                     profile_rate: float) -> Iterator[Tuple[str, dict]]:
+    from app.profiles.user_profile import DEFAULT_INTERESTS
+
+    for i in range(count):
+        email_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        yield "emails", {
+            "id": email_id,
+            "email": f"reader{i:07d}@corpus.example.com",
+            "name": f"Reader {i}",
+            "is_active": "true" if rng.random() < ACTIVE_RATE else "false",
+            "created_at": now - timedelta(days=rng.uniform(0, days)),
+        }
+        if rng.random() < profile_rate:
+            interests = rng.sample(DEFAULT_INTERESTS, rng.randint(2, 5))
+            yield "subscriber_profiles", {"email_id": email_id, "interests": json.dumps(interests), "updated_at": now}
+
+
+def generate_corpus(session, articles_per_source: int = 1000, days: float = 90, subscribers: int = 10_000,
+                    sources: Optional[List[str]] = None, backlog_hours: float = 24, duplicate_rate: float = 0.1,
+                    profile_rate: float = 0.75, seed: int = 0, chunk_size: int = 5000,
+                    now: Optional[datetime] = None, verbose: bool = True) -> Dict[str, int]:
+    """Insert the synthetic corpus through session; returns rows inserted per table"""
+    from app.database.models import Base
+
+    tables = Base.metadata.tables
+    rng = random.Random(seed)
+    now = now or datetime.now(timezone.utc).replace(microsecond=0)
+    pool = _text_pool(rng)
+    counts = Counter()
+    recent_digests = deque(maxlen=50)  # Near-duplicates point at a story from around the same time
+
+    def write(label: str, rows: Iterator[Tuple[str, dict]]) -> None:
+        before, started = counts.copy(), time.perf_counter()
+        _write(session, tables, rows, chunk_size, counts)
+        if verbose:
+            added = sorted(((counts[name] - before[name], name) for name in counts if counts[name] > before[name]),
+                           reverse=True)
+            added = ", ".join(f"{count:,} {name}" for count, name in added)
+            print(f"  {label:<20} {added or 'nothing'} in {time.perf_counter() - started:.1f}s")
+
+    for source in sources or list(SOURCES):
+        write(source, _source_rows(rng, source, articles_per_source, now, days, pool, recent_digests,
+                                   backlog_hours, duplicate_rate))
+    write("subscribers", _subscriber_rows(rng, subscribers, now, days, profile_rate))
+    return dict(counts)
+
+
+def reset_corpus_tables(session) -> None:
+    """Empty every table the generator fills (and the search index, which would point at them)"""
+    from app.database.models import Base
+
+    tables = Base.metadata.tables
+    names = [name for name, _, _, _ in SOURCES.values()]
+    names += ["digests", "digest_duplicates", "subscriber_profiles", "emails", "search_documents"]
+    for name in names:
+        session.execute(tables[name].delete())
+    session.commit()
+
+
+def open_session(database_url: str):
+    """Session on database_url, with the tables created; the caller closes it"""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.database.connection import get_engine_options
+    from app.database.models import Base
+
+    if database_url.startswith("sqlite:///"):
+        Path(database_url[len("sqlite:///"):]).parent.mkdir(parents=True, exist_ok=True)
+    engine = create_engine(database_url, **get_engine_options(database_url))
+    Base.metadata.create_all(engine)
+    return Session(engine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill a database with a synthetic corpus and subscriber base")
+    parser.add_argument("--database", default=DEFAULT_DATABASE, help="SQLAlchemy URL (default: .corpus/corpus.db)")
+    parser.add_argument("--articles", type=int, default=1000, help="Articles per source")
+    parser.add_argument("--days", type=float, default=90, help="History the articles and digests span")
+    parser.add_argument("--subscribers", type=int, default=10_000)
+    parser.add_argument("--sources", help=f"Comma-separated subset of: {', '.join(SOURCES)}")
+    parser.add_argument("--backlog-hours", type=float, default=24, help="Newer articles are left undigested")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--profile-rate", type=float, default=0.75, help="Share of subscribers with interests")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--reset", action="store_true", help="Empty the corpus tables first")
+    parser.add_argument("--yes", action="store_true", help="Allow a database other than SQLite")
+    args = parser.parse_args()
+
+    if not args.database.startswith("sqlite") and not args.yes:
+        sys.exit("Refusing to write a synthetic corpus into a non-SQLite database without --yes")
+    sources = [s.strip() for s in args.sources.split(",")] if args.sources else None
+    unknown = set(sources or []) - set(SOURCES)
+    if unknown:
+        sys.exit(f"Unknown sources: {', '.join(sorted(unknown))}")
+
+    from sqlalchemy.exc import IntegrityError
+
+    session = open_session(args.database)
+    started = time.perf_counter()
+    try:
+        if args.reset:
+            reset_corpus_tables(session)
+        print(f"Generating into {session.get_bind().url.render_as_string(hide_password=True)}")
+        counts = generate_corpus(
+            session, articles_per_source=args.articles, days=args.days, subscribers=args.subscribers,
+            sources=sources, backlog_hours=args.backlog_hours, duplicate_rate=args.duplicate_rate,
+            profile_rate=args.profile_rate, seed=args.seed, chunk_size=args.chunk_size,
+        )
+    except IntegrityError:
+        sys.exit("The database already holds corpus rows; pass --reset (or use an empty database)")
+    finally:
+        session.close()
+    print(f"\nInserted {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s")
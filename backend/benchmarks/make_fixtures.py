@@ -0,0 +1,298 @@
+"""
+Build the stored HTTP fixtures the benchmark suite runs against.
+
+Every URL the scrapers fetch (feeds, listing pages, paper pages) plus a few
+article pages for the markdown converter is written gzipped to
+benchmarks/fixtures/, with urls.json mapping each URL to its file.
+
+By default the content is synthetic and deterministic (seeded), sized like the
+real sources: the same command always produces the same fixtures, so timings
+stay comparable across machines and commits. --live records the real responses
+instead (needs network; paper pages linked from a live listing are not
+recorded, so those descriptions come back empty).
+
+Usage (from backend/):
+    python benchmarks/make_fixtures.py
+    python benchmarks/make_fixtures.py --live
+"""
+import argparse
+import gzip
+import json
+import random
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from html import escape
+from pathlib import Path
+from typing import Dict, List
+from urllib.parse import urlparse
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+FEED_ENTRIES = 30
+LISTING_ENTRIES = 20
+NEWEST = datetime(2026, 1, 15, 12, 0, tzinfo=timezone.utc)
+
+WORDS = (
+    "model training inference agents reasoning benchmark open weights fine-tuning retrieval "
+    "multimodal vision language transformer attention context window latency throughput GPU "
+    "cluster safety alignment evaluation dataset tokens parameters distillation quantization "
+    "sparse mixture experts robotics policy reinforcement learning reward deployment API "
+    "developers enterprise research paper results accuracy scaling compute efficient release"
+).split()
+
+
+def _sentence(rng: random.Random, words: int, vocabulary: List[str] = WORDS) -> str:
+    text = " ".join(rng.choice(vocabulary) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def _paragraph(rng: random.Random, sentences: int, vocabulary: List[str] = WORDS) -> str:
+    return " ".join(_sentence(rng, rng.randint(8, 20), vocabulary) for _ in range(sentences))
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 9))).title()
+
+
+def _slug(title: str, index: int) -> str:
+    return f"{'-'.join(title.lower().split()[:5])}-{index}"
+
+
+def rss_feed(rng: random.Random, base_url: str, entries: int = FEED_ENTRIES, newest: datetime = NEWEST) -> str:
+    items = []
+    for i in range(entries):
+        title = _title(rng)
+        link = f"{base_url.rstrip('/')}/{_slug(title, i)}"
+        published = format_datetime(newest - timedelta(hours=7 * i))
+        items.append(f"""    <item>
+      <title>{escape(title)}</title>
+      <link>{link}</link>
+      <guid isPermaLink="false">{link}</guid>
+      <pubDate>{published}</pubDate>
+      <category>{escape(rng.choice(WORDS).title())}</category>
+      <description>{escape("<p>" + _paragraph(rng, 3) + "</p>")}</description>
+    </item>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0">
+  <channel>
+    <title>Fixture feed</title>
+    <link>{base_url}</link>
+    <description>Synthetic feed for benchmarks</description>
+{chr(10).join(items)}
+  </channel>
+</rss>
+"""
+
+
+def youtube_feed(rng: random.Random, channel_id: str, entries: int = 15, newest: datetime = NEWEST) -> str:
+    items = []
+    for i in range(entries):
+        video_id = "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-") for _ in range(11))
+        path = f"shorts/{video_id}" if i % 5 == 4 else f"watch?v={video_id}"
+        published = (newest - timedelta(hours=11 * i)).isoformat()
+        items.append(f"""  <entry>
+    <id>yt:video:{video_id}</id>
+    <yt:videoId>{video_id}</yt:videoId>
+    <title>{escape(_title(rng))}</title>
+    <link rel="alternate" href="https://www.youtube.com/{path}"/>
+    <published>{published}</published>
+    <media:group>
+      <media:description>{escape(_paragraph(rng, 4))}</media:description>
+    </media:group>
+  </entry>""")
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+  <id>yt:channel:{channel_id}</id>
+  <title>Fixture channel</title>
+{chr(10).join(items)}
+</feed>
+"""
+
+
+def listing_page(rng: random.Random, path_prefix: str, entries: int = LISTING_ENTRIES,
+                 newest: datetime = NEWEST) -> str:
+    """Blog / news index with one <article> card per post (Meta, Mistral)"""
+    cards = []
+    for i in range(entries):
+        title = _title(rng)
+        published = (newest - timedelta(days=i)).isoformat().replace("+00:00", "Z")
+        cards.append(f"""      <article class="post-card">
+        <a href="{path_prefix}{_slug(title, i)}/"><h3>{escape(title)}</h3></a>
+        <p>{escape(_paragraph(rng, 2))}</p>
+        <time datetime="{published}">{published[:10]}</time>
+      </article>""")
+    return _page("Blog", "\n".join(cards), rng)
+
+
+def papers_page(rng: random.Random, paper_ids: List[str]) -> str:
+    cards = [
+        f"""      <article>
+        <h3>{escape(_title(rng))}</h3>
+        <a href="/papers/{paper_id}">View paper</a>
+        <div class="upvotes">{rng.randint(5, 400)}</div>
+      </article>"""
+        for paper_id in paper_ids
+    ]
+    return _page("Daily Papers", "\n".join(cards), rng)
+
+
+def paper_page(rng: random.Random) -> str:
+    body = f"""      <h1>{escape(_title(rng))}</h1>
+      <p>Join the discussion on this paper page</p>
+      <h2>Abstract</h2>
+      <p>{escape(_paragraph(rng, 7))}</p>"""
+    return _page("Paper", body, rng)
+
+
+def article_page(rng: random.Random, sections: int, vocabulary: List[str] = WORDS) -> str:
+    """Long-form post with the markup the converter has to handle: headings, lists, code, tables, images"""
+    parts = [f"      <h1>{escape(_title(rng))}</h1>"]
+    for s in range(sections):
+        parts.append(f"      <h2>{escape(_title(rng))}</h2>")
+        parts.extend(f"      <p>{escape(_paragraph(rng, rng.randint(3, 6), vocabulary))} "
+                     f"<a href=\"https://example.com/ref/{s}\">reference</a></p>" for _ in range(3))
+        parts.append("      <ul>" + "".join(f"<li>{escape(_sentence(rng, 9, vocabulary))}</li>" for _ in range(4)) + "</ul>")
+        if s % 2 == 0:
+            parts.append("      <pre><code>" + escape("\n".join(
+                f"result_{i} = model.generate(prompt_{i}, max_tokens={64 * (i + 1)})" for i in range(6)
+            )) + "</code></pre>")
+        if s % 3 == 0:
+            rows = "".join(f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.uniform(0, 100):.1f}</td></tr>" for _ in range(6))
+            parts.append(f"      <table><tr><th>Benchmark</th><th>Score</th></tr>{rows}</table>")
+            parts.append(f"      <img src=\"https://example.com/figure-{s}.png\" alt=\"Figure {s}\">")
+    return _page("Article", "\n".join(parts), rng, wrap_article=True)
+
+
+def _page(title: str, body: str, rng: random.Random, wrap_article: bool = False) -> str:
+    nav = "".join(f'<a href="/{w}">{w.title()}</a>' for w in rng.sample(WORDS, 12))
+    content = f"    <article>\n{body}\n    </article>" if wrap_article else f"    <main>\n{body}\n    </main>"
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+  <title>{title}</title>
+  <style>body {{ font-family: sans-serif; }} .post-card {{ margin: 1em; }}</style>
+  <script>window.analytics = {{ track: function () {{}} }};</script>
+</head>
+<body>
+  <header><nav>{nav}</nav></header>
+{content}
+  <footer><p>{escape(_sentence(rng, 12))}</p></footer>
+  <script>console.log("loaded");</script>
+</body>
+</html>
+"""
+
+
+def linked_articles(rng: random.Random, fixtures: Dict[str, str]) -> Dict[str, str]:
+    """An article page for every post the feeds and listings link to, for the enrichment stages"""
+    urls = set()
+    for url, body in fixtures.items():
+        urls.update(re.findall(r"<link>(https?://[^<]+)</link>", body))
+        site = "{0.scheme}://{0.netloc}".format(urlparse(url))
+        urls.update(site + path for path in re.findall(r'href="(/(?:blog|news)/[^"]+)"', body))
+    pages = {}
+    for url in sorted(urls - fixtures.keys()):
+        # Each story gets words of its own, otherwise near-duplicate detection folds them together
+        topic = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9))) for _ in range(60)]
+        pages[url] = article_page(rng, sections=rng.randint(3, 8), vocabulary=WORDS + topic)
+    return pages
+
+
+def synthetic_fixtures(newest: datetime = NEWEST, with_articles: bool = False) -> Dict[str, str]:
+    """
+    URL → body for every request the benchmarks make. with_articles adds the
+    pages the feeds link to, so a whole pipeline run can be served (the sandbox).
+    """
+    from app.config import YOUTUBE_CHANNELS
+    from app.scrapers.anthropic import AnthropicScraper
+    from app.scrapers.google import GoogleScraper
+    from app.scrapers.huggingface import HuggingFaceScraper
+    from app.scrapers.huggingface_papers import HuggingFacePapersScraper
+    from app.scrapers.meta import MetaScraper
+    from app.scrapers.mistral import MistralScraper
+    from app.scrapers.mittr import MITTRScraper
+    from app.scrapers.openai import OpenAIScraper
+    from app.scrapers.techcrunch import TechCrunchScraper
+    from app.scrapers.venturebeat import VentureBeatScraper
+    from app.scrapers.youtube import YouTubeScraper
+
+    rng = random.Random(42)
+    fixtures: Dict[str, str] = {}
+    feed_urls = (
+        [OpenAIScraper().rss_url, HuggingFaceScraper().rss_url, TechCrunchScraper().rss_url,
+         MITTRScraper().rss_url, VentureBeatScraper().rss_url]
+        + AnthropicScraper().rss_urls + GoogleScraper().rss_urls
+    )
+    for url in feed_urls:
+        fixtures[url] = rss_feed(rng, url.rsplit("/feed", 1)[0], newest=newest)
+    youtube = YouTubeScraper()
+    for channel_id in YOUTUBE_CHANNELS:
+        fixtures[youtube._get_rss_url(channel_id)] = youtube_feed(rng, channel_id, newest=newest)
+
+    fixtures[MetaScraper().blog_url] = listing_page(rng, "/blog/", newest=newest)
+    fixtures[MistralScraper().news_url] = listing_page(rng, "/news/", newest=newest)
+
+    papers = HuggingFacePapersScraper()
+    paper_ids = [f"2601.{10000 + i}" for i in range(LISTING_ENTRIES)]
+    fixtures[papers.base_url] = papers_page(rng, paper_ids)
+    for paper_id in paper_ids:
+        fixtures[f"https://huggingface.co/papers/{paper_id}"] = paper_page(rng)
+
+    # Pages for the markdown converter, short and long
+    fixtures["https://fixtures.local/articles/short"] = article_page(rng, sections=3)
+    fixtures["https://fixtures.local/articles/long"] = article_page(rng, sections=24)
+    if with_articles:
+        fixtures.update(linked_articles(rng, fixtures))
+    return fixtures
+
+
+def live_fixtures(urls: List[str]) -> Dict[str, str]:
+    import requests
+
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+    fixtures = {}
+    for url in urls:
+        try:
+            response = requests.get(url, headers=headers, timeout=20)
+            response.raise_for_status()
+            fixtures[url] = response.text
+            print(f"  recorded {url} ({len(response.content):,} bytes)")
+        except Exception as e:
+            print(f"  skipped {url}: {e}")
+    return fixtures
+
+
+def _filename(index: int, url: str) -> str:
+    stem = "".join(c if c.isalnum() else "_" for c in url.split("://", 1)[-1]).strip("_")[:60]
+    return f"{index:02d}_{stem}.gz"
+
+
+def write_fixtures(fixtures: Dict[str, str], directory: Path = FIXTURES_DIR) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for old in directory.glob("*.gz"):
+        old.unlink()
+    index = {}
+    for i, (url, body) in enumerate(sorted(fixtures.items())):
+        name = _filename(i, url)
+        # mtime=0 keeps the files byte-identical across runs
+        (directory / name).write_bytes(gzip.compress(body.encode("utf-8"), mtime=0))
+        index[url] = name
+    (directory / "urls.json").write_text(json.dumps(index, indent=2) + "\n")
+    total = sum((directory / name).stat().st_size for name in index.values())
+    print(f"Wrote {len(index)} fixtures to {directory} ({total / 1024:.0f} KiB gzipped)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the benchmark HTTP fixtures")
+    parser.add_argument("--live", action="store_true", help="Record the real responses instead of synthetic ones")
+    args = parser.parse_args()
+
+    fixtures = synthetic_fixtures()
+    if args.live:
+        fixtures = live_fixtures(list(fixtures))
+    write_fixtures(fixtures)
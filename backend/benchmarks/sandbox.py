@@ -0,0 +1,244 @@
+"""
+End-to-end offline sandbox for the daily pipeline.
+
+One command runs the complete pipeline (scrape → enrich → digest → rank →
+render → send → maintenance) with every external service swapped for a local
+stand-in:
+
+- Database: a fresh SQLite file, seeded with --subscribers subscribers.
+- HTTP: HTTP_MODE=replay over a cassette store built from the synthetic site in
+  make_fixtures.py. The store holds every feed, listing, paper and article page,
+  dated relative to now. --cassettes replays a store you recorded instead
+  (HTTP_MODE=record).
+- LLM: LLM_BACKEND=fake, with no client-side spacing unless asked.
+- SMTP: an aiosmtpd sink on localhost, which keeps every message in the mailbox directory.
+
+It then writes a timing and throughput report: wall time, the stage table,
+items/digests/emails per second, LLM usage and the sink's counts. That makes
+it the macro-benchmark to run before and after a performance change. Everything
+lives in --workdir (default .sandbox/), which is wiped first.
+
+YouTube transcripts are not in the synthetic site, so videos are scraped but
+not digested (unless the cassettes you replay have them).
+
+Usage (from backend/):
+    python benchmarks/sandbox.py
+    python benchmarks/sandbox.py --subscribers 200 --llm-latency-ms 300 --llm-rpm 60
+    python benchmarks/sandbox.py --cassettes cassettes --hours 48
+    python benchmarks/sandbox.py --profile      # per-stage profiles in .sandbox/profiles/
+"""
+import argparse
+import base64
+import json
+import os
+import random
+import shutil
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+class SinkHandler:
+    """aiosmtpd handler that accepts everything and keeps it in a mailbox directory"""
+
+    def __init__(self, mailbox: Path):
+        self.mailbox = mailbox
+        self.messages = 0
+        self.recipients = 0
+        self.bytes = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        self.recipients += len(envelope.rcpt_tos)
+        self.bytes += len(envelope.content)
+        (self.mailbox / f"{self.messages:05d}.eml").write_bytes(envelope.content)
+        return "250 Message accepted for delivery"
+
+    def stats(self) -> dict:
+        return {"messages": self.messages, "recipients": self.recipients, "bytes": self.bytes}
+
+
+def start_smtp_sink(mailbox: Path):
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("The sandbox needs aiosmtpd for its SMTP sink: pip install aiosmtpd (or pip install -e \".[dev]\")")
+
+    mailbox.mkdir(parents=True)
+    handler = SinkHandler(mailbox)
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    return controller, handler
+
+
+def configure_environment(workdir: Path, cassettes: Path, smtp_port: int, args) -> None:
+    """Point every external service at its stand-in. Must run before any app module is imported."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir / 'sandbox.db'}",
+        "HTTP_MODE": "replay",
+        "HTTP_CASSETTE_DIR": str(cassettes),
+        "LLM_BACKEND": "fake",
+        "SMTP_HOST": "127.0.0.1",
+        "SMTP_PORT": str(smtp_port),
+        "SMTP_STARTTLS": "false",
+        "SMTP_AUTH": "false",
+        "MY_EMAIL": "digest@sandbox.local",
+        "APP_PASSWORD": "sandbox",
+        "METRICS_REPORT_DIR": str(workdir / "run_reports"),
+        "PIPELINE_PROFILE_DIR": str(workdir / "profiles"),
+        "LLM_MIN_REQUEST_INTERVAL": str(args.llm_min_interval),
+        "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+        "FAKE_LLM_RPM": str(args.llm_rpm),
+        "FAKE_LLM_TPM": str(args.llm_tpm),
+        "FAKE_LLM_MALFORMED_RATE": str(args.llm_malformed_rate),
+    })
+    # Replay is instant unless asked otherwise; other knobs (PIPELINE_*, COHORT_COUNT, ...) pass through
+    os.environ.setdefault("HTTP_REPLAY_LATENCY_MS", "0")
+    os.environ.setdefault("OUTBOX_DISPATCH_INLINE", "false")
+
+
+def build_cassettes(directory: Path) -> int:
+    """Cassette store serving the synthetic site, dated so its newest entries are an hour old"""
+    import requests
+
+    from app.utils.cassette import CassetteStore
+    from benchmarks.make_fixtures import synthetic_fixtures
+
+    newest = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    fixtures = synthetic_fixtures(newest=newest, with_articles=True)
+    store = CassetteStore(directory)
+    for url, body in fixtures.items():
+        url = requests.Request("GET", url).prepare().url  # As the adapter will see it
+        content_type = "application/xml" if "<?xml" in body[:100] else "text/html"
+        store.save(url, CassetteStore.key("GET", url), {
+            "method": "GET",
+            "url": url,
+            "status": 200,
+            "reason": "OK",
+            "headers": {"Content-Type": f"{content_type}; charset=utf-8"},
+            "body": base64.b64encode(body.encode("utf-8")).decode("ascii"),
+            "elapsed_ms": 0,
+        })
+    return len(fixtures)
+
+
+def seed_database(subscribers: int) -> None:
+    from app.database.connection import get_engine
+    from app.database.models import Base
+    from app.database.repository import Repository
+    from app.profiles.user_profile import DEFAULT_INTERESTS
+
+    Base.metadata.create_all(get_engine())
+    repo = Repository()
+    rng = random.Random(0)
+    try:
+        for i in range(subscribers):
+            email = f"reader{i:04d}@sandbox.local"
+            repo.create_email(email, name=f"Reader {i}", commit=False)
+            # Most readers pick a few interests, some keep the defaults, so cohorts have something to split
+            if i % 4:
+                repo.set_subscriber_interests(email, rng.sample(DEFAULT_INTERESTS, rng.randint(2, 5)), commit=False)
+        repo.session.commit()
+    finally:
+        repo.session.close()
+
+
+def throughput_report(results: dict, sink: dict, wall_seconds: float) -> dict:
+    scraped = sum(v for v in results.get("scraping", {}).values() if isinstance(v, int))
+    digests = results.get("digests") or {}
+    timings = results.get("timings") or {}
+    stages = timings.get("stages", {})
+
+    def stage_seconds(prefix: str) -> float:
+        return sum(s["duration"] for name, s in stages.items() if name == prefix or name.startswith(prefix + ":"))
+
+    def rate(count: float, seconds: float):
+        return round(count / seconds, 2) if seconds else None
+
+    return {
+        "wall_seconds": round(wall_seconds, 2),
+        "pipeline_seconds": round(results.get("duration_seconds", 0), 2),
+        "critical_path": timings.get("critical_path"),
+        "critical_path_seconds": timings.get("critical_path_seconds"),
+        "items_scraped": scraped,
+        "digests_created": digests.get("processed", 0),
+        "digests_failed": digests.get("failed", 0),
+        "emails_sent": sink["messages"],
+        "scrape_items_per_second": rate(scraped, stage_seconds("scrape") or stage_seconds("ingest")),
+        "digests_per_second": rate(digests.get("processed", 0), stage_seconds("digest") or stage_seconds("ingest")),
+        "emails_per_second": rate(sink["messages"], stage_seconds("send")),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the whole daily pipeline offline and report timings")
+    parser.add_argument("--workdir", type=Path, default=BACKEND_DIR / ".sandbox")
+    parser.add_argument("--cassettes", type=Path, help="Replay this recorded cassette store instead of the synthetic site")
+    parser.add_argument("--hours", type=int, default=72)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--subscribers", type=int, default=25)
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--llm-rpm", type=int, default=0, help="Fake LLM requests per minute quota (0 = unlimited)")
+    parser.add_argument("--llm-tpm", type=int, default=0, help="Fake LLM tokens per minute quota (0 = unlimited)")
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0)
+    parser.add_argument("--llm-min-interval", type=float, default=0.0, help="Client-side spacing per agent (s)")
+    parser.add_argument("--profile", action="store_true", help="Profile each stage (see app/utils/profiling.py)")
+    args = parser.parse_args()
+
+    workdir = args.workdir.resolve()
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir(parents=True)
+
+    controller, sink = start_smtp_sink(workdir / "mailbox")
+    cassettes = args.cassettes.resolve() if args.cassettes else workdir / "cassettes"
+    configure_environment(workdir, cassettes, controller.port, args)
+    try:
+        if not args.cassettes:
+            print(f"Built {build_cassettes(cassettes)} cassettes for the synthetic site")
+        seed_database(args.subscribers)
+
+        from app.daily_runner import run_daily_pipeline
+
+        started = time.perf_counter()
+        results = run_daily_pipeline(hours=args.hours, top_n=args.top_n, resume=False,
+                                     profile=True if args.profile else None)
+        wall_seconds = time.perf_counter() - started
+    finally:
+        controller.stop()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "settings": {key: str(value) for key, value in vars(args).items()},
+        "success": results["success"],
+        "throughput": throughput_report(results, sink.stats(), wall_seconds),
+        "smtp_sink": sink.stats(),
+        "llm_usage": results.get("llm_usage", []),
+        "results": results,
+    }
+    report_path = workdir / "sandbox_report.json"
+    report_path.write_text(json.dumps(report, indent=2, default=str))
+
+    throughput = report["throughput"]
+    print(f"\n{'=' * 60}")
+    print(f"Sandbox run: {'succeeded' if results['success'] else 'FAILED'} in {throughput['wall_seconds']:.1f}s "
+          f"(critical path {throughput['critical_path_seconds'] or 0:.1f}s)")
+    print(f"Scraped:  {throughput['items_scraped']} items ({throughput['scrape_items_per_second']}/s of stage time)")
+    print(f"Digests:  {throughput['digests_created']} created, {throughput['digests_failed']} failed "
+          f"({throughput['digests_per_second']}/s)")
+    print(f"Emails:   {throughput['emails_sent']} delivered to the sink ({throughput['emails_per_second']}/s)")
+    for usage in report["llm_usage"]:
+        print(f"LLM {usage['agent']:<8} {usage['calls']} calls, {usage['rate_limited']} rate limited, "
+              f"{usage['call_seconds']:.1f}s in calls, {usage['throttle_seconds'] + usage['backoff_seconds']:.1f}s waiting")
+    print(f"Report:   {report_path}")
+    if results.get("profile_dir"):
+        print(f"Profiles: {results['profile_dir']}")
+    print(f"Mailbox:  {workdir / 'mailbox'}")
+    sys.exit(0 if results["success"] else 1)
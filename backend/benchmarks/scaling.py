@@ -0,0 +1,224 @@
+"""
+Scaling curves for the queries and loops that grow with history or subscribers.
+
+Each point of a sweep is a fresh SQLite database filled by make_corpus.py. The
+operations are timed on it (best of --repeat), then the database is deleted.
+
+- history: --per-day articles per source per day, over each of --days. The last
+  day's backlog and digests stay the same size, so any growth is the cost of
+  the stored history. Times get_digested_keys, get_articles_without_digest,
+  get_recent_digests (24h) and the build_article_details join.
+- subscribers: each of --subscribers recipients over a fixed 30-day corpus.
+  Times count_subscriber_profiles, plan_cohorts, one keyset-paged pass over
+  the list, and that pass with the delivery loop's per-page work (cohort
+  lookup and personalization, no sending).
+
+For each operation it prints the seconds at every point and the growth exponent
+between neighbouring points: log(t2/t1) / log(n2/n1). About 0 is constant, 1 is
+linear and 2 is quadratic. The points go to scaling.json and scaling.csv in
+--workdir, and with --plot to a log-log chart (needs matplotlib).
+
+Usage (from backend/):
+    python benchmarks/scaling.py
+    python benchmarks/scaling.py --days 30,90,365 --subscribers 10000,100000,1000000
+    python benchmarks/scaling.py --sweep subscribers --plot scaling.png
+"""
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.make_corpus import generate_corpus, open_session  # noqa: E402
+
+SUBSCRIBER_SWEEP_DAYS = 30
+SUBSCRIBER_SWEEP_PER_DAY = 2
+
+
+def best_of(repeat: int, fn: Callable[[], object]) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def history_operations(repo) -> Dict[str, Callable[[], object]]:
+    from app.services.process_email import build_article_details
+
+    digests = repo.get_recent_digests(hours=24)
+    # The curator hands back every candidate; reversed so the join cannot just walk in step
+    ranked = [SimpleNamespace(digest_id=d["id"], rank=rank, relevance_score=5.0, reasoning=None)
+              for rank, d in enumerate(reversed(digests), 1)]
+    return {
+        "get_digested_keys": repo.get_digested_keys,
+        "get_articles_without_digest": repo.get_articles_without_digest,
+        "get_recent_digests": lambda: repo.get_recent_digests(hours=24),
+        "build_article_details": lambda: build_article_details(ranked, digests),
+    }
+
+
+def subscriber_operations(repo, top_n: int = 10) -> Dict[str, Callable[[], object]]:
+    from app.config import COHORT_COUNT, STREAM_PAGE_SIZE
+    from app.profiles.user_profile import parse_interests
+    from app.services.cohorts import DEFAULT_COHORT, plan_cohorts
+    from app.services.personalization import Personalizer
+    from app.services.process_email import build_article_details
+
+    digests = repo.get_recent_digests(hours=24 * 7)
+    ranked = [SimpleNamespace(digest_id=d["id"], rank=rank, relevance_score=10.0 - rank * 0.05, reasoning=None)
+              for rank, d in enumerate(digests, 1)]
+    personalizer = Personalizer(build_article_details(ranked, digests), top_n)
+    profile_counts = repo.count_subscriber_profiles()
+    assignment, _ = plan_cohorts(profile_counts, COHORT_COUNT)
+
+    def stream():
+        for _ in repo.iter_email_pages(page_size=STREAM_PAGE_SIZE):
+            pass
+
+    def deliver():
+        # deliver_editions' per-page work: group by cohort, then one selection per group
+        for page in repo.iter_email_pages(page_size=STREAM_PAGE_SIZE):
+            by_cohort = {}
+            for row in page:
+                by_cohort.setdefault(assignment.get(row.interests, DEFAULT_COHORT), []).append(row)
+            for rows in by_cohort.values():
+                personalizer.select([parse_interests(row.interests) for row in rows])
+
+    return {
+        "count_subscriber_profiles": repo.count_subscriber_profiles,
+        "plan_cohorts": lambda: plan_cohorts(profile_counts, COHORT_COUNT),
+        "stream_subscribers": stream,
+        "deliver_loop": deliver,
+    }
+
+
+def measure(workdir: Path, name: str, corpus: dict, operations, repeat: int) -> Dict[str, float]:
+    from app.database.repository import Repository
+
+    path = workdir / f"{name}.db"
+    path.unlink(missing_ok=True)
+    session = open_session(f"sqlite:///{path}")
+    try:
+        started = time.perf_counter()
+        generate_corpus(session, verbose=False, **corpus)
+        print(f"  generated {name} in {time.perf_counter() - started:.1f}s", flush=True)
+        repo = Repository(session=session)
+        return {op: best_of(repeat, fn) for op, fn in operations(repo).items()}
+    finally:
+        session.close()
+        session.get_bind().dispose()
+        path.unlink(missing_ok=True)
+
+
+def run_sweep(sweep: str, sizes: List[int], args) -> List[dict]:
+    points = []
+    for size in sizes:
+        if sweep == "history":
+            corpus = {"articles_per_source": args.per_day * size, "days": size, "subscribers": args.base_subscribers}
+            operations = history_operations
+        else:
+            corpus = {"articles_per_source": SUBSCRIBER_SWEEP_PER_DAY * SUBSCRIBER_SWEEP_DAYS,
+                      "days": SUBSCRIBER_SWEEP_DAYS, "subscribers": size}
+            operations = subscriber_operations
+        timings = measure(args.workdir, f"{sweep}-{size}", {**corpus, "seed": args.seed}, operations, args.repeat)
+        points.extend({"sweep": sweep, "size": size, "operation": op, "seconds": seconds}
+                      for op, seconds in timings.items())
+    return points
+
+
+def exponents(points: List[dict]) -> Dict[tuple, List[float]]:
+    """Growth exponent between neighbouring sizes, per (sweep, operation)"""
+    series = {}
+    for p in points:
+        series.setdefault((p["sweep"], p["operation"]), []).append((p["size"], p["seconds"]))
+    result = {}
+    for key, values in series.items():
+        result[key] = [
+            math.log(t2 / t1) / math.log(n2 / n1) if t1 > 0 and t2 > 0 and n2 != n1 else float("nan")
+            for (n1, t1), (n2, t2) in zip(values, values[1:])
+        ]
+    return result
+
+
+def print_table(points: List[dict]) -> None:
+    growth = exponents(points)
+    for sweep in dict.fromkeys(p["sweep"] for p in points):
+        sizes = list(dict.fromkeys(p["size"] for p in points if p["sweep"] == sweep))
+        unit = "days" if sweep == "history" else "subscribers"
+        print(f"\n{sweep} ({unit}: {', '.join(f'{s:,}' for s in sizes)})")
+        for operation in dict.fromkeys(p["operation"] for p in points if p["sweep"] == sweep):
+            seconds = [p["seconds"] for p in points if p["sweep"] == sweep and p["operation"] == operation]
+            slopes = ", ".join(f"{e:.2f}" for e in growth[(sweep, operation)]) or "-"
+            print(f"  {operation:<28} {' '.join(f'{s * 1000:>10.1f}ms' for s in seconds)}   exponent {slopes}")
+
+
+def plot(points: List[dict], path: Path) -> None:
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("--plot needs matplotlib: pip install matplotlib")
+        return
+
+    sweeps = list(dict.fromkeys(p["sweep"] for p in points))
+    fig, axes = plt.subplots(1, len(sweeps), figsize=(6 * len(sweeps), 4.5), squeeze=False)
+    for ax, sweep in zip(axes[0], sweeps):
+        for operation in dict.fromkeys(p["operation"] for p in points if p["sweep"] == sweep):
+            series = [(p["size"], p["seconds"]) for p in points if p["sweep"] == sweep and p["operation"] == operation]
+            ax.plot(*zip(*series), marker="o", label=operation)
+        ax.set(xscale="log", yscale="log", title=sweep, ylabel="seconds",
+               xlabel="days of history" if sweep == "history" else "subscribers")
+        ax.legend(fontsize=8)
+    fig.tight_layout()
+    fig.savefig(path)
+    print(f"Chart:   {path}")
+
+
+def _sizes(value: str) -> List[int]:
+    return sorted(int(v) for v in value.split(",") if v.strip())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart how the history and subscriber paths scale")
+    parser.add_argument("--sweep", choices=["all", "history", "subscribers"], default="all")
+    parser.add_argument("--days", type=_sizes, default=[30, 120, 480], help="History sweep sizes, in days")
+    parser.add_argument("--per-day", type=int, default=5, help="Articles per source per day in the history sweep")
+    parser.add_argument("--base-subscribers", type=int, default=1000, help="Subscribers in the history sweep")
+    parser.add_argument("--subscribers", type=_sizes, default=[10_000, 40_000, 160_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=Path, default=BACKEND_DIR / ".corpus" / "scaling")
+    parser.add_argument("--plot", type=Path, help="Write a log-log chart here (PNG, SVG, ...)")
+    args = parser.parse_args()
+
+    args.workdir.mkdir(parents=True, exist_ok=True)
+    os.environ.setdefault("GEMINI_API_KEY", "offline")
+
+    points = []
+    if args.sweep in ("all", "history"):
+        print(f"History sweep: {args.per_day} articles per source per day over {args.days} days")
+        points += run_sweep("history", args.days, args)
+    if args.sweep in ("all", "subscribers"):
+        print(f"Subscriber sweep: {args.subscribers} subscribers")
+        points += run_sweep("subscribers", args.subscribers, args)
+
+    print_table(points)
+    (args.workdir / "scaling.json").write_text(json.dumps(points, indent=2))
+    with open(args.workdir / "scaling.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["sweep", "size", "operation", "seconds"])
+        writer.writeheader()
+        writer.writerows(points)
+    print(f"\nPoints:  {args.workdir / 'scaling.json'}, {args.workdir / 'scaling.csv'}")
+    if args.plot:
+        plot(points, args.plot)
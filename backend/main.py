@@ -1,8 +1,10 @@
+from typing import Optional
+
 from app.daily_runner import run_daily_pipeline
 
 
-def main(hours: int = 24, top_n: int = 10):
-    return run_daily_pipeline(hours=hours, top_n=top_n)
+def main(hours: int = 24, top_n: int = 10, resume: bool = True, profile: Optional[bool] = None):
+    return run_daily_pipeline(hours=hours, top_n=top_n, resume=resume, profile=profile)
 
 
 if __name__ == "__main__":
@@ -11,11 +13,16 @@ if __name__ == "__main__":
     hours = 24
     top_n = 10
     
-    if len(sys.argv) > 1:
-        hours = int(sys.argv[1])
-    if len(sys.argv) > 2:
-        top_n = int(sys.argv[2])
+    # --fresh starts today's edition over instead of resuming it
+    resume = "--fresh" not in sys.argv
+    # --profile writes per-stage profiles and peak memory (otherwise PIPELINE_PROFILE decides)
+    profile = True if "--profile" in sys.argv else None
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    
+    if len(args) > 0:
+        hours = int(args[0])
+    if len(args) > 1:
+        top_n = int(args[1])
     
-    result = main(hours=hours, top_n=top_n)
+    result = main(hours=hours, top_n=top_n, resume=resume, profile=profile)
     exit(0 if result["success"] else 1)
-
@@ -0,0 +1,47 @@
+"""
+Shared setup for the unit tests.
+
+Nothing here touches the network or a real database: the repository runs
+against a throwaway SQLite file, emptied around each test that uses it.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Must be set before anything imports app.database.connection
+_db_dir = tempfile.mkdtemp(prefix="aggregator-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/tests.db"
+os.environ.setdefault("GEMINI_API_KEY", "offline")
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+
+def clear_tables(repo) -> None:
+    """Delete every row, children first; the schema (and SQLite's FTS index) stays in place"""
+    from app.database.models import Base
+
+    repo.session.rollback()
+    for table in reversed(Base.metadata.sorted_tables):
+        repo.session.execute(table.delete())
+    repo.session.commit()
+
+
+@pytest.fixture
+def repository():
+    """Repository on an empty SQLite database, emptied again afterwards"""
+    from app.database.connection import get_engine
+    from app.database.models import Base
+    from app.database.repository import Repository
+
+    Base.metadata.create_all(get_engine())
+    repo = Repository()
+    clear_tables(repo)
+    yield repo
+    clear_tables(repo)
+    repo.session.close()
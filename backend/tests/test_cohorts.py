@@ -0,0 +1,39 @@
+"""Subscriber cohorts: spherical k-means is reproducible and never makes more cohorts than profiles"""
+import json
+
+import numpy as np
+
+from app.services.cohorts import DEFAULT_COHORT, encode_profiles, plan_cohorts, spherical_kmeans
+
+VISION = [["computer vision", "image generation"], ["image generation", "computer vision"], ["computer vision"]]
+AUDIO = [["speech recognition", "audio models"], ["audio models"]]
+
+PROFILE_COUNTS = {
+    **{json.dumps(interests): 10 + i for i, interests in enumerate(VISION + AUDIO)},
+    None: 7,
+    "[]": 2,
+}
+
+
+def test_assignment_is_the_same_on_every_run():
+    vectors = encode_profiles(VISION + AUDIO)
+    first = spherical_kmeans(vectors, 2)
+    assert np.array_equal(first, spherical_kmeans(vectors, 2))
+    assert len(set(first[:3])) == 1 and len(set(first[3:])) == 1 and first[0] != first[3]
+
+    assert plan_cohorts(PROFILE_COUNTS, 2) == plan_cohorts(dict(PROFILE_COUNTS), 2)
+
+
+def test_k_is_capped_at_the_number_of_profiles():
+    labels = spherical_kmeans(encode_profiles(AUDIO), 10)
+    assert len(labels) == 2 and set(labels) <= {0, 1}
+
+    assignment, cohort_interests = plan_cohorts(PROFILE_COUNTS, 50)
+    assert len(cohort_interests) <= len(VISION + AUDIO)
+    assert set(assignment.values()) - {DEFAULT_COHORT} == set(cohort_interests)
+
+
+def test_profiles_without_interests_get_the_default_cohort():
+    assignment, _ = plan_cohorts(PROFILE_COUNTS, 2)
+    assert assignment[None] == assignment["[]"] == DEFAULT_COHORT
+    assert spherical_kmeans(encode_profiles(VISION[:1]), 4).tolist() == [0]
@@ -0,0 +1,76 @@
+"""Compressed text columns: values round-trip in every stored format, migrate copies alongside the text column"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, Table, create_engine, insert, select, text
+
+from app.database.compression import MIN_COMPRESS_BYTES, ZSTD_MAGIC, CompressedText, get_codec
+
+SHORT = "__UNAVAILABLE__"
+LONG = "A paragraph about model releases. " * 20
+
+
+@pytest.fixture
+def documents():
+    engine = create_engine("sqlite://")
+    table = Table("documents", MetaData(), Column("id", Integer, primary_key=True), Column("body", CompressedText()))
+    table.metadata.create_all(engine)
+    with engine.connect() as conn:
+        yield conn, table
+
+
+def _stored(conn, row_id):
+    return conn.execute(text("SELECT body FROM documents WHERE id = :id"), {"id": row_id}).scalar()
+
+
+def _read(conn, table, row_id):
+    return conn.execute(select(table.c.body).where(table.c.id == row_id)).scalar()
+
+
+def test_short_values_are_stored_raw_and_long_ones_compressed(documents):
+    conn, table = documents
+    assert len(SHORT.encode()) < MIN_COMPRESS_BYTES < len(LONG.encode())
+    conn.execute(insert(table), [{"id": 1, "body": SHORT}, {"id": 2, "body": LONG}, {"id": 3, "body": None}])
+
+    assert _stored(conn, 1) == SHORT.encode()
+    stored = _stored(conn, 2)
+    assert stored[:4] == ZSTD_MAGIC and len(stored) < len(LONG)
+    assert _stored(conn, 3) is None
+
+    assert _read(conn, table, 1) == SHORT
+    assert _read(conn, table, 2) == LONG
+    assert _read(conn, table, 3) is None
+    # Equality filters on short markers compare the raw bytes
+    assert conn.execute(select(table.c.id).where(table.c.body == SHORT)).scalar() == 1
+
+
+def test_values_not_compressed_yet_are_read_as_they_are(documents):
+    conn, table = documents
+    conn.execute(text("INSERT INTO documents (id, body) VALUES (1, :body)"), {"body": LONG})
+    conn.execute(text("INSERT INTO documents (id, body) VALUES (2, :body)"), {"body": LONG.encode()})
+
+    assert _read(conn, table, 1) == LONG
+    assert _read(conn, table, 2) == LONG
+
+
+def test_migrate_fills_the_compressed_column_and_leaves_the_text_one(repository):
+    from app.database.compress_text_columns import migrate
+    from app.database.models import AnthropicArticle
+
+    bodies = {"short": SHORT, "long": LONG, "empty": None}
+    for guid, body in bodies.items():
+        repository.session.add(AnthropicArticle(guid=guid, title=guid, url=f"https://example.com/{guid}",
+                                                published_at=datetime.utcnow(), markdown=body))
+    repository.session.commit()
+
+    assert migrate(batch_size=1)
+    assert migrate(batch_size=1)  # Nothing left to copy, nothing changes
+
+    rows = repository.session.execute(text("SELECT guid, markdown, markdown_zstd FROM anthropic_articles")).fetchall()
+    codec = get_codec()
+    for guid, markdown, packed in rows:
+        assert markdown == bodies[guid]
+        assert (codec.decompress(bytes(packed)) if packed is not None else None) == bodies[guid]
+    # The app, still on the text column, reads and writes as before
+    article = repository.session.get(AnthropicArticle, "long")
+    assert article.markdown == LONG
@@ -0,0 +1,77 @@
+"""Curator ranking: malformed replies are asked again, then ranked by keyword rather than dropped"""
+import pytest
+
+from app.agent import llm
+from app.agent.curator_agent import CuratorAgent
+from app.agent.fake_llm import FakeBackend
+from app.profiles.user_profile import build_profile
+from app.services import process_email
+
+DIGESTS = [
+    {"id": "google:1", "article_type": "google", "title": "New phone colours announced",
+     "summary": "The handset now ships in three colours."},
+    {"id": "anthropic:2", "article_type": "anthropic", "title": "Scaling laws for language model training",
+     "summary": "How language model loss falls with compute, data and parameters."},
+    {"id": "techcrunch:3", "article_type": "techcrunch", "title": "Startup raises a seed round",
+     "summary": "The company will hire more sales staff."},
+]
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    """Installs an instant fake backend; returns a function setting its malformed rate"""
+    monkeypatch.setattr(llm, "LLM_MIN_REQUEST_INTERVAL", 0)
+
+    def install(malformed_rate, seed=0):
+        backend = FakeBackend(latency_ms=0, jitter_ms=0, rpm=0, tpm=0, malformed_rate=malformed_rate, seed=seed)
+        monkeypatch.setitem(llm._backends, "fake", backend)
+        return backend
+    return install
+
+
+def _curator():
+    return CuratorAgent({**build_profile(), "interests": ["language model training", "scaling laws"]})
+
+
+def test_malformed_replies_are_asked_again(fake_llm):
+    backend = fake_llm(0.5, seed=3)
+    ranked = _curator().rank_digests(DIGESTS)
+
+    assert backend.stats["malformed"] >= 1
+    assert sorted(a.digest_id for a in ranked) == sorted(d["id"] for d in DIGESTS)
+    assert not any("curator ranking unavailable" in a.reasoning for a in ranked)
+
+
+def test_unusable_replies_fall_back_to_the_keyword_order(fake_llm):
+    fake_llm(1.0)
+    ranked = _curator().rank_digests(DIGESTS)
+
+    assert [a.rank for a in ranked] == [1, 2, 3]
+    assert ranked[0].digest_id == "anthropic:2"
+    assert [a.relevance_score for a in ranked] == sorted((a.relevance_score for a in ranked), reverse=True)
+
+
+def test_emails_are_sent_when_every_reply_is_malformed(monkeypatch, fake_llm, repository):
+    fake_llm(1.0)
+    sent = []
+
+    class Mailer:
+        def send_digest_email(self, to_email, subject, html_content):
+            sent.append(to_email)
+            return True
+
+    monkeypatch.setattr(process_email, "EmailService", Mailer)
+    for d in DIGESTS:
+        article_type, article_id = d["id"].split(":")
+        repository.create_digest(article_type, article_id, f"https://example.com/{article_id}", d["title"], d["summary"])
+    for i in range(3):
+        repository.create_email(f"reader{i}@example.com", name=f"Reader {i}")
+
+    inputs = process_email.load_send_inputs(hours=24)
+    plan = process_email.write_introductions(
+        process_email.rank_editions(inputs["digests"], inputs["profile_counts"], top_n=2), top_n=2
+    )
+    result = process_email.deliver_editions(plan["editions"], plan["assignment"], top_n=2)
+
+    assert result["sent"] == 3 and result["failed"] == 0
+    assert sorted(sent) == [f"reader{i}@example.com" for i in range(3)]
@@ -0,0 +1,70 @@
+"""Near-duplicate clustering: a press copy of a lab post is merged, a different story on the same topic is not"""
+from app.services.dedup import cluster_articles
+
+LAB_POST = """Today we are releasing Claude Haiku 4, our fastest model yet. Haiku 4 matches the coding
+performance of our previous mid-size model on SWE-bench Verified while running at a third of the cost.
+The model supports a context window of 200,000 tokens and is available today through the API, on Amazon
+Bedrock and on Google Cloud Vertex AI. Developers can use it for sub-agent tasks, real-time chat
+assistants and customer support, where low latency matters most. In our internal evaluations Haiku 4
+scored 73 percent on SWE-bench Verified and 41 percent on Terminal-bench. Pricing starts at one dollar
+per million input tokens and five dollars per million output tokens. We trained Haiku 4 with the same
+safety techniques as our frontier models, and it is deployed under AI Safety Level 2 protections.
+Computer use is supported, and the model can call tools in parallel. We look forward to seeing what
+developers build with it."""
+
+PRESS_COPY = """Anthropic on Tuesday launched a new small model. Today we are releasing Claude Haiku 4, our fastest
+model yet, the company wrote in a blog post. Haiku 4 matches the coding performance of our previous
+mid-size model on SWE-bench Verified while running at a third of the cost. The model supports a context
+window of 200,000 tokens and is available today through the API, on Amazon Bedrock and on Google Cloud
+Vertex AI. Developers can use it for sub-agent tasks, real-time chat assistants and customer support,
+where low latency matters most. In internal evaluations Haiku 4 scored 73 percent on SWE-bench Verified
+and 41 percent on Terminal-bench. Pricing starts at one dollar per million input tokens and five dollars
+per million output tokens. The startup trained Haiku 4 with the same safety techniques as its frontier
+models. Anthropic did not say when the model would reach its consumer apps."""
+
+# Same kind of launch, written to the same template, but a different story
+OTHER_LAUNCH = """Google today released Gemini 3 Flash, its fastest model yet. Gemini 3 Flash matches the coding
+performance of the previous Pro model on SWE-bench Verified while running at a fraction of the cost.
+The model supports a context window of one million tokens and is available today through the API, in
+Google AI Studio and on Google Cloud Vertex AI. Developers can use it for agentic workflows, real-time
+chat assistants and customer support, where low latency matters most. In Google's evaluations Gemini 3
+Flash scored 70 percent on SWE-bench Verified and 45 percent on Terminal-bench. Pricing starts at fifty
+cents per million input tokens and three dollars per million output tokens. The model was trained on
+Google's TPUs and is rolling out in the Gemini app and in Search."""
+
+
+def _article(article_type, article_id, content):
+    return {"type": article_type, "id": article_id, "title": article_id, "content": content}
+
+
+def _stories(clusters):
+    return sorted((c["canonical"]["id"], sorted(d["id"] for d in c["duplicates"])) for c in clusters)
+
+
+def test_press_copy_is_merged_into_the_lab_post():
+    clusters = cluster_articles([
+        _article("techcrunch", "tc-haiku", PRESS_COPY),
+        _article("anthropic", "haiku-4", LAB_POST),
+        _article("google", "gemini-flash", OTHER_LAUNCH),
+    ])
+
+    assert _stories(clusters) == [("gemini-flash", []), ("haiku-4", ["tc-haiku"])]
+    merged = next(c for c in clusters if c["duplicates"])
+    assert merged["duplicates"][0]["similarity"] >= 0.5
+
+
+def test_related_stories_are_kept_apart():
+    clusters = cluster_articles([
+        _article("anthropic", "haiku-4", LAB_POST),
+        _article("google", "gemini-flash", OTHER_LAUNCH),
+    ])
+    assert _stories(clusters) == [("gemini-flash", []), ("haiku-4", [])]
+
+
+def test_articles_without_content_are_their_own_story():
+    clusters = cluster_articles([
+        _article("openai", "empty", "  "),
+        _article("anthropic", "haiku-4", LAB_POST),
+        _article("techcrunch", "tc-haiku", PRESS_COPY),
+    ])
+    assert _stories(clusters) == [("empty", []), ("haiku-4", ["tc-haiku"])]
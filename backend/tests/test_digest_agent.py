@@ -0,0 +1,48 @@
+"""Digest prompt content: cached per article and content, without holding article bodies"""
+import pytest
+
+from app.agent import digest_agent
+from app.agent.digest_agent import article_prompt_content, batch_item
+
+
+@pytest.fixture
+def counted_compress(monkeypatch):
+    calls = []
+
+    def compress(content, budget, title=""):
+        calls.append(content)
+        return content[:100]
+
+    monkeypatch.setattr(digest_agent, "DIGEST_COMPRESSION_ENABLED", True)
+    monkeypatch.setattr(digest_agent, "compress", compress)
+    monkeypatch.setattr(digest_agent, "_prompt_cache", digest_agent.OrderedDict())
+    return calls
+
+
+def _article(article_id, content):
+    return {"type": "anthropic", "id": article_id, "title": f"Post {article_id}", "content": content}
+
+
+def test_packing_then_building_compresses_once(counted_compress):
+    article = _article("a", "Long body. " * 10_000)
+    batch_item("A1", article)
+    batch_item("A9", article)
+    assert len(counted_compress) == 1
+
+
+def test_cache_is_keyed_on_the_content_not_just_the_id(counted_compress):
+    assert article_prompt_content(_article("a", "First version.")) == "First version."
+    assert article_prompt_content(_article("a", "Edited version.")) == "Edited version."
+    assert len(counted_compress) == 2
+
+
+def test_cache_holds_neither_bodies_nor_more_than_its_size(monkeypatch, counted_compress):
+    monkeypatch.setattr(digest_agent, "PROMPT_CACHE_SIZE", 3)
+    body = "Long body. " * 10_000
+    for i in range(5):
+        article_prompt_content(_article(str(i), body))
+
+    cache = digest_agent._prompt_cache
+    assert [key[0] for key in cache] == ["anthropic:2", "anthropic:3", "anthropic:4"]
+    assert all(len(value) <= 100 for value in cache.values())
+    assert not any(body in part for key in cache for part in key if isinstance(part, str))
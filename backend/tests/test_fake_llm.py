@@ -0,0 +1,84 @@
+"""Fake LLM backend: seeded and reproducible, with the configured malformed rate and quota"""
+import json
+
+import pytest
+from google.genai.errors import ClientError
+
+from app import config
+from app.agent import fake_llm, llm
+from app.agent.fake_llm import FakeBackend
+
+
+def _prompt(i):
+    return (f"Create a digest for this article. Title: Release {i} \n Content: "
+            f"Version {i} of the model is out today. It is faster and cheaper than the last one.")
+
+
+def _backend(**options):
+    return FakeBackend(**{"latency_ms": 0, "jitter_ms": 0, "rpm": 0, "tpm": 0, **options})
+
+
+def _texts(backend, prompts):
+    return [backend.generate_content("fake", prompt).text for prompt in prompts]
+
+
+def _is_malformed(text):
+    try:
+        json.loads(text)
+    except json.JSONDecodeError:
+        return True
+    return False
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(fake_llm.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_same_seed_gives_the_same_answers():
+    # Each prompt twice: a repeat is a new draw, but the same one on every run
+    prompts = [_prompt(i) for i in range(40)] * 2
+    first = _texts(_backend(malformed_rate=0.5, seed=7), prompts)
+
+    assert first == _texts(_backend(malformed_rate=0.5, seed=7), prompts)
+    assert first != _texts(_backend(malformed_rate=0.5, seed=8), prompts)
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.3, 1.0])
+def test_malformed_rate_is_applied(rate):
+    backend = _backend(malformed_rate=rate, seed=1)
+    texts = _texts(backend, [_prompt(i) for i in range(400)])
+
+    malformed = sum(map(_is_malformed, texts))
+    assert backend.stats["malformed"] == malformed
+    assert abs(malformed / len(texts) - rate) < 0.06
+
+
+def test_requests_past_the_rpm_limit_get_a_429(clock):
+    backend = _backend(rpm=3)
+    for i in range(3):
+        backend.generate_content("fake", _prompt(i))
+        clock[0] += 10
+
+    with pytest.raises(ClientError) as error:
+        backend.generate_content("fake", _prompt(3))
+    assert error.value.code == 429
+    assert error.value.details["error"]["details"][0]["retryDelay"] == "30s"
+    assert backend.stats["rate_limited"] == 1
+
+    clock[0] += 30  # The first call leaves the window
+    backend.generate_content("fake", _prompt(3))
+    assert backend.stats["calls"] == 4
+
+
+def test_shared_backend_is_built_from_the_config(monkeypatch):
+    monkeypatch.setattr(config, "FAKE_LLM_RPM", 7)
+    monkeypatch.setattr(config, "FAKE_LLM_MALFORMED_RATE", 0.25)
+    monkeypatch.setattr(config, "FAKE_LLM_SEED", 11)
+    monkeypatch.setattr(llm, "_backends", {})
+
+    backend = llm.get_backend("fake")
+    assert isinstance(backend, FakeBackend)
+    assert (backend.rpm, backend.malformed_rate, backend.seed) == (7, 0.25, 11)
@@ -0,0 +1,104 @@
+"""Background job queue: coalescing, exclusive claims, stale-job recovery, inline runs"""
+import threading
+from datetime import datetime, timedelta
+
+from app.database.models import Job
+from app.database.repository import Repository
+
+
+def _enqueue(repo, key="2026-01-01/24h/top10"):
+    return repo.enqueue_job("daily_digest", key, {"hours": 24, "top_n": 10})
+
+
+def _go_silent(repo, job_id, seconds=3600):
+    """As if the job's worker died: its last heartbeat is long past"""
+    repo.session.query(Job).filter(Job.id == job_id).update(
+        {Job.heartbeat_at: datetime.utcnow() - timedelta(seconds=seconds)}, synchronize_session=False
+    )
+    repo.session.commit()
+
+
+def test_triggers_for_a_pending_edition_coalesce(repository):
+    first = _enqueue(repository)
+    second = _enqueue(repository)
+    assert not first["coalesced"]
+    assert second["coalesced"] and second["id"] == first["id"]
+    assert _enqueue(repository, key="2026-01-02/24h/top10")["id"] != first["id"]
+
+
+def test_each_job_is_claimed_by_one_worker(repository):
+    job = _enqueue(repository)
+    claims = []
+    barrier = threading.Barrier(4)
+
+    def claim(worker):
+        repo = Repository()
+        try:
+            barrier.wait()
+            claims.append(repo.claim_job(worker))
+        finally:
+            repo.session.close()
+
+    threads = [threading.Thread(target=claim, args=(f"worker-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    won = [c for c in claims if c is not None]
+    assert len(won) == 1
+    assert won[0]["id"] == job["id"]
+    assert won[0]["status"] == "running" and won[0]["attempts"] == 1
+    assert repository.claim_job("late-worker") is None
+
+
+def test_stale_job_is_requeued_then_failed_at_the_attempt_cap(repository):
+    job = _enqueue(repository)
+    for attempt in (1, 2):
+        assert repository.claim_job(f"worker-{attempt}")["attempts"] == attempt
+        _go_silent(repository, job["id"])
+        assert repository.requeue_stale_jobs(600, max_attempts=3) == {"requeued": 1, "failed": 0}
+        assert repository.get_job(job["id"])["status"] == "queued"
+
+    repository.claim_job("worker-3")
+    _go_silent(repository, job["id"])
+    assert repository.requeue_stale_jobs(600, max_attempts=3) == {"requeued": 0, "failed": 1}
+    failed = repository.get_job(job["id"])
+    assert failed["status"] == "failed" and failed["attempts"] == 3
+    assert failed["finished_at"] is not None
+    assert repository.claim_job("worker-4") is None
+
+
+def test_live_job_is_left_running(repository):
+    job = _enqueue(repository)
+    repository.claim_job("worker")
+    assert repository.requeue_stale_jobs(600, max_attempts=3) == {"requeued": 0, "failed": 0}
+    assert repository.get_job(job["id"])["status"] == "running"
+
+
+def test_inline_run_claims_and_runs_its_own_job(monkeypatch, repository):
+    from app import worker
+
+    calls = []
+    monkeypatch.setitem(worker.JOB_HANDLERS, worker.DAILY_DIGEST,
+                        lambda job: calls.append(job["dedupe_key"]) or {"success": True})
+    other = _enqueue(repository, key="some-other-edition")
+
+    job = worker.run_inline(hours=24, top_n=10)
+    assert job["status"] == "succeeded" and not job["coalesced"]
+    assert calls == [job["dedupe_key"]]
+    # Only this trigger's edition runs: other queued jobs are left for later
+    assert repository.get_job(other["id"])["status"] == "queued"
+
+
+def test_inline_run_leaves_a_job_running_elsewhere(monkeypatch, repository):
+    from app import worker
+    from app.pipeline.ledger import edition_id
+
+    monkeypatch.setitem(worker.JOB_HANDLERS, worker.DAILY_DIGEST, lambda job: {"success": True})
+    running = _enqueue(repository, key=edition_id(24, 10))
+    repository.claim_job("worker")
+
+    job = worker.run_inline(hours=24, top_n=10)
+    assert job["coalesced"] and job["id"] == running["id"]
+    assert repository.get_job(running["id"])["status"] == "running"
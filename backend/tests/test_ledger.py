@@ -0,0 +1,90 @@
+"""Run ledger: which stages a retried run reuses and which it runs again"""
+from collections import Counter
+
+from app.pipeline.dag import FAILED, SUCCESS, Pipeline, Stage
+from app.pipeline.ledger import RunLedger
+
+RUN_ID = "2026-01-01/24h/top10"
+
+
+class Flaky:
+    """Stage functions that count their calls and fail while told to"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self.failing = set()
+
+    def __call__(self, name):
+        def func(inputs):
+            self.calls[name] += 1
+            if name in self.failing:
+                raise RuntimeError(f"{name} failed")
+            return {"stage": name, "attempt": self.calls[name], "inputs": inputs}
+        return func
+
+
+def _attempt(stages, resume=True):
+    ledger = RunLedger(RUN_ID, resume=resume)
+    results = Pipeline(stages, ledger=ledger).run()
+    return ledger, results["runs"], results["outputs"]
+
+
+def test_completed_stages_are_reused_and_failed_ones_rerun(repository):
+    flaky = Flaky()
+    stages = [
+        Stage("scrape", flaky("scrape")),
+        Stage("digest", flaky("digest"), inputs=["scrape"]),
+        Stage("send", flaky("send"), inputs=["digest"]),
+    ]
+    flaky.failing = {"digest"}
+    _, runs, _ = _attempt(stages)
+    assert runs["digest"].status == FAILED
+
+    flaky.failing = set()
+    ledger, runs, outputs = _attempt(stages)
+    assert ledger.attempt == 2
+    assert runs["scrape"].resumed and runs["scrape"].status == SUCCESS
+    assert flaky.calls == {"scrape": 1, "digest": 2, "send": 1}
+    # The reused output comes from the ledger, not a new call
+    assert outputs["digest"]["inputs"]["scrape"]["attempt"] == 1
+
+
+def test_completed_stage_reruns_when_an_input_is_recomputed(repository):
+    flaky = Flaky()
+    stages = [
+        Stage("scrape", flaky("scrape")),
+        Stage("digest", flaky("digest"), inputs=["scrape"], always_run=True),
+        Stage("send", flaky("send"), inputs=["digest"], once=True),
+    ]
+    flaky.failing = {"scrape"}
+    _attempt(stages)
+    assert flaky.calls == {"scrape": 1, "digest": 1, "send": 1}
+
+    flaky.failing = set()
+    _, runs, _ = _attempt(stages)
+    # digest saw no scrape output the first time, so its stored result is stale
+    assert not runs["digest"].resumed
+    assert flaky.calls["digest"] == 2
+    # ...but a once stage (external side effects) is never repeated
+    assert runs["send"].resumed
+    assert flaky.calls["send"] == 1
+
+
+def test_without_resume_every_stage_runs_again(repository):
+    flaky = Flaky()
+    stages = [Stage("scrape", flaky("scrape")), Stage("send", flaky("send"), inputs=["scrape"], once=True)]
+    _attempt(stages)
+    _, runs, _ = _attempt(stages, resume=False)
+    assert not any(run.resumed for run in runs.values())
+    assert flaky.calls == {"scrape": 2, "send": 2}
+
+
+def test_checkpoint_is_kept_for_an_unfinished_stage(repository):
+    def send(_):
+        ledger.checkpoint("send", {"last_id": "42", "sent": 3})
+        raise RuntimeError("SMTP went away")
+
+    ledger = RunLedger(RUN_ID)
+    Pipeline([Stage("send", send)], ledger=ledger).run()
+
+    assert RunLedger(RUN_ID).cursor("send") == {"last_id": "42", "sent": 3}
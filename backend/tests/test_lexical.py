@@ -0,0 +1,39 @@
+"""Lexical pre-ranking: BM25 keeps the digests matching the interests, in their incoming order"""
+from app.utils.lexical import bm25_scores, interest_query, lexical_order, prerank
+
+INTERESTS = ["language model training", "scaling laws"]
+
+DIGESTS = [
+    {"id": "google:1", "title": "New phone colours announced", "summary": "The handset now ships in three colours."},
+    {"id": "anthropic:2", "title": "Scaling laws for language model training",
+     "summary": "How language model loss falls with compute, data and parameters."},
+    {"id": "techcrunch:3", "title": "Startup raises a seed round", "summary": "The company will hire more sales staff."},
+    {"id": "openai:4", "title": "Faster training kernels", "summary": "A new kernel speeds up model training."},
+]
+
+
+def _ids(digests):
+    return [d["id"] for d in digests]
+
+
+def test_matching_document_outscores_an_unrelated_one():
+    scores = bm25_scores(["scaling laws for language models", "phone colours announced"],
+                         interest_query(INTERESTS))
+    assert scores[0] > 0 == scores[1]
+
+
+def test_prerank_keeps_the_best_matches_in_incoming_order():
+    assert _ids(prerank(DIGESTS, INTERESTS, limit=2)) == ["anthropic:2", "openai:4"]
+    assert _ids(lexical_order(DIGESTS, INTERESTS)[:2]) == ["anthropic:2", "openai:4"]
+
+
+def test_prerank_returns_everything_when_under_the_limit():
+    assert prerank(DIGESTS, INTERESTS, limit=len(DIGESTS)) is DIGESTS
+    assert prerank(DIGESTS, INTERESTS, limit=10) is DIGESTS
+    assert prerank([], INTERESTS, limit=0) == []
+
+
+def test_no_interests_keeps_the_incoming_order():
+    assert interest_query([]) == {}
+    assert _ids(prerank(DIGESTS, [], limit=3)) == _ids(DIGESTS[:3])
+    assert _ids(lexical_order(DIGESTS, [])) == _ids(DIGESTS)
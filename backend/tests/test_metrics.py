@@ -0,0 +1,41 @@
+"""Metrics registry: /metrics series stay monotonic across runs, run reports cover one run"""
+import re
+
+from app.utils.metrics import Registry
+
+
+def _sample(text: str, line_start: str) -> float:
+    match = re.search(rf"^{re.escape(line_start)} (\S+)$", text, re.MULTILINE)
+    assert match, f"{line_start} not in output"
+    return float(match.group(1))
+
+
+def test_starting_a_run_does_not_reset_prometheus_series():
+    registry = Registry()
+    registry.inc("llm_tokens_total", 100, kind="prompt")
+    with registry.span("pipeline_stage", stage="digest"):
+        pass
+
+    registry.start_run()
+    registry.inc("llm_tokens_total", 40, kind="prompt")
+
+    text = registry.render_prometheus()
+    assert _sample(text, 'aggregator_llm_tokens_total{kind="prompt"}') == 140
+    assert _sample(text, 'aggregator_pipeline_stage_seconds_count{stage="digest",status="ok"}') == 1
+
+
+def test_run_report_covers_only_the_current_run():
+    registry = Registry()
+    registry.inc("llm_tokens_total", 100, kind="prompt")
+    with registry.span("pipeline_stage", stage="digest"):
+        pass
+
+    registry.start_run()
+    registry.inc("llm_tokens_total", 40, kind="prompt")
+    with registry.span("pipeline_stage", stage="send"):
+        pass
+
+    report = registry.run_report()
+    assert report["counters"]["llm_tokens_total"] == [{"labels": {"kind": "prompt"}, "value": 40}]
+    assert [entry["labels"]["stage"] for entry in report["histograms"]["pipeline_stage_seconds"]] == ["send"]
+    assert [span["labels"]["stage"] for span in report["spans"]] == ["send"]
@@ -0,0 +1,65 @@
+"""MinHash signatures: batched equals one at a time, estimates track Jaccard, clusters hold only near-duplicates"""
+import random
+import re
+
+import numpy as np
+
+from app.utils import minhash
+from app.utils.minhash import MinHasher, cluster_signatures, optimal_bands, shingle_hashes
+
+
+def _words(count, seed, vocabulary=2000):
+    rng = random.Random(seed)
+    return [f"w{rng.randrange(vocabulary)}" for _ in range(count)]
+
+
+def _trigram_jaccard(a, b):
+    def grams(text):
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+    return len(grams(a) & grams(b)) / len(grams(a) | grams(b))
+
+
+def test_batched_signatures_match_one_at_a_time(monkeypatch):
+    monkeypatch.setattr(minhash, "_CHUNK", 64)  # Several groups, and one text longer than a group
+    texts = [" ".join(_words(n, seed)) for seed, n in enumerate([0, 2, 30, 50, 200, 10, 0, 70])]
+    hasher = MinHasher(num_perm=32)
+
+    batched = hasher.signatures(texts)
+    assert batched.shape == (len(texts), 32)
+    assert (batched == np.vstack([hasher.signature(t) for t in texts])).all()
+    assert hasher.signatures([]).shape == (0, 32)
+
+
+def test_grams_differing_in_one_word_hash_apart():
+    # 9 distinct trigrams, several differing only in their last word
+    text = "the model ships today the model ships tomorrow the model shipped today"
+    assert len(shingle_hashes(text)) == 9
+    words = _words(20000, seed=5)
+    assert len(shingle_hashes(" ".join(words))) == len(set(zip(words, words[1:], words[2:])))
+
+
+def test_estimated_similarity_tracks_jaccard():
+    base = _words(400, seed=1)
+    edited = base[:250] + _words(150, seed=2)
+    a, b = " ".join(base), " ".join(edited)
+    signatures = MinHasher(num_perm=512).signatures([a, b])
+
+    estimate = (signatures[0] == signatures[1]).mean()
+    assert abs(estimate - _trigram_jaccard(a, b)) < 0.06
+
+
+def test_clusters_hold_near_duplicates_only():
+    story = _words(300, seed=3)
+    copy = ["breaking"] + story[:280] + ["more", "soon"]
+    other = _words(300, seed=4)
+    signatures = MinHasher().signatures([" ".join(story), " ".join(other), " ".join(copy)])
+
+    assert sorted(sorted(c) for c in cluster_signatures(signatures, threshold=0.5)) == [[0, 2], [1]]
+
+
+def test_bands_put_the_lsh_threshold_just_below_the_target():
+    for threshold in (0.3, 0.5, 0.8):
+        bands, rows = optimal_bands(128, threshold)
+        assert bands * rows <= 128
+        assert threshold - 0.1 < (1 / bands) ** (1 / rows) <= threshold
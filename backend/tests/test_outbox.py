@@ -0,0 +1,139 @@
+"""Email outbox: every committed message is sent once, failures are retried then given up"""
+import smtplib
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.models import OutboxMessage
+from app.services import outbox
+
+
+class Killed(BaseException):
+    """The dispatcher process dying: not an Exception, so nothing on the way up handles it"""
+
+
+class FakeSMTP:
+    """
+    Stands in for EmailService: records deliveries, refuses the addresses in reject,
+    and kills the dispatcher after kill_after deliveries
+    """
+
+    def __init__(self):
+        self.my_email = "digest@example.com"
+        self.app_password = "secret"
+        self.delivered = Counter()
+        self.reject = set()
+        self.kill_after = None
+
+    def connect(self):
+        return object()
+
+    def send_with(self, server, to_email, subject, html_content):
+        if to_email in self.reject:
+            raise smtplib.SMTPRecipientsRefused({to_email: (550, b"no such user")})
+        if self.kill_after is not None and sum(self.delivered.values()) >= self.kill_after:
+            raise Killed()
+        self.delivered[to_email] += 1
+
+
+@pytest.fixture
+def smtp(monkeypatch, repository):
+    fake = FakeSMTP()
+    monkeypatch.setattr(outbox, "EmailService", lambda: fake)
+    return fake
+
+
+def _queue(repo, *addresses):
+    return [repo.enqueue_outbox("confirmation", address, "Welcome", "<p>Hi</p>").id for address in addresses]
+
+
+def _status(repo, message_id):
+    repo.session.expire_all()
+    return repo.session.get(OutboxMessage, message_id).status
+
+
+def _expire_leases(repo):
+    repo.session.query(OutboxMessage).filter(OutboxMessage.status == "sending").update(
+        {OutboxMessage.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)}, synchronize_session=False
+    )
+    repo.session.commit()
+
+
+def test_each_message_is_sent_once(smtp, repository):
+    addresses = [f"reader{i}@example.com" for i in range(7)]
+    ids = _queue(repository, *addresses)
+
+    result = outbox.dispatch_outbox(batch_size=3, connections=2)
+    assert result == {"sent": 7, "failed": 0, "batches": 3}
+    assert smtp.delivered == Counter(addresses)
+    assert all(_status(repository, message_id) == "sent" for message_id in ids)
+
+    # Sent messages are never picked up again
+    assert outbox.dispatch_outbox()["sent"] == 0
+    assert sum(smtp.delivered.values()) == 7
+
+
+def test_only_committed_messages_are_sent(smtp, repository):
+    repository.enqueue_outbox("confirmation", "rolled-back@example.com", "Welcome", "<p>Hi</p>", commit=False)
+    repository.session.rollback()
+
+    assert outbox.dispatch_outbox()["sent"] == 0
+    assert not smtp.delivered
+
+
+def test_leased_messages_are_not_claimed_twice(repository):
+    _queue(repository, "a@example.com", "b@example.com")
+    assert len(repository.claim_outbox_batch(10, lease_seconds=300, max_attempts=5)) == 2
+    assert repository.claim_outbox_batch(10, lease_seconds=300, max_attempts=5) == []
+
+    # The dispatcher died: once the lease runs out the messages are due again
+    _expire_leases(repository)
+    assert len(repository.claim_outbox_batch(10, lease_seconds=300, max_attempts=5)) == 2
+
+
+def test_dispatcher_killed_mid_batch_resends_only_the_message_in_flight(smtp, repository):
+    addresses = [f"reader{i}@example.com" for i in range(5)]
+    ids = _queue(repository, *addresses)
+    smtp.kill_after = 3
+
+    with pytest.raises(Killed):
+        outbox.dispatch_outbox(batch_size=5, connections=1)
+    statuses = {address: _status(repository, message_id) for address, message_id in zip(addresses, ids)}
+    assert sorted(statuses.values()) == ["sending"] * 2 + ["sent"] * 3
+    assert {address for address, status in statuses.items() if status == "sent"} == set(smtp.delivered)
+
+    smtp.kill_after = None
+    _expire_leases(repository)
+    assert outbox.dispatch_outbox()["sent"] == 2
+    assert smtp.delivered == Counter(addresses)
+
+
+def test_a_message_whose_dispatcher_keeps_dying_is_given_up(repository):
+    (message_id,) = _queue(repository, "poison@example.com")
+    for _ in range(2):
+        assert len(repository.claim_outbox_batch(10, lease_seconds=300, max_attempts=2)) == 1
+        _expire_leases(repository)
+
+    assert repository.claim_outbox_batch(10, lease_seconds=300, max_attempts=2) == []
+    assert _status(repository, message_id) == "failed"
+
+
+def test_failures_are_retried_with_backoff_then_given_up(monkeypatch, smtp, repository):
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    smtp.reject = {"bounce@example.com"}
+    bounce, ok = _queue(repository, "bounce@example.com", "ok@example.com")
+
+    assert outbox.dispatch_outbox() == {"sent": 1, "failed": 1, "batches": 1}
+    assert _status(repository, ok) == "sent"
+    assert _status(repository, bounce) == "pending"
+    # Backed off: not due yet
+    assert outbox.dispatch_outbox()["batches"] == 0
+
+    repository.session.query(OutboxMessage).filter(OutboxMessage.id == bounce).update(
+        {OutboxMessage.next_attempt_at: datetime.utcnow()}, synchronize_session=False
+    )
+    repository.session.commit()
+    assert outbox.dispatch_outbox()["failed"] == 1
+    assert _status(repository, bounce) == "failed"
+    assert smtp.delivered == Counter({"ok@example.com": 1})
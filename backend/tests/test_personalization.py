@@ -0,0 +1,38 @@
+"""Personalized selection: the vectorized blend matches scores worked out by hand"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.personalization import Personalizer
+
+# One term per topic keeps the TF-IDF rows easy to write down:
+# vision = [1, 0], audio = [0, 1], both = [1/√2, 1/√2] over (vision, audio)
+ARTICLES = [
+    SimpleNamespace(title="vision", summary="vision", relevance_score=9),
+    SimpleNamespace(title="audio", summary="audio", relevance_score=8),
+    SimpleNamespace(title="vision audio", summary="vision audio", relevance_score=7),
+]
+
+
+@pytest.fixture
+def personalizer():
+    return Personalizer(ARTICLES, top_n=2, weight=0.5)
+
+
+def test_affinities_are_cosines_against_the_weighted_interests(personalizer):
+    # ["audio", "vision"] weighs audio 1.0 and vision 0.5: normalized (1, 2) / √5
+    affinity = (personalizer.interest_matrix([["vision"], ["audio", "vision"]]) @ personalizer.article_matrix.T).toarray()
+    s2, s5 = np.sqrt(2), np.sqrt(5)
+    np.testing.assert_allclose(affinity, [[1, 0, 1 / s2], [1 / s5, 2 / s5, 3 / (s5 * s2)]], atol=1e-9)
+
+
+def test_selection_blends_base_scores_with_scaled_affinities(personalizer):
+    # ["vision"]:          0.5*[.9, .8, .7] + 0.5*[1, 0, .707]   = [.950, .400, .704] -> 0, 2
+    # ["audio", "vision"]: 0.5*[.9, .8, .7] + 0.5*[.471, .943, 1] = [.686, .871, .850] -> 1, 2
+    assert personalizer.select([["vision"], ["audio", "vision"]]) == [[0, 2], [1, 2]]
+
+
+def test_subscribers_without_a_usable_profile_get_the_base_ranking(personalizer):
+    assert personalizer.select([None, ["finance"], ["vision"]]) == [[0, 1], [0, 1], [0, 2]]
+    assert Personalizer(ARTICLES, top_n=2, weight=0).select([["audio"]]) == [[0, 1]]
@@ -0,0 +1,41 @@
+"""Repository streaming reads"""
+from datetime import datetime
+
+
+def _add_subscribers(repo, count):
+    for i in range(count):
+        repo.create_email(f"reader{i:02d}@example.com", name=f"Reader {i}")
+
+
+def test_email_pages_cover_every_subscriber_in_id_order(repository):
+    _add_subscribers(repository, 7)
+    pages = list(repository.iter_email_pages(page_size=3))
+    assert [len(page) for page in pages] == [3, 3, 1]
+    ids = [row.id for page in pages for row in page]
+    assert ids == sorted(ids) and len(set(ids)) == 7
+
+    resumed = list(repository.iter_email_pages(page_size=3, after_id=ids[3]))
+    assert [row.id for page in resumed for row in page] == ids[4:]
+
+
+def test_paging_leaves_the_callers_pending_writes_uncommitted(repository):
+    _add_subscribers(repository, 5)
+    repository.create_email("half-done@example.com", name="Pending", commit=False)
+
+    assert sum(len(page) for page in repository.iter_email_pages(page_size=2)) == 5
+    repository.session.rollback()
+
+    assert repository.get_email_by_address("half-done@example.com") is None
+    assert repository.count_emails() == 5
+
+
+def test_enrich_rows_are_read_without_holding_a_connection(repository):
+    repository.bulk_create_anthropic_articles([{
+        "guid": "a1", "title": "Post", "url": "https://example.com/a1", "published_at": datetime.utcnow(),
+        "description": "", "category": None,
+    }])
+    articles = repository.get_anthropic_articles_without_markdown()
+
+    assert not repository.session.in_transaction()
+    assert articles[0].url == "https://example.com/a1"
+    assert repository.update_anthropic_article_markdown("a1", "# Post")
@@ -0,0 +1,60 @@
+"""Full-text search index (SQLite FTS5 over search_documents)"""
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+
+def _add_article(repo, guid: str, title: str, markdown: str, description: str = "") -> None:
+    from app.database.models import AnthropicArticle
+
+    repo.session.add(AnthropicArticle(guid=guid, title=title, url=f"https://example.com/{guid}",
+                                      description=description, published_at=datetime.now(timezone.utc)))
+    repo.session.commit()
+    assert repo.update_anthropic_article_markdown(guid, markdown)
+
+
+def test_search_finds_the_right_document_after_vacuum(repository):
+    for i in range(30):
+        _add_article(repository, f"filler-{i}", f"Filler post {i}", f"Nothing to see in post number {i}.")
+    _add_article(repository, "target", "Speculative decoding", "Draft models make speculative decoding fast.")
+    # Deleting rows leaves gaps VACUUM may close by renumbering implicit rowids
+    for i in range(0, 30, 2):
+        repository.session.execute(text("DELETE FROM search_documents WHERE id = :id"),
+                                   {"id": f"article:anthropic:filler-{i}"})
+    repository.session.commit()
+    with repository.session.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+    # VACUUM only promises to keep rowids that are a declared INTEGER PRIMARY KEY
+    mismatched = repository.session.execute(text(
+        "SELECT count(*) FROM search_documents d JOIN search_documents_fts f ON f.rowid = d.pk "
+        "WHERE f.body != d.body")).scalar()
+    assert mismatched == 0
+    results = repository.search("speculative decoding")["results"]
+    assert [r["id"] for r in results] == ["article:anthropic:target"]
+    assert repository.search("post number 5")["results"][0]["id"] == "article:anthropic:filler-5"
+
+
+def test_articles_are_indexed_by_a_bounded_excerpt(repository):
+    from app.database.models import SearchDocument
+    from app.database.repository import SEARCH_EXCERPT_CHARS
+
+    body = "Opening paragraph about mixture of experts. " + "Filler sentence. " * 5000 + "Closing remark."
+    _add_article(repository, "long", "A long post", body, description="Routing tokens to experts")
+
+    document = repository.session.query(SearchDocument).filter_by(id="article:anthropic:long").one()
+    assert len(document.body) == SEARCH_EXCERPT_CHARS
+    assert document.body.startswith("Routing tokens to experts")
+    assert repository.search("routing experts")["results"][0]["id"] == "article:anthropic:long"
+    assert repository.search("closing remark")["results"] == []
+
+
+def test_reindexing_updates_the_document_in_place(repository):
+    from app.database.models import SearchDocument
+
+    _add_article(repository, "edited", "Edited post", "First version about quantization.")
+    assert repository.update_anthropic_article_markdown("edited", "Second version about distillation.")
+
+    assert repository.session.query(SearchDocument).count() == 1
+    assert repository.search("quantization")["results"] == []
+    assert repository.search("distillation")["results"][0]["id"] == "article:anthropic:edited"
@@ -0,0 +1,81 @@
+"""Streaming ingest: a failing item must not stop its worker or hang the run"""
+import threading
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.pipeline import streaming
+from app.pipeline.streaming import StreamingIngest
+
+
+def _feed_items(count: int):
+    return [
+        SimpleNamespace(guid=f"item-{i}", title=f"Item {i}", url=f"https://example.com/{i}",
+                        description=f"Description of item {i}", published_at=datetime.now(timezone.utc))
+        for i in range(count)
+    ]
+
+
+def _run_with_timeout(ingest: StreamingIngest, seconds: float = 10.0) -> dict:
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(ingest.run()), daemon=True)
+    thread.start()
+    thread.join(seconds)
+    assert not thread.is_alive(), "streaming ingest hung"
+    return result
+
+
+def _fail_first(method):
+    calls = []
+
+    def wrapper(self, *args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return method(self, *args)
+    return wrapper
+
+
+@pytest.fixture
+def small_queues(monkeypatch, repository):
+    monkeypatch.setattr(streaming, "DIGEST_BATCH_ENABLED", False)
+
+    def digest(self, article, agent, repo):
+        self._count("digests", "total")
+        self._count("digests", "processed")
+    monkeypatch.setattr(StreamingIngest, "_digest", _fail_first(digest))
+
+
+def test_digest_worker_survives_a_failed_item(monkeypatch, small_queues):
+    monkeypatch.setattr(streaming, "SCRAPER_NAMES", ["openai"])
+    ingest = StreamingIngest(queue_size=2, digest_workers=1, scrape=lambda name, hours: _feed_items(10))
+
+    result = _run_with_timeout(ingest)
+    assert result["digests"]["failed"] == 1
+    assert result["digests"]["processed"] == 9
+
+
+def test_fetch_worker_survives_a_failed_item(monkeypatch, small_queues):
+    monkeypatch.setattr(streaming, "SCRAPER_NAMES", ["anthropic"])
+
+    def queue_pending(self, name):
+        self.stats["processing"][name] = {"total": 6, "processed": 0, "failed": 0}
+        for item in _feed_items(6):
+            self._put(self.fetch_queue, "fetch", {
+                "type": name, "id": item.guid, "title": item.title, "url": item.url,
+                "description": item.description, "published_at": item.published_at
+            })
+
+    def fetch(self, task, scrapers):
+        return {**task, "content": task["description"]}
+
+    monkeypatch.setattr(StreamingIngest, "_queue_pending_enrichment", queue_pending)
+    monkeypatch.setattr(StreamingIngest, "_fetch", _fail_first(fetch))
+    ingest = StreamingIngest(queue_size=2, fetch_workers=1, digest_workers=1, scrape=lambda name, hours: [])
+
+    result = _run_with_timeout(ingest)
+    assert result["processing"]["anthropic"]["failed"] == 1
+    # The first digest fails too (see small_queues), the rest go through
+    assert result["digests"]["failed"] == 1
+    assert result["digests"]["processed"] == 4
@@ -0,0 +1,55 @@
+"""Profile cache: invalidate() reloads edits, the cache is bounded in size and age"""
+import pytest
+
+from app.profiles import user_profile
+from app.profiles.user_profile import DEFAULT_INTERESTS, ProfileService
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_profile.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_invalidate_reloads_one_subscriber_or_everyone(repository):
+    repository.create_email("ada@example.com", name="Ada")
+    repository.create_email("bob@example.com", name="Bob")
+    service = ProfileService()
+    assert service.get()["name"] == "Ada"
+    assert service.get("bob@example.com")["interests"] == DEFAULT_INTERESTS
+
+    repository.set_subscriber_interests("bob@example.com", ["audio models"])
+    assert service.get("bob@example.com")["interests"] == DEFAULT_INTERESTS  # Still cached
+    service.invalidate("bob@example.com")
+    assert service.get("bob@example.com")["interests"] == ["audio models"]
+
+    repository.update_email_status("ada@example.com", False)
+    service.invalidate()
+    assert service.get()["name"] == "Bob"
+
+
+def test_least_recently_used_profiles_are_dropped(repository):
+    service = ProfileService(max_size=2)
+    service.prime("a@example.com", "A", None)
+    service.prime("b@example.com", "B", None)
+    service.get("a@example.com")
+    service.prime("c@example.com", "C", None)
+
+    assert list(service._profiles) == ["a@example.com", "c@example.com"]
+    # A batch larger than the cache still returns every profile
+    assert len(service.load_many(f"{i}@example.com" for i in range(5))) == 5
+    assert len(service._profiles) == 2
+
+
+def test_profiles_are_reloaded_after_the_ttl(repository, clock):
+    repository.create_email("ada@example.com", name="Ada")
+    service = ProfileService(ttl_seconds=60)
+    assert service.get("ada@example.com")["name"] == "Ada"
+
+    repository.get_email_by_address("ada@example.com").name = "Ada L."  # Renamed outside the API
+    repository.session.commit()
+    clock[0] += 59
+    assert service.get("ada@example.com")["name"] == "Ada"
+    clock[0] += 1
+    assert service.get("ada@example.com")["name"] == "Ada L."